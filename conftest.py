@@ -7,3 +7,20 @@
 What this file is actually for is per-directory fixture scopes:
 http://doc.pytest.org/en/latest/example/simple.html#package-directory-level-fixtures-setups
 """
+import pytest
+
+from pypyraws.aws.instrumentation import metrics
+import pypyraws.aws.s3
+import pypyraws.aws.service
+
+
+@pytest.fixture(autouse=True)
+def clear_client_cache():
+    """Do not leak cached boto clients, documents or metrics between tests."""
+    pypyraws.aws.service.clear_client_cache()
+    pypyraws.aws.s3.clear_document_cache()
+    metrics.reset()
+    yield
+    pypyraws.aws.service.clear_client_cache()
+    pypyraws.aws.s3.clear_document_cache()
+    metrics.reset()
@@ -0,0 +1,204 @@
+"""asyncio execution backend for aws client operations.
+
+Multiplexes many concurrent aws calls on one event loop.
+
+If aiobotocore is installed, calls use native async aiobotocore clients, so
+thousands of in-flight requests don't need a thread each. If it isn't, or if
+you use a pypyraws.aws.session.AwsSession, calls fall back to the blocking
+pypyraws.aws.service functions on a thread pool executor.
+
+Only the pypyraws.steps.clientbatch fan-out runs on this backend. Waiters and
+the other polling steps don't: they spend nearly all their time sleeping
+between polls, so they run on threads or on the shared
+pypyraws.aws.scheduler instead.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack
+import functools
+import logging
+from pypyraws.aws import instrumentation
+import pypyraws.aws.service
+from pypyraws.aws.service import CallResult
+
+# pypyr logger means the log level will be set correctly and output formatted.
+logger = logging.getLogger(__name__)
+
+
+class AsyncBackend():
+    """Async context manager that executes aws calls with bounded concurrency.
+
+    Use it like this:
+        async with AsyncBackend(max_concurrency=100) as backend:
+            response = await backend.operation_exec('ecs', 'describe_tasks',
+                                                    operation_args=args)
+
+    aiobotocore clients live as long as the backend, so calls with the same
+    service_name and client_args reuse the same client and connection pool.
+
+    Attributes:
+        max_concurrency (int): At most this many calls in flight at once.
+        is_native (bool): True if using aiobotocore, False if using the
+            thread pool fallback.
+    """
+
+    def __init__(self, max_concurrency=100, session=None):
+        """Initialize the backend.
+
+        Args:
+            max_concurrency (int): At most this many calls in flight at once.
+            session (pypyraws.aws.session.AwsSession): Create clients from
+                this session. Forces the thread pool fallback, because
+                aiobotocore can't create clients from a boto3 session.
+        """
+        self.max_concurrency = max_concurrency
+        self.session = session
+        self._aio_session = None if session else get_aio_session()
+        self.is_native = self._aio_session is not None
+        self._semaphore = None
+        self._stack = None
+        self._executor = None
+        self._clients = {}
+        self._clients_lock = None
+
+    async def __aenter__(self):
+        """Start the backend."""
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._stack = AsyncExitStack()
+        if self.is_native:
+            logger.debug("using aiobotocore async clients")
+            self._clients_lock = asyncio.Lock()
+        else:
+            logger.debug("aiobotocore not available, using thread pool")
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_concurrency)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        """Close clients and shut down the thread pool."""
+        await self._stack.aclose()
+        self._clients.clear()
+        if self._executor:
+            self._executor.shutdown(wait=True)
+
+    async def operation_exec(self,
+                             service_name,
+                             method_name,
+                             client_args=None,
+                             operation_args=None):
+        """Execute operation on aws service client.
+
+        Args and return are the same as pypyraws.aws.service.operation_exec.
+        """
+        async with self._semaphore:
+            if self.is_native:
+                client = await self._get_client(service_name, client_args)
+                return await getattr(client, method_name)(
+                    **(operation_args or {}))
+
+            return await self._run_in_executor(
+                pypyraws.aws.service.operation_exec,
+                service_name=service_name,
+                method_name=method_name,
+                client_args=client_args,
+                operation_args=operation_args,
+                session=self.session)
+
+    async def _get_client(self, service_name, client_args):
+        """Get aiobotocore client, create it on first use.
+
+        If client_args config is a dict, it's the kwargs for
+        aiobotocore.config.AioConfig, like get_client does with
+        botocore.config.Config.
+        """
+        key = (service_name, pypyraws.aws.service.freeze(client_args))
+        async with self._clients_lock:
+            client = self._clients.get(key)
+            if client is None:
+                client_args = dict(client_args or {})
+                config = client_args.get('config', None)
+                if isinstance(config, dict):
+                    from aiobotocore.config import AioConfig
+
+                    client_args['config'] = AioConfig(**config)
+
+                client = await self._stack.enter_async_context(
+                    self._aio_session.create_client(service_name,
+                                                    **client_args))
+                self._clients[key] = instrumentation.instrument(client)
+                logger.debug(f"aiobotocore client instantiated {service_name}")
+        return client
+
+    async def _run_in_executor(self, func, **kwargs):
+        """Run blocking func on the thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor,
+                                          functools.partial(func, **kwargs))
+
+
+def get_aio_session():
+    """Get aiobotocore session if aiobotocore is installed, else None."""
+    try:
+        from aiobotocore.session import get_session
+    except ImportError:
+        return None
+
+    return get_session()
+
+
+async def operation_exec_many_async(calls,
+                                    max_concurrency=100,
+                                    fail_fast=False,
+                                    session=None):
+    """Execute many aws client operations concurrently on the event loop.
+
+    Args, return and errors are the same as
+    pypyraws.aws.service.operation_exec_many, with max_concurrency instead of
+    max_workers.
+    """
+    logger.debug("started")
+    if not calls:
+        logger.debug("no calls, done")
+        return []
+
+    async with AsyncBackend(max_concurrency=max_concurrency,
+                            session=session) as backend:
+        tasks = [asyncio.ensure_future(backend.operation_exec(**call))
+                 for call in calls]
+
+        if fail_fast:
+            try:
+                responses = await asyncio.gather(*tasks)
+            except Exception:
+                for task in tasks:
+                    task.cancel()
+                raise
+            results = [CallResult(response, None) for response in responses]
+        else:
+            outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+            results = [CallResult(None, outcome)
+                       if isinstance(outcome, Exception)
+                       else CallResult(outcome, None)
+                       for outcome in outcomes]
+
+    logger.debug(f"executed {len(calls)} calls with max {max_concurrency} "
+                 "concurrent")
+    logger.debug("done")
+    return results
+
+
+def operation_exec_many(calls,
+                        max_concurrency=100,
+                        fail_fast=False,
+                        session=None):
+    """Execute many aws client operations concurrently on a new event loop.
+
+    Blocking entry point for operation_exec_many_async, for use from steps.
+    Don't call this from inside a running event loop - await
+    operation_exec_many_async instead.
+    """
+    return asyncio.run(operation_exec_many_async(
+        calls=calls,
+        max_concurrency=max_concurrency,
+        fail_fast=fail_fast,
+        session=session))
@@ -0,0 +1,198 @@
+"""Wait for aws events on an sqs queue instead of polling describe calls.
+
+EventBridge rules can send state change events, like ecs task state changes
+or cloudformation stack status changes, to an sqs queue. Long polling that
+queue gets the event as soon as it arrives, for one receive call per 20
+seconds, rather than one describe call per poll interval and on average half a
+poll interval of extra latency.
+
+receive_event works with any sqs compatible endpoint, so point clientArgs
+endpoint_url at a local sqs stand-in like ElasticMQ or LocalStack to test.
+"""
+import json
+import logging
+import math
+import pypyraws.aws.service
+from pypyraws.poll import Deadline
+
+# pypyr logger means the log level will be set correctly and output formatted.
+logger = logging.getLogger(__name__)
+
+# sqs limits per receive_message call.
+MAX_WAIT_TIME_SECONDS = 20
+MAX_MESSAGES = 10
+
+
+def match_event(event, pattern):
+    """Check if event matches an EventBridge style event pattern.
+
+    Every key in pattern must be in event. For each key, the pattern value
+    is one of:
+        - dict: the event value is a dict that matches it, recursively.
+        - list: the event value equals any item in the list. If the event
+          value is itself a list, any of its items equals any item.
+        - anything else: the event value equals it.
+
+    Args:
+        event (dict): The event.
+        pattern (dict): Match event against this.
+
+    Returns:
+        bool. True if event matches pattern.
+    """
+    if not isinstance(event, dict):
+        return False
+
+    for key, expected in pattern.items():
+        if key not in event:
+            return False
+
+        value = event[key]
+        if isinstance(expected, dict):
+            if not match_event(value, expected):
+                return False
+        elif isinstance(expected, list):
+            values = value if isinstance(value, list) else [value]
+            if not any(item in expected for item in values):
+                return False
+        elif value != expected:
+            return False
+
+    return True
+
+
+def get_event(message):
+    """Get the event in an sqs message body.
+
+    Unwraps the event if it came through an sns topic.
+
+    Args:
+        message (dict): sqs message from receive_message.
+
+    Returns:
+        dict. The event, or None if the body isn't json.
+    """
+    try:
+        event = json.loads(message['Body'])
+        if (isinstance(event, dict)
+                and event.get('Type') == 'Notification'
+                and 'Message' in event):
+            event = json.loads(event['Message'])
+    except ValueError:
+        logger.debug(f"skipping message {message.get('MessageId')}: body "
+                     "isn't json")
+        return None
+
+    return event
+
+
+def receive_event(queue_url,
+                  pattern,
+                  timeout,
+                  wait_time_seconds=MAX_WAIT_TIME_SECONDS,
+                  delete_matched=True,
+                  delete_unmatched=False,
+                  client_args=None,
+                  session=None,
+                  clock=None):
+    """Long poll an sqs queue until an event matching pattern arrives.
+
+    Messages that don't match stay on the queue and become visible again after
+    the queue's visibility timeout, unless delete_unmatched.
+
+    Args:
+        queue_url (str): sqs queue that receives the events.
+        pattern (dict): EventBridge style event pattern. See match_event.
+        timeout (float): Stop waiting after this many seconds.
+        wait_time_seconds (int): Long poll for at most this many seconds per
+            receive call. 20 at most.
+        delete_matched (bool): Delete the matching message from the queue.
+        delete_unmatched (bool): Delete messages that don't match. Only do
+            this if nothing else reads the queue.
+        client_args (dict): kwargs for the sqs boto client ctor.
+        session (pypyraws.aws.session.AwsSession): Create client from this
+            session. If None, use the boto3 default session.
+        clock (callable): Returns monotonic time in seconds. Default
+            time.monotonic.
+
+    Returns:
+        dict. The first matching event, or None if timeout ran out first.
+    """
+    logger.debug("started")
+    deadline = Deadline(timeout, clock)
+    wait_time_seconds = min(int(wait_time_seconds), MAX_WAIT_TIME_SECONDS)
+    received = 0
+
+    while True:
+        remaining = deadline.remaining()
+        if remaining <= 0:
+            logger.debug(f"no matching event in {received} messages within "
+                         f"{timeout} seconds")
+            logger.debug("done")
+            return None
+
+        response = pypyraws.aws.service.operation_exec(
+            service_name='sqs',
+            method_name='receive_message',
+            client_args=client_args,
+            operation_args={
+                'QueueUrl': queue_url,
+                'MaxNumberOfMessages': MAX_MESSAGES,
+                'WaitTimeSeconds': min(wait_time_seconds,
+                                       math.ceil(remaining))},
+            session=session)
+
+        messages = response.get('Messages', [])
+        received += len(messages)
+
+        matched = None
+        to_delete = []
+        for message in messages:
+            event = get_event(message)
+            if event is not None and match_event(event, pattern):
+                # later matches in the batch stay on the queue, they aren't
+                # unmatched.
+                if matched is None:
+                    matched = event
+                    if delete_matched:
+                        to_delete.append(message)
+            elif delete_unmatched:
+                to_delete.append(message)
+
+        delete_messages(queue_url, to_delete, client_args, session)
+
+        if matched is not None:
+            logger.debug(f"matched event after {received} messages")
+            logger.debug("done")
+            return matched
+
+
+def delete_messages(queue_url, messages, client_args=None, session=None):
+    """Delete up to 10 messages from queue_url in one call.
+
+    Logs a warning for messages sqs couldn't delete, rather than raising,
+    since the event has already been received.
+
+    Args:
+        queue_url (str): sqs queue.
+        messages (list of dict): sqs messages from receive_message.
+        client_args (dict): kwargs for the sqs boto client ctor.
+        session (pypyraws.aws.session.AwsSession): Create client from this
+            session. If None, use the boto3 default session.
+    """
+    if not messages:
+        return
+
+    response = pypyraws.aws.service.operation_exec(
+        service_name='sqs',
+        method_name='delete_message_batch',
+        client_args=client_args,
+        operation_args={
+            'QueueUrl': queue_url,
+            'Entries': [{'Id': str(i), 'ReceiptHandle': m['ReceiptHandle']}
+                        for i, m in enumerate(messages)]},
+        session=session)
+
+    for failed in response.get('Failed', []):
+        logger.warning(f"couldn't delete message {failed.get('Id')} from "
+                       f"{queue_url}: {failed.get('Message')}")
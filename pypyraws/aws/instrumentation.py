@@ -0,0 +1,219 @@
+"""Per-operation metrics for the boto clients pypyraws creates.
+
+Hooks into botocore's client events, so every aws call through any pypyraws
+step records latency, retries, throttling, errors and bytes transferred.
+
+Metrics are process-wide, like the client cache. Call reset() to start
+counting from zero, for example at the start of a pipeline.
+"""
+from collections import defaultdict
+import logging
+import threading
+import time
+
+# pypyr logger means the log level will be set correctly and output formatted.
+logger = logging.getLogger(__name__)
+
+# botocore's standard retry mode treats these error codes as throttling.
+THROTTLING_ERROR_CODES = frozenset([
+    'BandwidthLimitExceeded',
+    'EC2ThrottledException',
+    'LimitExceededException',
+    'PriorRequestNotComplete',
+    'ProvisionedThroughputExceededException',
+    'RequestLimitExceeded',
+    'RequestThrottled',
+    'RequestThrottledException',
+    'SlowDown',
+    'ThrottledException',
+    'Throttling',
+    'ThrottlingException',
+    'TooManyRequestsException',
+    'TransactionInProgressException',
+])
+
+# keys in the botocore request context to keep state between events.
+_START_KEY = 'pypyraws_start'
+_OPERATION_KEY = 'pypyraws_operation'
+_BYTES_SENT_KEY = 'pypyraws_bytes_sent'
+
+
+class OperationMetrics():
+    """Running totals for one aws operation."""
+
+    __slots__ = ('calls', 'errors', 'retries', 'throttles', 'latency_total',
+                 'latency_max', 'bytes_sent', 'bytes_received')
+
+    def __init__(self):
+        """Initialize all totals to 0."""
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.throttles = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def to_dict(self):
+        """Get totals as dict with camelCase keys, latency in seconds."""
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'retries': self.retries,
+            'throttles': self.throttles,
+            'latencyTotal': self.latency_total,
+            'latencyMax': self.latency_max,
+            'latencyAvg': (self.latency_total / self.calls
+                           if self.calls else 0.0),
+            'bytesSent': self.bytes_sent,
+            'bytesReceived': self.bytes_received}
+
+
+class Metrics():
+    """Thread-safe metrics for all instrumented clients."""
+
+    def __init__(self):
+        """Initialize empty metrics."""
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Set all metrics back to 0."""
+        with self._lock:
+            self._operations = defaultdict(OperationMetrics)
+            self._clients_created = 0
+            self._client_creation_time = 0.0
+
+    def record_client_created(self, duration):
+        """Record that creating a client took duration seconds."""
+        with self._lock:
+            self._clients_created += 1
+            self._client_creation_time += duration
+
+    def record_call(self,
+                    operation,
+                    latency,
+                    retries=0,
+                    is_error=False,
+                    bytes_sent=0,
+                    bytes_received=0):
+        """Record one completed aws call, including all of its retries."""
+        with self._lock:
+            metrics = self._operations[operation]
+            metrics.calls += 1
+            metrics.retries += retries
+            metrics.latency_total += latency
+            metrics.latency_max = max(metrics.latency_max, latency)
+            metrics.bytes_sent += bytes_sent
+            metrics.bytes_received += bytes_received
+            if is_error:
+                metrics.errors += 1
+
+    def record_throttle(self, operation):
+        """Record one throttled attempt."""
+        with self._lock:
+            self._operations[operation].throttles += 1
+
+    def summary(self):
+        """Get all metrics as a dict.
+
+        Returns:
+            dict with keys:
+                - operations: dict. Key is service.Operation, value is dict of
+                  calls, errors, retries, throttles, latencyTotal, latencyMax,
+                  latencyAvg, bytesSent, bytesReceived. Latency is in seconds
+                  and includes retries.
+                - clients: dict of created and creationTime in seconds.
+                - totals: dict of calls, errors, retries, throttles,
+                  latencyTotal, bytesSent, bytesReceived over all operations.
+        """
+        with self._lock:
+            operations = {name: metrics.to_dict()
+                          for name, metrics in self._operations.items()}
+            clients = {'created': self._clients_created,
+                       'creationTime': self._client_creation_time}
+
+        totals = {key: sum(op[key] for op in operations.values())
+                  for key in ('calls', 'errors', 'retries', 'throttles',
+                              'latencyTotal', 'bytesSent', 'bytesReceived')}
+
+        return {'operations': operations,
+                'clients': clients,
+                'totals': totals}
+
+
+metrics = Metrics()
+
+
+def instrument(client):
+    """Register metrics handlers on client's botocore events.
+
+    Args:
+        client: boto low-level service client.
+
+    Returns:
+        The same client, for convenience. Clients without botocore events
+        return as is, uninstrumented.
+    """
+    try:
+        events = client.meta.events
+    except AttributeError:
+        logger.debug("client has no botocore events, not instrumenting it")
+        return client
+
+    events.register('before-call', _before_call)
+    events.register('after-call', _after_call)
+    events.register('after-call-error', _after_call_error)
+    events.register('needs-retry', _needs_retry)
+    return client
+
+
+def _before_call(model, params, context, **kwargs):
+    """Record start time and request size before the first attempt."""
+    context[_START_KEY] = time.perf_counter()
+    context[_OPERATION_KEY] = _get_operation_name(model)
+    body = params.get('body') if isinstance(params, dict) else None
+    context[_BYTES_SENT_KEY] = (
+        len(body) if isinstance(body, (bytes, bytearray, str)) else 0)
+
+
+def _after_call(http_response, parsed, model, context, **kwargs):
+    """Record latency, retries and response size after the last attempt."""
+    metadata = parsed.get('ResponseMetadata', {}) if parsed else {}
+    content_length = http_response.headers.get('content-length')
+
+    metrics.record_call(
+        operation=_get_operation_name(model),
+        latency=_get_latency(context),
+        retries=metadata.get('RetryAttempts', 0),
+        is_error=http_response.status_code >= 400,
+        bytes_sent=context.get(_BYTES_SENT_KEY, 0),
+        bytes_received=int(content_length) if content_length else 0)
+
+
+def _after_call_error(context, **kwargs):
+    """Record a call that failed without an http response."""
+    metrics.record_call(
+        operation=context.get(_OPERATION_KEY, 'unknown'),
+        latency=_get_latency(context),
+        is_error=True,
+        bytes_sent=context.get(_BYTES_SENT_KEY, 0))
+
+
+def _needs_retry(response, operation, **kwargs):
+    """Count attempts that failed with a throttling error."""
+    if response:
+        _, parsed = response
+        code = (parsed or {}).get('Error', {}).get('Code')
+        if code in THROTTLING_ERROR_CODES:
+            metrics.record_throttle(_get_operation_name(operation))
+
+
+def _get_latency(context):
+    start = context.get(_START_KEY)
+    return time.perf_counter() - start if start else 0.0
+
+
+def _get_operation_name(model):
+    return f"{model.service_model.service_name}.{model.name}"
@@ -0,0 +1,116 @@
+"""Track many aws resources through batched describe calls.
+
+Describe operations take a list of ids, up to a per-api limit. Rather than one
+call per resource per poll, ResourceTracker chunks the ids that are still
+pending into as few calls as the limit allows, and picks each resource's item
+out of the responses by id.
+
+jmespath only imports when you create a tracker.
+"""
+import logging
+
+# pypyr logger means the log level will be set correctly and output formatted.
+logger = logging.getLogger(__name__)
+
+# resource states in addition to the acceptor states.
+STATE_PENDING = 'pending'
+
+# ec2 describe_instances takes up to 1000 ids, but 100 is the limit for
+# ecs describe_tasks and many other describe calls.
+DEFAULT_BATCH_SIZE = 100
+
+
+class ResourceTracker():
+    """State per resource id for a multi-resource wait.
+
+    Attributes:
+        resource_ids (list): All ids, in input order.
+        ids_key (str): Inject each chunk of ids into the operation args
+            under this key.
+        batch_size (int): At most this many ids per call.
+    """
+
+    def __init__(self,
+                 resource_ids,
+                 ids_key,
+                 items_query,
+                 id_query,
+                 batch_size=DEFAULT_BATCH_SIZE):
+        """Initialize all resources as pending.
+
+        Args:
+            resource_ids (list): Ids of the resources to wait for.
+            ids_key (str): Operation arg that takes the list of ids, e.g
+                InstanceIds or tasks.
+            items_query (str): JMESPath expression that gets the list of
+                per-resource items from a response, e.g
+                Reservations[].Instances[] or tasks.
+            id_query (str): JMESPath expression that gets the id from an
+                item, e.g InstanceId or taskArn.
+            batch_size (int): At most this many ids per call.
+
+        Raises:
+            ValueError: batch_size < 1.
+        """
+        import jmespath
+
+        if batch_size < 1:
+            raise ValueError(f"batch size must be >= 1, not {batch_size}.")
+
+        self.resource_ids = list(dict.fromkeys(resource_ids))
+        self.ids_key = ids_key
+        self.batch_size = batch_size
+        self._items_query = jmespath.compile(items_query)
+        self._id_query = jmespath.compile(id_query)
+        self._states = {resource_id: STATE_PENDING
+                        for resource_id in self.resource_ids}
+
+    @property
+    def pending(self):
+        """Ids still pending, in input order."""
+        return [resource_id for resource_id in self.resource_ids
+                if self._states[resource_id] == STATE_PENDING]
+
+    @property
+    def done(self):
+        """True if no resources are pending."""
+        return not self.pending
+
+    def get_calls(self, operation_args=None):
+        """Get operation args for each chunk of pending ids.
+
+        Args:
+            operation_args (dict): Operation args to add the ids to. Doesn't
+                change this dict.
+
+        Returns:
+            list of dict. One dict of operation args per chunk.
+        """
+        pending = self.pending
+        return [{**(operation_args or {}),
+                 self.ids_key: pending[i:i + self.batch_size]}
+                for i in range(0, len(pending), self.batch_size)]
+
+    def get_items(self, responses):
+        """Get the item for each pending resource in responses.
+
+        Args:
+            responses (list of dict): aws responses to the get_calls calls.
+
+        Yields:
+            tuple(resource_id, item) for each pending resource found.
+            Resources missing from the responses stay pending.
+        """
+        for response in responses:
+            for item in self._items_query.search(response) or []:
+                resource_id = self._id_query.search(item)
+                if self._states.get(resource_id) == STATE_PENDING:
+                    yield resource_id, item
+
+    def set_state(self, resource_id, state):
+        """Set resource_id's state."""
+        self._states[resource_id] = state
+
+    def to_dict(self):
+        """Get state per resource id."""
+        return dict(self._states)
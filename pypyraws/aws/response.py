@@ -0,0 +1,236 @@
+"""Work with the responses from aws client operations."""
+import logging
+from string import Formatter
+
+# pypyr logger means the log level will be set correctly and output formatted.
+logger = logging.getLogger(__name__)
+
+
+def project(response, query=None, strip_metadata=False):
+    """Keep only the parts of an aws response that you need.
+
+    Args:
+        response (dict): Response from an aws client operation.
+        query (str): JMESPath expression. Return only the result of this
+            expression on the response.
+        strip_metadata (bool): If True, remove ResponseMetadata (request id,
+            http status, headers and retries) from the response before applying
+            query.
+
+    Returns:
+        The projected response. If neither query nor strip_metadata, the
+        response as is.
+    """
+    if strip_metadata and isinstance(response, dict):
+        logger.debug("removing ResponseMetadata from aws response")
+        response = {k: v for k, v in response.items()
+                    if k != 'ResponseMetadata'}
+
+    if query:
+        import jmespath
+
+        logger.debug(f"projecting aws response with {query}")
+        response = jmespath.compile(query).search(response)
+
+    return response
+
+
+# how a query result compares to the expected value. Same as botocore waiter
+# acceptor matchers.
+MATCH_PATH = 'path'
+MATCH_PATH_ALL = 'pathAll'
+MATCH_PATH_ANY = 'pathAny'
+
+# acceptor states. Same as botocore waiter acceptors.
+STATE_SUCCESS = 'success'
+STATE_FAILURE = 'failure'
+STATE_RETRY = 'retry'
+
+
+def compile_format(format_string):
+    """Compile a str.format expression to format many responses with.
+
+    Parses format_string once, so each call only looks up the fields.
+
+    Args:
+        format_string (str): str.format expression with response keys as
+            fields, e.g '{tasks[0][lastStatus]}'.
+
+    Returns:
+        callable: format_response(response) -> str. Same result as
+        format_string.format(**response).
+    """
+    formatter = Formatter()
+    parts = list(formatter.parse(format_string))
+
+    if any(spec and '{' in spec for _, _, spec, _ in parts):
+        # nested fields in the format spec need the full formatter.
+        return lambda response: format_string.format(**response)
+
+    def format_response(response):
+        out = []
+        for literal, field_name, spec, conversion in parts:
+            out.append(literal)
+            if field_name is not None:
+                value, _ = formatter.get_field(field_name, (), response)
+                value = formatter.convert_field(value, conversion)
+                out.append(format(value, spec))
+
+        return ''.join(out)
+
+    return format_response
+
+
+class ResponseMatcher():
+    """Check whether an aws response has the expected value.
+
+    Compile once, call on every poll.
+
+    With field, formats field against the response like str.format and compares
+    the resulting string with str(expected).
+
+    With query, evaluates the JMESPath query and compares the typed result with
+    expected, so 3 == 3 and True == True but '3' != 3 and 1 != True. matcher
+    decides how:
+        - path: the result equals expected.
+        - pathAll: the result is a non-empty list where every item equals
+          expected.
+        - pathAny: the result is a list where at least one item equals
+          expected.
+
+    Attributes:
+        expression (str): The field or query, for logging.
+        is_query (bool): True if expression is a JMESPath query, False if
+            it's a str.format field.
+        expected: Match this value.
+    """
+
+    def __init__(self, expected, field=None, query=None, matcher=MATCH_PATH):
+        """Compile field or query.
+
+        Args:
+            expected: Match this value.
+            field (str): str.format expression. Set this or query.
+            query (str): JMESPath expression. Set this or field.
+            matcher (str): path, pathAll or pathAny. Only for query.
+
+        Raises:
+            ValueError: Not exactly one of field and query, or unknown matcher.
+        """
+        if (field is None) == (query is None):
+            raise ValueError("set exactly one of field or query.")
+
+        if matcher not in (MATCH_PATH, MATCH_PATH_ALL, MATCH_PATH_ANY):
+            raise ValueError(f"matcher must be {MATCH_PATH}, "
+                             f"{MATCH_PATH_ALL} or {MATCH_PATH_ANY}, not "
+                             f"{matcher}.")
+
+        self.expected = expected
+        self.matcher = matcher
+        self.is_query = field is None
+
+        if self.is_query:
+            import jmespath
+
+            self.expression = query
+            self.get_value = jmespath.compile(query).search
+            self._expected = expected
+        else:
+            self.expression = field
+            self.get_value = compile_format(field)
+            self._expected = str(expected)
+            self.matcher = MATCH_PATH
+
+    def matches(self, value):
+        """Check value from get_value against expected.
+
+        Args:
+            value: Result of get_value(response).
+
+        Returns:
+            bool. True if value matches expected.
+        """
+        if self.matcher == MATCH_PATH:
+            return _equals(value, self._expected)
+
+        if not isinstance(value, list):
+            return False
+
+        if self.matcher == MATCH_PATH_ALL:
+            return bool(value) and all(_equals(item, self._expected)
+                                       for item in value)
+
+        return any(_equals(item, self._expected) for item in value)
+
+    def __call__(self, response):
+        """Check whether response has the expected value."""
+        return self.matches(self.get_value(response))
+
+    def __repr__(self):
+        """Show what this matches."""
+        return (f"ResponseMatcher({self.matcher} {self.expression} == "
+                f"{self.expected!r})")
+
+
+class Acceptor():
+    """Waiter state to enter when a response matches.
+
+    Attributes:
+        state (str): success, failure or retry.
+        matcher (ResponseMatcher): Enter state when this matches.
+    """
+
+    def __init__(self, state, matcher):
+        """Initialize the acceptor.
+
+        Args:
+            state (str): success, failure or retry.
+            matcher (ResponseMatcher): Enter state when this matches.
+
+        Raises:
+            ValueError: Unknown state.
+        """
+        if state not in (STATE_SUCCESS, STATE_FAILURE, STATE_RETRY):
+            raise ValueError(f"acceptor state must be {STATE_SUCCESS}, "
+                             f"{STATE_FAILURE} or {STATE_RETRY}, not "
+                             f"{state}.")
+
+        self.state = state
+        self.matcher = matcher
+
+    def to_dict(self):
+        """Describe acceptor as dict with camelCase keys."""
+        return {'state': self.state,
+                'matcher': self.matcher.matcher,
+                'expression': self.matcher.expression,
+                'expected': self.matcher.expected}
+
+    def to_waiter_acceptor(self):
+        """Describe acceptor as an acceptor in a botocore waiter model.
+
+        Raises:
+            ValueError: The matcher is a str.format field, which botocore
+                        can't evaluate. Only JMESPath queries can.
+        """
+        if not self.matcher.is_query:
+            raise ValueError(
+                f"botocore waiters need a JMESPath query, not field "
+                f"{self.matcher.expression}.")
+
+        return {'state': self.state,
+                'matcher': self.matcher.matcher,
+                'argument': self.matcher.expression,
+                'expected': self.matcher.expected}
+
+    def __repr__(self):
+        """Show state and what it matches."""
+        return f"Acceptor({self.state} when {self.matcher!r})"
+
+
+def _equals(value, expected):
+    """Compare, but don't let bools equal ints like python does."""
+    if isinstance(value, bool) or isinstance(expected, bool):
+        return (isinstance(value, bool) and isinstance(expected, bool)
+                and value == expected)
+
+    return value == expected
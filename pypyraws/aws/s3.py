@@ -1,13 +1,46 @@
 """s3 higher-level functions."""
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+import copy
+import io
 import logging
+import tempfile
+import threading
+import pypyraws.aws.s3cache
 import pypyraws.aws.service
 from pypyr.errors import KeyNotInContextError
+from pypyr.utils.types import cast_to_bool
+from pypyraws.cache import LruCache
 
 # pypyr logger means the log level will be set correctly and output formatted.
 logger = logging.getLogger(__name__)
 
+# same defaults as boto3's s3 transfer manager.
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+DEFAULT_MAX_CONCURRENCY = 10
 
-def get_payload(fetch_me):
+# bytes of source the parsed document cache holds.
+DOCUMENT_CACHE_MAXSIZE = 64 * 1024 * 1024
+
+# body is the source if the cache parses it again on each hit, else None &
+# document is the parsed document.
+CachedDocument = namedtuple('CachedDocument',
+                            ['etag', 'size', 'body', 'document'])
+
+_document_cache = LruCache(maxsize=DOCUMENT_CACHE_MAXSIZE,
+                           weigh=lambda entry: entry.size)
+
+# get_object args that head_object doesn't take.
+_GET_ONLY_ARGS = frozenset(['Range',
+                            'ResponseCacheControl',
+                            'ResponseContentDisposition',
+                            'ResponseContentEncoding',
+                            'ResponseContentLanguage',
+                            'ResponseContentType',
+                            'ResponseExpires'])
+
+
+def get_payload(fetch_me, session=None):
     """Get object from s3, reads underlying http stream, returns bytes.
 
     Args:
@@ -15,29 +48,78 @@ def get_payload(fetch_me):
             - methodArgs
                 - Bucket: string. s3 bucket name.
                 - Key: string. s3 key name.
+            Optional key:
+            - parallel: bool or dict. Download byte ranges of large objects
+              over many connections at the same time. True uses the
+              defaults. dict contains:
+                - partSize: int. Bytes per range. Objects up to this size
+                  download in one call. Default 8 MiB.
+                - maxConcurrency: int. At most this many ranges at once.
+                  Default 10.
+                - toFile: bool. Reassemble in a temporary file instead of
+                  memory. Default False.
+            - cache: bool or dict. Keep the body in a cache on local disk and
+              only download it again when its ETag changes. True uses the
+              defaults. dict contains:
+                - dir: string. Cache directory. Default
+                  ~/.cache/pypyraws/s3.
+                - ttl: float. Seconds to trust a cached body without
+                  asking s3 if it changed. Default 0, always ask.
+                - maxSize: int. Evict least recently used bodies once the
+                  cache holds more than this many bytes. Default 100 MiB.
+        session (pypyraws.aws.session.AwsSession): Create client from this
+            session. If None, use the boto3 default session.
 
     Returns:
-        bytes: payload of the s3 obj in bytes
+        file-like: payload of the s3 obj. Read it for the bytes.
 
     Raises:
         KeyNotInContextError: s3Fetch or s3Fetch.methodArgs missing
+        ValueError: Both cache and parallel set.
     """
     logger.debug("started")
 
-    try:
-        operation_args = fetch_me['methodArgs']
-    except KeyError as err:
-        raise KeyNotInContextError(
-            "s3Fetch missing required key for pypyraws.steps.s3fetch step: "
-            "methodArgs") from err
-
+    operation_args = get_operation_args(fetch_me)
     client_args = fetch_me.get('clientArgs', None)
 
+    parallel = get_option(fetch_me, 'parallel')
+    cache = get_option(fetch_me, 'cache')
+    if cache:
+        if parallel:
+            raise ValueError("s3Fetch can't use cache and parallel together.")
+
+        cache = {} if cache is True else cache
+        payload = pypyraws.aws.s3cache.S3Cache(
+            directory=cache.get('dir', None),
+            ttl=float(cache.get('ttl', 0)),
+            max_size=int(cache.get('maxSize',
+                                   pypyraws.aws.s3cache.DEFAULT_MAX_SIZE))
+        ).fetch(operation_args=operation_args,
+                client_args=client_args,
+                session=session)
+        logger.debug("done")
+        return payload
+
+    if parallel:
+        parallel = {} if parallel is True else parallel
+        payload = get_ranged_payload(
+            operation_args=operation_args,
+            client_args=client_args,
+            session=session,
+            part_size=int(parallel.get('partSize', DEFAULT_PART_SIZE)),
+            max_concurrency=int(parallel.get('maxConcurrency',
+                                             DEFAULT_MAX_CONCURRENCY)),
+            to_file=cast_to_bool(parallel.get('toFile', False)))
+        if payload is not None:
+            logger.debug("done")
+            return payload
+
     response = pypyraws.aws.service.operation_exec(
         service_name='s3',
         method_name='get_object',
         client_args=client_args,
-        operation_args=operation_args)
+        operation_args=operation_args,
+        session=session)
 
     logger.debug("reading response stream")
     payload = response['Body']
@@ -47,6 +129,266 @@ def get_payload(fetch_me):
     return payload
 
 
+def get_operation_args(fetch_me):
+    """Get methodArgs from s3Fetch.
+
+    Raises:
+        KeyNotInContextError: s3Fetch.methodArgs missing
+    """
+    try:
+        return fetch_me['methodArgs']
+    except KeyError as err:
+        raise KeyNotInContextError(
+            "s3Fetch missing required key for pypyraws.steps.s3fetch step: "
+            "methodArgs") from err
+
+
+def get_option(fetch_me, name):
+    """Get bool or dict option from s3Fetch.
+
+    Args:
+        fetch_me (dict): Formatted s3Fetch.
+        name (str): Option name, e.g parallel.
+
+    Returns:
+        The option if it's a dict, else the option cast to bool. A string
+        is True only if it's true, 1 or 1.0, in any case, so 'False' is
+        False.
+    """
+    option = fetch_me.get(name, None)
+    if isinstance(option, dict):
+        return option
+
+    return cast_to_bool(option)
+
+
+def get_document(fetch_me, parse, kind, session=None, cache_parsed=True):
+    """Get s3 object parsed into a document, from memory if it's unchanged.
+
+    Without s3Fetch.memoryCache, downloads and parses the object every time.
+
+    With it, keeps documents in a process-wide LRU cache bounded by
+    DOCUMENT_CACHE_MAXSIZE bytes of source. The key is kind, the get_object
+    args, so includes Bucket, Key and VersionId, the client args and the
+    session's profile and region. So a document fetched with one profile or
+    region never returns to a fetch with another. Each entry keeps the ETag it
+    came with. An object version never changes, so with VersionId a cached
+    document returns without calling s3. Otherwise get_object sends the ETag
+    as IfNoneMatch and only downloads again if s3 says the object changed.
+
+    Every call returns a document of its own, so changing it in context
+    doesn't change the cached one. With cache_parsed, that's a deep copy of
+    the parsed document. Without, the cache keeps the source bytes and parses
+    them again, which is quicker than a deep copy when parse is fast, e.g
+    json.
+
+    Args:
+        fetch_me (dict): s3Fetch. See get_payload. Optional key:
+            - memoryCache: bool. Cache the document in memory.
+        parse (callable): parse(file-like) returns the document.
+        kind (str): Kind of document parse makes, e.g json or yaml. Part of
+            the cache key, so the same object parsed differently doesn't mix.
+        session (pypyraws.aws.session.AwsSession): Create client from this
+            session. If None, use the boto3 default session.
+        cache_parsed (bool): Cache the parsed document and deep copy it on
+            every call. False caches the source and parses it on every call.
+
+    Returns:
+        The parsed document.
+
+    Raises:
+        KeyNotInContextError: s3Fetch.methodArgs missing
+        ValueError: memoryCache with cache or parallel.
+    """
+    if not get_option(fetch_me, 'memoryCache'):
+        return parse(get_payload(fetch_me, session=session))
+
+    if get_option(fetch_me, 'cache') or get_option(fetch_me, 'parallel'):
+        raise ValueError("s3Fetch can't use memoryCache with cache or "
+                         "parallel.")
+
+    operation_args = get_operation_args(fetch_me)
+    client_args = fetch_me.get('clientArgs', None)
+    key = (kind,
+           pypyraws.aws.service.freeze(operation_args),
+           pypyraws.aws.service.freeze(client_args),
+           pypyraws.aws.service.freeze(
+               pypyraws.aws.s3cache.get_identity(session)))
+    entry = _document_cache.peek(key)
+
+    if entry is not None:
+        if operation_args.get('VersionId', None):
+            return get_cached_document(key, entry, parse)
+
+        operation_args = {**operation_args, 'IfNoneMatch': entry.etag}
+
+    from botocore.exceptions import ClientError
+    try:
+        response = pypyraws.aws.service.operation_exec(
+            service_name='s3',
+            method_name='get_object',
+            client_args=client_args,
+            operation_args=operation_args,
+            session=session)
+    except ClientError as err:
+        if (entry is None
+                or not pypyraws.aws.s3cache.is_not_modified(err)):
+            raise
+
+        return get_cached_document(key, entry, parse)
+
+    body = response['Body'].read()
+    document = parse(io.BytesIO(body))
+    etag = response.get('ETag', None)
+    if etag is None:
+        logger.debug("no ETag in response, not caching")
+        return document
+
+    if cache_parsed:
+        entry = CachedDocument(etag=etag,
+                               size=len(body),
+                               body=None,
+                               document=document)
+        document = copy.deepcopy(document)
+    else:
+        entry = CachedDocument(etag=etag,
+                               size=len(body),
+                               body=body,
+                               document=None)
+
+    _document_cache.put(key, entry)
+    log_document_cache(f"document cache miss for {kind}")
+    return document
+
+
+def get_cached_document(key, entry, parse):
+    """Count a document cache hit and get a new copy of entry's document."""
+    _document_cache.hit(key)
+    log_document_cache(f"document cache hit for {key[0]}")
+    if entry.body is None:
+        return copy.deepcopy(entry.document)
+
+    return parse(io.BytesIO(entry.body))
+
+
+def log_document_cache(message):
+    """Log message with document cache hit ratio."""
+    info = _document_cache.info()
+    logger.debug(f"{message}. hit ratio {get_hit_ratio(info):.2f}, "
+                 f"{info.currsize} of {info.maxsize} bytes.")
+
+
+def get_hit_ratio(info):
+    """Get hits / (hits + misses) from CacheInfo. 0 if no lookups yet."""
+    lookups = info.hits + info.misses
+    return info.hits / lookups if lookups else 0.0
+
+
+def clear_document_cache():
+    """Remove all documents from the document cache and reset its counters."""
+    _document_cache.clear()
+
+
+def reset_document_cache_counters():
+    """Reset the document cache hit and miss counters, keep the documents."""
+    _document_cache.reset_counters()
+
+
+def document_cache_info():
+    """Get hit and miss counters for the parsed document cache.
+
+    Returns:
+        pypyraws.cache.CacheInfo: namedtuple(hits, misses, maxsize, currsize)
+        where maxsize and currsize are bytes of source.
+    """
+    return _document_cache.info()
+
+
+def get_ranged_payload(operation_args,
+                       client_args=None,
+                       session=None,
+                       part_size=DEFAULT_PART_SIZE,
+                       max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                       to_file=False):
+    """Download an s3 object in byte ranges at the same time.
+
+    Gets the object's size and ETag with head_object first. Each range fetches
+    with IfMatch on that ETag, so if the object changes mid-download, s3
+    fails the call rather than mixing two versions.
+
+    Args:
+        operation_args (dict): get_object args. Must have Bucket and Key.
+        client_args (dict): kwargs for the s3 boto client ctor.
+        session (pypyraws.aws.session.AwsSession): Create client from this
+            session. If None, use the boto3 default session.
+        part_size (int): Bytes per range.
+        max_concurrency (int): At most this many ranges at once.
+        to_file (bool): Reassemble in a temporary file instead of memory.
+
+    Returns:
+        file-like: The whole object, positioned at the start. None if the
+        object is no bigger than part_size, so one get_object is quicker.
+
+    Raises:
+        ValueError: part_size or max_concurrency < 1.
+        botocore.exceptions.ClientError: Any of the calls failed.
+    """
+    if part_size < 1 or max_concurrency < 1:
+        raise ValueError("part size and max concurrency must be >= 1.")
+
+    head = pypyraws.aws.service.operation_exec(
+        service_name='s3',
+        method_name='head_object',
+        client_args=client_args,
+        operation_args={k: v for k, v in operation_args.items()
+                        if k not in _GET_ONLY_ARGS},
+        session=session)
+
+    size = head['ContentLength']
+    if size <= part_size:
+        logger.debug(f"{size} bytes fit in 1 part, not splitting")
+        return None
+
+    ranges = [(start, min(start + part_size, size) - 1)
+              for start in range(0, size, part_size)]
+    logger.debug(f"fetching {size} bytes in {len(ranges)} ranges of "
+                 f"{part_size}, max {max_concurrency} at once")
+
+    out = tempfile.TemporaryFile() if to_file else io.BytesIO()
+    lock = threading.Lock()
+
+    def fetch(start, end):
+        response = pypyraws.aws.service.operation_exec(
+            service_name='s3',
+            method_name='get_object',
+            client_args=client_args,
+            operation_args={**operation_args,
+                            'Range': f'bytes={start}-{end}',
+                            'IfMatch': head['ETag']},
+            session=session)
+        data = response['Body'].read()
+        with lock:
+            out.seek(start)
+            out.write(data)
+
+    try:
+        with ThreadPoolExecutor(
+                max_workers=min(max_concurrency, len(ranges))) as executor:
+            futures = [executor.submit(fetch, start, end)
+                       for start, end in ranges]
+            done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+            for future in futures:
+                future.cancel()
+            for future in done:
+                future.result()
+    except Exception:
+        out.close()
+        raise
+
+    out.seek(0)
+    return out
+
+
 def get_fetch_input(context, caller):
     """Get s3Fetch formatted context.
 
@@ -0,0 +1,271 @@
+"""On-disk cache of s3 object bodies, revalidated by ETag.
+
+Each cached object is one file: a json line with the ETag, then the body.
+Writes go to a temporary file in the cache directory that then replaces the
+entry with os.replace, so readers in other processes see either the old
+entry or the new one, never half of each.
+
+A file's mtime is when s3 last confirmed the body is current, its atime is
+when the cache last used it. TTL checks the mtime, eviction removes the
+least recently used files first.
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+import time
+import pypyraws.aws.service
+
+# pypyr logger means the log level will be set correctly and output formatted.
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SIZE = 100 * 1024 * 1024
+ENTRY_SUFFIX = '.s3'
+TEMP_PREFIX = '.tmp'
+# a write takes well under this. Older temp files belong to dead processes.
+TEMP_MAX_AGE = 3600
+
+
+def get_default_dir():
+    """Get the default cache directory, under the user's cache home."""
+    cache_home = os.environ.get('XDG_CACHE_HOME',
+                                os.path.join(os.path.expanduser('~'),
+                                             '.cache'))
+    return os.path.join(cache_home, 'pypyraws', 's3')
+
+
+class S3Cache():
+    """Cache of s3 object bodies on local disk, shared by processes.
+
+    Attributes:
+        directory (str): Cache files live here.
+        ttl (float): Seconds after s3 last confirmed an entry that the cache
+            trusts it without asking s3 again. 0 means always revalidate.
+        max_size (int): Evict least recently used entries once the cache
+            holds more than this many bytes.
+    """
+
+    def __init__(self, directory=None, ttl=0, max_size=DEFAULT_MAX_SIZE):
+        """Initialize the cache.
+
+        Args:
+            directory (str): Cache files live here. Created if it doesn't
+                exist. Default get_default_dir().
+            ttl (float): Trust entries this many seconds after s3 last
+                confirmed them.
+            max_size (int): Hold at most this many bytes.
+        """
+        self.directory = directory if directory else get_default_dir()
+        self.ttl = ttl
+        self.max_size = max_size
+
+    def get_path(self, operation_args, client_args=None, session=None):
+        """Get path of the cache file for a get_object call.
+
+        Args:
+            operation_args (dict): get_object args, e.g Bucket, Key and
+                VersionId.
+            client_args (dict): kwargs for the s3 boto client ctor, so a
+                local stand-in's objects don't mix with aws's.
+            session (pypyraws.aws.session.AwsSession): Session the client
+                comes from, so objects fetched with one profile or region
+                don't serve another.
+
+        Returns:
+            str. Path of the cache file. It might not exist.
+        """
+        key = json.dumps([operation_args,
+                          client_args,
+                          get_identity(session)],
+                         sort_keys=True,
+                         default=str)
+        name = hashlib.sha256(key.encode()).hexdigest() + ENTRY_SUFFIX
+        return os.path.join(self.directory, name)
+
+    def fetch(self, operation_args, client_args=None, session=None):
+        """Get object body from the cache or from s3.
+
+        A fresh entry returns without calling s3. Otherwise get_object sends
+        the cached ETag as IfNoneMatch, so if the object didn't change s3
+        answers 304 and the body doesn't download again.
+
+        Args:
+            operation_args (dict): get_object args. Must have Bucket and Key.
+            client_args (dict): kwargs for the s3 boto client ctor.
+            session (pypyraws.aws.session.AwsSession): Create client from
+                this session. If None, use the boto3 default session.
+
+        Returns:
+            file-like: The object's body, positioned at the start.
+
+        Raises:
+            botocore.exceptions.ClientError: get_object failed.
+        """
+        path = self.get_path(operation_args, client_args, session)
+        entry = read_entry(path)
+
+        if entry is not None:
+            etag, body, validated = entry
+            if self.ttl and time.time() - validated < self.ttl:
+                logger.debug(f"cache hit within ttl for {path}")
+                touch(path, validated)
+                return io.BytesIO(body)
+
+            operation_args = {**operation_args, 'IfNoneMatch': etag}
+
+        from botocore.exceptions import ClientError
+        try:
+            response = pypyraws.aws.service.operation_exec(
+                service_name='s3',
+                method_name='get_object',
+                client_args=client_args,
+                operation_args=operation_args,
+                session=session)
+        except ClientError as err:
+            if entry is None or not is_not_modified(err):
+                raise
+
+            logger.debug(f"s3 says not modified, using cached {path}")
+            touch(path, time.time())
+            return io.BytesIO(body)
+
+        body = response['Body'].read()
+        etag = response.get('ETag', None)
+        if etag is None:
+            logger.debug("no ETag in response, not caching")
+        else:
+            logger.debug(f"caching {len(body)} bytes at {path}")
+            self.write_entry(path, etag, body)
+            self.evict()
+
+        return io.BytesIO(body)
+
+    def write_entry(self, path, etag, body):
+        """Write cache file atomically.
+
+        Args:
+            path (str): Cache file path from get_path.
+            etag (str): ETag s3 returned with the body.
+            body (bytes): Object body.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory,
+                                         prefix=TEMP_PREFIX)
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(json.dumps({'etag': etag}).encode())
+                file.write(b'\n')
+                file.write(body)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def evict(self):
+        """Remove least recently used entries until within max_size.
+
+        Also removes temporary files older than TEMP_MAX_AGE seconds, which a
+        process killed in the middle of write_entry left behind. Younger
+        temporary files might be writes still in progress, so they stay.
+
+        Other processes might remove the same files at the same time, so a
+        file that's already gone doesn't count as an error.
+        """
+        entries = []
+        stale = []
+        stale_before = time.time() - TEMP_MAX_AGE
+        with os.scandir(self.directory) as it:
+            for dir_entry in it:
+                is_entry = dir_entry.name.endswith(ENTRY_SUFFIX)
+                is_temp = dir_entry.name.startswith(TEMP_PREFIX)
+                if not (is_entry or is_temp):
+                    continue
+
+                try:
+                    stat = dir_entry.stat()
+                except FileNotFoundError:
+                    continue
+
+                if is_entry:
+                    entries.append((stat.st_atime, stat.st_size,
+                                    dir_entry.path))
+                elif stat.st_mtime < stale_before:
+                    stale.append(dir_entry.path)
+
+        for path in stale:
+            logger.debug(f"removing abandoned temp file {path}")
+            remove(path)
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            logger.debug(f"cache over {self.max_size} bytes, evicting {path}")
+            remove(path)
+            total -= size
+
+
+def get_identity(session):
+    """Get profile and region of session, or None for the default session.
+
+    Args:
+        session (pypyraws.aws.session.AwsSession): Session to identify.
+
+    Returns:
+        list. [profile_name, region_name]. None if session is None.
+    """
+    if session is None:
+        return None
+
+    boto_session = session.boto_session
+    return [boto_session.profile_name, boto_session.region_name]
+
+
+def read_entry(path):
+    """Read cache file.
+
+    Args:
+        path (str): Cache file path.
+
+    Returns:
+        tuple (etag, body, validated) where validated is the epoch time s3
+        last confirmed the body. None if the file doesn't exist or is
+        corrupt.
+    """
+    try:
+        with open(path, 'rb') as file:
+            validated = os.fstat(file.fileno()).st_mtime
+            header = json.loads(file.readline())
+            return header['etag'], file.read(), validated
+    except FileNotFoundError:
+        return None
+    except (ValueError, KeyError, TypeError):
+        logger.debug(f"ignoring corrupt cache file {path}")
+        return None
+
+
+def remove(path):
+    """Remove cache file, unless another process already removed it."""
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def touch(path, validated):
+    """Mark cache file used now and validated at validated epoch time."""
+    try:
+        os.utime(path, (time.time(), validated))
+    except FileNotFoundError:
+        # another process evicted it. Next fetch downloads again.
+        pass
+
+
+def is_not_modified(err):
+    """Check if botocore ClientError is s3's 304 Not Modified."""
+    response = err.response
+    return (response.get('Error', {}).get('Code', None) == '304'
+            or response.get('ResponseMetadata', {}).get(
+                'HTTPStatusCode', None) == 304)
@@ -0,0 +1,329 @@
+"""Shared poll scheduler that multiplexes many waits onto one thread.
+
+Without it, every wait holds a thread that spends nearly all its time
+asleep. With it, each wait registers a poll job and blocks on a future, while
+One scheduler thread keeps a heap of when each job is next due. When jobs come
+due, it runs their aws calls on a small worker pool and wakes each waiting
+caller once its condition is met or its attempts or time run out.
+
+Jobs whose identical aws calls come due within the coalesce window share one
+call, so many pipelines waiting on the same resource cost one describe call
+per poll between them.
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+import heapq
+import itertools
+import logging
+import threading
+import time
+import pypyraws.aws.service
+from pypyraws.poll import Deadline
+
+# pypyr logger means the log level will be set correctly and output formatted.
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 10
+DEFAULT_COALESCE_WINDOW = 0.5
+
+
+class PollJob():
+    """1 wait registered with the scheduler.
+
+    Attributes:
+        call (dict): kwargs for pypyraws.aws.service.operation_exec.
+        check (callable): check(response). Truthy ends the wait.
+        future (concurrent.futures.Future): Resolves to True when check
+            returns truthy, False when max_attempts or timeout run out.
+        attempts (int): Polls so far.
+    """
+
+    def __init__(self, call, check, backoff, max_attempts, timeout, clock):
+        """Initialize the job. See PollScheduler.submit."""
+        self.call = call
+        self.check = check
+        self.future = Future()
+        self.attempts = 0
+        self._max_attempts = max_attempts
+        self._delays = backoff.delays()
+        self._deadline = None if timeout is None else Deadline(timeout,
+                                                               clock)
+        try:
+            self.key = (call['service_name'],
+                        call['method_name'],
+                        pypyraws.aws.service.freeze(call.get('client_args')),
+                        pypyraws.aws.service.freeze(
+                            call.get('operation_args')),
+                        id(call.get('session')))
+        except TypeError:
+            # unhashable args can't coalesce, so give the job its own key.
+            self.key = id(self)
+
+    def next_delay(self, response):
+        """Check response and get the delay before the next poll.
+
+        Resolves the future if the wait is over.
+
+        Args:
+            response (dict): aws response to the job's call.
+
+        Returns:
+            float. Seconds until the next poll, or None if the wait is over.
+        """
+        self.attempts += 1
+        try:
+            if self.check(response):
+                logger.debug(f"attempt {self.attempts}. Desired state "
+                             "reached.")
+                self.future.set_result(True)
+                return None
+        except Exception as err:
+            self.future.set_exception(err)
+            return None
+
+        return self._get_delay()
+
+    def timed_out(self, err):
+        """Count a poll whose call timed out as an unsuccessful attempt.
+
+        Args:
+            err (Exception): botocore connect or read timeout.
+
+        Returns:
+            float. Seconds until the next poll, or None if the wait is over.
+        """
+        self.attempts += 1
+        logger.warning(f"aws {self.call['service_name']} "
+                       f"{self.call['method_name']} timed out: {err}")
+        return self._get_delay()
+
+    def remaining(self):
+        """Get seconds left before timeout, or None if there's no timeout."""
+        return None if self._deadline is None else self._deadline.remaining()
+
+    def _get_delay(self):
+        """Get delay before the next poll after an unsuccessful attempt.
+
+        Resolves the future False if attempts or time ran out.
+        """
+        if (self._max_attempts is not None
+                and self.attempts >= self._max_attempts):
+            logger.debug(f"attempt {self.attempts}. Out of attempts.")
+            self.future.set_result(False)
+            return None
+
+        delay = next(self._delays)
+        if self._deadline is not None:
+            remaining = self._deadline.remaining()
+            if remaining <= 0:
+                logger.debug(f"attempt {self.attempts}. Out of time.")
+                self.future.set_result(False)
+                return None
+            delay = min(delay, remaining)
+
+        return delay
+
+
+class PollScheduler():
+    """Timer heap on one thread that runs the polls for many waits.
+
+    Use it like this:
+        future = scheduler.submit(call, check, backoff, max_attempts=10)
+        reached = future.result()
+
+    Attributes:
+        max_workers (int): Run at most this many aws calls at once.
+        coalesce_window (float): Jobs with identical calls due within this
+            many seconds of each other share one call.
+    """
+
+    def __init__(self,
+                 max_workers=DEFAULT_MAX_WORKERS,
+                 coalesce_window=DEFAULT_COALESCE_WINDOW,
+                 clock=None):
+        """Initialize the scheduler. It starts on the first submit.
+
+        Args:
+            max_workers (int): Run at most this many aws calls at once.
+            coalesce_window (float): Coalesce identical calls due within this
+                many seconds of each other.
+            clock (callable): Returns monotonic time in seconds. Default
+                time.monotonic.
+        """
+        self.max_workers = max_workers
+        self.coalesce_window = coalesce_window
+        self._clock = clock if clock else time.monotonic
+        self._heap = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._executor = None
+        self._shutdown = False
+
+    def submit(self,
+               call,
+               check,
+               backoff,
+               max_attempts=None,
+               timeout=None,
+               start=True):
+        """Register a wait. The first poll is due right away.
+
+        Args:
+            call (dict): kwargs for pypyraws.aws.service.operation_exec:
+                service_name, method_name, client_args, operation_args and
+                session.
+            check (callable): check(response) runs on a worker thread after
+                each poll. Return truthy to end the wait. Exceptions end the
+                wait and raise from future.result().
+            backoff (pypyraws.poll.Backoff): Delays between polls.
+            max_attempts (int): Poll at most this many times. None means no
+                limit, so set timeout.
+            timeout (float): Stop after this many seconds. None means no
+                limit, so set max_attempts. Also caps each call's connect and
+                read timeouts at the time left, and a call that times out
+                counts as an unsuccessful attempt.
+            start (bool): Start the scheduler thread if it isn't running
+                yet. Set False to queue many jobs before start().
+
+        Returns:
+            concurrent.futures.Future. True when check returned truthy, False
+            when max_attempts or timeout ran out. Raises the aws call's
+            error or check's exception.
+
+        Raises:
+            ValueError: Neither max_attempts nor timeout set.
+            RuntimeError: Scheduler is shut down.
+        """
+        if max_attempts is None and timeout is None:
+            raise ValueError("set max_attempts or timeout, else polling never "
+                             "stops.")
+
+        job = PollJob(call, check, backoff, max_attempts, timeout,
+                      self._clock)
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("poll scheduler is shut down.")
+
+            self._push(job, self._clock())
+
+        if start:
+            self.start()
+
+        return job.future
+
+    def start(self):
+        """Start the scheduler thread and worker pool, if not started yet."""
+        with self._condition:
+            if self._thread is None:
+                logger.debug("starting poll scheduler")
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix='pypyraws-poll')
+                self._thread = threading.Thread(target=self._run,
+                                                name='pypyraws-poll-scheduler',
+                                                daemon=True)
+                self._thread.start()
+
+    def shutdown(self):
+        """Stop the scheduler. Waits still pending resolve to False."""
+        with self._condition:
+            self._shutdown = True
+            pending = [job for _, _, job in self._heap]
+            self._heap.clear()
+            self._condition.notify()
+
+        for job in pending:
+            job.future.set_result(False)
+
+        if self._thread is not None:
+            self._thread.join()
+            self._executor.shutdown(wait=True)
+
+    def _push(self, job, due):
+        """Schedule job's next poll at due. Hold the condition to call."""
+        heapq.heappush(self._heap, (due, next(self._sequence), job))
+        self._condition.notify()
+
+    def _run(self):
+        """Pop jobs as they come due and hand their calls to the workers."""
+        while True:
+            with self._condition:
+                while not self._shutdown:
+                    if self._heap:
+                        wait_for = self._heap[0][0] - self._clock()
+                        if wait_for <= 0:
+                            break
+                        self._condition.wait(wait_for)
+                    else:
+                        self._condition.wait()
+
+                if self._shutdown:
+                    return
+
+                cutoff = self._clock() + self.coalesce_window
+                groups = {}
+                while self._heap and self._heap[0][0] <= cutoff:
+                    _, _, job = heapq.heappop(self._heap)
+                    groups.setdefault(job.key, []).append(job)
+
+            for jobs in groups.values():
+                if len(jobs) > 1:
+                    logger.debug(f"coalescing {len(jobs)} "
+                                 f"{jobs[0].call['method_name']} calls")
+                self._executor.submit(self._poll, jobs)
+
+    def _poll(self, jobs):
+        """Make jobs' shared aws call and reschedule the jobs still waiting.
+
+        If any of the jobs has a timeout, the call's connect and read timeouts
+        cap at the least time any of them has left. A call that times out
+        then counts as an unsuccessful attempt for the jobs with a timeout.
+        """
+        call = jobs[0].call
+        remaining = [job.remaining() for job in jobs
+                     if job.remaining() is not None]
+        if remaining:
+            call = {**call,
+                    'client_args': pypyraws.aws.service.cap_timeouts(
+                        call.get('client_args'),
+                        min(remaining),
+                        call.get('session'))}
+
+        try:
+            response = pypyraws.aws.service.operation_exec(**call)
+        except Exception as err:
+            from botocore.exceptions import (ConnectTimeoutError,
+                                             ReadTimeoutError)
+            timed_out = isinstance(err, (ConnectTimeoutError,
+                                         ReadTimeoutError))
+            for job in jobs:
+                if timed_out and job.remaining() is not None:
+                    self._reschedule(job, job.timed_out(err))
+                else:
+                    job.future.set_exception(err)
+            return
+
+        for job in jobs:
+            self._reschedule(job, job.next_delay(response))
+
+    def _reschedule(self, job, delay):
+        """Schedule job's next poll after delay. None means the job is done."""
+        if delay is not None:
+            with self._condition:
+                if self._shutdown:
+                    job.future.set_result(False)
+                else:
+                    self._push(job, self._clock() + delay)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Get the process-wide poll scheduler, creating it on first use."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = PollScheduler()
+        return _scheduler
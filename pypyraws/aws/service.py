@@ -1,20 +1,223 @@
 """aws service client.
 
 This works with the boto low-level service client object.
+
+boto3 only imports on first use, because importing it costs far more than
+running most steps.
 """
-import boto3
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
 import logging
+import time
+from pypyraws.aws import instrumentation
+from pypyraws.cache import LruCache
 
 # pypyr logger means the log level will be set correctly and output formatted.
 logger = logging.getLogger(__name__)
 
+# boto clients are thread-safe and expensive to create, so share them
+# process-wide. Each client holds its own connection pool.
+CLIENT_CACHE_MAXSIZE = 64
+_client_cache = LruCache(maxsize=CLIENT_CACHE_MAXSIZE)
+
+CallResult = namedtuple('CallResult', ['response', 'error'])
+
+# botocore's default connect and read timeouts are 60s. cap_timeouts rounds
+# down to one of these, so a shrinking deadline only needs a few cached
+# clients.
+CALL_TIMEOUT_STEPS = (1, 2, 5, 10, 20, 30, 60)
+# botocore's total attempts per call for each retry mode, if not configured.
+DEFAULT_ATTEMPTS = {'legacy': 5, 'standard': 3, 'adaptive': 3}
+
+
+def get_client(service_name, client_args=None, session=None):
+    """Get boto low-level service client from the process-wide client cache.
+
+    Creates the client and caches it on first use. Subsequent calls with the
+    same service_name and client_args get the same client object, so the
+    service model, endpoint resolution, credentials and http connection pool
+    are reused.
+
+    If client_args contains a value that cannot be used as a cache key, you
+    get a new uncached client each time.
+
+    Every new client records its aws calls in
+    pypyraws.aws.instrumentation.metrics.
+
+    Args:
+        service_name: String. Name of service. Available services here:
+                      http://boto3.readthedocs.io/en/latest/reference/services/
+        client_args: dict. Passed to the kwargs of the
+                     boto3.client(*args, **kwargs) function. If config is a
+                     dict, it's the kwargs for botocore.config.Config.
+        session: pypyraws.aws.session.AwsSession. Create client from this
+                 session. If None, use the boto3 default session.
+
+    Returns:
+        boto low-level service client.
+    """
+    def create_client():
+        import boto3
+
+        start = time.perf_counter()
+        if session:
+            client = session.client(service_name, **(client_args or {}))
+            logger.debug(f"boto client instantiated {service_name} from "
+                         "pypyraws session")
+        elif client_args is None:
+            client = boto3.client(service_name)
+            logger.debug(f"boto client instantiated {service_name} with no "
+                         "constructor args")
+        else:
+            config = client_args.get('config', None)
+            if isinstance(config, dict):
+                from botocore.config import Config
+
+                client = boto3.client(service_name,
+                                      **{**client_args,
+                                         'config': Config(**config)})
+            else:
+                client = boto3.client(service_name, **client_args)
+            logger.debug(f"boto client instantiated {service_name} with "
+                         "constructor args")
+
+        instrumentation.metrics.record_client_created(
+            time.perf_counter() - start)
+        return instrumentation.instrument(client)
+
+    try:
+        key = (session, service_name, freeze(client_args))
+    except TypeError:
+        logger.debug(f"clientArgs for {service_name} not cacheable. Creating "
+                     "uncached client.")
+        return create_client()
+
+    return _client_cache.get_or_create(key, create_client)
+
+
+def cap_timeouts(client_args, seconds, session=None):
+    """Get client_args with connect and read timeouts of at most seconds.
+
+    Rounds seconds down to the nearest CALL_TIMEOUT_STEPS, with a minimum of
+    the smallest step. Lower timeouts already in client_args, or in the
+    session's config if client_args doesn't set them, stay as they are.
+
+    botocore retries a call that timed out, so this also limits the retries
+    config to as many attempts as fit in seconds, but always at least one.
+    Otherwise each retry could run for the whole timeout again.
+
+    Args:
+        client_args: dict. boto3.client kwargs. Doesn't change this dict.
+        seconds: float. Time left.
+        session: pypyraws.aws.session.AwsSession. The client's session. Its
+                 config merges under client_args config when it creates the
+                 client, so its timeouts and retries count too.
+
+    Returns:
+        dict. Copy of client_args with config connect_timeout, read_timeout
+        and retries.
+    """
+    cap = max((step for step in CALL_TIMEOUT_STEPS if step <= seconds),
+              default=CALL_TIMEOUT_STEPS[0])
+    attempts = max(int(seconds // cap), 1)
+
+    session_config = getattr(session, 'config', None)
+    client_args = dict(client_args or {})
+    config = client_args.get('config', None)
+
+    if config is None or isinstance(config, dict):
+        config = dict(config or {})
+        for name in ('connect_timeout', 'read_timeout'):
+            config[name] = min(
+                config.get(name, getattr(session_config, name, cap)), cap)
+        config['retries'] = cap_retries(
+            config.get('retries', getattr(session_config, 'retries', None)),
+            attempts)
+    else:
+        from botocore.config import Config
+
+        effective = session_config.merge(config) if session_config else config
+        config = config.merge(Config(
+            connect_timeout=min(effective.connect_timeout, cap),
+            read_timeout=min(effective.read_timeout, cap),
+            retries=cap_retries(effective.retries, attempts)))
+
+    client_args['config'] = config
+    return client_args
+
+
+def cap_retries(retries, attempts):
+    """Get copy of botocore retries config with at most attempts in total.
+
+    Args:
+        retries: dict. botocore.config.Config retries, or None.
+        attempts: int. Most attempts allowed, counting the first call.
+
+    Returns:
+        dict. Copy of retries with total_max_attempts. Lower limits already
+        in retries, or botocore's default for the retry mode, stay as they
+        are.
+    """
+    retries = dict(retries or {})
+    if 'total_max_attempts' in retries:
+        current = retries['total_max_attempts']
+    elif 'max_attempts' in retries:
+        # max_attempts doesn't count the first call.
+        current = retries['max_attempts'] + 1
+    else:
+        current = DEFAULT_ATTEMPTS.get(retries.get('mode', None),
+                                       DEFAULT_ATTEMPTS['legacy'])
+
+    retries['total_max_attempts'] = min(current, attempts)
+    return retries
+
+
+def clear_client_cache():
+    """Remove all clients from the client cache and reset its counters."""
+    _client_cache.clear()
+
+
+def client_cache_info():
+    """Get hit and miss counters for the client cache.
+
+    Returns:
+        pypyraws.cache.CacheInfo: namedtuple(hits, misses, maxsize, currsize)
+    """
+    return _client_cache.info()
+
+
+def freeze(obj):
+    """Get canonical hashable version of obj for use in a cache key.
+
+    dict keys are sorted, so the same clientArgs in a different order result in
+    the same key.
+
+    Raises:
+        TypeError: obj contains something unhashable.
+    """
+    if isinstance(obj, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in obj.items()))
+
+    if isinstance(obj, (list, tuple)):
+        return tuple(freeze(v) for v in obj)
+
+    if isinstance(obj, (set, frozenset)):
+        return frozenset(freeze(v) for v in obj)
+
+    hash(obj)
+    return obj
+
 
 def operation_exec(service_name,
                    method_name,
                    client_args=None,
-                   operation_args=None):
+                   operation_args=None,
+                   session=None):
     """Execute operation on boto low-level service client.
 
+    Gets the client from the process-wide client cache, so repeated calls with
+    the same service_name and client_args reuse the same client.
+
     Args:
         service_name: String. Name of service. Available services here:
                       http://boto3.readthedocs.io/en/latest/reference/services/
@@ -25,25 +228,20 @@ def operation_exec(service_name,
                      boto3.client(*args, **kwargs) function.
         operation_args: dict. These are passed as kwargs to the method_name
                         when executing it.
+        session: pypyraws.aws.session.AwsSession. Create client from this
+                 session. If None, use the boto3 default session.
 
     Returns:
         dict. Response from
                     service_name(client_args).method_name(operation_args)
               Be aware this could well be None if the service operation doesn't
               have a return.
-              Code safe: use the default 2nd args on dict.get(key, default)
+              Code safe: use the default second args on dict.get(key, default)
               to specify a default value where there is a chance of the value
               not existing. Don't bother if you're cheerful about KeyError.
     """
     logger.debug("started")
-    if client_args is None:
-        client = boto3.client(service_name)
-        logger.debug(f"boto client instantiated {service_name} with no "
-                     "constructor args")
-    else:
-        client = boto3.client(service_name, **client_args)
-        logger.debug(f"boto client instantiated {service_name} with "
-                     "constructor args")
+    client = get_client(service_name, client_args, session)
 
     # dynamically executing method_name against the client and passing it
     # operation_args while it's at it.
@@ -53,7 +251,159 @@ def operation_exec(service_name,
     return response
 
 
-def waiter(service_name, waiter_name, waiter_args=None, wait_args=None):
+def operation_exec_many(calls,
+                        max_workers=10,
+                        fail_fast=False,
+                        session=None):
+    """Execute many operations on boto low-level service clients concurrently.
+
+    Runs the calls on a thread pool. Calls to the same service with the same
+    client args share the same cached client, which is thread-safe.
+
+    Each client's connection pool defaults to 10 connections, so if
+    max_workers is more than that, set max_pool_connections in the client or
+    session config to match, otherwise the extra threads just queue for a
+    connection.
+
+    Args:
+        calls: list of dict. Each dict is the kwargs for operation_exec:
+               service_name, method_name, client_args, operation_args.
+        max_workers: int. Run at most this many calls at the same time.
+        fail_fast: bool. If True, stop on the first error: calls that haven't
+                   started yet don't run and the error raises. If False, run
+                   all calls and report errors per call.
+        session: pypyraws.aws.session.AwsSession. Create clients from this
+                 session. If None, use the boto3 default session.
+
+    Returns:
+        list of CallResult(response, error) in the same order as calls. error
+        is the exception the call raised, or None if it succeeded.
+
+    Raises:
+        Exception: With fail_fast, whatever the first failing call raised.
+    """
+    logger.debug("started")
+    if not calls:
+        logger.debug("no calls, done")
+        return []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(operation_exec, session=session, **call)
+                   for call in calls]
+
+        if fail_fast:
+            done, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+            for future in not_done:
+                future.cancel()
+
+            for future in futures:
+                if future in done and future.exception():
+                    raise future.exception()
+
+    results = []
+    for future in futures:
+        error = future.exception()
+        results.append(CallResult(response=None if error else future.result(),
+                                  error=error))
+
+    logger.debug(f"executed {len(calls)} calls with max {max_workers} "
+                 "concurrent")
+    logger.debug("done")
+    return results
+
+
+def paginate(service_name,
+             method_name,
+             client_args=None,
+             operation_args=None,
+             pagination_config=None,
+             session=None):
+    """Get page iterator for operation on boto low-level service client.
+
+    Uses the botocore paginator for method_name, so subsequent pages use the
+    continuation token from the previous page. No aws calls happen until you
+    iterate the result.
+
+    Args:
+        service_name: String. Name of service. Available services here:
+                      http://boto3.readthedocs.io/en/latest/reference/services/
+        method_name: String. Paginate this method on the service_name client.
+                     client.can_paginate(method_name) must be True.
+        client_args: dict. Passed to the kwargs of the
+                     boto3.client(*args, **kwargs) function.
+        operation_args: dict. These are passed as kwargs to the method_name
+                        for every page.
+        pagination_config: dict. botocore PaginationConfig. Keys MaxItems,
+                           PageSize, StartingToken.
+        session: pypyraws.aws.session.AwsSession. Create client from this
+                 session. If None, use the boto3 default session.
+
+    Returns:
+        botocore.paginate.PageIterator. Call build_full_result() on it to get
+        all pages merged into a single response.
+    """
+    logger.debug("started")
+    client = get_client(service_name, client_args, session)
+
+    paginate_args = dict(operation_args) if operation_args else {}
+    if pagination_config:
+        paginate_args['PaginationConfig'] = pagination_config
+
+    page_iterator = client.get_paginator(method_name).paginate(
+        **paginate_args)
+    logger.debug(f"Got page iterator for {method_name} on {service_name}.")
+    logger.debug("done")
+    return page_iterator
+
+
+class PageItems():
+    """Lazy, re-iterable items from all pages of a botocore page iterator.
+
+    Fetches the next page only once you've consumed the items of the previous
+    page, so memory use stays at about one page no matter how many items there
+    are in total.
+
+    Every new iteration starts again from the first page.
+    """
+
+    def __init__(self, page_iterator, result_key=None):
+        """Initialize the items.
+
+        Args:
+            page_iterator (botocore.paginate.PageIterator): Get pages from
+                this.
+            result_key (str): JMESPath expression for the items in each page,
+                e.g 'Contents' or 'Reservations[].Instances[]'. If None,
+                defaults to the paginator's first result key.
+        """
+        import jmespath
+
+        self.page_iterator = page_iterator
+        if result_key is None:
+            result_key = page_iterator.result_keys[0].expression
+
+        self.result_key = result_key
+        self._expression = jmespath.compile(result_key)
+
+    def __iter__(self):
+        """Yield each item in the result key of each page."""
+        for page in self.page_iterator:
+            items = self._expression.search(page)
+            if isinstance(items, list):
+                yield from items
+            elif items is not None:
+                yield items
+
+    def __repr__(self):
+        """Show the result key rather than materializing items."""
+        return f"{type(self).__name__}(result_key={self.result_key!r})"
+
+
+def waiter(service_name,
+           waiter_name,
+           waiter_args=None,
+           wait_args=None,
+           session=None):
     """Wait for an aws low-level client operation to reach poll state.
 
     Waiters use a client's service operations to poll the status of an AWS
@@ -73,6 +423,8 @@ def waiter(service_name, waiter_name, waiter_args=None, wait_args=None):
                      boto3.get_waiter(*args, **kwargs) function.
         wait_args: dict. These are passed as kwargs to the waiter's wait method
                    get_waiter(waiter_name).wait(**kwargs)
+        session: pypyraws.aws.session.AwsSession. Create client from this
+                 session. If None, use the boto3 default session.
 
     Returns: None
 
@@ -85,7 +437,7 @@ def waiter(service_name, waiter_name, waiter_args=None, wait_args=None):
     """
     logger.debug("started")
 
-    client = boto3.client(service_name)
+    client = get_client(service_name, session=session)
 
     if waiter_args is None:
         waiter = client.get_waiter(waiter_name)
@@ -0,0 +1,90 @@
+"""aws session shared by the pypyraws steps in a pipeline run.
+
+Without a session, boto clients come from the implicit boto3 default session.
+
+boto3 and botocore only import when you create a session.
+"""
+import logging
+
+# pypyr logger means the log level will be set correctly and output formatted.
+logger = logging.getLogger(__name__)
+
+# context key where pypyraws.steps.session saves the AwsSession.
+SESSION_CONTEXT_KEY = 'awsSessionOut'
+
+
+class AwsSession():
+    """boto3 Session with a botocore Config for all clients it creates.
+
+    Create this once per pipeline run so that credentials, region and client
+    config such as retries, timeouts and max_pool_connections only resolve
+    once.
+
+    Attributes:
+        boto_session (boto3.Session): Creates clients.
+        config (botocore.config.Config): Default config for every client. None
+            means use the botocore defaults.
+    """
+
+    def __init__(self, session_args=None, config=None):
+        """Initialize the session.
+
+        Args:
+            session_args (dict): kwargs for boto3.Session(**kwargs). For
+                example profile_name, region_name.
+            config (dict or botocore.config.Config): Default botocore config
+                for all clients this session creates. If dict, kwargs for
+                botocore.config.Config(**kwargs).
+        """
+        import boto3
+
+        if session_args:
+            self.boto_session = boto3.Session(**session_args)
+        else:
+            self.boto_session = boto3.Session()
+
+        self.config = _get_config(config)
+
+    def client(self, service_name, **client_args):
+        """Create boto low-level service client from this session.
+
+        If client_args contains config, it merges on top of the session's
+        config, so individual values in client_args win.
+
+        Args:
+            service_name: String. Name of service.
+            client_args: kwargs for boto3.Session.client(*args, **kwargs).
+
+        Returns:
+            boto low-level service client.
+        """
+        config = _get_config(client_args.get('config'))
+        if self.config:
+            config = self.config.merge(config) if config else self.config
+
+        if config:
+            client_args['config'] = config
+
+        return self.boto_session.client(service_name, **client_args)
+
+
+def get_session(context):
+    """Get the AwsSession in context, if there is one.
+
+    Args:
+        context (pypyr.context.Context): Get session from this context.
+
+    Returns:
+        AwsSession or None if no pypyraws.steps.session ran in this pipeline.
+    """
+    return context.get(SESSION_CONTEXT_KEY, None)
+
+
+def _get_config(config):
+    """Get botocore Config from dict. Pass through Config or None as is."""
+    if isinstance(config, dict):
+        from botocore.config import Config
+
+        return Config(**config)
+
+    return config
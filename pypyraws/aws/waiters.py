@@ -0,0 +1,373 @@
+"""Run boto waiters concurrently, with cancellation.
+
+botocore's Waiter.wait sleeps with time.sleep between polls, so nothing can
+stop it early. wait() here runs the same acceptor logic as botocore, but
+sleeps on a threading.Event, so another thread can cancel it. This is what
+lets wait_many stop the remaining waiters as soon as the outcome is known.
+
+botocore only imports on first use.
+"""
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+import logging
+import threading
+from pypyraws.aws.service import cap_timeouts, get_client
+from pypyraws.poll import Deadline
+
+# pypyr logger means the log level will be set correctly and output formatted.
+logger = logging.getLogger(__name__)
+
+# waiter states in WaitResult.
+SUCCESS = 'success'
+FAILURE = 'failure'
+CANCELLED = 'cancelled'
+
+# complete modes for wait_many.
+COMPLETE_ALL = 'all'
+COMPLETE_ANY = 'any'
+
+# WaiterError reasons, same as botocore's.
+REASON_FAILURE_STATE = 'Waiter encountered a terminal failure state'
+REASON_MAX_ATTEMPTS = 'Max attempts exceeded'
+
+WaitResult = namedtuple('WaitResult', ['state', 'error'])
+
+
+def get_waiter(service_name,
+               waiter_name,
+               waiter_args=None,
+               session=None,
+               client_args=None):
+    """Get boto waiter and the cached client it polls with.
+
+    Args:
+        service_name: String. Name of service.
+        waiter_name: String. Get this waiter from the service_name client.
+        waiter_args: dict. kwargs for client.get_waiter(*args, **kwargs).
+        session: pypyraws.aws.session.AwsSession. Create client from this
+                 session. If None, use the boto3 default session.
+        client_args: dict. kwargs for the boto client ctor.
+
+    Returns:
+        tuple(client, botocore.waiter.Waiter)
+    """
+    if client_args is None:
+        client = get_client(service_name, session=session)
+    else:
+        client = get_client(service_name, client_args, session=session)
+
+    return client, client.get_waiter(waiter_name, **(waiter_args or {}))
+
+
+def get_capped_client_getter(service_name,
+                             client_args,
+                             deadline,
+                             session=None):
+    """Get callable for wait that caps each call to the time left.
+
+    Args:
+        service_name: String. Name of service.
+        client_args: dict. kwargs for the boto client ctor.
+        deadline: pypyraws.poll.Deadline. Calls must finish by this.
+        session: pypyraws.aws.session.AwsSession. Create client from this
+                 session. If None, use the boto3 default session.
+
+    Returns:
+        callable. Returns a cached client with connect and read timeouts
+        and retries that fit in the time left on deadline when called.
+    """
+    def get_call_client():
+        return get_client(service_name,
+                          cap_timeouts(client_args,
+                                       deadline.remaining(),
+                                       session),
+                          session=session)
+
+    return get_call_client
+
+
+def create_waiter(client,
+                  waiter_name,
+                  method_name,
+                  acceptors,
+                  delay,
+                  max_attempts):
+    """Compile acceptors into a botocore custom waiter for client.
+
+    Args:
+        client: boto low-level service client. The waiter polls with this.
+        waiter_name: String. Name the waiter this.
+        method_name: String. Client method to poll, e.g describe_tables.
+        acceptors: list of pypyraws.aws.response.Acceptor with JMESPath
+                   queries.
+        delay: float. Seconds between polls.
+        max_attempts: int. Poll at most this many times.
+
+    Returns:
+        botocore.waiter.Waiter
+
+    Raises:
+        ValueError: client has no method_name, or an acceptor isn't a
+                    JMESPath query.
+    """
+    from botocore.waiter import create_waiter_with_client, WaiterModel
+
+    try:
+        operation = client.meta.method_to_api_mapping[method_name]
+    except KeyError as err:
+        raise ValueError(f"{client.meta.service_model.service_name} has no "
+                         f"method {method_name}.") from err
+
+    model = WaiterModel({
+        'version': 2,
+        'waiters': {
+            waiter_name: {
+                'operation': operation,
+                'delay': delay,
+                'maxAttempts': max_attempts,
+                'acceptors': [acceptor.to_waiter_acceptor()
+                              for acceptor in acceptors]}}})
+
+    return create_waiter_with_client(waiter_name, model, client)
+
+
+@contextmanager
+def cancel_after(timeout, cancel):
+    """Set cancel after timeout seconds, unless the block finishes first.
+
+    Args:
+        timeout: float. Seconds. None means never.
+        cancel: threading.Event. Set this at timeout.
+    """
+    if timeout is None:
+        yield
+        return
+
+    timer = threading.Timer(timeout, cancel.set)
+    timer.daemon = True
+    timer.start()
+    try:
+        yield
+    finally:
+        timer.cancel()
+
+
+def match(waiter, response):
+    """Get the first of waiter's acceptors that matches response, or None."""
+    return next((acceptor for acceptor in waiter.config.acceptors
+                 if acceptor.matcher_func(response)),
+                None)
+
+
+def is_satisfied(waiter, response):
+    """Check if response already shows waiter's success state.
+
+    Use this to skip waiting when an earlier response, like the one from the
+    call that started the change, is already in the state you want.
+
+    Args:
+        waiter: botocore.waiter.Waiter.
+        response: dict. Response in the shape of the waiter's operation.
+
+    Returns:
+        bool. True if the first acceptor that matches response is success.
+        False if it's failure or retry, or nothing matched, so polling
+        decides.
+    """
+    acceptor = match(waiter, response)
+    return acceptor is not None and acceptor.state == SUCCESS
+
+
+def wait(client, waiter, wait_args=None, cancel=None, get_call_client=None):
+    """Poll until waiter reaches a success or failure state.
+
+    Same semantics as botocore.waiter.Waiter.wait, including the WaiterConfig
+    Delay and MaxAttempts in wait_args.
+
+    Args:
+        client: boto low-level service client that owns waiter.
+        waiter: botocore.waiter.Waiter.
+        wait_args: dict. kwargs for the waiter's operation, plus optional
+                   WaiterConfig.
+        cancel: threading.Event. Stop waiting when this is set. Checked
+                before each poll and interrupts the delay between polls.
+        get_call_client: callable. Returns the client for each poll, e.g
+                         with timeouts capped to the time left. A poll that
+                         times out then counts as an attempt, rather than
+                         raising. Default always poll with client.
+
+    Returns:
+        bool. True if the waiter reached its success state, False if it was
+        cancelled first.
+
+    Raises:
+        botocore.exceptions.WaiterError: Failure state, error response that
+                                         no acceptor matched, or max attempts
+                                         exceeded.
+    """
+    from botocore import xform_name
+    from botocore.exceptions import (ClientError,
+                                     ConnectTimeoutError,
+                                     ReadTimeoutError,
+                                     WaiterError)
+    from botocore.waiter import is_valid_waiter_error
+
+    cancel = cancel if cancel else threading.Event()
+    operation_args = dict(wait_args or {})
+    waiter_config = operation_args.pop('WaiterConfig', {})
+    delay = waiter_config.get('Delay', waiter.config.delay)
+    max_attempts = waiter_config.get('MaxAttempts',
+                                     waiter.config.max_attempts)
+    operation_name = xform_name(waiter.config.operation)
+
+    last_acceptor = None
+    attempts = 0
+
+    while not cancel.is_set():
+        call_client = get_call_client() if get_call_client else client
+        try:
+            response = getattr(call_client, operation_name)(
+                **operation_args)
+        except ClientError as err:
+            response = err.response
+        except (ConnectTimeoutError, ReadTimeoutError) as err:
+            if not get_call_client:
+                raise
+            logger.warning(f"{waiter.name} {operation_name} timed out: "
+                           f"{err}")
+            # no acceptor matches a call without a response.
+            response = {}
+
+        attempts += 1
+
+        acceptor = match(waiter, response)
+        if acceptor:
+            last_acceptor = acceptor
+            if acceptor.state == SUCCESS:
+                logger.debug(f"{waiter.name} matched success state after "
+                             f"{attempts} attempts")
+                return True
+            if acceptor.state == FAILURE:
+                raise WaiterError(
+                    name=waiter.name,
+                    reason=(f"{REASON_FAILURE_STATE}: "
+                            f"{acceptor.explanation}"),
+                    last_response=response)
+        elif is_valid_waiter_error(response):
+            raise WaiterError(
+                name=waiter.name,
+                reason=(f"An error occurred "
+                        f"({response['Error'].get('Code', 'Unknown')}): "
+                        f"{response['Error'].get('Message', 'Unknown')}"),
+                last_response=response)
+
+        if attempts >= max_attempts:
+            reason = REASON_MAX_ATTEMPTS
+            if last_acceptor:
+                reason = (f"{reason}. Previously accepted state: "
+                          f"{last_acceptor.explanation}")
+            raise WaiterError(name=waiter.name,
+                              reason=reason,
+                              last_response=response)
+
+        cancel.wait(delay)
+
+    logger.debug(f"{waiter.name} cancelled after {attempts} attempts")
+    return False
+
+
+def wait_many(waiters,
+              complete=COMPLETE_ALL,
+              max_workers=None,
+              session=None,
+              timeout=None):
+    """Run many waiters at the same time.
+
+    With complete 'all', the first waiter to fail cancels the rest. With
+    complete 'any', the first waiter to succeed cancels the rest. At timeout,
+    all waiters still running cancel.
+
+    Args:
+        waiters: list of dict. Each dict is kwargs for get_waiter plus
+                 wait_args: service_name, waiter_name, waiter_args, wait_args.
+        complete: str. 'all' or 'any'.
+        max_workers: int. Run at most this many waiters at the same time.
+                     Default is all of them, since waiters spend nearly all
+                     their time sleeping.
+        session: pypyraws.aws.session.AwsSession. Create clients from this
+                 session. If None, use the boto3 default session.
+        timeout: float. Cancel waiters still running after this many
+                 seconds. Also caps the connect and read timeouts and the
+                 retries of each aws call to the time left when it starts,
+                 so that an in-flight call can't run far past the deadline.
+                 None means no timeout.
+
+    Returns:
+        list of WaitResult in the same order as waiters. state is success,
+        failure or cancelled. error is the exception if state is failure,
+        else None.
+
+    Raises:
+        ValueError: complete is not all or any.
+    """
+    logger.debug("started")
+    if complete not in (COMPLETE_ALL, COMPLETE_ANY):
+        raise ValueError(f"complete must be {COMPLETE_ALL} or {COMPLETE_ANY}, "
+                         f"not {complete}.")
+
+    if not waiters:
+        logger.debug("no waiters, done")
+        return []
+
+    cancel = threading.Event()
+    deadline = None if timeout is None else Deadline(timeout)
+
+    def run(spec):
+        if cancel.is_set():
+            return False
+
+        client_args = spec.get('client_args', None)
+        client, waiter = get_waiter(service_name=spec['service_name'],
+                                    waiter_name=spec['waiter_name'],
+                                    waiter_args=spec.get('waiter_args'),
+                                    session=session,
+                                    client_args=client_args)
+        get_call_client = None
+        if deadline is not None:
+            get_call_client = get_capped_client_getter(spec['service_name'],
+                                                       client_args,
+                                                       deadline,
+                                                       session)
+
+        return wait(client,
+                    waiter,
+                    spec.get('wait_args'),
+                    cancel,
+                    get_call_client)
+
+    with cancel_after(timeout, cancel), ThreadPoolExecutor(
+            max_workers=max_workers or len(waiters)) as executor:
+        futures = [executor.submit(run, spec) for spec in waiters]
+
+        for future in as_completed(futures):
+            failed = future.exception() is not None
+            if ((complete == COMPLETE_ALL and failed)
+                    or (complete == COMPLETE_ANY
+                        and not failed and future.result())):
+                logger.debug(f"{complete} outcome known, cancelling "
+                             "waiters")
+                cancel.set()
+
+    results = []
+    for future in futures:
+        error = future.exception()
+        if error:
+            results.append(WaitResult(FAILURE, error))
+        elif future.result():
+            results.append(WaitResult(SUCCESS, None))
+        else:
+            results.append(WaitResult(CANCELLED, None))
+
+    logger.debug("done")
+    return results
@@ -0,0 +1,165 @@
+"""Thread-safe in-process caches."""
+from collections import OrderedDict, namedtuple
+import logging
+import threading
+
+# pypyr logger means the log level will be set correctly and output formatted.
+logger = logging.getLogger(__name__)
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+class LruCache():
+    """Bounded least-recently-used cache that is safe to share across threads.
+
+    Once the cache holds maxsize items, adding another evicts the item that
+    was used least recently.
+
+    Hit and miss counters let you see how often the cache saves you the cost of
+    creating the item.
+    """
+
+    def __init__(self, maxsize, weigh=None):
+        """Initialize the cache.
+
+        Args:
+            maxsize (int): Maximum number of items to keep. If weigh is set,
+                maximum total weight of items to keep instead.
+            weigh (callable): weigh(item) returns the item's weight, e.g its
+                size in bytes. Default every item weighs 1.
+        """
+        self.maxsize = maxsize
+        self._weigh = weigh if weigh else _weigh_one
+        self._items = OrderedDict()
+        self._weights = {}
+        self._currsize = 0
+        self._lock = threading.RLock()
+        self._hits = 0
+        self._misses = 0
+
+    def get_or_create(self, key, creator):
+        """Get item for key from cache. Create and cache it if it's not there.
+
+        The creator runs inside the cache lock, so concurrent callers asking
+        for the same key only ever create the item once.
+
+        Args:
+            key (hashable): Cache key.
+            creator (callable): Call with no args to create item on miss.
+
+        Returns:
+            The cached item.
+        """
+        with self._lock:
+            try:
+                item = self._items[key]
+            except KeyError:
+                self._misses += 1
+            else:
+                self._hits += 1
+                self._items.move_to_end(key)
+                return item
+
+            item = creator()
+            self._add(key, item)
+            return item
+
+    def peek(self, key, default=None):
+        """Get item for key without counting a hit or miss.
+
+        Use with hit and put when it takes more than the key to decide if the
+        cached item is still good, e.g asking a server if it changed. Keep
+        the item peek returns, rather than looking it up again, because
+        another thread can evict it any time.
+
+        Args:
+            key (hashable): Cache key.
+            default: Return this if key isn't in the cache.
+
+        Returns:
+            The cached item, or default.
+        """
+        with self._lock:
+            return self._items.get(key, default)
+
+    def hit(self, key):
+        """Count a hit for key and mark it most recently used.
+
+        Use after peek. Another thread might have evicted key since, so a
+        missing key still counts as a hit, for the item peek returned.
+
+        Args:
+            key (hashable): Cache key.
+        """
+        with self._lock:
+            self._hits += 1
+            if key in self._items:
+                self._items.move_to_end(key)
+
+    def put(self, key, item):
+        """Count a miss for key and add or replace its item.
+
+        Args:
+            key (hashable): Cache key.
+            item: Cache this.
+        """
+        with self._lock:
+            self._misses += 1
+            self._add(key, item)
+
+    def _add(self, key, item):
+        """Add item and evict until within maxsize. Hold the lock to call."""
+        self._remove(key)
+        weight = self._weigh(item)
+        if weight > self.maxsize:
+            logger.debug("item heavier than cache maxsize, not caching")
+            return
+
+        self._items[key] = item
+        self._weights[key] = weight
+        self._currsize += weight
+        while self._currsize > self.maxsize:
+            self._remove(next(iter(self._items)))
+            logger.debug("cache full, evicted least recently used item")
+
+    def _remove(self, key):
+        """Remove key if it's in the cache. Hold the lock to call."""
+        if key in self._items:
+            del self._items[key]
+            self._currsize -= self._weights.pop(key)
+
+    def clear(self):
+        """Remove all items from cache and reset the hit and miss counters."""
+        with self._lock:
+            self._items.clear()
+            self._weights.clear()
+            self._currsize = 0
+            self.reset_counters()
+
+    def reset_counters(self):
+        """Reset the hit and miss counters, but keep the items."""
+        with self._lock:
+            self._hits = 0
+            self._misses = 0
+
+    def info(self):
+        """Get cache statistics.
+
+        Returns:
+            CacheInfo: namedtuple(hits, misses, maxsize, currsize). currsize is
+            the total weight of the items.
+        """
+        with self._lock:
+            return CacheInfo(hits=self._hits,
+                             misses=self._misses,
+                             maxsize=self.maxsize,
+                             currsize=self._currsize)
+
+    def __len__(self):
+        """Get number of items in cache."""
+        return len(self._items)
+
+
+def _weigh_one(item):
+    """Every item weighs 1, so maxsize is the number of items."""
+    return 1
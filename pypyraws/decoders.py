@@ -0,0 +1,155 @@
+"""Pluggable json decoders and cached yaml loaders.
+
+orjson and simdjson decode large documents several times faster than the
+stdlib json module. Neither is a hard dependency: auto uses the first one that
+imports, else the stdlib.
+
+The fast decoders are stricter than the stdlib. orjson rejects NaN,
+Infinity and integers wider than 64 bits, which the stdlib accepts. So when a
+fast decoder can't decode a document, it decodes again with the stdlib,
+which either succeeds the way it always did or raises its usual error.
+
+yaml loaders are ruamel.yaml safe loaders, cached per thread, because a
+ruamel YAML instance is costly to build but can't load on two threads at once.
+The c loader swaps in ruamel.yaml.clib's libyaml-based parser, but keeps
+ruamel's YAML 1.2 resolver and safe constructor, so it loads exactly what the
+pure loader does. PyYAML's CSafeLoader isn't an option, because it resolves
+YAML 1.1 style, e.g yes and on load as True and 017 as 15.
+"""
+import json
+import logging
+import threading
+
+# pypyr logger means the log level will be set correctly and output formatted.
+logger = logging.getLogger(__name__)
+
+AUTO = 'auto'
+STDLIB = 'json'
+# auto tries these in order.
+FAST_DECODERS = ('orjson', 'simdjson')
+
+_auto_name = None
+
+PURE_YAML = 'pure'
+C_YAML = 'c'
+YAML_LOADERS = (PURE_YAML, C_YAML)
+
+_yaml_loaders = threading.local()
+
+
+def get_decoder(name=AUTO):
+    """Get load function for a json decoder.
+
+    Args:
+        name (str): auto, orjson, simdjson or json. auto picks the first of
+            FAST_DECODERS that is installed, else json. None means auto.
+
+    Returns:
+        callable. load(fp) reads the file-like fp and returns the decoded
+        json.
+
+    Raises:
+        ValueError: Unknown decoder name.
+        ImportError: Named decoder isn't installed.
+    """
+    if not name or name == AUTO:
+        name = get_auto_name()
+
+    if name == STDLIB:
+        return json.load
+
+    if name not in FAST_DECODERS:
+        raise ValueError(f"unknown json decoder {name}. Use {AUTO}, "
+                         f"{', '.join(FAST_DECODERS)} or {STDLIB}.")
+
+    loads = import_loads(name)
+
+    def load(fp):
+        data = fp.read()
+        try:
+            return loads(data)
+        except ValueError as err:
+            logger.debug(f"{name} couldn't decode, falling back to {STDLIB}: "
+                         f"{err}")
+            return json.loads(data)
+
+    return load
+
+
+def get_auto_name():
+    """Get name of the fastest installed decoder. Checks only once."""
+    global _auto_name
+    if _auto_name is None:
+        for name in FAST_DECODERS:
+            try:
+                import_loads(name)
+            except ImportError:
+                continue
+            _auto_name = name
+            break
+        else:
+            _auto_name = STDLIB
+
+        logger.debug(f"using {_auto_name} to decode json")
+
+    return _auto_name
+
+
+def import_loads(name):
+    """Import fast decoder module name and get its loads function.
+
+    Raises:
+        ImportError: name isn't installed.
+    """
+    if name == 'orjson':
+        import orjson
+        return orjson.loads
+
+    import simdjson
+    return simdjson.loads
+
+
+def get_yaml_loader(name=PURE_YAML):
+    """Get this thread's safe yaml loader.
+
+    Args:
+        name (str): pure or c. None means pure. If ruamel.yaml.clib isn't
+            installed, c logs a warning and uses pure.
+
+    Returns:
+        ruamel.yaml.YAML. Call load(stream) on it.
+
+    Raises:
+        ValueError: Unknown loader name.
+    """
+    if not name:
+        name = PURE_YAML
+
+    if name not in YAML_LOADERS:
+        raise ValueError(f"unknown yaml loader {name}. Use "
+                         f"{' or '.join(YAML_LOADERS)}.")
+
+    loader = getattr(_yaml_loaders, name, None)
+    if loader is None:
+        pure = name == PURE_YAML
+        if not pure and not has_yaml_clib():
+            logger.warning("ruamel.yaml.clib isn't installed, so using the "
+                           "pure python yaml loader.")
+            pure = True
+
+        import ruamel.yaml
+        loader = ruamel.yaml.YAML(typ='safe', pure=pure)
+        setattr(_yaml_loaders, name, loader)
+        logger.debug(f"created {name} yaml loader")
+
+    return loader
+
+
+def has_yaml_clib():
+    """Check if ruamel.yaml's libyaml-based c extension is installed."""
+    try:
+        import _ruamel_yaml  # noqa: F401
+    except ImportError:
+        return False
+
+    return True
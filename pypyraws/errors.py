@@ -12,3 +12,7 @@ class Error(PlugInError):
 
 class WaitTimeOut(Error):
     """Aws resource that did not finish processing within wait limit."""
+
+
+class WaitFailure(Error):
+    """Aws resource reached a terminal failure state while waiting."""
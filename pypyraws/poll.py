@@ -0,0 +1,210 @@
+"""Poll with exponential backoff, jitter and an overall deadline.
+
+A fixed poll interval either burns api calls and gets throttled when it's
+short, or adds up to a whole interval of extra latency when it's long. Backing
+off exponentially polls often while the resource is likely to change soon
+and less often the longer it takes. Jitter spreads out many pollers so that
+they don't all hit the api at the same moment.
+
+See https://aws.amazon.com/blogs/architecture/exponential-backoff-and-jitter/
+"""
+import logging
+import random
+import time
+
+# pypyr logger means the log level will be set correctly and output formatted.
+logger = logging.getLogger(__name__)
+
+JITTER_NONE = 'none'
+JITTER_FULL = 'full'
+JITTER_DECORRELATED = 'decorrelated'
+
+
+class Backoff():
+    """Delay policy between polls.
+
+    Without jitter, delay n is initial_delay * multiplier^n, capped at
+    max_delay.
+
+    Jitter:
+        - none: exact exponential delays.
+        - full: random delay between 0 and the exponential delay.
+        - decorrelated: random delay between initial_delay and multiplier times
+          the previous delay, capped at max_delay.
+
+    Attributes:
+        initial_delay (float): Seconds before the second poll.
+        multiplier (float): Grow the delay by this factor each poll. 1 means
+            a fixed interval.
+        max_delay (float): Never wait longer than this many seconds between
+            polls. None means no cap.
+        jitter (str): none, full or decorrelated.
+    """
+
+    def __init__(self,
+                 initial_delay=1,
+                 multiplier=2,
+                 max_delay=None,
+                 jitter=JITTER_NONE,
+                 rand=None):
+        """Initialize the policy.
+
+        Args:
+            initial_delay (float): Seconds before the second poll.
+            multiplier (float): Grow the delay by this factor each poll.
+            max_delay (float): Cap on the delay in seconds. None is no cap.
+            jitter (str): none, full or decorrelated.
+            rand (random.Random): Random source for jitter. Inject a seeded
+                Random for repeatable delays. Default the random module.
+
+        Raises:
+            ValueError: Negative delay, multiplier < 1, or unknown jitter.
+        """
+        if initial_delay < 0 or (max_delay is not None and max_delay < 0):
+            raise ValueError("backoff delays can't be negative.")
+
+        if multiplier < 1:
+            raise ValueError(
+                f"backoff multiplier must be >= 1, not {multiplier}.")
+
+        if jitter not in (JITTER_NONE, JITTER_FULL, JITTER_DECORRELATED):
+            raise ValueError(f"backoff jitter must be {JITTER_NONE}, "
+                             f"{JITTER_FULL} or {JITTER_DECORRELATED}, not "
+                             f"{jitter}.")
+
+        self.initial_delay = initial_delay
+        self.multiplier = multiplier
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self._rand = rand if rand else random
+
+    def delays(self):
+        """Yield the delay in seconds before each subsequent poll, forever."""
+        delay = self.initial_delay
+        previous = self.initial_delay
+        while True:
+            capped = self._cap(delay)
+            if self.jitter == JITTER_FULL:
+                yield self._rand.uniform(0, capped)
+            elif self.jitter == JITTER_DECORRELATED:
+                previous = self._cap(
+                    self._rand.uniform(self.initial_delay,
+                                       previous * self.multiplier))
+                yield previous
+            else:
+                yield capped
+
+            # with max_delay set, stop growing once capped so the float
+            # can't overflow. Without it, delay grows without limit.
+            if capped == delay:
+                delay *= self.multiplier
+
+    def _cap(self, delay):
+        """Limit delay to max_delay."""
+        if self.max_delay is None:
+            return delay
+
+        return min(delay, self.max_delay)
+
+    def __repr__(self):
+        """Show the policy."""
+        return (f"Backoff(initial_delay={self.initial_delay}, "
+                f"multiplier={self.multiplier}, max_delay={self.max_delay}, "
+                f"jitter='{self.jitter}')")
+
+
+class Deadline():
+    """Point in time that a wait has to finish by.
+
+    Attributes:
+        timeout (float): Seconds from creation to the deadline.
+    """
+
+    def __init__(self, timeout, clock=None):
+        """Start the clock.
+
+        Args:
+            timeout (float): Seconds from now.
+            clock (callable): Returns monotonic time in seconds. Default
+                time.monotonic.
+        """
+        self.timeout = timeout
+        self._clock = clock if clock else time.monotonic
+        self._end = self._clock() + timeout
+
+    def remaining(self):
+        """Get seconds left until the deadline, 0 if it's passed."""
+        return max(self._end - self._clock(), 0)
+
+    @property
+    def expired(self):
+        """True if the deadline has passed."""
+        return self.remaining() <= 0
+
+
+def poll_until_true(func,
+                    backoff,
+                    max_attempts=None,
+                    timeout=None,
+                    clock=None,
+                    sleep=None):
+    """Call func until it returns True, backing off between calls.
+
+    Stops at whichever comes first of func returning True, max_attempts calls,
+    or timeout seconds. The last delay shortens to end exactly at the
+    deadline, so func gets one final call at the deadline rather than the
+    timeout overshooting by up to a whole delay.
+
+    Args:
+        func (callable): Call with no arguments. Return truthy to stop.
+        backoff (Backoff): Delays between calls.
+        max_attempts (int): Call func at most this many times. None means no
+            limit, so set timeout.
+        timeout (float): Stop after this many seconds. None means no limit, so
+            set max_attempts.
+        clock (callable): Returns monotonic time in seconds. Default
+            time.monotonic.
+        sleep (callable): sleep(seconds). Default time.sleep.
+
+    Returns:
+        bool. True if func returned True, False if max_attempts or timeout
+        ran out first.
+
+    Raises:
+        ValueError: Neither max_attempts nor timeout set.
+    """
+    if max_attempts is None and timeout is None:
+        raise ValueError("set max_attempts or timeout, else polling never "
+                         "stops.")
+
+    # resolve at call time so that callers can patch time.sleep.
+    clock = clock if clock else time.monotonic
+    sleep = sleep if sleep else time.sleep
+
+    deadline = None if timeout is None else Deadline(timeout, clock)
+    delays = backoff.delays()
+    attempt = 0
+
+    logger.debug(f"polling with {backoff} for {max_attempts} attempts and "
+                 f"{timeout} seconds")
+
+    while True:
+        attempt += 1
+        if func():
+            logger.debug(f"attempt {attempt}. Desired state reached.")
+            return True
+
+        if max_attempts is not None and attempt >= max_attempts:
+            logger.debug(f"attempt {attempt}. Out of attempts.")
+            return False
+
+        delay = next(delays)
+        if deadline is not None:
+            remaining = deadline.remaining()
+            if remaining <= 0:
+                logger.debug(f"attempt {attempt}. Out of time.")
+                return False
+            delay = min(delay, remaining)
+
+        logger.debug(f"attempt {attempt}. Still waiting {delay:.3f}s. . .")
+        sleep(delay)
@@ -1,6 +1,8 @@
 """pypyr step that runs any boto3 low-level client method."""
 import logging
+from pypyraws.aws.response import project
 import pypyraws.aws.service
+from pypyraws.aws.session import get_session
 import pypyraws.contextargs as contextargs
 
 
@@ -27,12 +29,45 @@ def run_step(context):
                 - methodName: mandatory. String. Name of method to execute.
                 - clientArgs: optional. Dict. kwargs for the boto client ctor.
                 - methodArgs: optional. Dict. kwargs for the client method call
+                - paginate: optional. Bool or Dict. Default False. If True,
+                  get all pages of the result with the botocore paginator for
+                  methodName and merge them into a single response.
+                  If dict, paginate with this as the botocore
+                  PaginationConfig. Keys are:
+                    - MaxItems: int. Stop after this many items in total.
+                      Response contains NextToken if there were more.
+                    - PageSize: int. Items per aws call.
+                    - StartingToken: string. Continue from this NextToken.
+                - stream: optional. Bool. Default False. If True, paginate and
+                  save a lazy iterable of the items in all pages to
+                  awsClientOut instead of the merged response. Each page is
+                  only fetched when you iterate over it, e.g. in a foreach
+                  loop, so memory use stays constant however many items there
+                  are. Iterating again fetches all pages again.
+                - resultKey: optional. String. JMESPath expression for the
+                  items to stream from each page, e.g 'Contents' or
+                  'Reservations[].Instances[]'. Defaults to the paginator's
+                  first result key. Only applies with stream.
+                - outputQuery: optional. String. JMESPath expression. Save
+                  only the result of this expression on the aws response to
+                  awsClientOut, e.g 'Reservations[].Instances[].InstanceId'.
+                  Does not apply with stream.
+                - stripMetadata: optional. Bool. Default False. If True,
+                  remove ResponseMetadata from the aws response. Does not
+                  apply with stream.
+
+            If context contains awsSessionOut from pypyraws.steps.session,
+            the client comes from that session.
 
     Returns: None. Although there is no return, this does add awsClientOut to
              context.
 
              Adds key to context for response from aws client:
                 - awsClientOut. Dictionary containing the full aws response.
+                  With paginate, contains the result keys of all pages
+                  concatenated, but not ResponseMetadata.
+                  With stream, pypyraws.aws.service.PageItems iterable of the
+                  items in all pages.
 
     Raises:
         botocore.exceptions.ClientError: Anything inside boto went wrong.
@@ -49,11 +84,44 @@ def run_step(context):
      client_args,
      method_args) = contextargs.get_awsclient_args(client_in, __name__)
 
-    context['awsClientOut'] = pypyraws.aws.service.operation_exec(
-        service_name=service_name,
-        method_name=method_name,
-        client_args=client_args,
-        operation_args=method_args)
+    paginate = client_in.get('paginate', False)
+    if not isinstance(paginate, dict):
+        paginate = context.get_formatted_as_type(paginate, out_type=bool)
+    stream = context.get_formatted_as_type(client_in.get('stream', False),
+                                           out_type=bool)
+
+    if paginate or stream:
+        logger.debug(f"paginating {method_name}")
+        page_iterator = pypyraws.aws.service.paginate(
+            service_name=service_name,
+            method_name=method_name,
+            client_args=client_args,
+            operation_args=method_args,
+            pagination_config=(paginate if isinstance(paginate, dict)
+                               else None),
+            session=get_session(context))
+
+        if stream:
+            context['awsClientOut'] = pypyraws.aws.service.PageItems(
+                page_iterator=page_iterator,
+                result_key=client_in.get('resultKey', None))
+            logger.debug("lazy items iterator in context['awsClientOut']")
+        else:
+            response = page_iterator.build_full_result()
+    else:
+        response = pypyraws.aws.service.operation_exec(
+            service_name=service_name,
+            method_name=method_name,
+            client_args=client_args,
+            operation_args=method_args,
+            session=get_session(context))
+
+    if not stream:
+        context['awsClientOut'] = project(
+            response,
+            query=client_in.get('outputQuery', None),
+            strip_metadata=context.get_formatted_as_type(
+                client_in.get('stripMetadata', False), out_type=bool))
 
     logger.debug("aws response in context['awsClientOut']")
     logger.info(f"Executed {method_name} on aws {service_name}.")
@@ -0,0 +1,173 @@
+"""pypyr step that runs many boto3 low-level client methods concurrently."""
+import logging
+from pypyr.errors import KeyNotInContextError
+import pypyraws.aws.aio
+from pypyraws.aws.response import project
+import pypyraws.aws.service
+from pypyraws.aws.session import get_session
+import pypyraws.contextargs as contextargs
+
+
+# pypyr logger means the log level will be set correctly and output formatted.
+logger = logging.getLogger(__name__)
+
+
+def run_step(context):
+    """Execute many low-level boto3 client methods with bounded concurrency.
+
+    All of the awsClientBatchIn descendant values support {key}
+    string interpolation.
+
+    Args:
+        context:
+            Dictionary. Mandatory.
+            Requires the following context keys in context:
+                - awsClientBatchIn. dict. mandatory. Contains keys:
+
+            The awsClientBatchIn dictionary should contain either:
+                - calls: list of dict. Each dict is an awsClientIn, the same
+                  as for pypyraws.steps.client: serviceName, methodName,
+                  clientArgs, methodArgs.
+            or:
+                - awsClientIn: dict. Run this awsClientIn once for each
+                  item in methodArgsList.
+                - methodArgsList: list of dict. Each dict is the methodArgs
+                  for one call. Overrides methodArgs in awsClientIn.
+
+            And optionally:
+                - maxWorkers: int. Default 10. Run at most this many calls at
+                  the same time. If you use more than 10, set
+                  max_pool_connections in the client config to match.
+                - failFast: bool. Default False. If True, stop at the first
+                  error and raise it. Calls that haven't started yet don't run.
+                  If False, run all calls and report errors per call in
+                  awsClientBatchOut.
+                - outputQuery: string. JMESPath expression. Save only the
+                  result of this expression on each aws response.
+                - stripMetadata: bool. Default False. If True, remove
+                  ResponseMetadata from each aws response.
+                - backend: string. Default 'thread'. How to run the calls:
+                    - thread: on a pool of maxWorkers threads.
+                    - asyncio: on one asyncio event loop with at most
+                      maxWorkers calls in flight. Uses aiobotocore if it's
+                      installed, so large maxWorkers like 1000 do not need a
+                      thread per call. Without aiobotocore, or with an
+                      awsSessionOut from pypyraws.steps.session, it falls
+                      back to a thread pool.
+
+    Returns: None. Although there is no return, this does add
+             awsClientBatchOut to context.
+
+             Adds key to context:
+                - awsClientBatchOut. list of dict in the same order as the
+                  input calls. Each dict contains:
+                    - response: the aws response. None if the call failed.
+                    - error: None if the call succeeded, else string
+                      describing the error.
+
+    Raises:
+        botocore.exceptions.ClientError: Anything inside boto went wrong and
+                                         failFast is True.
+        pypyr.errors.KeyNotInContextError: awsClientBatchIn missing in
+                                           context, or contains neither calls
+                                           nor awsClientIn.
+        pypyr.errors.KeyInContextHasNoValueError: awsClientBatchIn exists but
+                                                  is None.
+        ValueError: backend is not thread or asyncio.
+    """
+    logger.debug("started")
+    context.assert_key_has_value('awsClientBatchIn', __name__)
+    batch_in = context.get_formatted('awsClientBatchIn')
+
+    calls = get_calls(batch_in)
+
+    max_workers = int(batch_in.get('maxWorkers', 10))
+    fail_fast = context.get_formatted_as_type(batch_in.get('failFast', False),
+                                              out_type=bool)
+    backend = batch_in.get('backend', 'thread')
+
+    logger.info(f"Executing {len(calls)} aws calls with max {max_workers} "
+                f"at the same time on {backend} backend.")
+
+    if backend == 'thread':
+        results = pypyraws.aws.service.operation_exec_many(
+            calls=calls,
+            max_workers=max_workers,
+            fail_fast=fail_fast,
+            session=get_session(context))
+    elif backend == 'asyncio':
+        results = pypyraws.aws.aio.operation_exec_many(
+            calls=calls,
+            max_concurrency=max_workers,
+            fail_fast=fail_fast,
+            session=get_session(context))
+    else:
+        raise ValueError(f"awsClientBatchIn backend for {__name__} must be "
+                         f"thread or asyncio, not {backend}.")
+
+    query = batch_in.get('outputQuery', None)
+    strip_metadata = context.get_formatted_as_type(
+        batch_in.get('stripMetadata', False), out_type=bool)
+
+    error_count = 0
+    out = []
+    for result in results:
+        if result.error:
+            error_count += 1
+            out.append({'response': None,
+                        'error': f"{type(result.error).__name__}: "
+                                 f"{result.error}"})
+        else:
+            out.append({'response': project(result.response,
+                                            query=query,
+                                            strip_metadata=strip_metadata),
+                        'error': None})
+
+    context['awsClientBatchOut'] = out
+
+    if error_count:
+        logger.warning(f"{error_count} of {len(calls)} aws calls failed. "
+                       "See error in context['awsClientBatchOut'].")
+    else:
+        logger.info(f"Executed {len(calls)} aws calls.")
+
+    logger.debug("done")
+
+
+def get_calls(batch_in):
+    """Get operation_exec kwargs for each call in awsClientBatchIn.
+
+    Args:
+        batch_in (dict): Formatted awsClientBatchIn.
+
+    Returns:
+        list of dict: kwargs for pypyraws.aws.service.operation_exec.
+
+    Raises:
+        pypyr.errors.KeyNotInContextError: Neither calls nor awsClientIn.
+        pypyr.errors.KeyInContextHasNoValueError: awsClientIn has empty
+                                                  serviceName or methodName.
+    """
+    if 'calls' in batch_in:
+        client_ins = batch_in['calls']
+    elif 'awsClientIn' in batch_in:
+        template = batch_in['awsClientIn']
+        client_ins = [{**template, 'methodArgs': method_args}
+                      for method_args in batch_in.get('methodArgsList', [])]
+    else:
+        raise KeyNotInContextError(
+            f"awsClientBatchIn for {__name__} must contain either calls or "
+            "awsClientIn.")
+
+    calls = []
+    for client_in in client_ins:
+        (service_name,
+         method_name,
+         client_args,
+         method_args) = contextargs.get_awsclient_args(client_in, __name__)
+        calls.append({'service_name': service_name,
+                      'method_name': method_name,
+                      'client_args': client_args,
+                      'operation_args': method_args})
+
+    return calls
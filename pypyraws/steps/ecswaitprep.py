@@ -6,6 +6,10 @@
 # pypyr logger means the log level will be set correctly and output formatted.
 logger = logging.getLogger(__name__)
 
+# most arns that ecs describe_tasks and describe_services accept per call.
+MAX_TASKS_PER_CALL = 100
+MAX_SERVICES_PER_CALL = 10
+
 
 def run_step(context):
     """Run me after an ecs task run or stop to prepare an ecs waiter.
@@ -50,6 +54,17 @@ def run_step(context):
         Overwrites the awsWaitIn key in context. The new awsWaitIn will contain
         waitArgs filled with the task or service arns found in awsClientOut.
 
+        Also sets awsWaitIn.initialResponse to the tasks or services in
+        awsClientOut, in the shape of a describe_tasks or describe_services
+        response. pypyraws.steps.wait checks the waiter against this first, and
+        doesn't wait at all if it already shows the success state. Removed
+        if awsClientOut only has arns.
+
+        ecs describes at most 100 tasks or 10 services per call. If there are
+        more arns than that, waitArgs is a list of dicts, each with at most
+        that many arns. pypyraws.steps.wait runs a waiter for each of them at
+        the same time.
+
     Raises:
         pypyr.errors.KeyNotInContextError: awsClientOut missing in context.
         pypyr.errors.KeyInContextHasNoValueError: awsClientOut exists but is
@@ -69,12 +84,14 @@ def run_step(context):
     parse_me = context['awsClientOut']
     isTask = False
     isService = False
+    initial_response = None
 
     if 'service' in parse_me:
         logger.debug("Found 'service' in awsClientOut")
         if cluster is None:
             cluster = parse_me['service']['clusterArn']
         arn_list = [parse_me['service']['serviceArn']]
+        initial_response = {'services': [parse_me['service']]}
         isService = True
     elif 'serviceArns' in parse_me:
         logger.debug("Found 'serviceArns' in awsClientOut")
@@ -89,12 +106,14 @@ def run_step(context):
             cluster = parse_me['services'][0]['clusterArn']
         arn_list = [svc['serviceArn']
                     for svc in parse_me['services']]
+        initial_response = {'services': parse_me['services']}
         isService = True
     elif 'task' in parse_me:
         logger.debug("Found 'task' in awsClientOut")
         if cluster is None:
             cluster = parse_me['task']['clusterArn']
         arn_list = [parse_me['task']['taskArn']]
+        initial_response = {'tasks': [parse_me['task']]}
         isTask = True
     elif 'taskArns' in parse_me:
         logger.debug("Found 'taskArns' in awsClientOut")
@@ -109,6 +128,7 @@ def run_step(context):
             # return tasks
             cluster = parse_me['tasks'][0]['clusterArn']
         arn_list = [task['taskArn'] for task in parse_me['tasks']]
+        initial_response = {'tasks': parse_me['tasks']}
         isTask = True
     else:
         raise KeyNotInContextError('Run ecswaitprep after an ecs method that '
@@ -117,23 +137,47 @@ def run_step(context):
                                    'services, task, taskArns or tasks in '
                                    'awsClientOut.')
 
-    waiter_dict = {}
     if cluster is None:
         logger.debug("No cluster specified. Waiter will use default cluster.")
     else:
         logger.debug(f"{cluster} cluster specified.")
-        waiter_dict['cluster'] = cluster
 
     if isTask:
         logger.debug("Adding task arns")
-        waiter_dict['tasks'] = arn_list
+        arns_key = 'tasks'
+        chunk_size = MAX_TASKS_PER_CALL
 
     if isService:
         logger.debug("Adding service arns")
-        waiter_dict['services'] = arn_list
+        arns_key = 'services'
+        chunk_size = MAX_SERVICES_PER_CALL
+
+    waiter_dicts = []
+    for i in range(0, max(len(arn_list), 1), chunk_size):
+        waiter_dict = {}
+        if cluster is not None:
+            waiter_dict['cluster'] = cluster
+        waiter_dict[arns_key] = arn_list[i:i + chunk_size]
+        waiter_dicts.append(waiter_dict)
 
     if 'awsWaitIn' not in context:
         context['awsWaitIn'] = {}
-    context['awsWaitIn']['waitArgs'] = waiter_dict
+
+    if len(waiter_dicts) == 1:
+        context['awsWaitIn']['waitArgs'] = waiter_dicts[0]
+    else:
+        context['awsWaitIn']['waitArgs'] = waiter_dicts
+        logger.info(f"split {len(arn_list)} {arns_key} into "
+                    f"{len(waiter_dicts)} waiters of max {chunk_size}.")
+
+    if initial_response is not None and 'failures' in parse_me:
+        initial_response['failures'] = parse_me['failures']
+
+    # lives with the waitArgs it describes, so it can't outlive them.
+    if initial_response is None:
+        context['awsWaitIn'].pop('initialResponse', None)
+    else:
+        context['awsWaitIn']['initialResponse'] = initial_response
+
     logger.info("added context['awsWaitIn']['waitArgs']")
     logger.debug("done")
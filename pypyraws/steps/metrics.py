@@ -0,0 +1,94 @@
+"""pypyr step that reports metrics for all aws calls pypyraws made."""
+import logging
+from pypyraws.aws.instrumentation import metrics
+import pypyraws.aws.s3
+
+
+# pypyr logger means the log level will be set correctly and output formatted.
+logger = logging.getLogger(__name__)
+
+
+def run_step(context):
+    """Save and log latency, retry, throttling and size metrics for aws calls.
+
+    Every boto client pypyraws creates records each aws call it makes. Run
+    this step at the end of a pipeline, or in on_success/on_failure, to see how
+    much of the pipeline's time went to aws.
+
+    Metrics are process-wide, so they include calls from earlier pipeline
+    runs in the same process, unless you reset them.
+
+    Args:
+        context:
+            Dictionary. Mandatory.
+            Optional context keys:
+                - awsMetricsIn. dict. optional. Contains keys:
+                    - reset: optional. Bool. Default False. Set all metrics
+                      back to 0 after saving them. Run a step with only reset
+                      at the start of a pipeline to measure just that
+                      pipeline. Also resets the document cache hit and miss
+                      counters, but keeps the cached documents.
+
+    Returns: None. Although there is no return, this does add awsMetricsOut to
+             context.
+
+             Adds key to context:
+                - awsMetricsOut. dict. Contains keys:
+                    - operations: dict. Key is service.Operation, e.g
+                      ecs.DescribeTasks. Value is dict with calls, errors,
+                      retries, throttles, latencyTotal, latencyMax,
+                      latencyAvg, bytesSent, bytesReceived. Latency is in
+                      seconds and includes retries.
+                    - clients: dict with created and creationTime, the seconds
+                      spent creating boto clients.
+                    - totals: dict with calls, errors, retries, throttles,
+                      latencyTotal, bytesSent, bytesReceived over all
+                      operations.
+                    - documentCache: dict with hits, misses, hitRatio, size
+                      and maxSize of the s3fetchjson and s3fetchyaml
+                      memoryCache. Sizes are bytes of source.
+    """
+    logger.debug("started")
+    metrics_in = context.get_formatted_value(context.get('awsMetricsIn', {}))
+    summary = metrics.summary()
+    cache_info = pypyraws.aws.s3.document_cache_info()
+    summary['documentCache'] = {
+        'hits': cache_info.hits,
+        'misses': cache_info.misses,
+        'hitRatio': pypyraws.aws.s3.get_hit_ratio(cache_info),
+        'size': cache_info.currsize,
+        'maxSize': cache_info.maxsize}
+    context['awsMetricsOut'] = summary
+
+    totals = summary['totals']
+    clients = summary['clients']
+    logger.info(f"aws calls: {totals['calls']} in "
+                f"{totals['latencyTotal']:.3f}s, errors: {totals['errors']}, "
+                f"retries: {totals['retries']}, "
+                f"throttles: {totals['throttles']}, "
+                f"bytes sent: {totals['bytesSent']}, "
+                f"bytes received: {totals['bytesReceived']}, "
+                f"clients created: {clients['created']} in "
+                f"{clients['creationTime']:.3f}s.")
+
+    for name, op in sorted(summary['operations'].items()):
+        logger.info(f"{name}: {op['calls']} calls, "
+                    f"avg {op['latencyAvg']:.3f}s, "
+                    f"max {op['latencyMax']:.3f}s, "
+                    f"errors: {op['errors']}, retries: {op['retries']}, "
+                    f"throttles: {op['throttles']}")
+
+    document_cache = summary['documentCache']
+    if document_cache['hits'] or document_cache['misses']:
+        logger.info(f"s3 document cache: {document_cache['hits']} hits, "
+                    f"{document_cache['misses']} misses, hit ratio "
+                    f"{document_cache['hitRatio']:.2f}, "
+                    f"{document_cache['size']} bytes.")
+
+    if metrics_in and context.get_formatted_as_type(
+            metrics_in.get('reset', False), out_type=bool):
+        metrics.reset()
+        pypyraws.aws.s3.reset_document_cache_counters()
+        logger.debug("reset aws metrics")
+
+    logger.debug("done")
@@ -1,8 +1,9 @@
 """pypyr step to fetch a json file from s3 and put it in context."""
 from collections.abc import MutableMapping
-import json
 import logging
 import pypyraws.aws.s3
+from pypyraws.aws.session import get_session
+from pypyraws.decoders import get_decoder
 
 # pypyr logger means the log level will be set correctly and output formatted.
 logger = logging.getLogger(__name__)
@@ -19,6 +20,23 @@ def run_step(context):
                     - Key: string. s3 key name.
                 -key. string. If exists, write json structure to this
                                context key. Else json writes to context root.
+                -parallel. bool or dict. optional. Download large files
+                           in byte ranges at the same time. dict can have
+                           partSize, maxConcurrency and toFile. See
+                           pypyraws.aws.s3.get_payload.
+                -cache. bool or dict. optional. Keep the file on local disk and
+                        only download it again when its ETag changes. dict
+                        can have dir, ttl and maxSize. See
+                        pypyraws.aws.s3.get_payload.
+                -memoryCache. bool. optional. Keep the json in memory and reuse
+                              it while the file's ETag doesn't change. See
+                              pypyraws.aws.s3.get_document.
+                -decoder. string. optional. auto, orjson, simdjson or json.
+                          Default awsJsonDecoder, else auto, which uses the
+                          fastest decoder installed. See
+                          pypyraws.decoders.get_decoder.
+            - awsJsonDecoder: string. optional. Pipeline-wide decoder for
+                              s3Fetch without decoder.
 
     All inputs support formatting expressions.
 
@@ -31,9 +49,16 @@ def run_step(context):
     logger.debug("started")
     fetch_me = pypyraws.aws.s3.get_fetch_input(context, __name__)
 
-    response = pypyraws.aws.s3.get_payload(fetch_me)
+    decoder = fetch_me.get('decoder', None)
+    if not decoder:
+        decoder = context.get_formatted_value(
+            context.get('awsJsonDecoder', None))
 
-    payload = json.load(response)
+    payload = pypyraws.aws.s3.get_document(fetch_me,
+                                           parse=get_decoder(decoder),
+                                           kind='json',
+                                           cache_parsed=False,
+                                           session=get_session(context))
     logger.debug("successfully parsed json from s3 response bytes")
 
     destination_key = fetch_me.get('key', None)
@@ -2,7 +2,8 @@
 from collections.abc import MutableMapping
 import logging
 import pypyraws.aws.s3
-import ruamel.yaml as yaml
+from pypyraws.aws.session import get_session
+from pypyraws.decoders import get_yaml_loader
 
 # pypyr logger means the log level will be set correctly and output formatted.
 logger = logging.getLogger(__name__)
@@ -18,6 +19,23 @@ def run_step(context):
                 - Key: string. s3 key name.
             - key. string. If exists, write yaml structure to this
                            context key. Else yaml writes to context root.
+            - parallel. bool or dict. optional. Download large files in
+                        byte ranges at the same time. dict can have
+                        partSize, maxConcurrency and toFile. See
+                        pypyraws.aws.s3.get_payload.
+            - cache. bool or dict. optional. Keep the file on local disk and
+                     only download it again when its ETag changes. dict can
+                     have dir, ttl and maxSize. See
+                     pypyraws.aws.s3.get_payload.
+            - memoryCache. bool. optional. Keep the parsed yaml in memory and
+                           reuse it while the file's ETag doesn't change.
+                           See pypyraws.aws.s3.get_document.
+            - loader. string. optional. pure or c. c parses with
+                      ruamel.yaml.clib's libyaml-based parser, with the same
+                      safe YAML 1.2 semantics as pure. Default awsYamlLoader,
+                      else pure. See pypyraws.decoders.get_yaml_loader.
+            - awsYamlLoader: string. optional. Pipeline-wide loader for
+                             s3Fetch without loader.
 
     yaml parsed from the s3 file will be merged into the
     context. This will overwrite existing values if the same keys are already
@@ -29,10 +47,16 @@ def run_step(context):
 
     fetch_me = context.get_formatted('s3Fetch')
 
-    response = pypyraws.aws.s3.get_payload(fetch_me)
+    loader_name = fetch_me.get('loader', None)
+    if not loader_name:
+        loader_name = context.get_formatted_value(
+            context.get('awsYamlLoader', None))
 
-    yaml_loader = yaml.YAML(typ='safe', pure=True)
-    payload = yaml_loader.load(response)
+    yaml_loader = get_yaml_loader(loader_name)
+    payload = pypyraws.aws.s3.get_document(fetch_me,
+                                           parse=yaml_loader.load,
+                                           kind='yaml',
+                                           session=get_session(context))
     logger.debug("successfully parsed yaml from s3 response bytes")
 
     destination_key = fetch_me.get('key', None)
@@ -0,0 +1,54 @@
+"""pypyr step that creates an aws session for the rest of the pipeline."""
+import logging
+from pypyraws.aws.session import AwsSession, SESSION_CONTEXT_KEY
+
+
+# pypyr logger means the log level will be set correctly and output formatted.
+logger = logging.getLogger(__name__)
+
+
+def run_step(context):
+    """Create one boto3 session and client config for later pypyraws steps.
+
+    Run me once at the start of a pipeline. The pypyraws client, wait, waitfor
+    and s3fetch steps that run after me create their boto clients from this
+    session, so region, profile, retries, timeouts and connection pool size are
+    set in one place, and credentials only resolve once.
+
+    All of the awsSessionIn descendant values support {key}
+    string interpolation.
+
+    Args:
+        context:
+            Dictionary. Mandatory.
+            Requires the following context keys in context:
+                - awsSessionIn. dict. mandatory. Contains keys:
+                    - sessionArgs: optional. Dict. kwargs for
+                      boto3.Session(), e.g profile_name, region_name.
+                    - config: optional. Dict. kwargs for
+                      botocore.config.Config(), e.g retries, connect_timeout,
+                      read_timeout, max_pool_connections. Applies to all
+                      clients the session creates. config in a step's
+                      clientArgs merges on top of this.
+
+    Returns: None. Although there is no return, this does add awsSessionOut to
+             context.
+
+             Adds key to context:
+                - awsSessionOut. pypyraws.aws.session.AwsSession.
+
+    Raises:
+        pypyr.errors.KeyNotInContextError: awsSessionIn missing in context.
+        pypyr.errors.KeyInContextHasNoValueError: awsSessionIn exists but is
+                                                  None.
+    """
+    logger.debug("started")
+    context.assert_key_has_value('awsSessionIn', __name__)
+    session_in = context.get_formatted('awsSessionIn')
+
+    context[SESSION_CONTEXT_KEY] = AwsSession(
+        session_args=session_in.get('sessionArgs', None),
+        config=session_in.get('config', None))
+
+    logger.info("created aws session in context['awsSessionOut']")
+    logger.debug("done")
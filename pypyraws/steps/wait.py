@@ -1,7 +1,10 @@
 """pypyr step that runs any boto3 low-level client waiter."""
 import logging
 import pypyraws.aws.service
+from pypyraws.aws.session import get_session
+import pypyraws.aws.waiters
 from pypyr.errors import KeyInContextHasNoValueError, KeyNotInContextError
+from pypyraws.errors import WaitTimeOut
 
 
 # pypyr logger means the log level will be set correctly and output formatted.
@@ -18,17 +21,66 @@ def run_step(context):
         context:
             Dictionary. Mandatory.
             Requires the following context keys in context:
-                - awsWaitIn. dict. mandatory. Contains keys:
+                - awsWaitIn. dict or list. mandatory.
 
-                  The awsWaitIn dictionary should contain:
+                  For one waiter, the awsWaitIn dictionary should contain:
                     - serviceName: mandatory. String for service name.
                       Available services here:
                       http://boto3.readthedocs.io/en/latest/reference/services/
                     - waiterName: mandatory. String. Name of waiter.
                     - waiterArgs: optional. Dict. kwargs for get_waiter
-                    - waitArgs: optional. Dict. kwargs for wait
+                    - waitArgs: optional. Dict. kwargs for wait. If this is
+                      a list of dicts, run the same waiter for each of them
+                      at the same time, like waiters below with complete
+                      all. pypyraws.steps.ecswaitprep does this when there
+                      are too many arns for one call.
 
-    Returns: None
+                  To run many waiters at the same time, awsWaitIn is either
+                  a list of the above dicts, or a dict containing:
+                    - waiters: mandatory. List of the above dicts.
+                    - complete: optional. String. Default 'all'.
+                        - all: wait until all waiters succeed. The first
+                          waiter to fail stops the others.
+                        - any: wait until one waiter succeeds. This stops the
+                          others. Fails only if all waiters fail.
+                    - maxWorkers: optional. Int. Run at most this many
+                      waiters at the same time. Default all of them.
+
+                  Both forms of dict also take:
+                    - timeout: optional. Float. In seconds. Stop waiting and
+                      raise WaitTimeOut after this long, however many
+                      attempts the waiter has left. Also caps the botocore
+                      connect and read timeouts and retries of each call to
+                      the time left when it starts, so a slow endpoint
+                      can't hold the step far past the deadline.
+
+                  The dict for one waiter, also inside the list or waiters,
+                  takes:
+                    - initialResponse: optional. Dict. Response in the shape
+                      of the waiter's operation, e.g from
+                      pypyraws.steps.ecswaitprep. Not formatted. If the
+                      waiter's acceptors say this response is already in the
+                      success state, don't run that waiter at all. The step
+                      removes it from awsWaitIn, so it only applies once.
+
+            If context contains awsSessionOut from pypyraws.steps.session,
+            the client comes from that session.
+
+    Returns: None. When running many waiters, or with timeout, adds
+             awsWaitOut to context.
+
+             Adds key to context:
+                - awsWaitSkipped. bool. Only if any initialResponse was
+                  set. True if the step didn't wait because every waiter's
+                  initialResponse was already in the success state.
+                - awsWaitOut. list of dict in the same order as the waiters.
+                  Each dict contains:
+                    - serviceName: string.
+                    - waiterName: string.
+                    - state: string. success, failure or cancelled. A
+                      waiter that initialResponse skipped is success.
+                    - error: None if state is not failure, else string
+                      describing the error.
 
     Raises:
         botocore.exceptions.ClientError: Anything inside boto went wrong.
@@ -40,13 +92,54 @@ def run_step(context):
         pypyr.errors.KeyNotInContextError: awsClientIn missing in context.
         pypyr.errors.KeyInContextHasNoValueError: awsClientIn exists but is
                                                 None.
+        pypyraws.errors.WaitTimeOut: timeout ran out before the waiters
+                                     completed.
+        ValueError: complete is not all or any.
     """
     logger.debug("started")
-    client_in, service_name, waiter_name = get_waiter_args(context)
+    context.assert_key_has_value(key='awsWaitIn', caller=__name__)
+    wait_in = context['awsWaitIn']
+    if isinstance(wait_in, list) or 'waiters' in wait_in:
+        if pop_initial_response(wait_in) is not None:
+            logger.warning("initialResponse only applies to one waiter. Set "
+                           "it on each of the waiters instead. Ignoring it.")
+        waiters_in = wait_in if isinstance(wait_in, list) else wait_in[
+            'waiters']
+        initial_responses = ([pop_initial_response(waiter_in)
+                              for waiter_in in waiters_in]
+                             if isinstance(waiters_in, list) else None)
+        run_waiters(context,
+                    context.get_formatted('awsWaitIn'),
+                    initial_responses)
+        logger.debug("done")
+        return
 
-    waiter_args = client_in.get('waiterArgs', None)
+    initial_response = pop_initial_response(wait_in)
+    client_in = context.get_formatted('awsWaitIn')
+
+    if initial_response is not None:
+        skipped = is_satisfied(context, client_in, initial_response)
+        context['awsWaitSkipped'] = skipped
+        if skipped:
+            logger.debug("done")
+            return
 
     wait_args = client_in.get('waitArgs', None)
+    timeout = client_in.get('timeout', None)
+    if isinstance(wait_args, list) or timeout is not None:
+        wait_args_list = wait_args if isinstance(wait_args, list) else [
+            wait_args]
+        run_waiters(context,
+                    {'waiters': [{**client_in, 'waitArgs': wait_args}
+                                 for wait_args in wait_args_list],
+                     'maxWorkers': client_in.get('maxWorkers', None),
+                     'timeout': timeout})
+        logger.debug("done")
+        return
+
+    service_name, waiter_name = get_waiter_names(client_in)
+
+    waiter_args = client_in.get('waiterArgs', None)
 
     logger.info(f"Waiting for {waiter_name} on aws {service_name}.")
 
@@ -54,11 +147,58 @@ def run_step(context):
         service_name=service_name,
         waiter_name=waiter_name,
         waiter_args=waiter_args,
-        wait_args=wait_args)
+        wait_args=wait_args,
+        session=get_session(context))
 
     logger.debug("done")
 
 
+def is_satisfied(context, client_in, initial_response):
+    """Check if initial_response already shows the waiter's success state.
+
+    Args:
+        context: pypyr context.
+        client_in: dict. Formatted awsWaitIn.
+        initial_response: dict. Response in the shape of the waiter's
+                          operation.
+
+    Returns:
+        bool. True if the waiter's first acceptor to match initial_response is
+        success.
+    """
+    service_name, waiter_name = get_waiter_names(client_in)
+    _, waiter = pypyraws.aws.waiters.get_waiter(
+        service_name=service_name,
+        waiter_name=waiter_name,
+        waiter_args=client_in.get('waiterArgs', None),
+        session=get_session(context))
+
+    if pypyraws.aws.waiters.is_satisfied(waiter, initial_response):
+        logger.info(f"{waiter_name} on aws {service_name} is already done. "
+                    "Skipping the wait.")
+        return True
+
+    logger.debug(f"{waiter_name} not done yet per initialResponse")
+    return False
+
+
+def pop_initial_response(waiter_in):
+    """Remove initialResponse from one unformatted awsWaitIn dict.
+
+    Not formatted, because aws responses can contain literal {braces}.
+
+    Args:
+        waiter_in - dict. Unformatted awsWaitIn, or one of its waiters.
+
+    Returns:
+        dict. The initial response, or None if waiter_in doesn't have one.
+    """
+    if not isinstance(waiter_in, dict):
+        return None
+
+    return waiter_in.pop('initialResponse', None)
+
+
 def get_waiter_args(context):
     """Get required args from context for this step.
 
@@ -75,6 +215,24 @@ def get_waiter_args(context):
     """
     context.assert_key_has_value(key='awsWaitIn', caller=__name__)
     client_in = context.get_formatted('awsWaitIn')
+    service_name, waiter_name = get_waiter_names(client_in)
+    return client_in, service_name, waiter_name
+
+
+def get_waiter_names(client_in):
+    """Get required service and waiter names from one awsWaitIn dict.
+
+    Args:
+        client_in - dict. Formatted awsWaitIn, or one of its waiters.
+
+    Returns:
+        tuple(service_name, waiter_name)
+
+    Raises:
+        pypyr.errors.KeyNotInContextError: Required key missing.
+        pypyr.errors.KeyInContextHasNoValueError: Required key exists but is
+                                                  empty or None.
+    """
     try:
         service_name = client_in['serviceName']
         waiter_name = client_in['waiterName']
@@ -93,4 +251,114 @@ def get_waiter_args(context):
         raise KeyInContextHasNoValueError(
             'waiterName required in awsWaitIn for pypyraws.steps.wait')
 
-    return client_in, service_name, waiter_name
+    return service_name, waiter_name
+
+
+def run_waiters(context, wait_in, initial_responses=None):
+    """Run many waiters at the same time and save results to awsWaitOut.
+
+    Args:
+        context - pypyr.context.Context. Save awsWaitOut here.
+        wait_in - list or dict. Formatted awsWaitIn.
+        initial_responses - list. Unformatted initialResponse or None for
+                            each of the waiters. Waiters it already shows
+                            in the success state don't run.
+
+    Raises:
+        botocore.exceptions.WaiterError: The first failed waiter's error, if
+                                         complete is all and any waiter failed,
+                                         or complete is any and all failed.
+        pypyraws.errors.WaitTimeOut: timeout ran out before complete.
+        ValueError: complete is not all or any.
+    """
+    if isinstance(wait_in, list):
+        wait_in = {'waiters': wait_in}
+
+    complete = wait_in.get('complete', pypyraws.aws.waiters.COMPLETE_ALL)
+    if complete not in (pypyraws.aws.waiters.COMPLETE_ALL,
+                        pypyraws.aws.waiters.COMPLETE_ANY):
+        raise ValueError(
+            f"complete must be {pypyraws.aws.waiters.COMPLETE_ALL} or "
+            f"{pypyraws.aws.waiters.COMPLETE_ANY}, not {complete}.")
+
+    max_workers = wait_in.get('maxWorkers', None)
+    timeout = wait_in.get('timeout', None)
+
+    waiters = []
+    for waiter_in in wait_in['waiters']:
+        service_name, waiter_name = get_waiter_names(waiter_in)
+        waiters.append({'service_name': service_name,
+                        'waiter_name': waiter_name,
+                        'waiter_args': waiter_in.get('waiterArgs', None),
+                        'wait_args': waiter_in.get('waitArgs', None)})
+
+    satisfied = [False] * len(waiters)
+    skipped = False
+    if initial_responses and any(response is not None
+                                 for response in initial_responses):
+        satisfied = [response is not None
+                     and is_satisfied(context, waiter_in, response)
+                     for waiter_in, response in zip(wait_in['waiters'],
+                                                    initial_responses)]
+        # any is already complete once one waiter is satisfied.
+        skipped = (any(satisfied)
+                   if complete == pypyraws.aws.waiters.COMPLETE_ANY
+                   else all(satisfied))
+        context['awsWaitSkipped'] = skipped
+
+    if skipped:
+        logger.info("initialResponse shows the waiters are already "
+                    f"complete for {complete}. Skipping the wait.")
+        results = [pypyraws.aws.waiters.WaitResult(
+            pypyraws.aws.waiters.SUCCESS if is_done
+            else pypyraws.aws.waiters.CANCELLED, None)
+            for is_done in satisfied]
+    else:
+        pending = [waiter for waiter, is_done in zip(waiters, satisfied)
+                   if not is_done]
+        logger.info(f"Waiting for {complete} of {len(pending)} waiters.")
+
+        pending_results = iter(pypyraws.aws.waiters.wait_many(
+            waiters=pending,
+            complete=complete,
+            max_workers=int(max_workers) if max_workers else None,
+            session=get_session(context),
+            timeout=None if timeout is None else float(timeout)))
+        results = [pypyraws.aws.waiters.WaitResult(
+            pypyraws.aws.waiters.SUCCESS, None) if is_done
+            else next(pending_results) for is_done in satisfied]
+
+    context['awsWaitOut'] = [
+        {'serviceName': waiter['service_name'],
+         'waiterName': waiter['waiter_name'],
+         'state': result.state,
+         'error': (f"{type(result.error).__name__}: {result.error}"
+                   if result.error else None)}
+        for waiter, result in zip(waiters, results)]
+
+    errors = [result.error for result in results if result.error]
+    succeeded = sum(1 for result in results
+                    if result.state == pypyraws.aws.waiters.SUCCESS)
+    # waiters only cancel early when the outcome is known, or at timeout.
+    cancelled = sum(1 for result in results
+                    if result.state == pypyraws.aws.waiters.CANCELLED)
+
+    if complete == pypyraws.aws.waiters.COMPLETE_ALL:
+        timed_out = cancelled and not errors
+    else:
+        timed_out = cancelled and not succeeded
+
+    if timed_out:
+        logger.error(f"{cancelled} of {len(waiters)} waiters did not "
+                     f"complete within {timeout} seconds. See "
+                     "context['awsWaitOut'].")
+        raise WaitTimeOut(f"{cancelled} of {len(waiters)} aws waiters did "
+                          f"not complete within {timeout} seconds.")
+
+    if errors and (complete == pypyraws.aws.waiters.COMPLETE_ALL
+                   or not succeeded):
+        logger.error(f"{len(errors)} of {len(waiters)} waiters failed. See "
+                     "context['awsWaitOut'].")
+        raise errors[0]
+
+    logger.info(f"{succeeded} of {len(waiters)} waiters succeeded.")
@@ -1,10 +1,25 @@
 """pypyr step that creates a custom waiter for any aws client operation."""
 import logging
+import math
+import threading
+from pypyr.errors import KeyNotInContextError
 from pypyr.utils.asserts import assert_key_has_value
-from pypyr.utils.poll import wait_until_true
+from pypyraws.aws.response import (Acceptor,
+                                   MATCH_PATH,
+                                   MATCH_PATH_ALL,
+                                   MATCH_PATH_ANY,
+                                   ResponseMatcher,
+                                   STATE_FAILURE,
+                                   STATE_RETRY,
+                                   STATE_SUCCESS)
+from pypyraws.aws.resources import DEFAULT_BATCH_SIZE, ResourceTracker
+from pypyraws.aws.scheduler import get_scheduler
 import pypyraws.aws.service
+from pypyraws.aws.session import get_session
+import pypyraws.aws.waiters
 import pypyraws.contextargs as contextargs
-from pypyraws.errors import WaitTimeOut
+from pypyraws.errors import WaitFailure, WaitTimeOut
+from pypyraws.poll import Backoff, Deadline, JITTER_NONE, poll_until_true
 
 # pypyr logger means the log level will be set correctly and output formatted.
 logger = logging.getLogger(__name__)
@@ -16,6 +31,9 @@ def run_step(context):
     All of the awsWaitFor descendant values support {key}
     string interpolation, except waitForField.
 
+    Set either waitForField or waitForQuery to pick the value to check in
+    the aws response. Both compile once, not on every poll.
+
     Args:
         context:
             Dictionary. Mandatory.
@@ -32,31 +50,138 @@ def run_step(context):
                                     ctor.
                       - methodArgs: optional. Dict. kwargs for the client
                                     method call
-                    - waitForField: mandatory. string. format expression for
+                    - waitForField: string. format expression for
                                     field name to check in awsClient response.
-                    - toBe: mandatory. string. string. Stop waiting when
-                            waitForField equals this value.
+                                    Compares as strings.
+                    - waitForQuery: string. JMESPath expression to check in
+                                    awsClient response. Compares with toBe's
+                                    type, so 3 is not '3' and true is not 1.
+                    - matcher: optional. string. For waitForQuery only.
+                               Default path.
+                        - path: query result equals toBe.
+                        - pathAll: query result is a list and all of its items
+                                   equal toBe.
+                        - pathAny: query result is a list and any of its items
+                                   equals toBe.
+                    - toBe: Stop waiting when waitForField or
+                            waitForQuery equals this value. Mandatory unless
+                            acceptors has a success acceptor.
+                    - failWhen: optional. Value or list of values. Stop
+                                waiting and raise WaitFailure as soon as
+                                waitForField or waitForQuery equals any of
+                                these. With matcher pathAll, fails when any
+                                item in the list equals a failWhen value.
+                    - acceptors: optional. list of dict. Like botocore
+                                 waiter acceptors. The first acceptor that
+                                 matches decides what happens. Checked before
+                                 toBe and failWhen. Each dict contains:
+                        - state: mandatory. success, failure or retry.
+                                 retry keeps polling without checking the
+                                 acceptors after it.
+                        - expected: mandatory. Match this value.
+                        - field or query: mandatory. str.format expression
+                                          or JMESPath expression, like
+                                          waitForField and waitForQuery.
+                        - matcher: optional. path, pathAll or pathAny.
+                                   For query only. Default path.
+                    - resourceIds: optional. list. Wait for each of these
+                                   resources instead of the whole response.
+                                   Polls all pending resources with one
+                                   describe call per batchSize ids, and stops
+                                   asking for resources once they reach toBe.
+                                   waitForField, waitForQuery, toBe,
+                                   failWhen and acceptors apply to each
+                                   resource's item in the response.
+                    - resourceIdsKey: mandatory with resourceIds. string.
+                                      Put each batch of ids into methodArgs
+                                      under this key, e.g InstanceIds.
+                    - itemsQuery: mandatory with resourceIds. string.
+                                  JMESPath expression for the list of
+                                  resource items in the response, e.g
+                                  Reservations[].Instances[].
+                    - resourceIdQuery: mandatory with resourceIds. string.
+                                       JMESPath expression for the id in
+                                       each item, e.g InstanceId.
+                    - batchSize: optional. int. At most this many ids per
+                                 call. Default 100.
                     - pollInterval: optional. int. In seconds. Default to 30.
-                    - maxAttempts: optional. int. Default 10.
+                    - maxAttempts: optional. int. Default 10, or no limit
+                                   if you set timeout.
+                    - backoff: optional. dict. Back off exponentially
+                               between polls instead of polling every
+                               pollInterval. Contains keys:
+                        - initialDelay: optional. float. Seconds before the
+                                        second poll. Default pollInterval.
+                        - multiplier: optional. float. Grow the delay by
+                                      this factor each poll. Default 2.
+                        - maxDelay: optional. float. Never wait longer than
+                                    this many seconds between polls.
+                                    Default no cap.
+                        - jitter: optional. string. none, full or
+                                  decorrelated. Default none.
+                    - timeout: optional. float. In seconds. Stop waiting
+                               after this long, even if maxAttempts aren't
+                               used up yet. The last poll happens at the
+                               deadline. Each call's connect and read timeouts
+                               shrink to fit the time left, and a call that
+                               times out counts as an unsuccessful poll.
+                    - compileWaiter: optional. bool. Default False. Compile
+                                     the acceptors into a botocore custom
+                                     waiter and wait with that, on cached
+                                     clients. Needs waitForQuery and
+                                     query acceptors, no waitForField,
+                                     resourceIds or backoff. Compares like
+                                     botocore, so 1 equals true. An error
+                                     response that no acceptor matches
+                                     raises botocore WaiterError.
+                    - scheduler: optional. bool. Default False. Poll on the
+                                 process-wide poll scheduler instead of
+                                 sleeping on this thread, so many
+                                 concurrent waits share one scheduler thread,
+                                 and identical calls due within half a
+                                 second share one call. Not with
+                                 resourceIds or compileWaiter. With
+                                 timeout, each call's timeouts cap to the
+                                 least time left of the waits sharing it,
+                                 and a call that times out counts as an
+                                 unsuccessful poll.
                     - errorOnWaitTimeout: optional. Default True. Throws error
-                                          if maxAttempts exhausted without
-                                          reaching toBe value. If false,
+                                          if maxAttempts or timeout
+                                          exhausted without reaching toBe
+                                          value. If false,
                                           step completes without raising
                                           error.
 
+            If context contains awsSessionOut from pypyraws.steps.session,
+            the client comes from that session.
+
     Returns: None
              Adds key to context:
             - awsWaitForTimedOut: bool. Adds key with value True if
               errorOnWaitTimeout=False and max_attempts exhausted without
               reaching toBe. If steps completes successfully and waitForField's
               value becomes toBe, awsWaitForTimedOut == False.
+            - awsWaitForAcceptor: dict. Only if you set acceptors or
+              failWhen. The last acceptor that matched, with keys state,
+              matcher, expression and expected. None if nothing matched. With
+              compileWaiter, only set when a failure acceptor matched.
+            - awsWaitForResources: dict. Only if you set resourceIds. Key is
+              resource id, value is its state: success, failure or pending.
 
     Raises:
-        pypyr.errors.KeyNotInContextError: awsWaitFor missing in context.
+        pypyr.errors.KeyNotInContextError: awsWaitFor missing in context,
+                                           or has neither waitForField nor
+                                           waitForQuery, or resourceIds
+                                           without its mandatory keys.
         pypyr.errors.KeyInContextHasNoValueError: awsWaitFor exists but is
                                                 None.
-        pypyraws.errors.WaitTimeOut: maxAttempts exceeded without waitForField
-                                  changing to toBe.
+        pypyraws.errors.WaitFailure: A failure acceptor or failWhen matched.
+        pypyraws.errors.WaitTimeOut: maxAttempts or timeout exceeded without
+                                     waitForField changing to toBe.
+        ValueError: Invalid backoff, matcher or acceptor, or both
+                    waitForField and waitForQuery, or compileWaiter with
+                    something botocore waiters can't do, or scheduler with
+                    resourceIds or compileWaiter.
     """
     logger.debug("started")
     context.assert_key_has_value('awsWaitFor', __name__)
@@ -76,29 +201,157 @@ def run_step(context):
      max_attempts,
      error_on_wait_timeout) = get_poll_args(wait_for, context)
 
-    wait_response = wait_until_true(interval=poll_interval,
-                                    max_attempts=max_attempts)(
-        execute_aws_client_method)(
-        service_name=service_name,
-        method_name=method_name,
-        client_args=client_args,
-        method_args=method_args,
-        wait_for_field=wait_for_field,
-        to_be=to_be
-    )
+    acceptors = get_acceptors(wait_for, context, wait_for_field, to_be)
+    backoff, timeout = get_backoff_args(wait_for, context, poll_interval)
+    if timeout is not None and 'maxAttempts' not in wait_for:
+        max_attempts = None
+
+    if to_be is None:
+        to_be = 'a success state'
+
+    record_acceptor = 'acceptors' in wait_for or 'failWhen' in wait_for
+    if record_acceptor:
+        context['awsWaitForAcceptor'] = None
+
+    tracker = get_resource_tracker(wait_for, context)
+    session = get_session(context)
+    deadline = None if timeout is None else Deadline(timeout)
+
+    # a call that times out near the deadline is just an unsuccessful poll.
+    timeout_errors = ()
+    if deadline:
+        from botocore.exceptions import ConnectTimeoutError, ReadTimeoutError
+        timeout_errors = (ConnectTimeoutError, ReadTimeoutError)
+
+    def on_accept(acceptor, resource_id=None):
+        if record_acceptor:
+            context['awsWaitForAcceptor'] = acceptor.to_dict()
+
+        if tracker and acceptor.state != STATE_RETRY:
+            tracker.set_state(resource_id, acceptor.state)
+            context['awsWaitForResources'] = tracker.to_dict()
+
+        if acceptor.state == STATE_FAILURE:
+            which = f" {resource_id}" if tracker else ''
+            logger.error(f"aws {service_name} {method_name}{which} reached "
+                         f"failure state: {acceptor.matcher}")
+            raise WaitFailure(
+                f"aws {service_name} {method_name}{which} reached failure "
+                f"state: {acceptor.matcher.expression} is "
+                f"{acceptor.matcher.expected!r} ({acceptor.matcher.matcher}).")
+
+    def poll(call_client_args):
+        if tracker:
+            for resource_id, acceptor in poll_resources(
+                    service_name=service_name,
+                    method_name=method_name,
+                    client_args=call_client_args,
+                    method_args=method_args,
+                    acceptors=acceptors,
+                    tracker=tracker,
+                    session=session):
+                on_accept(acceptor, resource_id)
+
+            pending = len(tracker.pending)
+            logger.info(f"{len(tracker.resource_ids) - pending} of "
+                        f"{len(tracker.resource_ids)} resources reached "
+                        f"{to_be}.")
+            return not pending
+
+        return is_accepted(poll_aws_client_method(
+            service_name=service_name,
+            method_name=method_name,
+            client_args=call_client_args,
+            method_args=method_args,
+            acceptors=acceptors,
+            session=session))
+
+    def is_accepted(acceptor):
+        if acceptor is None:
+            return False
+
+        on_accept(acceptor)
+        return acceptor.state == STATE_SUCCESS
+
+    def is_success():
+        if deadline is None:
+            return poll(client_args)
+
+        try:
+            return poll(pypyraws.aws.service.cap_timeouts(
+                client_args, deadline.remaining(), session))
+        except timeout_errors as err:
+            logger.warning(f"aws {service_name} {method_name} timed out: "
+                           f"{err}")
+            return False
+
+    if tracker:
+        context['awsWaitForResources'] = tracker.to_dict()
+
+    use_scheduler = context.get_formatted_as_type(
+        wait_for.get('scheduler', False), out_type=bool)
+    compile_waiter = context.get_formatted_as_type(
+        wait_for.get('compileWaiter', False), out_type=bool)
+
+    if use_scheduler:
+        if tracker or compile_waiter:
+            raise ValueError(f"awsWaitFor for {__name__} can't use the "
+                             "scheduler with resourceIds or compileWaiter.")
+
+        logger.debug("polling on the shared scheduler")
+        wait_response = get_scheduler().submit(
+            call={'service_name': service_name,
+                  'method_name': method_name,
+                  'client_args': client_args,
+                  'operation_args': method_args,
+                  'session': session},
+            check=lambda response: is_accepted(
+                match_acceptors(response, acceptors)),
+            backoff=backoff,
+            max_attempts=max_attempts,
+            timeout=timeout).result()
+    elif compile_waiter:
+        if tracker or 'backoff' in wait_for:
+            raise ValueError(f"awsWaitFor for {__name__} can't compile "
+                             "resourceIds or backoff into a botocore "
+                             "waiter.")
+
+        wait_response, acceptor = wait_with_waiter(
+            service_name=service_name,
+            method_name=method_name,
+            client_args=client_args,
+            method_args=method_args,
+            acceptors=acceptors,
+            poll_interval=poll_interval,
+            max_attempts=max_attempts,
+            timeout=timeout,
+            session=session)
+        if acceptor:
+            on_accept(acceptor)
+    else:
+        wait_response = poll_until_true(is_success,
+                                        backoff=backoff,
+                                        max_attempts=max_attempts,
+                                        timeout=timeout)
 
     if wait_response:
         context['awsWaitForTimedOut'] = False
         logger.info(f"aws {service_name} {method_name} returned {to_be}. "
                     "Pipeline will now continue.")
     else:
+        if timeout is None:
+            log_limit = f"{max_attempts}"
+            err_limit = f"{max_attempts} retries"
+        else:
+            log_limit = err_limit = f"{timeout} seconds"
+
         if error_on_wait_timeout:
             context['awsWaitForTimedOut'] = True
             logger.error(f"aws {service_name} {method_name} did not return "
-                         f"{to_be} within {max_attempts}. errorOnWaitTimeout "
+                         f"{to_be} within {log_limit}. errorOnWaitTimeout "
                          "is True, throwing error")
             raise WaitTimeOut(f"aws {service_name} {method_name} did not "
-                              f"return {to_be} within {max_attempts} retries.")
+                              f"return {to_be} within {err_limit}.")
         else:
             context['awsWaitForTimedOut'] = True
             logger.warning(
@@ -114,7 +367,8 @@ def execute_aws_client_method(service_name,
                               client_args,
                               method_args,
                               wait_for_field,
-                              to_be):
+                              to_be,
+                              session=None):
     """Execute method_name on service_name.
 
     Args:
@@ -124,20 +378,21 @@ def execute_aws_client_method(service_name,
         method_args: method args
         wait_for_field: look for this field in the aws response
         to_be: return True if wait_for_field's value equals this.
+        session: pypyraws.aws.session.AwsSession. Create client from this
+                 session. If None, use the boto3 default session.
 
     Return:
         True if value of wait_for_field == to_be, False if not.
     """
     logger.debug("started")
-    response = pypyraws.aws.service.operation_exec(
-        service_name=service_name,
-        method_name=method_name,
-        client_args=client_args,
-        operation_args=method_args)
+    matcher = ResponseMatcher(to_be, field=wait_for_field)
 
-    wait_for_this_value = wait_for_field.format(**response)
-    logger.info(f"{wait_for_field} in aws response is: {wait_for_this_value}")
-    if wait_for_this_value == str(to_be):
+    if poll_aws_client_method(service_name=service_name,
+                              method_name=method_name,
+                              client_args=client_args,
+                              method_args=method_args,
+                              acceptors=[Acceptor(STATE_SUCCESS, matcher)],
+                              session=session):
         logger.debug("Required status reached. The wait is so over.")
         logger.debug("done")
         return True
@@ -147,6 +402,199 @@ def execute_aws_client_method(service_name,
         return False
 
 
+def poll_aws_client_method(service_name,
+                           method_name,
+                           client_args,
+                           method_args,
+                           acceptors,
+                           session=None):
+    """Execute method_name on service_name and match its response.
+
+    Args:
+        service_name: string. Name of aws service.
+        method_name: method to execute.
+        client_args: aws client constructor args.
+        method_args: method args
+        acceptors: list of pypyraws.aws.response.Acceptor. Check the response
+                   against these, in order.
+        session: pypyraws.aws.session.AwsSession. Create client from this
+                 session. If None, use the boto3 default session.
+
+    Return:
+        The first acceptor that matched the response, or None.
+    """
+    response = pypyraws.aws.service.operation_exec(
+        service_name=service_name,
+        method_name=method_name,
+        client_args=client_args,
+        operation_args=method_args,
+        session=session)
+
+    return match_acceptors(response, acceptors)
+
+
+def wait_with_waiter(service_name,
+                     method_name,
+                     client_args,
+                     method_args,
+                     acceptors,
+                     poll_interval,
+                     max_attempts,
+                     timeout=None,
+                     session=None):
+    """Compile acceptors into a botocore waiter and wait with it.
+
+    The waiter polls with a cached client. With timeout, each call's connect
+    and read timeouts and retries shrink to fit the time left, a call that
+    times out counts as an unsuccessful poll, and the wait cancels between
+    polls at the deadline.
+
+    Args:
+        service_name: string. Name of aws service.
+        method_name: method to poll.
+        client_args: aws client constructor args.
+        method_args: method args
+        acceptors: list of pypyraws.aws.response.Acceptor with JMESPath
+                   queries.
+        poll_interval: float. Seconds between polls.
+        max_attempts: int. Poll at most this many times. None means until
+                      timeout.
+        timeout: float. Stop waiting after this many seconds. None means no
+                 timeout.
+        session: pypyraws.aws.session.AwsSession. Create client from this
+                 session. If None, use the boto3 default session.
+
+    Return:
+        tuple(bool, acceptor). True if a success acceptor matched. acceptor
+        is the failure acceptor that matched, else None.
+
+    Raises:
+        botocore.exceptions.WaiterError: Error response no acceptor matched.
+        ValueError: An acceptor isn't a JMESPath query, or the client has no
+                    method_name.
+    """
+    from botocore.exceptions import WaiterError
+
+    get_call_client = None
+    if timeout is not None:
+        get_call_client = pypyraws.aws.waiters.get_capped_client_getter(
+            service_name,
+            client_args,
+            Deadline(timeout),
+            session)
+
+    client = pypyraws.aws.service.get_client(service_name,
+                                             client_args,
+                                             session=session)
+    waiter = pypyraws.aws.waiters.create_waiter(
+        client,
+        waiter_name=f"{service_name}.{method_name}",
+        method_name=method_name,
+        acceptors=acceptors,
+        delay=poll_interval,
+        max_attempts=math.inf if max_attempts is None else max_attempts)
+
+    cancel = threading.Event()
+    try:
+        with pypyraws.aws.waiters.cancel_after(timeout, cancel):
+            return (pypyraws.aws.waiters.wait(client,
+                                              waiter,
+                                              method_args,
+                                              cancel,
+                                              get_call_client),
+                    None)
+    except WaiterError as err:
+        reason = err.kwargs.get('reason', '')
+        if reason.startswith(pypyraws.aws.waiters.REASON_MAX_ATTEMPTS):
+            return False, None
+
+        if reason.startswith(pypyraws.aws.waiters.REASON_FAILURE_STATE):
+            return False, match_acceptors(err.last_response, acceptors)
+
+        raise
+
+
+def poll_resources(service_name,
+                   method_name,
+                   client_args,
+                   method_args,
+                   acceptors,
+                   tracker,
+                   session=None):
+    """Describe all pending resources in batches and match their items.
+
+    Args:
+        service_name: string. Name of aws service.
+        method_name: method to execute.
+        client_args: aws client constructor args.
+        method_args: method args. Each batch of ids adds to these.
+        acceptors: list of pypyraws.aws.response.Acceptor. Check each
+                   resource's item against these, in order.
+        tracker: pypyraws.aws.resources.ResourceTracker. Pending resources.
+        session: pypyraws.aws.session.AwsSession. Create client from this
+                 session. If None, use the boto3 default session.
+
+    Yields:
+        tuple(resource_id, acceptor) for each pending resource whose item
+        matched an acceptor.
+
+    Raises:
+        botocore.exceptions.ClientError: Any of the describe calls failed.
+    """
+    calls = [{'service_name': service_name,
+              'method_name': method_name,
+              'client_args': client_args,
+              'operation_args': operation_args}
+             for operation_args in tracker.get_calls(method_args)]
+
+    logger.debug(f"polling {len(tracker.pending)} resources in "
+                 f"{len(calls)} calls")
+    results = pypyraws.aws.service.operation_exec_many(calls=calls,
+                                                       fail_fast=True,
+                                                       session=session)
+
+    for resource_id, item in tracker.get_items(
+            [result.response for result in results]):
+        acceptor = match_acceptors(item, acceptors, describe=resource_id)
+        if acceptor:
+            yield resource_id, acceptor
+
+
+def match_acceptors(response, acceptors, describe=None):
+    """Get the first acceptor that matches response.
+
+    Evaluates each distinct expression only once per response.
+
+    Args:
+        response (dict): Response from an aws client operation.
+        acceptors (list of Acceptor): Check in this order.
+        describe (str): Log values as debug for this resource id rather
+                        than as info for the whole response.
+
+    Returns:
+        Acceptor or None if nothing matched.
+    """
+    values = {}
+    for acceptor in acceptors:
+        matcher = acceptor.matcher
+        key = (matcher.is_query, matcher.expression)
+        if key not in values:
+            value = matcher.get_value(response)
+            values[key] = value
+            if describe is None:
+                logger.info(f"{matcher.expression} in aws response is: "
+                            f"{value}")
+            else:
+                logger.debug(f"{matcher.expression} for {describe} is: "
+                             f"{value}")
+
+        if matcher.matches(values[key]):
+            logger.debug(f"matched {acceptor}")
+            return acceptor
+
+    return None
+
+
 def get_poll_args(waitfor_dict, context):
     """Get polling arguments from waitfor_dict.
 
@@ -162,9 +610,9 @@ def get_poll_args(waitfor_dict, context):
           error_on_wait_timeout)
     """
     logger.debug("started")
-    wait_for_field = waitfor_dict['waitForField']
+    wait_for_field = waitfor_dict.get('waitForField', None)
 
-    to_be = context.get_formatted_value(waitfor_dict['toBe'])
+    to_be = context.get_formatted_value(waitfor_dict.get('toBe', None))
 
     poll_interval = context.get_formatted_as_type(
         waitfor_dict.get('pollInterval', 30),
@@ -185,3 +633,198 @@ def get_poll_args(waitfor_dict, context):
             poll_interval,
             max_attempts,
             error_on_wait_timeout)
+
+
+def get_backoff_args(waitfor_dict, context, poll_interval):
+    """Get backoff policy and overall timeout from waitfor_dict.
+
+    Args:
+        waitfor_dict: The awsWaitFor dict
+        context: the pypyr context
+        poll_interval: float. Fixed delay between polls if there's no
+                       backoff, else the default initialDelay.
+
+    Returns:
+    tuple(pypyraws.poll.Backoff, timeout). timeout is None if not set.
+
+    Raises:
+        ValueError: Invalid backoff.
+    """
+    logger.debug("started")
+    backoff_in = waitfor_dict.get('backoff', None)
+
+    if backoff_in:
+        backoff_in = context.get_formatted_value(backoff_in)
+        max_delay = backoff_in.get('maxDelay', None)
+        backoff = Backoff(
+            initial_delay=float(backoff_in.get('initialDelay',
+                                               poll_interval)),
+            multiplier=float(backoff_in.get('multiplier', 2)),
+            max_delay=None if max_delay is None else float(max_delay),
+            jitter=backoff_in.get('jitter', JITTER_NONE))
+    else:
+        backoff = Backoff(initial_delay=poll_interval, multiplier=1)
+
+    timeout = waitfor_dict.get('timeout', None)
+    if timeout is not None:
+        timeout = context.get_formatted_as_type(timeout, out_type=float)
+
+    logger.debug("done")
+    return backoff, timeout
+
+
+def get_matcher(waitfor_dict, context, wait_for_field, to_be, matcher=None):
+    """Compile waitForField or waitForQuery from waitfor_dict.
+
+    Args:
+        waitfor_dict: The awsWaitFor dict
+        context: the pypyr context
+        wait_for_field: string. Unformatted waitForField, or None.
+        to_be: Formatted toBe.
+        matcher: string. Use this matcher instead of the one in
+                 waitfor_dict.
+
+    Returns:
+    pypyraws.aws.response.ResponseMatcher
+
+    Raises:
+        pypyr.errors.KeyNotInContextError: Neither waitForField nor
+                                           waitForQuery.
+        ValueError: Both waitForField and waitForQuery, or invalid matcher.
+    """
+    query = waitfor_dict.get('waitForQuery', None)
+
+    if query is None:
+        if wait_for_field is None:
+            raise KeyNotInContextError(
+                f"awsWaitFor for {__name__} needs waitForField or "
+                "waitForQuery.")
+
+        return ResponseMatcher(to_be, field=wait_for_field)
+
+    if wait_for_field is not None:
+        raise ValueError(f"awsWaitFor for {__name__} can have waitForField "
+                         "or waitForQuery, not both.")
+
+    if matcher is None:
+        matcher = context.get_formatted_value(
+            waitfor_dict.get('matcher', MATCH_PATH))
+
+    return ResponseMatcher(to_be,
+                           query=context.get_formatted_value(query),
+                           matcher=matcher)
+
+
+def get_acceptors(waitfor_dict, context, wait_for_field, to_be):
+    """Get acceptors from acceptors, toBe and failWhen in waitfor_dict.
+
+    Args:
+        waitfor_dict: The awsWaitFor dict
+        context: the pypyr context
+        wait_for_field: string. Unformatted waitForField, or None.
+        to_be: Formatted toBe, or None.
+
+    Returns:
+    list of pypyraws.aws.response.Acceptor in the order to check them.
+
+    Raises:
+        pypyr.errors.KeyNotInContextError: No success acceptor, or an
+                                           acceptor missing a required key.
+        ValueError: Invalid state, matcher or expression.
+    """
+    logger.debug("started")
+    acceptors = []
+
+    for acceptor_in in waitfor_dict.get('acceptors', None) or []:
+        try:
+            state = context.get_formatted_value(acceptor_in['state'])
+            expected = context.get_formatted_value(acceptor_in['expected'])
+        except KeyError as err:
+            raise KeyNotInContextError(
+                f"awsWaitFor acceptors for {__name__} missing required key: "
+                f"{err}") from err
+
+        query = acceptor_in.get('query', None)
+        acceptors.append(Acceptor(
+            state,
+            ResponseMatcher(
+                expected,
+                field=acceptor_in.get('field', None),
+                query=None if query is None else context.get_formatted_value(
+                    query),
+                matcher=context.get_formatted_value(
+                    acceptor_in.get('matcher', MATCH_PATH)))))
+
+    if to_be is not None:
+        success_matcher = get_matcher(waitfor_dict,
+                                      context,
+                                      wait_for_field,
+                                      to_be)
+        acceptors.append(Acceptor(STATE_SUCCESS, success_matcher))
+
+    fail_when = context.get_formatted_value(
+        waitfor_dict.get('failWhen', None))
+    if fail_when is not None:
+        if not isinstance(fail_when, list):
+            fail_when = [fail_when]
+
+        matcher = context.get_formatted_value(
+            waitfor_dict.get('matcher', MATCH_PATH))
+        # all items must succeed, so any item in a failure state is terminal.
+        if matcher == MATCH_PATH_ALL:
+            matcher = MATCH_PATH_ANY
+
+        for fail_value in fail_when:
+            acceptors.append(Acceptor(
+                STATE_FAILURE,
+                get_matcher(waitfor_dict,
+                            context,
+                            wait_for_field,
+                            fail_value,
+                            matcher=matcher)))
+
+    if not any(acceptor.state == STATE_SUCCESS for acceptor in acceptors):
+        raise KeyNotInContextError(
+            f"awsWaitFor for {__name__} needs toBe or a success acceptor.")
+
+    logger.debug("done")
+    return acceptors
+
+
+def get_resource_tracker(waitfor_dict, context):
+    """Get tracker for resourceIds in waitfor_dict.
+
+    Args:
+        waitfor_dict: The awsWaitFor dict
+        context: the pypyr context
+
+    Returns:
+    pypyraws.aws.resources.ResourceTracker, or None if no resourceIds.
+
+    Raises:
+        pypyr.errors.KeyNotInContextError: resourceIds without
+                                           resourceIdsKey, itemsQuery or
+                                           resourceIdQuery.
+    """
+    if 'resourceIds' not in waitfor_dict:
+        return None
+
+    try:
+        resources_in = {key: context.get_formatted_value(waitfor_dict[key])
+                        for key in ('resourceIds',
+                                    'resourceIdsKey',
+                                    'itemsQuery',
+                                    'resourceIdQuery')}
+    except KeyError as err:
+        raise KeyNotInContextError(
+            f"awsWaitFor with resourceIds for {__name__} missing required "
+            f"key: {err}") from err
+
+    return ResourceTracker(
+        resource_ids=resources_in['resourceIds'],
+        ids_key=resources_in['resourceIdsKey'],
+        items_query=resources_in['itemsQuery'],
+        id_query=resources_in['resourceIdQuery'],
+        batch_size=context.get_formatted_as_type(
+            waitfor_dict.get('batchSize', DEFAULT_BATCH_SIZE),
+            out_type=int))
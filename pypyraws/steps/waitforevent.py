@@ -0,0 +1,130 @@
+"""pypyr step that waits for an aws event on an sqs queue."""
+import logging
+from pypyr.utils.asserts import assert_key_has_value
+import pypyraws.aws.events
+from pypyraws.aws.session import get_session
+from pypyraws.errors import WaitTimeOut
+import pypyraws.steps.waitfor
+
+# pypyr logger means the log level will be set correctly and output formatted.
+logger = logging.getLogger(__name__)
+
+
+def run_step(context):
+    """Wait for an event that matches a pattern to arrive on an sqs queue.
+
+    Set up an EventBridge rule that sends the events you care about to an sqs
+    queue, e.g ECS Task State Change or CloudFormation Stack Status Change.
+    This step long polls the queue and completes as soon as a matching event
+    arrives, rather than polling a describe call every pollInterval like
+    pypyraws.steps.waitfor.
+
+    If no matching event arrives within timeout and context has awsWaitFor,
+    falls back to pypyraws.steps.waitfor, so a lost or delayed event doesn't
+    fail the pipeline.
+
+    All of the awsWaitForEvent descendant values support {key} string
+    interpolation.
+
+    Args:
+        context:
+            Dictionary. Mandatory.
+            Requires the following context keys in context:
+                - awsWaitForEvent. dict. mandatory. Contains keys:
+                    - queueUrl: mandatory. string. sqs queue that receives
+                                the events.
+                    - match: mandatory. dict. EventBridge style event
+                             pattern. Every key must be in the event. A dict
+                             value matches recursively, a list value matches
+                             any of its items, anything else must be equal.
+                             e.g {'detail-type': ['ECS Task State Change'],
+                                  'detail': {'taskArn': ['arn1'],
+                                             'lastStatus': ['STOPPED']}}
+                    - clientArgs: optional. dict. kwargs for the sqs boto
+                                  client ctor. Set endpoint_url to use a
+                                  local sqs stand-in.
+                    - timeout: optional. float. In seconds. Default 300.
+                    - waitTimeSeconds: optional. int. Long poll for at most
+                                       this long per receive call. Default
+                                       and max 20.
+                    - deleteMatched: optional. bool. Delete the matching
+                                     message from the queue. Default True.
+                    - deleteUnmatched: optional. bool. Delete messages that
+                                       don't match. Only set this if
+                                       nothing else reads the queue.
+                                       Default False.
+                    - errorOnWaitTimeout: optional. bool. Default True.
+                                          Raise WaitTimeOut if no matching
+                                          event arrives within timeout and
+                                          there is no awsWaitFor to fall back
+                                          to.
+                - awsWaitFor. dict. optional. Same as for
+                  pypyraws.steps.waitfor. Run waitfor with this if no
+                  matching event arrives within timeout.
+
+            If context contains awsSessionOut from pypyraws.steps.session,
+            the client comes from that session.
+
+    Returns: None
+             Adds key to context:
+            - awsWaitForEventOut: dict. The matching event, or None if none
+              arrived within timeout.
+            - awsWaitForEventTimedOut: bool. True if no matching event
+              arrived within timeout.
+
+    Raises:
+        pypyr.errors.KeyNotInContextError: awsWaitForEvent, queueUrl or match
+                                           missing.
+        pypyr.errors.KeyInContextHasNoValueError: awsWaitForEvent, queueUrl
+                                                or match is None.
+        pypyraws.errors.WaitTimeOut: No matching event within timeout and
+                                     errorOnWaitTimeout with no awsWaitFor.
+    """
+    logger.debug("started")
+    context.assert_key_has_value('awsWaitForEvent', __name__)
+    wait_in = context.get_formatted('awsWaitForEvent')
+
+    assert_key_has_value(wait_in, 'queueUrl', __name__, 'awsWaitForEvent')
+    assert_key_has_value(wait_in, 'match', __name__, 'awsWaitForEvent')
+
+    queue_url = wait_in['queueUrl']
+    timeout = float(wait_in.get('timeout', 300))
+
+    logger.info(f"Waiting up to {timeout} seconds for a matching event on "
+                f"{queue_url}.")
+    event = pypyraws.aws.events.receive_event(
+        queue_url=queue_url,
+        pattern=wait_in['match'],
+        timeout=timeout,
+        wait_time_seconds=int(wait_in.get(
+            'waitTimeSeconds', pypyraws.aws.events.MAX_WAIT_TIME_SECONDS)),
+        delete_matched=context.get_formatted_as_type(
+            wait_in.get('deleteMatched', True), out_type=bool),
+        delete_unmatched=context.get_formatted_as_type(
+            wait_in.get('deleteUnmatched', False), out_type=bool),
+        client_args=wait_in.get('clientArgs', None),
+        session=get_session(context))
+
+    context['awsWaitForEventOut'] = event
+    context['awsWaitForEventTimedOut'] = event is None
+
+    if event is not None:
+        logger.info(f"Matching event arrived on {queue_url}. Pipeline will "
+                    "now continue.")
+    elif 'awsWaitFor' in context:
+        logger.warning(f"No matching event on {queue_url} within {timeout} "
+                       "seconds. Falling back to polling with awsWaitFor.")
+        pypyraws.steps.waitfor.run_step(context)
+    elif context.get_formatted_as_type(wait_in.get('errorOnWaitTimeout',
+                                                   True),
+                                       out_type=bool):
+        logger.error(f"No matching event on {queue_url} within {timeout} "
+                     "seconds. errorOnWaitTimeout is True, throwing error")
+        raise WaitTimeOut(f"no matching event on {queue_url} within "
+                          f"{timeout} seconds.")
+    else:
+        logger.warning(f"No matching event on {queue_url} within {timeout} "
+                       "seconds. errorOnWaitTimeout is False, so pipeline "
+                       "will proceed to the next step anyway.")
+
+    logger.debug("done")
@@ -98,11 +98,15 @@
     # for example:
     # $ pip install -e .[dev,test]
     extras_require={
+        'aio': ['aiobotocore'],
+        'json': ['orjson'],
+        'yaml': ['ruamel.yaml.clib'],
         'dev': [
             'bumpversion',
             'codecov',
             'flake8',
             'flake8-docstrings',
+            'orjson',
             'pypyr',
             'pytest',
             'pytest-cov',
@@ -0,0 +1,225 @@
+"""aio.py unit tests."""
+import asyncio
+import sys
+import types
+from unittest.mock import Mock, patch
+import pypyraws.aws.aio as aio
+from pypyraws.aws.service import CallResult
+import pytest
+
+
+class FakeAioClient():
+    """Stand-in for an aiobotocore client."""
+
+    def __init__(self, service_name, tracker, **client_args):
+        """Initialize fake client."""
+        self.service_name = service_name
+        self.client_args = client_args
+        self.tracker = tracker
+        self.closed = False
+
+    async def __aenter__(self):
+        """Open client."""
+        return self
+
+    async def __aexit__(self, *args):
+        """Close client."""
+        self.closed = True
+
+    async def describe(self, Name):
+        """Fake aws call that yields to the event loop."""
+        self.tracker['running'] += 1
+        self.tracker['max_running'] = max(self.tracker['max_running'],
+                                          self.tracker['running'])
+        await asyncio.sleep(0.01)
+        self.tracker['running'] -= 1
+        if Name == 'bad':
+            raise ValueError('arb')
+        return {'name': Name, 'client': id(self)}
+
+
+class FakeAioSession():
+    """Stand-in for an aiobotocore session."""
+
+    def __init__(self):
+        """Initialize fake session."""
+        self.clients = []
+        self.tracker = {'running': 0, 'max_running': 0}
+
+    def create_client(self, service_name, **client_args):
+        """Create fake client."""
+        client = FakeAioClient(service_name, self.tracker, **client_args)
+        self.clients.append(client)
+        return client
+
+# ---------------------------- get_aio_session ------------------------------#
+
+
+def test_get_aio_session_not_installed():
+    """No aiobotocore gives None."""
+    with patch.dict('sys.modules', {'aiobotocore': None,
+                                    'aiobotocore.session': None}):
+        assert aio.get_aio_session() is None
+
+
+def test_get_aio_session_installed():
+    """Installed aiobotocore gives its session."""
+    fake_module = Mock()
+    with patch.dict('sys.modules', {'aiobotocore': Mock(),
+                                    'aiobotocore.session': fake_module}):
+        assert aio.get_aio_session() is fake_module.get_session.return_value
+
+# ---------------------------- get_aio_session ------------------------------#
+
+# ---------------------------- native backend -------------------------------#
+
+
+def test_native_operation_exec_many():
+    """Native calls share a client per args, bounded and in order."""
+    fake_session = FakeAioSession()
+    calls = [{'service_name': 'logs',
+              'method_name': 'describe',
+              'client_args': {'region_name': 'r1'},
+              'operation_args': {'Name': f'g{i}'}} for i in range(20)]
+    calls.append({'service_name': 'logs',
+                  'method_name': 'describe',
+                  'operation_args': {'Name': 'bad'}})
+
+    with patch('pypyraws.aws.aio.get_aio_session', return_value=fake_session):
+        results = aio.operation_exec_many(calls, max_concurrency=4)
+
+    assert len(fake_session.clients) == 2
+    client1, client2 = fake_session.clients
+    assert client1.client_args == {'region_name': 'r1'}
+    assert client2.client_args == {}
+    assert client1.closed and client2.closed
+    assert fake_session.tracker['max_running'] == 4
+
+    assert results[:20] == [
+        CallResult({'name': f'g{i}', 'client': id(client1)}, None)
+        for i in range(20)]
+    assert results[20].response is None
+    assert str(results[20].error) == 'arb'
+
+
+def test_native_dict_config():
+    """Dict config becomes an AioConfig."""
+    class AioConfig():
+        def __init__(self, **kwargs):
+            self.kwargs = kwargs
+
+    config_module = types.ModuleType('aiobotocore.config')
+    config_module.AioConfig = AioConfig
+    fake_session = FakeAioSession()
+    client_args = {'region_name': 'r1',
+                   'config': {'max_pool_connections': 200}}
+
+    with patch.dict(sys.modules, {'aiobotocore': types.ModuleType('x'),
+                                  'aiobotocore.config': config_module}):
+        with patch('pypyraws.aws.aio.get_aio_session',
+                   return_value=fake_session):
+            results = aio.operation_exec_many(
+                [{'service_name': 'logs',
+                  'method_name': 'describe',
+                  'client_args': client_args,
+                  'operation_args': {'Name': 'g1'}}])
+
+    assert results[0].error is None
+    client = fake_session.clients[0]
+    assert client.client_args['region_name'] == 'r1'
+    assert isinstance(client.client_args['config'], AioConfig)
+    assert client.client_args['config'].kwargs == {
+        'max_pool_connections': 200}
+    assert client_args == {'region_name': 'r1',
+                           'config': {'max_pool_connections': 200}}
+
+
+def test_native_operation_exec_many_fail_fast():
+    """Native fail fast raises first error and closes clients."""
+    fake_session = FakeAioSession()
+    calls = [{'service_name': 'logs',
+              'method_name': 'describe',
+              'operation_args': {'Name': name}}
+             for name in ['a', 'bad', 'c']]
+
+    with patch('pypyraws.aws.aio.get_aio_session', return_value=fake_session):
+        with pytest.raises(ValueError) as err_info:
+            aio.operation_exec_many(calls, fail_fast=True)
+
+    assert str(err_info.value) == 'arb'
+    assert fake_session.clients[0].closed
+
+# ---------------------------- native backend -------------------------------#
+
+# ---------------------------- executor backend -----------------------------#
+
+
+@patch('pypyraws.aws.aio.get_aio_session', return_value=None)
+@patch('pypyraws.aws.service.operation_exec')
+def test_executor_operation_exec_many(mock_exec, mock_get_session):
+    """Executor fallback runs blocking operation_exec, errors per call."""
+    err = ValueError('arb')
+    mock_exec.side_effect = lambda **kwargs: (
+        _raise(err) if kwargs['operation_args'] == 'bad' else kwargs)
+    calls = [{'service_name': 'svc',
+              'method_name': 'm',
+              'operation_args': args} for args in ['a', 'bad', 'c']]
+
+    results = aio.operation_exec_many(calls, max_concurrency=2)
+
+    assert results == [
+        CallResult({'service_name': 'svc',
+                    'method_name': 'm',
+                    'client_args': None,
+                    'operation_args': 'a',
+                    'session': None}, None),
+        CallResult(None, err),
+        CallResult({'service_name': 'svc',
+                    'method_name': 'm',
+                    'client_args': None,
+                    'operation_args': 'c',
+                    'session': None}, None)]
+
+
+@patch('pypyraws.aws.aio.get_aio_session')
+@patch('pypyraws.aws.service.operation_exec', return_value={'r': 1})
+def test_executor_with_session(mock_exec, mock_get_session):
+    """Session forces executor fallback and passes session through."""
+    results = aio.operation_exec_many(
+        [{'service_name': 'svc', 'method_name': 'm'}],
+        fail_fast=True,
+        session='arb session')
+
+    assert results == [CallResult({'r': 1}, None)]
+    mock_get_session.assert_not_called()
+    mock_exec.assert_called_once_with(service_name='svc',
+                                      method_name='m',
+                                      client_args=None,
+                                      operation_args=None,
+                                      session='arb session')
+
+
+@patch('pypyraws.aws.aio.get_aio_session', return_value=None)
+@patch('pypyraws.aws.service.operation_exec', side_effect=ValueError('arb'))
+def test_executor_fail_fast(mock_exec, mock_get_session):
+    """Executor fallback fail fast raises."""
+    with pytest.raises(ValueError) as err_info:
+        aio.operation_exec_many([{'service_name': 'svc',
+                                  'method_name': 'm'}] * 3,
+                                max_concurrency=1,
+                                fail_fast=True)
+
+    assert str(err_info.value) == 'arb'
+
+
+@patch('pypyraws.aws.service.operation_exec')
+def test_operation_exec_many_empty(mock_exec):
+    """No calls gives empty list."""
+    assert aio.operation_exec_many([]) == []
+    mock_exec.assert_not_called()
+
+# ---------------------------- executor backend -----------------------------#
+
+
+def _raise(err):
+    raise err
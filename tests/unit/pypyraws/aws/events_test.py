@@ -0,0 +1,255 @@
+"""events.py unit tests."""
+import json
+import logging
+from unittest.mock import patch
+import pypyraws.aws.events as events
+
+# ---------------------------- match_event ----------------------------------#
+
+ECS_EVENT = {
+    'source': 'aws.ecs',
+    'detail-type': 'ECS Task State Change',
+    'detail': {'taskArn': 'arn1',
+               'lastStatus': 'STOPPED',
+               'containers': [{'name': 'c1', 'exitCode': 0}],
+               'group': ['a', 'b']}}
+
+
+def test_match_event_nested():
+    """Nested dicts and any-of lists match."""
+    assert events.match_event(ECS_EVENT, {
+        'source': ['aws.ecs'],
+        'detail': {'taskArn': ['arn0', 'arn1'],
+                   'lastStatus': 'STOPPED'}})
+
+
+def test_match_event_empty_pattern():
+    """Empty pattern matches any dict."""
+    assert events.match_event(ECS_EVENT, {})
+
+
+def test_match_event_list_event_value():
+    """List event value matches if any item is in the pattern list."""
+    assert events.match_event(ECS_EVENT, {'detail': {'group': ['b', 'c']}})
+    assert not events.match_event(ECS_EVENT, {'detail': {'group': ['c']}})
+
+
+def test_match_event_no_match():
+    """Missing key, wrong value or wrong type don't match."""
+    assert not events.match_event(ECS_EVENT, {'region': 'r'})
+    assert not events.match_event(ECS_EVENT,
+                                  {'detail': {'lastStatus': ['RUNNING']}})
+    assert not events.match_event(ECS_EVENT, {'source': 'aws.ec2'})
+    assert not events.match_event(ECS_EVENT, {'source': {'a': 'b'}})
+    assert not events.match_event('arb', {})
+
+# ---------------------------- match_event ----------------------------------#
+
+# ---------------------------- get_event ------------------------------------#
+
+
+def test_get_event():
+    """Body is the event."""
+    assert events.get_event({'Body': json.dumps(ECS_EVENT)}) == ECS_EVENT
+
+
+def test_get_event_sns():
+    """Event through sns unwraps from the notification."""
+    body = json.dumps({'Type': 'Notification',
+                       'Message': json.dumps(ECS_EVENT)})
+
+    assert events.get_event({'Body': body}) == ECS_EVENT
+
+
+def test_get_event_not_json():
+    """Body that isn't json is None."""
+    assert events.get_event({'MessageId': 'm1', 'Body': 'arb'}) is None
+
+# ---------------------------- get_event ------------------------------------#
+
+# ---------------------------- receive_event --------------------------------#
+
+
+def get_message(i, event):
+    """Get sqs message with event as body."""
+    return {'MessageId': f'm{i}',
+            'ReceiptHandle': f'rh{i}',
+            'Body': event if isinstance(event, str) else json.dumps(event)}
+
+
+def get_fake_sqs(*batches, call_duration=20):
+    """Fake operation_exec that returns batches of messages in order.
+
+    Each receive takes call_duration seconds on the returned clock.
+    """
+    now = [0]
+    batches = list(batches)
+
+    def operation_exec(service_name, method_name, client_args,
+                       operation_args, session):
+        if method_name == 'receive_message':
+            now[0] += call_duration
+            messages = batches.pop(0) if batches else []
+            return {'Messages': messages} if messages else {}
+        return {'Successful': [{'Id': e['Id']}
+                               for e in operation_args['Entries']]}
+
+    return operation_exec, lambda: now[0]
+
+
+def test_receive_event_match_deletes_matched_only():
+    """Returns first match, deletes it and leaves the rest."""
+    fake, clock = get_fake_sqs(
+        [get_message(1, {'detail': {'lastStatus': 'RUNNING'}}),
+         get_message(2, 'not json')],
+        [get_message(3, {'detail': {'lastStatus': 'RUNNING'}}),
+         get_message(4, ECS_EVENT),
+         get_message(5, ECS_EVENT)])
+
+    with patch('pypyraws.aws.service.operation_exec',
+               side_effect=fake) as mock_exec:
+        event = events.receive_event(
+            'url',
+            {'detail': {'lastStatus': ['STOPPED']}},
+            timeout=300,
+            client_args={'region_name': 'r'},
+            session='session',
+            clock=clock)
+
+    assert event == ECS_EVENT
+    assert [c.kwargs['method_name'] for c in mock_exec.call_args_list] == [
+        'receive_message', 'receive_message', 'delete_message_batch']
+    assert mock_exec.call_args_list[0].kwargs == {
+        'service_name': 'sqs',
+        'method_name': 'receive_message',
+        'client_args': {'region_name': 'r'},
+        'operation_args': {'QueueUrl': 'url',
+                           'MaxNumberOfMessages': 10,
+                           'WaitTimeSeconds': 20},
+        'session': 'session'}
+    assert mock_exec.call_args_list[2].kwargs['operation_args'] == {
+        'QueueUrl': 'url',
+        'Entries': [{'Id': '0', 'ReceiptHandle': 'rh4'}]}
+
+
+def test_receive_event_delete_unmatched():
+    """Delete unmatched deletes everything received but keeps the match."""
+    fake, clock = get_fake_sqs(
+        [get_message(1, {'a': 1}), get_message(2, ECS_EVENT)])
+
+    with patch('pypyraws.aws.service.operation_exec',
+               side_effect=fake) as mock_exec:
+        event = events.receive_event('url',
+                                     {'source': 'aws.ecs'},
+                                     timeout=300,
+                                     delete_matched=False,
+                                     delete_unmatched=True,
+                                     clock=clock)
+
+    assert event == ECS_EVENT
+    assert mock_exec.call_args_list[1].kwargs['operation_args'][
+        'Entries'] == [{'Id': '0', 'ReceiptHandle': 'rh1'}]
+
+
+def test_receive_event_delete_unmatched_keeps_later_match():
+    """Delete unmatched leaves later matches in the batch on the queue."""
+    fake, clock = get_fake_sqs(
+        [get_message(1, ECS_EVENT),
+         get_message(2, {'a': 1}),
+         get_message(3, ECS_EVENT)])
+
+    with patch('pypyraws.aws.service.operation_exec',
+               side_effect=fake) as mock_exec:
+        event = events.receive_event('url',
+                                     {'source': 'aws.ecs'},
+                                     timeout=300,
+                                     delete_unmatched=True,
+                                     clock=clock)
+
+    assert event == ECS_EVENT
+    assert mock_exec.call_args_list[1].kwargs['operation_args'][
+        'Entries'] == [{'Id': '0', 'ReceiptHandle': 'rh1'},
+                       {'Id': '1', 'ReceiptHandle': 'rh2'}]
+
+
+def test_receive_event_timeout():
+    """No match within timeout is None, last long poll fits the deadline."""
+    fake, clock = get_fake_sqs([get_message(1, {'a': 1})],
+                               call_duration=15)
+
+    with patch('pypyraws.aws.service.operation_exec',
+               side_effect=fake) as mock_exec:
+        event = events.receive_event('url',
+                                     {'source': 'aws.ecs'},
+                                     timeout=50,
+                                     wait_time_seconds=60,
+                                     clock=clock)
+
+    assert event is None
+    # 0, 15, 30, 45 with 50, 35, 20, 5 seconds left.
+    assert [c.kwargs['operation_args']['WaitTimeSeconds']
+            for c in mock_exec.call_args_list] == [20, 20, 20, 5]
+
+
+def test_receive_event_delete_failed_logs():
+    """Failed deletes log a warning."""
+    responses = [{'Messages': [get_message(1, ECS_EVENT)]},
+                 {'Failed': [{'Id': '0', 'Message': 'arb'}]}]
+
+    logger = logging.getLogger('pypyraws.aws.events')
+    with patch('pypyraws.aws.service.operation_exec',
+               side_effect=responses):
+        with patch.object(logger, 'warning') as mock_logger_warning:
+            event = events.receive_event('url', {}, timeout=300)
+
+    assert event == ECS_EVENT
+    mock_logger_warning.assert_called_once_with(
+        "couldn't delete message 0 from url: arb")
+
+
+@patch('boto3.client')
+def test_receive_event_sqs_client(mock_boto):
+    """Real sqs client against stubbed responses, like a local stand-in."""
+    import boto3
+    from botocore.stub import Stubber
+
+    sqs = boto3.session.Session().client(
+        'sqs',
+        region_name='us-east-1',
+        endpoint_url='http://localhost:9324',
+        aws_access_key_id='a',
+        aws_secret_access_key='b')
+    mock_boto.return_value = sqs
+    url = 'http://localhost:9324/000000000000/events'
+
+    with Stubber(sqs) as stubber:
+        stubber.add_response('receive_message',
+                             {},
+                             {'QueueUrl': url,
+                              'MaxNumberOfMessages': 10,
+                              'WaitTimeSeconds': 1})
+        stubber.add_response('receive_message',
+                             {'Messages': [get_message(1, ECS_EVENT)]},
+                             {'QueueUrl': url,
+                              'MaxNumberOfMessages': 10,
+                              'WaitTimeSeconds': 1})
+        stubber.add_response('delete_message_batch',
+                             {'Successful': [{'Id': '0'}], 'Failed': []},
+                             {'QueueUrl': url,
+                              'Entries': [{'Id': '0',
+                                           'ReceiptHandle': 'rh1'}]})
+
+        event = events.receive_event(
+            url,
+            {'detail-type': ['ECS Task State Change']},
+            timeout=300,
+            wait_time_seconds=1,
+            client_args={'endpoint_url': 'http://localhost:9324'})
+
+        stubber.assert_no_pending_responses()
+
+    assert event == ECS_EVENT
+    mock_boto.assert_called_once_with(
+        'sqs', endpoint_url='http://localhost:9324')
+
+# ---------------------------- receive_event --------------------------------#
@@ -0,0 +1,193 @@
+"""instrumentation.py unit tests."""
+from unittest.mock import Mock, patch
+from botocore.awsrequest import AWSResponse
+from botocore.config import Config
+from botocore.exceptions import ClientError, EndpointConnectionError
+from pypyraws.aws import instrumentation
+from pypyraws.aws.instrumentation import metrics
+import pypyraws.aws.service
+import pytest
+
+
+class FakeRaw():
+    """Raw http body for AWSResponse."""
+
+    def __init__(self, body):
+        """Initialize body."""
+        self.body = body
+
+    def stream(self):
+        """Stream body."""
+        yield self.body
+
+
+def get_logs_client(responses, max_attempts=3):
+    """Get real logs client that gets http responses from responses list.
+
+    Each item in responses is (status_code, body bytes) or an exception to
+    raise instead of sending the request.
+    """
+    client = pypyraws.aws.service.get_client(
+        'logs',
+        {'region_name': 'us-east-1',
+         'aws_access_key_id': 'arb',
+         'aws_secret_access_key': 'arb',
+         'config': Config(retries={'mode': 'standard',
+                                   'total_max_attempts': max_attempts})})
+
+    def before_send(request, **kwargs):
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        status_code, body = response
+        return AWSResponse(request.url,
+                           status_code,
+                           {'content-length': str(len(body))},
+                           FakeRaw(body))
+
+    client.meta.events.register('before-send', before_send)
+    return client
+
+
+def test_metrics_success_after_throttle():
+    """Throttled attempt then success records retry and throttle."""
+    client = get_logs_client([
+        (400, b'{"__type":"ThrottlingException","message":"slow"}'),
+        (200, b'{"logGroups": []}')])
+
+    with patch('time.sleep'):
+        client.describe_log_groups(logGroupNamePrefix='arb')
+
+    summary = metrics.summary()
+    op = summary['operations']['logs.DescribeLogGroups']
+    assert op['calls'] == 1
+    assert op['errors'] == 0
+    assert op['retries'] == 1
+    assert op['throttles'] == 1
+    assert op['bytesReceived'] == 17
+    assert op['bytesSent'] == len(b'{"logGroupNamePrefix": "arb"}')
+    assert op['latencyTotal'] > 0
+    assert op['latencyMax'] == op['latencyTotal']
+    assert op['latencyAvg'] == op['latencyTotal']
+    assert summary['clients']['created'] == 1
+    assert summary['clients']['creationTime'] > 0
+    assert summary['totals'] == {'calls': 1,
+                                 'errors': 0,
+                                 'retries': 1,
+                                 'throttles': 1,
+                                 'latencyTotal': op['latencyTotal'],
+                                 'bytesSent': op['bytesSent'],
+                                 'bytesReceived': 17}
+
+
+def test_metrics_error_response():
+    """Non-retryable error response counts as error."""
+    client = get_logs_client([
+        (400, b'{"__type":"ResourceNotFoundException","message":"no"}'),
+        (200, b'{"logGroups": []}')])
+
+    with pytest.raises(ClientError):
+        client.describe_log_groups()
+    client.describe_log_groups()
+
+    op = metrics.summary()['operations']['logs.DescribeLogGroups']
+    assert op['calls'] == 2
+    assert op['errors'] == 1
+    assert op['retries'] == 0
+    assert op['throttles'] == 0
+
+
+def test_metrics_connection_error():
+    """Call that never gets an http response counts as error."""
+    client = get_logs_client(
+        [EndpointConnectionError(endpoint_url='arb')], max_attempts=1)
+
+    with pytest.raises(EndpointConnectionError):
+        client.describe_log_groups()
+
+    op = metrics.summary()['operations']['logs.DescribeLogGroups']
+    assert op['calls'] == 1
+    assert op['errors'] == 1
+    assert op['bytesReceived'] == 0
+
+
+def test_metrics_not_modified_isnt_error():
+    """304 Not Modified from a revalidated cache isn't an error."""
+    for status_code in (304, 400):
+        instrumentation._after_call(
+            http_response=Mock(headers={}, status_code=status_code),
+            parsed=None,
+            model=get_model(),
+            context={})
+
+    op = metrics.summary()['operations']['svc.Op']
+    assert op['calls'] == 2
+    assert op['errors'] == 1
+
+
+def get_model():
+    """Get fake botocore operation model for svc.Op."""
+    model = Mock(service_model=Mock(service_name='svc'))
+    model.name = 'Op'
+    return model
+
+
+def test_metrics_handlers_without_state():
+    """Handlers cope with missing start time and bodies."""
+    context = {}
+    instrumentation._after_call_error(context=context)
+    instrumentation._after_call(
+        http_response=Mock(headers={}, status_code=200),
+        parsed=None,
+        model=get_model(),
+        context=context)
+    instrumentation._needs_retry(response=None, operation=None)
+    instrumentation._needs_retry(response=(None, None), operation=None)
+
+    summary = metrics.summary()
+    assert summary['operations']['unknown']['errors'] == 1
+    assert summary['operations']['svc.Op']['latencyTotal'] == 0.0
+    assert summary['totals']['calls'] == 2
+
+
+def test_before_call_non_bytes_body():
+    """File-like request bodies don't count bytes sent."""
+    context = {}
+    instrumentation._before_call(
+        model=get_model(),
+        params={'body': Mock()},
+        context=context)
+
+    assert context['pypyraws_bytes_sent'] == 0
+    assert context['pypyraws_operation'] == 'svc.Op'
+
+
+def test_instrument_without_events():
+    """Client without botocore events returns as is."""
+    client = Mock(spec=int)
+    assert instrumentation.instrument(client) is client
+
+
+def test_metrics_reset():
+    """Reset sets everything back to 0."""
+    metrics.record_client_created(1.0)
+    metrics.record_call('svc.Op', 1.0)
+    metrics.record_throttle('svc.Op')
+
+    metrics.reset()
+
+    assert metrics.summary() == {
+        'operations': {},
+        'clients': {'created': 0, 'creationTime': 0.0},
+        'totals': {'calls': 0,
+                   'errors': 0,
+                   'retries': 0,
+                   'throttles': 0,
+                   'latencyTotal': 0,
+                   'bytesSent': 0,
+                   'bytesReceived': 0}}
+
+
+def test_operation_metrics_no_calls_avg():
+    """Average latency with no calls is 0."""
+    assert instrumentation.OperationMetrics().to_dict()['latencyAvg'] == 0.0
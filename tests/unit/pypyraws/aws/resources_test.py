@@ -0,0 +1,85 @@
+"""resources.py unit tests."""
+from pypyraws.aws.resources import ResourceTracker
+import pytest
+
+
+def get_tracker(resource_ids, batch_size=2):
+    """Get tracker for ec2 describe_instances."""
+    return ResourceTracker(resource_ids,
+                           ids_key='InstanceIds',
+                           items_query='Reservations[].Instances[]',
+                           id_query='InstanceId',
+                           batch_size=batch_size)
+
+
+def get_instances_response(*instances):
+    """Get describe_instances response for (id, state) instances."""
+    return {'Reservations': [
+        {'Instances': [{'InstanceId': instance_id,
+                        'State': {'Name': state}}
+                       for instance_id, state in instances]}]}
+
+
+def test_tracker_all_pending():
+    """New tracker has everything pending, without duplicates."""
+    tracker = get_tracker(['i-1', 'i-2', 'i-1', 'i-3'])
+
+    assert tracker.resource_ids == ['i-1', 'i-2', 'i-3']
+    assert tracker.pending == ['i-1', 'i-2', 'i-3']
+    assert not tracker.done
+    assert tracker.to_dict() == {'i-1': 'pending',
+                                 'i-2': 'pending',
+                                 'i-3': 'pending'}
+
+
+def test_tracker_get_calls_chunks_pending():
+    """Calls chunk pending ids and drop finished ones."""
+    tracker = get_tracker(['i-1', 'i-2', 'i-3', 'i-4', 'i-5'])
+    method_args = {'DryRun': False}
+
+    assert tracker.get_calls(method_args) == [
+        {'DryRun': False, 'InstanceIds': ['i-1', 'i-2']},
+        {'DryRun': False, 'InstanceIds': ['i-3', 'i-4']},
+        {'DryRun': False, 'InstanceIds': ['i-5']}]
+
+    tracker.set_state('i-2', 'success')
+    tracker.set_state('i-5', 'success')
+
+    assert tracker.get_calls(method_args) == [
+        {'DryRun': False, 'InstanceIds': ['i-1', 'i-3']},
+        {'DryRun': False, 'InstanceIds': ['i-4']}]
+    assert method_args == {'DryRun': False}
+
+
+def test_tracker_get_calls_no_args_done():
+    """No pending resources means no calls."""
+    tracker = get_tracker(['i-1'])
+    assert tracker.get_calls() == [{'InstanceIds': ['i-1']}]
+
+    tracker.set_state('i-1', 'success')
+
+    assert tracker.done
+    assert tracker.get_calls() == []
+
+
+def test_tracker_get_items():
+    """Items for pending ids only, across responses."""
+    tracker = get_tracker(['i-1', 'i-2', 'i-3'])
+    tracker.set_state('i-3', 'success')
+
+    items = list(tracker.get_items([
+        get_instances_response(('i-1', 'running'), ('i-3', 'running')),
+        get_instances_response(('i-9', 'running')),
+        {'Reservations': []},
+        {}]))
+
+    assert items == [('i-1', {'InstanceId': 'i-1',
+                              'State': {'Name': 'running'}})]
+
+
+def test_tracker_bad_batch_size():
+    """Batch size must be positive."""
+    with pytest.raises(ValueError) as err:
+        get_tracker(['i-1'], batch_size=0)
+
+    assert str(err.value) == "batch size must be >= 1, not 0."
@@ -0,0 +1,243 @@
+"""response.py unit tests."""
+import pypyraws.aws.response as response_module
+from pypyraws.aws.response import project
+import pytest
+
+
+def get_response():
+    """Get arb describe-style response."""
+    return {
+        'Reservations': [
+            {'Instances': [{'InstanceId': 'i-1', 'State': {'Name': 'a'}},
+                           {'InstanceId': 'i-2', 'State': {'Name': 'b'}}]},
+            {'Instances': [{'InstanceId': 'i-3', 'State': {'Name': 'a'}}]}],
+        'ResponseMetadata': {'RequestId': 'arb',
+                             'HTTPHeaders': {'h1': 'v1'}}}
+
+
+def test_project_no_op():
+    """No query or strip returns response as is."""
+    response = get_response()
+    assert project(response) is response
+
+
+def test_project_strip_metadata():
+    """Strip removes ResponseMetadata without mutating input."""
+    response = get_response()
+
+    out = project(response, strip_metadata=True)
+
+    assert 'ResponseMetadata' not in out
+    assert out['Reservations'] is response['Reservations']
+    assert 'ResponseMetadata' in response
+
+
+def test_project_strip_metadata_not_dict():
+    """Strip on a non-dict returns it as is."""
+    assert project(['a'], strip_metadata=True) == ['a']
+    assert project(None, strip_metadata=True) is None
+
+
+def test_project_query():
+    """Query keeps only projected data."""
+    out = project(get_response(),
+                  query="Reservations[].Instances[?State.Name=='a']"
+                        "[].InstanceId")
+
+    assert out == ['i-1', 'i-3']
+
+
+def test_project_query_and_strip():
+    """Query applies after strip."""
+    assert project(get_response(),
+                   query='ResponseMetadata',
+                   strip_metadata=True) is None
+
+# ---------------------------- compile_format -------------------------------#
+
+
+def test_compile_format_same_as_str_format():
+    """Compiled format gives the same result as str.format."""
+    response = {'a': 'x',
+                'b': [1.5, {'c': True}],
+                'd': {'e': 3}}
+    for format_string in ('{a}',
+                          'literal',
+                          'pre {a} mid {b[1][c]} post',
+                          '{b[0]:.3f}',
+                          '{d[e]:>4}',
+                          '{a!r}',
+                          '{{escaped}} {a}'):
+        format_response = response_module.compile_format(format_string)
+        assert format_response(response) == format_string.format(**response)
+
+
+def test_compile_format_nested_spec():
+    """Nested fields in the format spec still work."""
+    format_response = response_module.compile_format('{a:>{width}}')
+    assert format_response({'a': 'x', 'width': 3}) == '  x'
+
+
+def test_compile_format_missing_key():
+    """Missing key raises KeyError like str.format."""
+    format_response = response_module.compile_format('{a[b]}')
+    with pytest.raises(KeyError):
+        format_response({'a': {}})
+
+# ---------------------------- compile_format -------------------------------#
+
+# ---------------------------- ResponseMatcher ------------------------------#
+
+
+def test_matcher_field_compares_strings():
+    """Field matcher compares str of the expected value."""
+    matcher = response_module.ResponseMatcher(123, field='{a[0]}')
+
+    assert matcher({'a': [123]})
+    assert matcher({'a': ['123']})
+    assert not matcher({'a': [1234]})
+    assert matcher.expression == '{a[0]}'
+    assert repr(matcher) == "ResponseMatcher(path {a[0]} == 123)"
+
+
+def test_matcher_field_ignores_matcher():
+    """Field matcher only does path."""
+    matcher = response_module.ResponseMatcher('x',
+                                              field='{a}',
+                                              matcher='pathAll')
+    assert matcher.matcher == 'path'
+    assert matcher({'a': 'x'})
+
+
+def test_matcher_query_typed():
+    """Query matcher compares typed values."""
+    matcher = response_module.ResponseMatcher(3, query='a.b')
+
+    assert matcher({'a': {'b': 3}})
+    assert matcher({'a': {'b': 3.0}})
+    assert not matcher({'a': {'b': '3'}})
+    assert not matcher({'a': {}})
+
+
+def test_matcher_query_bool_not_int():
+    """Bools don't equal ints."""
+    true_matcher = response_module.ResponseMatcher(True, query='a')
+    assert true_matcher({'a': True})
+    assert not true_matcher({'a': 1})
+    assert not true_matcher({'a': False})
+
+    one_matcher = response_module.ResponseMatcher(1, query='a')
+    assert one_matcher({'a': 1})
+    assert not one_matcher({'a': True})
+
+
+def test_matcher_query_path_all():
+    """The pathAll matcher needs a non-empty list of all matches."""
+    matcher = response_module.ResponseMatcher('STOPPED',
+                                              query='tasks[].lastStatus',
+                                              matcher='pathAll')
+
+    assert matcher({'tasks': [{'lastStatus': 'STOPPED'},
+                              {'lastStatus': 'STOPPED'}]})
+    assert not matcher({'tasks': [{'lastStatus': 'STOPPED'},
+                                  {'lastStatus': 'RUNNING'}]})
+    assert not matcher({'tasks': []})
+    assert not matcher({})
+
+
+def test_matcher_query_path_any():
+    """The pathAny matcher needs a list with at least one match."""
+    matcher = response_module.ResponseMatcher('MISSING',
+                                              query='failures[].reason',
+                                              matcher='pathAny')
+
+    assert matcher({'failures': [{'reason': 'X'}, {'reason': 'MISSING'}]})
+    assert not matcher({'failures': [{'reason': 'X'}]})
+    assert not matcher({'failures': []})
+    assert not matcher({'failures': 'MISSING'})
+
+
+def test_matcher_query_filter_expression():
+    """Query can filter and count."""
+    matcher = response_module.ResponseMatcher(
+        0, query="length(tasks[?lastStatus!='STOPPED'])")
+
+    assert matcher({'tasks': [{'lastStatus': 'STOPPED'}]})
+    assert not matcher({'tasks': [{'lastStatus': 'RUNNING'}]})
+
+
+def test_matcher_needs_field_or_query():
+    """Exactly one of field or query."""
+    with pytest.raises(ValueError) as err:
+        response_module.ResponseMatcher(1)
+    assert str(err.value) == "set exactly one of field or query."
+
+    with pytest.raises(ValueError):
+        response_module.ResponseMatcher(1, field='{a}', query='a')
+
+
+def test_matcher_bad_matcher():
+    """Unknown matcher raises."""
+    with pytest.raises(ValueError) as err:
+        response_module.ResponseMatcher(1, query='a', matcher='arb')
+
+    assert str(err.value) == ("matcher must be path, pathAll or pathAny, "
+                              "not arb.")
+
+# ---------------------------- ResponseMatcher ------------------------------#
+
+# ---------------------------- Acceptor -------------------------------------#
+
+
+def test_acceptor_to_dict():
+    """Acceptor describes itself."""
+    acceptor = response_module.Acceptor(
+        'failure',
+        response_module.ResponseMatcher('STOPPED',
+                                        query='tasks[].lastStatus',
+                                        matcher='pathAny'))
+
+    assert acceptor.to_dict() == {'state': 'failure',
+                                  'matcher': 'pathAny',
+                                  'expression': 'tasks[].lastStatus',
+                                  'expected': 'STOPPED'}
+    assert repr(acceptor) == ("Acceptor(failure when ResponseMatcher(pathAny "
+                              "tasks[].lastStatus == 'STOPPED'))")
+
+
+def test_acceptor_bad_state():
+    """Unknown state raises."""
+    with pytest.raises(ValueError) as err:
+        response_module.Acceptor(
+            'arb', response_module.ResponseMatcher(1, query='a'))
+
+    assert str(err.value) == ("acceptor state must be success, failure or "
+                              "retry, not arb.")
+
+
+def test_acceptor_to_waiter_acceptor():
+    """Query acceptor describes itself as a botocore waiter acceptor."""
+    acceptor = response_module.Acceptor(
+        'retry',
+        response_module.ResponseMatcher(True,
+                                        query='tasks[].stopped',
+                                        matcher='pathAll'))
+
+    assert acceptor.to_waiter_acceptor() == {'state': 'retry',
+                                             'matcher': 'pathAll',
+                                             'argument': 'tasks[].stopped',
+                                             'expected': True}
+
+
+def test_acceptor_to_waiter_acceptor_field():
+    """Field acceptor can't be a botocore waiter acceptor."""
+    acceptor = response_module.Acceptor(
+        'success', response_module.ResponseMatcher('a', field='{k1}'))
+
+    with pytest.raises(ValueError) as err:
+        acceptor.to_waiter_acceptor()
+
+    assert str(err.value) == ("botocore waiters need a JMESPath query, not "
+                              "field {k1}.")
+
+# ---------------------------- Acceptor -------------------------------------#
@@ -1,9 +1,14 @@
 """service.py unit tests."""
+import io
+import json
+import os
+import threading
 import pypyraws.aws.s3 as ps3
+from pypyraws.aws.session import AwsSession
 from pypyr.context import Context
 from pypyr.errors import KeyNotInContextError
 import pytest
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 
 # ---------------------------- get_payload ----------------------------------#
 
@@ -67,7 +72,8 @@ def test_aws_client_pass(mock_s3):
                                         'Bucket': 'bucket name',
                                         'Key': 'key name',
                                         'SSECustomerAlgorithm': 'sse alg',
-                                        'SSECustomerKey': 'sse key'}
+                                        'SSECustomerKey': 'sse key'},
+                                    session=None
                                     )
 
 
@@ -108,7 +114,8 @@ def test_aws_client_pass_no_client_args(mock_s3):
                                         'Bucket': 'bucket name',
                                         'Key': 'key name',
                                         'SSECustomerAlgorithm': 'sse alg',
-                                        'SSECustomerKey': 'sse key'}
+                                        'SSECustomerKey': 'sse key'},
+                                    session=None
                                     )
 
 
@@ -156,6 +163,497 @@ def test_aws_client_pass_substitutions(mock_s3):
                                         'Bucket': 'v3 bucket name',
                                         'Key': 'key name v4',
                                         'SSECustomerAlgorithm': 'sse alg',
-                                        'SSECustomerKey': 'sse key'}
+                                        'SSECustomerKey': 'sse key'},
+                                    session=None
                                     )
 # ---------------------------- get_payload ----------------------------------#
+
+# ---------------------------- get_ranged_payload ---------------------------#
+
+
+class FakeS3():
+    """In-memory s3 object that serves head_object and ranged get_object."""
+
+    def __init__(self, data, etag='"etag1"', fail_range=None):
+        """Serve data. Fail the get for fail_range with an error."""
+        self.data = data
+        self.etag = etag
+        self.fail_range = fail_range
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def operation_exec(self, service_name, method_name, client_args,
+                       operation_args, session):
+        """Fake pypyraws.aws.service.operation_exec."""
+        with self.lock:
+            self.calls.append((method_name, dict(operation_args)))
+
+        if method_name == 'head_object':
+            return {'ContentLength': len(self.data), 'ETag': self.etag}
+
+        if 'Range' not in operation_args:
+            return {'Body': io.BytesIO(self.data)}
+
+        assert operation_args['IfMatch'] == self.etag
+        if operation_args['Range'] == self.fail_range:
+            raise ValueError('arb')
+
+        start, end = operation_args['Range'][len('bytes='):].split('-')
+        return {'Body': io.BytesIO(self.data[int(start):int(end) + 1])}
+
+
+def get_ranged_fetch(**parallel):
+    """Get s3Fetch with parallel."""
+    return {'methodArgs': {'Bucket': 'b',
+                           'Key': 'k',
+                           'VersionId': 'v1',
+                           'ResponseContentType': 'text/plain'},
+            'parallel': parallel or True}
+
+
+@pytest.mark.parametrize('to_file', [False, True])
+def test_get_payload_parallel(to_file):
+    """Large object reassembles in order from ranges."""
+    data = bytes(range(256)) * 41
+    fake = FakeS3(data)
+
+    with patch('pypyraws.aws.service.operation_exec',
+               side_effect=fake.operation_exec):
+        payload = ps3.get_payload(get_ranged_fetch(partSize=1000,
+                                                   maxConcurrency=3,
+                                                   toFile=to_file))
+
+    assert payload.read() == data
+    payload.close()
+    assert fake.calls[0] == ('head_object', {'Bucket': 'b',
+                                             'Key': 'k',
+                                             'VersionId': 'v1'})
+    ranges = sorted(args['Range'] for method, args in fake.calls[1:])
+    assert len(ranges) == 11
+    assert 'bytes=10000-10495' in ranges
+    assert all(args['VersionId'] == 'v1'
+               and args['ResponseContentType'] == 'text/plain'
+               for method, args in fake.calls[1:])
+
+
+def test_get_payload_parallel_small_object():
+    """Object no bigger than one part downloads in one get."""
+    fake = FakeS3(b'small')
+
+    with patch('pypyraws.aws.service.operation_exec',
+               side_effect=fake.operation_exec):
+        payload = ps3.get_payload(get_ranged_fetch())
+
+    assert payload.read() == b'small'
+    assert [method for method, args in fake.calls] == ['head_object',
+                                                       'get_object']
+
+
+@pytest.mark.parametrize('parallel, calls', [
+    ('true', ['head_object', 'get_object']),
+    ('False', ['get_object'])])
+def test_get_payload_parallel_string(parallel, calls):
+    """Parallel from a formatted string casts to bool."""
+    fake = FakeS3(b'small')
+    fetch_me = get_ranged_fetch()
+    fetch_me['parallel'] = parallel
+
+    with patch('pypyraws.aws.service.operation_exec',
+               side_effect=fake.operation_exec):
+        payload = ps3.get_payload(fetch_me)
+
+    assert payload.read() == b'small'
+    assert [method for method, args in fake.calls] == calls
+
+
+def test_get_payload_parallel_to_file_string():
+    """Formatted toFile string False reassembles in memory."""
+    fake = FakeS3(b'x' * 20)
+
+    with patch('pypyraws.aws.service.operation_exec',
+               side_effect=fake.operation_exec):
+        with patch('tempfile.TemporaryFile') as mock_temp_file:
+            payload = ps3.get_payload(get_ranged_fetch(partSize=10,
+                                                       toFile='False'))
+
+    assert payload.read() == b'x' * 20
+    mock_temp_file.assert_not_called()
+
+
+def test_get_payload_parallel_part_fails():
+    """Any range failing raises and cancels the rest."""
+    fake = FakeS3(b'x' * 100, fail_range='bytes=0-9')
+
+    with patch('pypyraws.aws.service.operation_exec',
+               side_effect=fake.operation_exec):
+        with pytest.raises(ValueError) as err:
+            ps3.get_payload(get_ranged_fetch(partSize=10, maxConcurrency=1))
+
+    assert str(err.value) == 'arb'
+    assert len(fake.calls) < 11
+
+
+def test_get_ranged_payload_bad_args():
+    """Part size and concurrency must be positive."""
+    with pytest.raises(ValueError) as err:
+        ps3.get_ranged_payload({'Bucket': 'b', 'Key': 'k'}, part_size=0)
+
+    assert str(err.value) == "part size and max concurrency must be >= 1."
+
+
+@patch('boto3.client')
+def test_get_payload_parallel_s3_client(mock_boto):
+    """Real s3 client against stubbed ranged responses."""
+    import boto3
+    from botocore.response import StreamingBody
+    from botocore.stub import Stubber
+
+    s3 = boto3.session.Session().client('s3',
+                                        region_name='us-east-1',
+                                        aws_access_key_id='a',
+                                        aws_secret_access_key='b')
+    mock_boto.return_value = s3
+    data = b'0123456789abcdefghij'
+
+    with Stubber(s3) as stubber:
+        stubber.add_response('head_object',
+                             {'ContentLength': 20, 'ETag': '"e"'},
+                             {'Bucket': 'b', 'Key': 'k'})
+        for start in (0, 10):
+            stubber.add_response(
+                'get_object',
+                {'Body': StreamingBody(io.BytesIO(data[start:start + 10]),
+                                       10)},
+                {'Bucket': 'b',
+                 'Key': 'k',
+                 'Range': f'bytes={start}-{start + 9}',
+                 'IfMatch': '"e"'})
+
+        payload = ps3.get_payload({'methodArgs': {'Bucket': 'b', 'Key': 'k'},
+                                   'parallel': {'partSize': 10,
+                                                'maxConcurrency': 1}})
+        stubber.assert_no_pending_responses()
+
+    assert payload.read() == data
+
+# ---------------------------- get_ranged_payload ---------------------------#
+
+# ---------------------------- get_payload cache ----------------------------#
+
+
+@patch('pypyraws.aws.s3cache.S3Cache.fetch', return_value='payload')
+def test_get_payload_cache_defaults(mock_fetch):
+    """Cache True fetches through the disk cache with defaults."""
+    with patch('pypyraws.aws.s3cache.S3Cache.__init__',
+               return_value=None) as mock_init:
+        payload = ps3.get_payload({'methodArgs': {'Bucket': 'b',
+                                                  'Key': 'k'},
+                                   'clientArgs': {'region_name': 'r'},
+                                   'cache': True},
+                                  session='session')
+
+    assert payload == 'payload'
+    mock_init.assert_called_once_with(directory=None,
+                                      ttl=0.0,
+                                      max_size=100 * 1024 * 1024)
+    mock_fetch.assert_called_once_with(
+        operation_args={'Bucket': 'b', 'Key': 'k'},
+        client_args={'region_name': 'r'},
+        session='session')
+
+
+@patch('pypyraws.aws.service.operation_exec')
+def test_get_payload_cache_args(mock_exec, tmp_path):
+    """Cache dict sets dir, ttl and maxSize."""
+    mock_exec.return_value = {'Body': io.BytesIO(b'body'), 'ETag': 'e'}
+    fetch_me = {'methodArgs': {'Bucket': 'b', 'Key': 'k'},
+                'cache': {'dir': str(tmp_path),
+                          'ttl': '60',
+                          'maxSize': '1000'}}
+
+    assert ps3.get_payload(fetch_me).read() == b'body'
+    assert ps3.get_payload(fetch_me).read() == b'body'
+
+    mock_exec.assert_called_once()
+    assert len(os.listdir(tmp_path)) == 1
+
+
+@pytest.mark.parametrize('cache, fetched', [('true', True),
+                                            ('False', False)])
+def test_get_payload_cache_string(cache, fetched):
+    """Cache from a formatted string casts to bool."""
+    with patch('pypyraws.aws.s3cache.S3Cache.fetch',
+               return_value='cached') as mock_fetch:
+        with patch('pypyraws.aws.service.operation_exec',
+                   return_value={'Body': 'body'}):
+            payload = ps3.get_payload({'methodArgs': {'Bucket': 'b',
+                                                      'Key': 'k'},
+                                       'cache': cache})
+
+    assert payload == ('cached' if fetched else 'body')
+    assert mock_fetch.called is fetched
+
+
+def test_get_payload_cache_and_parallel():
+    """Cache with parallel raises."""
+    with pytest.raises(ValueError) as err:
+        ps3.get_payload({'methodArgs': {'Bucket': 'b', 'Key': 'k'},
+                         'cache': True,
+                         'parallel': True})
+
+    assert str(err.value) == "s3Fetch can't use cache and parallel together."
+
+# ---------------------------- get_payload cache ----------------------------#
+
+# ---------------------------- get_document ---------------------------------#
+
+
+def get_json_response(document, etag='"e1"'):
+    """Get get_object response with json body."""
+    response = {'Body': io.BytesIO(json.dumps(document).encode())}
+    if etag:
+        response['ETag'] = etag
+    return response
+
+
+def get_not_modified():
+    """Get s3 304 ClientError."""
+    from botocore.exceptions import ClientError
+    return ClientError({'Error': {'Code': '304', 'Message': 'Not Modified'}},
+                       'GetObject')
+
+
+@patch('pypyraws.aws.service.operation_exec')
+def test_get_document_no_memory_cache(mock_exec):
+    """Without memoryCache parses every time and doesn't cache."""
+    mock_exec.side_effect = [get_json_response({'a': 1}),
+                             get_json_response({'a': 1})]
+    fetch_me = {'methodArgs': {'Bucket': 'b', 'Key': 'k'}}
+
+    assert ps3.get_document(fetch_me, json.load, 'json') == {'a': 1}
+    assert ps3.get_document(fetch_me, json.load, 'json') == {'a': 1}
+
+    assert mock_exec.call_count == 2
+    assert 'IfNoneMatch' not in mock_exec.call_args.kwargs['operation_args']
+    assert ps3.document_cache_info().misses == 0
+
+
+@pytest.mark.parametrize('memory_cache, calls', [('true', 1), ('False', 2)])
+@patch('pypyraws.aws.service.operation_exec')
+def test_get_document_memory_cache_string(mock_exec, memory_cache, calls):
+    """Memory cache option from a formatted string casts to bool."""
+    mock_exec.side_effect = [get_json_response({'a': 1}),
+                             get_json_response({'a': 1})]
+    fetch_me = {'methodArgs': {'Bucket': 'b', 'Key': 'k', 'VersionId': 'v1'},
+                'memoryCache': memory_cache,
+                'cache': 'False'}
+
+    assert ps3.get_document(fetch_me, json.load, 'json') == {'a': 1}
+    assert ps3.get_document(fetch_me, json.load, 'json') == {'a': 1}
+
+    assert mock_exec.call_count == calls
+
+
+@patch('pypyraws.aws.service.operation_exec')
+def test_get_document_not_modified(mock_exec):
+    """Cached ETag revalidates, 304 returns a copy of the cached document."""
+    mock_exec.side_effect = [get_json_response({'a': [1, 2]}),
+                             get_not_modified()]
+    fetch_me = {'methodArgs': {'Bucket': 'b', 'Key': 'k'},
+                'clientArgs': {'region_name': 'r'},
+                'memoryCache': True}
+    parse = Mock(side_effect=json.load)
+    session = AwsSession({'region_name': 'r'})
+
+    first = ps3.get_document(fetch_me, parse, 'json', session=session)
+    first['a'].append(3)
+    second = ps3.get_document(fetch_me, parse, 'json', session=session)
+
+    assert second == {'a': [1, 2]}
+    parse.assert_called_once()
+    mock_exec.assert_called_with(service_name='s3',
+                                 method_name='get_object',
+                                 client_args={'region_name': 'r'},
+                                 operation_args={'Bucket': 'b',
+                                                 'Key': 'k',
+                                                 'IfNoneMatch': '"e1"'},
+                                 session=session)
+    info = ps3.document_cache_info()
+    assert (info.hits, info.misses, info.currsize) == (1, 1, 13)
+    assert ps3.get_hit_ratio(info) == 0.5
+
+
+@patch('pypyraws.aws.service.operation_exec')
+def test_get_document_cache_source(mock_exec):
+    """Without cache_parsed, caches source and parses it on every hit."""
+    mock_exec.side_effect = [get_json_response({'a': [1, 2]}),
+                             get_not_modified()]
+    fetch_me = {'methodArgs': {'Bucket': 'b', 'Key': 'k'},
+                'memoryCache': True}
+    parse = Mock(side_effect=json.load)
+
+    first = ps3.get_document(fetch_me, parse, 'json', cache_parsed=False)
+    first['a'].append(3)
+
+    with patch('copy.deepcopy') as mock_deepcopy:
+        second = ps3.get_document(fetch_me, parse, 'json',
+                                  cache_parsed=False)
+
+    assert second == {'a': [1, 2]}
+    assert parse.call_count == 2
+    mock_deepcopy.assert_not_called()
+    entry = ps3._document_cache.peek(('json',
+                                      (('Bucket', 'b'), ('Key', 'k')),
+                                      None,
+                                      None))
+    assert entry.body == b'{"a": [1, 2]}'
+    assert entry.document is None
+    assert ps3.document_cache_info().hits == 1
+
+
+@patch('pypyraws.aws.service.operation_exec')
+def test_get_document_evicted_during_revalidate(mock_exec):
+    """Entry evicted by another thread mid-call still returns the document."""
+    responses = [get_json_response({'a': 1})]
+
+    def operation_exec(**kwargs):
+        if responses:
+            return responses.pop()
+        ps3.clear_document_cache()
+        raise get_not_modified()
+
+    mock_exec.side_effect = operation_exec
+    fetch_me = {'methodArgs': {'Bucket': 'b', 'Key': 'k'},
+                'memoryCache': True}
+
+    ps3.get_document(fetch_me, json.load, 'json')
+
+    assert ps3.get_document(fetch_me, json.load, 'json') == {'a': 1}
+    assert ps3.document_cache_info().hits == 1
+
+
+@patch('pypyraws.aws.service.operation_exec')
+def test_get_document_modified(mock_exec):
+    """Changed ETag downloads and parses again."""
+    mock_exec.side_effect = [get_json_response({'a': 1}),
+                             get_json_response({'a': 2}, '"e2"')]
+    fetch_me = {'methodArgs': {'Bucket': 'b', 'Key': 'k'},
+                'memoryCache': True}
+
+    ps3.get_document(fetch_me, json.load, 'json')
+
+    assert ps3.get_document(fetch_me, json.load, 'json') == {'a': 2}
+    assert ps3.document_cache_info().misses == 2
+
+
+@patch('pypyraws.aws.service.operation_exec')
+def test_get_document_version_id_skips_s3(mock_exec):
+    """Cached object version returns without calling s3."""
+    mock_exec.return_value = get_json_response({'a': 1})
+    fetch_me = {'methodArgs': {'Bucket': 'b', 'Key': 'k', 'VersionId': 'v1'},
+                'memoryCache': True}
+
+    ps3.get_document(fetch_me, json.load, 'json')
+    document = ps3.get_document(fetch_me, json.load, 'json')
+    document['a'] = 2
+
+    assert ps3.get_document(fetch_me, json.load, 'json') == {'a': 1}
+    mock_exec.assert_called_once()
+    assert ps3.document_cache_info().hits == 2
+
+
+@patch('pypyraws.aws.service.operation_exec')
+def test_get_document_kind_in_key(mock_exec):
+    """Same object parsed as a different kind doesn't share an entry."""
+    mock_exec.side_effect = [get_json_response({'a': 1}),
+                             get_json_response({'a': 1})]
+    fetch_me = {'methodArgs': {'Bucket': 'b', 'Key': 'k', 'VersionId': 'v1'},
+                'memoryCache': True}
+
+    ps3.get_document(fetch_me, json.load, 'json')
+    ps3.get_document(fetch_me, json.load, 'yaml')
+
+    assert mock_exec.call_count == 2
+
+
+@patch('pypyraws.aws.service.operation_exec')
+def test_get_document_session_in_key(mock_exec):
+    """Same object fetched with another profile or region calls s3."""
+    mock_exec.side_effect = [get_json_response({'a': 1}),
+                             get_json_response({'a': 2}),
+                             get_json_response({'a': 3})]
+    fetch_me = {'methodArgs': {'Bucket': 'b', 'Key': 'k', 'VersionId': 'v1'},
+                'memoryCache': True}
+    session = AwsSession({'region_name': 'eu-west-1'})
+
+    assert ps3.get_document(fetch_me, json.load, 'json', session) == {'a': 1}
+    assert ps3.get_document(fetch_me, json.load, 'json') == {'a': 2}
+    assert ps3.get_document(fetch_me,
+                            json.load,
+                            'json',
+                            AwsSession({'region_name': 'us-east-1'})) == {
+        'a': 3}
+    assert ps3.get_document(fetch_me, json.load, 'json', session) == {'a': 1}
+    assert mock_exec.call_count == 3
+
+
+@patch('pypyraws.aws.service.operation_exec')
+def test_get_document_no_etag(mock_exec):
+    """Response without ETag doesn't cache."""
+    mock_exec.return_value = get_json_response({'a': 1}, etag=None)
+
+    assert ps3.get_document({'methodArgs': {'Bucket': 'b', 'Key': 'k'},
+                             'memoryCache': True},
+                            json.load,
+                            'json') == {'a': 1}
+
+    assert ps3.document_cache_info().currsize == 0
+
+
+@patch('pypyraws.aws.service.operation_exec')
+def test_get_document_error_raises(mock_exec):
+    """Errors other than 304, or 304 with nothing cached, raise."""
+    from botocore.exceptions import ClientError
+    mock_exec.side_effect = [get_not_modified(),
+                             get_json_response({'a': 1}),
+                             ClientError({'Error': {'Code': 'AccessDenied'}},
+                                         'GetObject')]
+    fetch_me = {'methodArgs': {'Bucket': 'b', 'Key': 'k'},
+                'memoryCache': True}
+
+    with pytest.raises(ClientError):
+        ps3.get_document(fetch_me, json.load, 'json')
+
+    ps3.get_document(fetch_me, json.load, 'json')
+
+    with pytest.raises(ClientError) as err:
+        ps3.get_document(fetch_me, json.load, 'json')
+
+    assert err.value.response['Error']['Code'] == 'AccessDenied'
+
+
+@pytest.mark.parametrize('fetch_me', [{'cache': True}, {'parallel': True}])
+def test_get_document_memory_cache_with_others(fetch_me):
+    """Memory cache with cache or parallel raises."""
+    with pytest.raises(ValueError) as err:
+        ps3.get_document({'methodArgs': {'Bucket': 'b', 'Key': 'k'},
+                          'memoryCache': True,
+                          **fetch_me},
+                         json.load,
+                         'json')
+
+    assert str(err.value) == ("s3Fetch can't use memoryCache with cache or "
+                              "parallel.")
+
+
+def test_get_document_no_method_args():
+    """Memory cache without methodArgs raises."""
+    with pytest.raises(KeyNotInContextError):
+        ps3.get_document({'memoryCache': True}, json.load, 'json')
+
+
+def test_get_hit_ratio_no_lookups():
+    """No lookups yet is ratio 0."""
+    assert ps3.get_hit_ratio(ps3.document_cache_info()) == 0.0
+
+# ---------------------------- get_document ---------------------------------#
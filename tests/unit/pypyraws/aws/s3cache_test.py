@@ -0,0 +1,359 @@
+"""s3cache.py unit tests."""
+import io
+import os
+import time
+from unittest.mock import patch, PropertyMock
+from botocore.exceptions import ClientError
+import pypyraws.aws.s3cache as s3cache
+from pypyraws.aws.session import AwsSession
+import pytest
+
+ARGS = {'Bucket': 'b', 'Key': 'k'}
+
+
+def get_response(body, etag='"e1"'):
+    """Get get_object response."""
+    response = {'Body': io.BytesIO(body)}
+    if etag:
+        response['ETag'] = etag
+    return response
+
+
+def get_client_error(code='304', status=304):
+    """Get botocore ClientError for get_object."""
+    return ClientError({'Error': {'Code': code, 'Message': 'arb'},
+                        'ResponseMetadata': {'HTTPStatusCode': status}},
+                       'GetObject')
+
+
+def set_times(path, validated, used=None):
+    """Set cache file validated (mtime) and used (atime) times."""
+    os.utime(path, (validated if used is None else used, validated))
+
+# ---------------------------- get_default_dir ------------------------------#
+
+
+def test_get_default_dir_xdg(monkeypatch):
+    """XDG_CACHE_HOME sets the cache home."""
+    monkeypatch.setenv('XDG_CACHE_HOME', '/arb')
+
+    assert s3cache.get_default_dir() == os.path.join('/arb', 'pypyraws', 's3')
+
+
+def test_get_default_dir_home(monkeypatch):
+    """Cache home defaults to ~/.cache."""
+    monkeypatch.delenv('XDG_CACHE_HOME', raising=False)
+
+    assert s3cache.get_default_dir() == os.path.join(
+        os.path.expanduser('~'), '.cache', 'pypyraws', 's3')
+
+
+def test_s3cache_defaults():
+    """Default dir, ttl and max_size."""
+    cache = s3cache.S3Cache()
+
+    assert cache.directory == s3cache.get_default_dir()
+    assert cache.ttl == 0
+    assert cache.max_size == 100 * 1024 * 1024
+
+# ---------------------------- get_default_dir ------------------------------#
+
+# ---------------------------- get_path -------------------------------------#
+
+
+def test_get_path_keys_on_args(tmp_path):
+    """Path differs by version and client args, not by arg order."""
+    cache = s3cache.S3Cache(tmp_path)
+
+    path = cache.get_path({'Bucket': 'b', 'Key': 'k'})
+
+    assert os.path.dirname(path) == str(tmp_path)
+    assert path.endswith('.s3')
+    assert path == cache.get_path({'Key': 'k', 'Bucket': 'b'})
+    assert path != cache.get_path({'Bucket': 'b', 'Key': 'k',
+                                   'VersionId': 'v1'})
+    assert path != cache.get_path({'Bucket': 'b', 'Key': 'k'},
+                                  {'endpoint_url': 'http://localhost'})
+
+
+def test_get_path_keys_on_session(tmp_path):
+    """Path differs by session profile and region."""
+    cache = s3cache.S3Cache(tmp_path)
+    session = AwsSession({'region_name': 'eu-west-1'})
+
+    path = cache.get_path(ARGS, session=session)
+
+    assert path == cache.get_path(
+        ARGS, session=AwsSession({'region_name': 'eu-west-1'}))
+    assert path != cache.get_path(ARGS)
+    assert path != cache.get_path(
+        ARGS, session=AwsSession({'region_name': 'us-east-1'}))
+    with patch('boto3.Session.profile_name',
+               new_callable=PropertyMock, return_value='other'):
+        assert path != cache.get_path(ARGS, session=session)
+
+# ---------------------------- get_path -------------------------------------#
+
+# ---------------------------- fetch ----------------------------------------#
+
+
+@patch('pypyraws.aws.service.operation_exec')
+def test_fetch_miss_then_not_modified(mock_exec, tmp_path):
+    """First fetch downloads and caches, second sends ETag and gets 304."""
+    mock_exec.side_effect = [get_response(b'body'), get_client_error()]
+    cache = s3cache.S3Cache(tmp_path)
+    session = AwsSession({'region_name': 'r'})
+
+    assert cache.fetch(ARGS, {'region_name': 'r'}, session).read() == (
+        b'body')
+    path = cache.get_path(ARGS, {'region_name': 'r'}, session)
+    set_times(path, 1)
+
+    assert cache.fetch(ARGS, {'region_name': 'r'}, session).read() == (
+        b'body')
+
+    assert mock_exec.call_count == 2
+    mock_exec.assert_called_with(service_name='s3',
+                                 method_name='get_object',
+                                 client_args={'region_name': 'r'},
+                                 operation_args={'Bucket': 'b',
+                                                 'Key': 'k',
+                                                 'IfNoneMatch': '"e1"'},
+                                 session=session)
+    # 304 marks the entry validated now.
+    assert os.stat(path).st_mtime > 1
+    assert ARGS == {'Bucket': 'b', 'Key': 'k'}
+
+
+@patch('pypyraws.aws.service.operation_exec')
+def test_fetch_modified_replaces_entry(mock_exec, tmp_path):
+    """Changed object downloads again and replaces cached body."""
+    mock_exec.side_effect = [get_response(b'old'),
+                             get_response(b'new', '"e2"'),
+                             get_client_error()]
+    cache = s3cache.S3Cache(tmp_path)
+
+    cache.fetch(ARGS)
+    assert cache.fetch(ARGS).read() == b'new'
+    assert cache.fetch(ARGS).read() == b'new'
+
+    assert mock_exec.call_args.kwargs['operation_args'][
+        'IfNoneMatch'] == '"e2"'
+    assert os.listdir(tmp_path) == [os.path.basename(cache.get_path(ARGS))]
+
+
+@patch('pypyraws.aws.service.operation_exec')
+def test_fetch_within_ttl_skips_s3(mock_exec, tmp_path):
+    """Entry validated within ttl returns without calling s3."""
+    mock_exec.return_value = get_response(b'body')
+    cache = s3cache.S3Cache(tmp_path, ttl=60)
+
+    cache.fetch(ARGS)
+    path = cache.get_path(ARGS)
+    validated = time.time() - 30
+    set_times(path, validated, used=1)
+
+    assert cache.fetch(ARGS).read() == b'body'
+
+    mock_exec.assert_called_once()
+    stat = os.stat(path)
+    assert stat.st_mtime == pytest.approx(validated)
+    assert stat.st_atime > 1
+
+
+@patch('pypyraws.aws.service.operation_exec')
+def test_fetch_ttl_expired_revalidates(mock_exec, tmp_path):
+    """Entry validated longer ago than ttl revalidates."""
+    mock_exec.side_effect = [get_response(b'body'), get_client_error()]
+    cache = s3cache.S3Cache(tmp_path, ttl=60)
+
+    cache.fetch(ARGS)
+    set_times(cache.get_path(ARGS), time.time() - 61)
+
+    assert cache.fetch(ARGS).read() == b'body'
+    assert mock_exec.call_count == 2
+
+
+@patch('pypyraws.aws.service.operation_exec',
+       side_effect=get_client_error(status=None))
+def test_fetch_not_modified_without_entry_raises(mock_exec, tmp_path):
+    """304 with nothing cached raises."""
+    with pytest.raises(ClientError):
+        s3cache.S3Cache(tmp_path).fetch(ARGS)
+
+
+@patch('pypyraws.aws.service.operation_exec')
+def test_fetch_other_error_raises(mock_exec, tmp_path):
+    """Errors other than 304 raise even with a cached entry."""
+    mock_exec.side_effect = [get_response(b'body'),
+                             get_client_error('AccessDenied', 403)]
+    cache = s3cache.S3Cache(tmp_path)
+    cache.fetch(ARGS)
+
+    with pytest.raises(ClientError) as err:
+        cache.fetch(ARGS)
+
+    assert err.value.response['Error']['Code'] == 'AccessDenied'
+
+
+@patch('pypyraws.aws.service.operation_exec',
+       return_value=get_response(b'body', etag=None))
+def test_fetch_no_etag_doesnt_cache(mock_exec, tmp_path):
+    """Response without ETag doesn't cache."""
+    assert s3cache.S3Cache(tmp_path).fetch(ARGS).read() == b'body'
+    assert os.listdir(tmp_path) == []
+
+
+@patch('pypyraws.aws.service.operation_exec')
+def test_fetch_corrupt_entry_downloads(mock_exec, tmp_path):
+    """Corrupt cache file counts as a miss."""
+    mock_exec.return_value = get_response(b'body')
+    cache = s3cache.S3Cache(tmp_path)
+    path = cache.get_path(ARGS)
+    with open(path, 'wb') as file:
+        file.write(b'not json\nbody')
+
+    assert cache.fetch(ARGS).read() == b'body'
+
+    assert 'IfNoneMatch' not in mock_exec.call_args.kwargs['operation_args']
+    assert s3cache.read_entry(path)[:2] == ('"e1"', b'body')
+
+
+@patch('boto3.client')
+def test_fetch_s3_client_not_modified(mock_boto, tmp_path):
+    """Real s3 client against a stubbed 304."""
+    import boto3
+    from botocore.response import StreamingBody
+    from botocore.stub import Stubber
+
+    s3 = boto3.session.Session().client('s3',
+                                        region_name='us-east-1',
+                                        aws_access_key_id='a',
+                                        aws_secret_access_key='b')
+    mock_boto.return_value = s3
+    cache = s3cache.S3Cache(tmp_path)
+
+    with Stubber(s3) as stubber:
+        stubber.add_response('get_object',
+                             {'Body': StreamingBody(io.BytesIO(b'body'), 4),
+                              'ETag': '"e1"'},
+                             ARGS)
+        stubber.add_client_error('get_object',
+                                 service_error_code='304',
+                                 http_status_code=304,
+                                 expected_params={**ARGS,
+                                                  'IfNoneMatch': '"e1"'})
+
+        assert cache.fetch(ARGS).read() == b'body'
+        assert cache.fetch(ARGS).read() == b'body'
+        stubber.assert_no_pending_responses()
+
+# ---------------------------- fetch ----------------------------------------#
+
+# ---------------------------- write_entry ----------------------------------#
+
+
+def test_write_entry_creates_dir(tmp_path):
+    """Cache dir creates on first write."""
+    cache = s3cache.S3Cache(tmp_path / 'a' / 'b')
+    path = cache.get_path(ARGS)
+
+    cache.write_entry(path, '"e1"', b'line1\nline2')
+
+    assert s3cache.read_entry(path)[:2] == ('"e1"', b'line1\nline2')
+
+
+def test_write_entry_error_removes_temp(tmp_path):
+    """Failed write leaves no temporary file or entry behind."""
+    cache = s3cache.S3Cache(tmp_path)
+
+    with patch('os.replace', side_effect=OSError('arb')):
+        with pytest.raises(OSError):
+            cache.write_entry(cache.get_path(ARGS), '"e1"', b'body')
+
+    assert os.listdir(tmp_path) == []
+
+# ---------------------------- write_entry ----------------------------------#
+
+# ---------------------------- evict ----------------------------------------#
+
+
+def test_evict_least_recently_used(tmp_path):
+    """Evicts oldest atime first until within max_size, ignores temp files."""
+    cache = s3cache.S3Cache(tmp_path, max_size=20)
+    paths = [cache.get_path({'Key': str(i)}) for i in range(3)]
+    for path in paths:
+        cache.write_entry(path, 'e', b'1234')
+    # each entry is 18 bytes with its header, so only 0 fits.
+    set_times(paths[0], 1, used=300)
+    set_times(paths[1], 1, used=100)
+    set_times(paths[2], 1, used=200)
+    (tmp_path / '.tmparb').write_bytes(b'x' * 100)
+
+    cache.evict()
+
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        ['.tmparb', os.path.basename(paths[0])])
+
+
+def test_evict_stale_temp_files(tmp_path):
+    """Removes temp files older than TEMP_MAX_AGE, keeps younger ones."""
+    cache = s3cache.S3Cache(tmp_path)
+    cache.write_entry(cache.get_path(ARGS), 'e', b'body')
+    stale = tmp_path / '.tmpstale'
+    stale.write_bytes(b'half')
+    old = time.time() - s3cache.TEMP_MAX_AGE - 10
+    set_times(stale, old)
+    (tmp_path / '.tmpwriting').write_bytes(b'half')
+    (tmp_path / 'other').write_bytes(b'x')
+    set_times(tmp_path / 'other', old)
+
+    cache.evict()
+
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        ['.tmpwriting', 'other', os.path.basename(cache.get_path(ARGS))])
+
+
+def test_evict_files_gone(tmp_path):
+    """Files other processes removed mid-evict don't raise."""
+    class GoneEntry():
+        name = 'gone.s3'
+        path = str(tmp_path / 'gone.s3')
+
+        def stat(self):
+            raise FileNotFoundError()
+
+    cache = s3cache.S3Cache(tmp_path, max_size=0)
+    cache.write_entry(cache.get_path(ARGS), 'e', b'body')
+    (tmp_path / '.tmpstale').write_bytes(b'half')
+    set_times(tmp_path / '.tmpstale', 1)
+    entries = list(os.scandir(tmp_path)) + [GoneEntry()]
+
+    with patch('os.scandir') as mock_scandir:
+        mock_scandir.return_value.__enter__.return_value = entries
+        with patch('os.unlink', side_effect=FileNotFoundError()):
+            cache.evict()
+
+# ---------------------------- evict ----------------------------------------#
+
+# ---------------------------- helpers --------------------------------------#
+
+
+def test_read_entry_missing(tmp_path):
+    """Missing file is None."""
+    assert s3cache.read_entry(str(tmp_path / 'arb.s3')) is None
+
+
+def test_touch_missing(tmp_path):
+    """Touching an evicted file doesn't raise."""
+    s3cache.touch(str(tmp_path / 'arb.s3'), 1)
+
+
+def test_is_not_modified():
+    """304 by error code or http status."""
+    assert s3cache.is_not_modified(get_client_error('304', None))
+    assert s3cache.is_not_modified(get_client_error('arb', 304))
+    assert not s3cache.is_not_modified(get_client_error('arb', 200))
+    assert not s3cache.is_not_modified(ClientError({}, 'GetObject'))
+
+# ---------------------------- helpers --------------------------------------#
@@ -0,0 +1,321 @@
+"""scheduler.py unit tests."""
+import logging
+import threading
+from unittest.mock import patch
+import pypyraws.aws.scheduler as scheduler_module
+from pypyraws.poll import Backoff
+import pytest
+
+NO_DELAY = Backoff(initial_delay=0, multiplier=1)
+ONE_ATTEMPT = {'total_max_attempts': 1}
+
+
+@pytest.fixture
+def scheduler():
+    """Get a fresh scheduler and shut it down after the test."""
+    scheduler = scheduler_module.PollScheduler(max_workers=2,
+                                               coalesce_window=0.5)
+    yield scheduler
+    scheduler.shutdown()
+
+
+def get_call(name='arb', **kwargs):
+    """Get scheduler call for method name."""
+    return {'service_name': 'svc',
+            'method_name': name,
+            'client_args': None,
+            'operation_args': {'k': 'v'},
+            'session': None,
+            **kwargs}
+
+
+def is_done(response):
+    """Check fake response."""
+    return response['status'] == 'done'
+
+# ---------------------------- PollScheduler --------------------------------#
+
+
+@patch('pypyraws.aws.service.operation_exec')
+def test_scheduler_polls_until_check(mock_exec, scheduler):
+    """Polls with the call until check returns True."""
+    mock_exec.side_effect = [{'status': 'x'},
+                             {'status': 'x'},
+                             {'status': 'done'}]
+
+    future = scheduler.submit(get_call(), is_done, NO_DELAY, max_attempts=5)
+
+    assert future.result(timeout=5) is True
+    assert mock_exec.call_count == 3
+    mock_exec.assert_called_with(service_name='svc',
+                                 method_name='arb',
+                                 client_args=None,
+                                 operation_args={'k': 'v'},
+                                 session=None)
+
+
+@patch('pypyraws.aws.service.operation_exec',
+       return_value={'status': 'x'})
+def test_scheduler_max_attempts(mock_exec, scheduler):
+    """Out of attempts resolves False."""
+    future = scheduler.submit(get_call(), is_done, NO_DELAY, max_attempts=3)
+
+    assert future.result(timeout=5) is False
+    assert mock_exec.call_count == 3
+
+
+@patch('pypyraws.aws.service.operation_exec',
+       return_value={'status': 'x'})
+def test_scheduler_timeout(mock_exec, scheduler):
+    """Out of time resolves False."""
+    future = scheduler.submit(get_call(),
+                              is_done,
+                              Backoff(initial_delay=0.01, multiplier=1),
+                              timeout=0.05)
+
+    assert future.result(timeout=5) is False
+    assert mock_exec.call_count >= 2
+
+
+@patch('pypyraws.aws.service.operation_exec')
+def test_scheduler_timeout_caps_each_call(mock_exec):
+    """Each call's timeouts cap at the time left when it runs."""
+    now = [0]
+    durations = [55, 40, 0]
+
+    def operation_exec(**kwargs):
+        now[0] += durations.pop(0)
+        return {'status': 'done' if not durations else 'x'}
+
+    mock_exec.side_effect = operation_exec
+    scheduler = scheduler_module.PollScheduler(clock=lambda: now[0])
+    try:
+        future = scheduler.submit(get_call(), is_done, NO_DELAY, timeout=100)
+
+        assert future.result(timeout=5) is True
+    finally:
+        scheduler.shutdown()
+
+    assert [c.kwargs['client_args']['config']
+            for c in mock_exec.call_args_list] == [
+        {'connect_timeout': 60, 'read_timeout': 60, 'retries': ONE_ATTEMPT},
+        {'connect_timeout': 30, 'read_timeout': 30, 'retries': ONE_ATTEMPT},
+        {'connect_timeout': 5, 'read_timeout': 5, 'retries': ONE_ATTEMPT}]
+    assert mock_exec.call_args.kwargs['operation_args'] == {'k': 'v'}
+
+
+@patch('pypyraws.aws.service.operation_exec')
+def test_scheduler_timed_out_call_is_failed_attempt(mock_exec, scheduler):
+    """Call timing out is an unsuccessful poll for a job with timeout."""
+    from botocore.exceptions import ReadTimeoutError
+
+    mock_exec.side_effect = [ReadTimeoutError(endpoint_url='https://arb'),
+                             {'status': 'done'}]
+
+    logger = logging.getLogger('pypyraws.aws.scheduler')
+    with patch.object(logger, 'warning') as mock_logger_warning:
+        future = scheduler.submit(get_call(), is_done, NO_DELAY, timeout=60)
+        assert future.result(timeout=5) is True
+
+    assert mock_exec.call_count == 2
+    mock_logger_warning.assert_called_once_with(
+        'aws svc arb timed out: Read timeout on endpoint URL: "https://arb"')
+
+
+@patch('pypyraws.aws.service.operation_exec')
+def test_scheduler_timed_out_out_of_attempts(mock_exec, scheduler):
+    """Calls that keep timing out run out of attempts."""
+    from botocore.exceptions import ConnectTimeoutError
+
+    mock_exec.side_effect = ConnectTimeoutError(endpoint_url='https://arb')
+
+    future = scheduler.submit(get_call(), is_done, NO_DELAY,
+                              max_attempts=2, timeout=60)
+
+    assert future.result(timeout=5) is False
+    assert mock_exec.call_count == 2
+
+
+@patch('pypyraws.aws.service.operation_exec')
+def test_scheduler_timed_out_coalesced(mock_exec, scheduler):
+    """Shared call caps at the least time left and only errors without timeout.
+
+    The job without timeout gets the timeout error, the job with timeout
+    tries again.
+    """
+    from botocore.exceptions import ReadTimeoutError
+
+    mock_exec.side_effect = [ReadTimeoutError(endpoint_url='https://arb'),
+                             {'status': 'done'}]
+    futures = [scheduler.submit(get_call(), is_done, NO_DELAY,
+                                timeout=10, start=False),
+               scheduler.submit(get_call(), is_done, NO_DELAY,
+                                max_attempts=5, start=False)]
+    scheduler.start()
+
+    assert futures[0].result(timeout=5) is True
+    with pytest.raises(ReadTimeoutError):
+        futures[1].result(timeout=5)
+    assert mock_exec.call_args_list[0].kwargs['client_args'] == {
+        'config': {'connect_timeout': 5,
+                   'read_timeout': 5,
+                   'retries': ONE_ATTEMPT}}
+
+
+@patch('pypyraws.aws.service.operation_exec',
+       return_value={'status': 'done'})
+def test_scheduler_coalesces_identical_calls(mock_exec, scheduler):
+    """Identical calls due together share one call, different calls don't."""
+    futures = [scheduler.submit(get_call(), is_done, NO_DELAY,
+                                max_attempts=1, start=False),
+               scheduler.submit(get_call(), is_done, NO_DELAY,
+                                max_attempts=1, start=False),
+               scheduler.submit(get_call('other'), is_done, NO_DELAY,
+                                max_attempts=1, start=False)]
+    scheduler.start()
+
+    assert [future.result(timeout=5) for future in futures] == [True,
+                                                                True,
+                                                                True]
+    assert sorted(c.kwargs['method_name']
+                  for c in mock_exec.call_args_list) == ['arb', 'other']
+
+
+@patch('pypyraws.aws.service.operation_exec',
+       return_value={'status': 'done'})
+def test_scheduler_unhashable_args_dont_coalesce(mock_exec, scheduler):
+    """Unhashable call args get their own call."""
+    class Unhashable():
+        __hash__ = None
+
+    call = get_call(client_args={'config': Unhashable()})
+    futures = [scheduler.submit(call, is_done, NO_DELAY,
+                                max_attempts=1, start=False)
+               for _ in range(2)]
+    scheduler.start()
+
+    assert [future.result(timeout=5) for future in futures] == [True, True]
+    assert mock_exec.call_count == 2
+
+
+@patch('pypyraws.aws.service.operation_exec',
+       side_effect=ValueError('arb'))
+def test_scheduler_call_error(mock_exec, scheduler):
+    """Call error raises from every coalesced future."""
+    futures = [scheduler.submit(get_call(), is_done, NO_DELAY,
+                                max_attempts=1, start=False)
+               for _ in range(2)]
+    scheduler.start()
+
+    for future in futures:
+        with pytest.raises(ValueError) as err:
+            future.result(timeout=5)
+        assert str(err.value) == 'arb'
+
+    mock_exec.assert_called_once()
+
+
+@patch('pypyraws.aws.service.operation_exec',
+       return_value={'status': 'x'})
+def test_scheduler_check_error(mock_exec, scheduler):
+    """Check error raises from only that job's future."""
+    def bad_check(response):
+        raise KeyError('arb')
+
+    futures = [scheduler.submit(get_call(), bad_check, NO_DELAY,
+                                max_attempts=1, start=False),
+               scheduler.submit(get_call(), is_done, NO_DELAY,
+                                max_attempts=1, start=False)]
+    scheduler.start()
+
+    with pytest.raises(KeyError):
+        futures[0].result(timeout=5)
+    assert futures[1].result(timeout=5) is False
+
+
+def test_scheduler_needs_limit(scheduler):
+    """Neither max_attempts nor timeout raises."""
+    with pytest.raises(ValueError) as err:
+        scheduler.submit(get_call(), is_done, NO_DELAY)
+
+    assert str(err.value) == ("set max_attempts or timeout, else polling "
+                              "never stops.")
+
+
+@patch('pypyraws.aws.service.operation_exec')
+def test_scheduler_shutdown(mock_exec):
+    """Shutdown resolves pending waits False and refuses new ones."""
+    polled = threading.Event()
+
+    def operation_exec(**kwargs):
+        polled.set()
+        return {'status': 'x'}
+
+    mock_exec.side_effect = operation_exec
+    scheduler = scheduler_module.PollScheduler()
+    future = scheduler.submit(get_call(),
+                              is_done,
+                              Backoff(initial_delay=600),
+                              max_attempts=5)
+    assert polled.wait(5)
+
+    scheduler.shutdown()
+
+    assert future.result(timeout=5) is False
+    with pytest.raises(RuntimeError) as err:
+        scheduler.submit(get_call(), is_done, NO_DELAY, max_attempts=1)
+    assert str(err.value) == 'poll scheduler is shut down.'
+
+
+def test_scheduler_shutdown_not_started():
+    """Shutdown before start resolves queued waits False."""
+    scheduler = scheduler_module.PollScheduler()
+    future = scheduler.submit(get_call(), is_done, NO_DELAY,
+                              max_attempts=1, start=False)
+
+    scheduler.shutdown()
+
+    assert future.result(timeout=5) is False
+
+
+@patch('pypyraws.aws.service.operation_exec')
+def test_scheduler_shutdown_during_poll(mock_exec):
+    """Job polled during shutdown resolves False instead of rescheduling."""
+    scheduler = scheduler_module.PollScheduler()
+    polling = threading.Event()
+    release = threading.Event()
+
+    def operation_exec(**kwargs):
+        polling.set()
+        release.wait(5)
+        return {'status': 'x'}
+
+    mock_exec.side_effect = operation_exec
+    future = scheduler.submit(get_call(), is_done, NO_DELAY, max_attempts=5)
+    assert polling.wait(5)
+
+    stopper = threading.Thread(target=scheduler.shutdown)
+    stopper.start()
+    while not scheduler._shutdown:
+        pass
+    release.set()
+    stopper.join(5)
+
+    assert future.result(timeout=5) is False
+    mock_exec.assert_called_once()
+
+# ---------------------------- PollScheduler --------------------------------#
+
+# ---------------------------- get_scheduler --------------------------------#
+
+
+def test_get_scheduler_shared():
+    """Same scheduler for the whole process."""
+    with patch.object(scheduler_module, '_scheduler', None):
+        scheduler = scheduler_module.get_scheduler()
+
+        assert scheduler_module.get_scheduler() is scheduler
+        assert scheduler.max_workers == 10
+        assert scheduler.coalesce_window == 0.5
+
+# ---------------------------- get_scheduler --------------------------------#
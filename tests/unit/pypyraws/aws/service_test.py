@@ -1,8 +1,11 @@
 """service.py unit tests."""
+import threading
+import time
 from unittest.mock import patch
 import pypyraws.aws.service as paws
+from pypyraws.cache import CacheInfo
 import pytest
-from unittest.mock import MagicMock, Mock
+from unittest.mock import call, MagicMock, Mock
 
 
 # ---------------------------- operation_exec --------------------------------#
@@ -53,8 +56,505 @@ def test_op_exec_method_doesnt_exist(mock_boto):
 
     assert str(err_info.value) == "Mock object has no attribute 'arbmethod'"
 
+
+@patch('boto3.client')
+def test_op_exec_reuses_cached_client(mock_boto):
+    """Operation exec creates the client only once for same args."""
+    mock_boto.return_value.arbmethod.return_value = {'k': 'v'}
+
+    for _ in range(3):
+        paws.operation_exec(service_name='test svc',
+                            method_name='arbmethod',
+                            client_args={'ck1': 'cv1', 'ck2': ['a', 'b']},
+                            operation_args={'k1': 'v1'})
+
+    mock_boto.assert_called_once_with('test svc', ck1='cv1', ck2=['a', 'b'])
+    assert mock_boto.return_value.arbmethod.call_count == 3
+    assert paws.client_cache_info() == CacheInfo(hits=2,
+                                                 misses=1,
+                                                 maxsize=64,
+                                                 currsize=1)
+
 # ---------------------------- operation_exec --------------------------------#
 
+# ---------------------------- operation_exec_many ---------------------------#
+
+
+@patch('boto3.client')
+def test_op_exec_many_preserves_order(mock_boto):
+    """Results come back in input order with one shared client."""
+    def arbmethod(delay, value):
+        time.sleep(delay)
+        return {'v': value}
+
+    mock_boto.return_value.arbmethod.side_effect = arbmethod
+
+    calls = [{'service_name': 'svc',
+              'method_name': 'arbmethod',
+              'operation_args': {'delay': 0.05 - (i * 0.01), 'value': i}}
+             for i in range(5)]
+
+    results = paws.operation_exec_many(calls, max_workers=5)
+
+    assert results == [paws.CallResult(response={'v': i}, error=None)
+                       for i in range(5)]
+    mock_boto.assert_called_once_with('svc')
+
+
+def test_op_exec_many_bounded_concurrency():
+    """No more than max_workers calls run at the same time."""
+    lock = threading.Lock()
+    running = 0
+    max_running = 0
+
+    def op_exec(**kwargs):
+        nonlocal running, max_running
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+        time.sleep(0.01)
+        with lock:
+            running -= 1
+
+    with patch('pypyraws.aws.service.operation_exec', side_effect=op_exec):
+        results = paws.operation_exec_many([{}] * 20, max_workers=3)
+
+    assert len(results) == 20
+    assert max_running <= 3
+
+
+@patch('pypyraws.aws.service.operation_exec')
+def test_op_exec_many_errors_per_call(mock_exec):
+    """Errors are reported per call without aborting the batch."""
+    err = ValueError('arb')
+    mock_exec.side_effect = [{'r': 1}, err, {'r': 3}]
+
+    results = paws.operation_exec_many([{'a': 1}, {'a': 2}, {'a': 3}],
+                                       max_workers=1,
+                                       session='arb session')
+
+    assert results == [paws.CallResult({'r': 1}, None),
+                       paws.CallResult(None, err),
+                       paws.CallResult({'r': 3}, None)]
+    assert mock_exec.mock_calls == [call(session='arb session', a=1),
+                                    call(session='arb session', a=2),
+                                    call(session='arb session', a=3)]
+
+
+def test_op_exec_many_fail_fast():
+    """Fail fast raises first error and doesn't start remaining calls."""
+    started = []
+
+    def op_exec(i, session):
+        started.append(i)
+        if i == 1:
+            raise ValueError('arb')
+        if i == 2:
+            # if 2 already started, it's still running when the error
+            # arrives, so 3 never starts.
+            time.sleep(0.1)
+        return {'r': i}
+
+    with patch('pypyraws.aws.service.operation_exec', side_effect=op_exec):
+        with pytest.raises(ValueError) as err_info:
+            paws.operation_exec_many([{'i': i} for i in range(4)],
+                                     max_workers=1,
+                                     fail_fast=True)
+
+    assert str(err_info.value) == 'arb'
+    assert started[:2] == [0, 1]
+    assert 3 not in started
+
+
+@patch('pypyraws.aws.service.operation_exec', return_value={'r': 1})
+def test_op_exec_many_fail_fast_no_errors(mock_exec):
+    """Fail fast with no errors returns all results."""
+    results = paws.operation_exec_many([{}] * 3, fail_fast=True)
+
+    assert results == [paws.CallResult({'r': 1}, None)] * 3
+
+
+@patch('pypyraws.aws.service.operation_exec')
+def test_op_exec_many_empty(mock_exec):
+    """No calls return empty list."""
+    assert paws.operation_exec_many([]) == []
+    mock_exec.assert_not_called()
+
+# ---------------------------- operation_exec_many ---------------------------#
+
+# ---------------------------- get_client --------------------------------#
+
+
+@patch('boto3.client', side_effect=[Mock(), Mock(), Mock()])
+def test_get_client_keyed_on_service_and_args(mock_boto):
+    """Different service or args get different clients."""
+    c1 = paws.get_client('svc1', {'region_name': 'r1'})
+    c2 = paws.get_client('svc2', {'region_name': 'r1'})
+    c3 = paws.get_client('svc1', {'region_name': 'r2'})
+
+    assert len({id(c1), id(c2), id(c3)}) == 3
+    assert paws.get_client('svc1', {'region_name': 'r1'}) is c1
+    assert mock_boto.call_count == 3
+
+
+@patch('boto3.client', side_effect=[Mock(), Mock()])
+def test_get_client_canonical_args(mock_boto):
+    """Equivalent clientArgs in different key order get the same client."""
+    c1 = paws.get_client('svc', {'a': 1,
+                                 'b': {'y': 2, 'x': 1},
+                                 'c': {1, 2},
+                                 'd': (1, 2)})
+    c2 = paws.get_client('svc', {'d': (1, 2),
+                                 'c': {2, 1},
+                                 'b': {'x': 1, 'y': 2},
+                                 'a': 1})
+
+    assert c1 is c2
+    mock_boto.assert_called_once()
+
+
+@patch('boto3.client', side_effect=[Mock(), Mock()])
+def test_get_client_unhashable_args_not_cached(mock_boto):
+    """Unhashable clientArgs values bypass the cache."""
+    class Unhashable():
+        __hash__ = None
+
+    arb = Unhashable()
+    c1 = paws.get_client('svc', {'config': arb})
+    c2 = paws.get_client('svc', {'config': arb})
+
+    assert c1 is not c2
+    assert mock_boto.call_count == 2
+    assert paws.client_cache_info().currsize == 0
+
+
+@patch('boto3.client', side_effect=[Mock(), Mock()])
+def test_clear_client_cache(mock_boto):
+    """Clearing the cache creates a new client on next use."""
+    c1 = paws.get_client('svc')
+    paws.clear_client_cache()
+    assert paws.client_cache_info() == CacheInfo(hits=0,
+                                                 misses=0,
+                                                 maxsize=64,
+                                                 currsize=0)
+    c2 = paws.get_client('svc')
+
+    assert c1 is not c2
+    assert mock_boto.call_count == 2
+
+
+def test_get_client_from_session():
+    """Client comes from session, cached per session."""
+    session1 = Mock()
+    session2 = Mock()
+    session1.client.side_effect = [Mock()]
+    session2.client.side_effect = [Mock(), Mock()]
+
+    c1 = paws.get_client('svc', session=session1)
+    c2 = paws.get_client('svc', session=session2)
+    c3 = paws.get_client('svc', {'region_name': 'r1'}, session=session2)
+
+    assert paws.get_client('svc', session=session1) is c1
+    assert len({id(c1), id(c2), id(c3)}) == 3
+    session1.client.assert_called_once_with('svc')
+    assert session2.client.mock_calls[1] == call('svc', region_name='r1')
+
+
+@patch('boto3.client', side_effect=[Mock(), Mock()])
+def test_get_client_dict_config(mock_boto):
+    """Dict config becomes botocore Config, and the client stays cached."""
+    from botocore.config import Config
+
+    client_args = {'region_name': 'r', 'config': {'read_timeout': 5}}
+    c1 = paws.get_client('svc', client_args)
+
+    assert paws.get_client('svc', {'config': {'read_timeout': 5},
+                                   'region_name': 'r'}) is c1
+    mock_boto.assert_called_once()
+    config = mock_boto.call_args.kwargs['config']
+    assert isinstance(config, Config)
+    assert config.read_timeout == 5
+    assert mock_boto.call_args.kwargs['region_name'] == 'r'
+    assert client_args == {'region_name': 'r', 'config': {'read_timeout': 5}}
+
+# ---------------------------- get_client --------------------------------#
+
+# ---------------------------- cap_timeouts --------------------------------#
+
+
+def test_cap_timeouts_rounds_down_to_step():
+    """Seconds round down to the nearest step."""
+    assert paws.cap_timeouts(None, 45.5) == {
+        'config': {'connect_timeout': 30,
+                   'read_timeout': 30,
+                   'retries': {'total_max_attempts': 1}}}
+    assert paws.cap_timeouts({}, 600) == {
+        'config': {'connect_timeout': 60,
+                   'read_timeout': 60,
+                   'retries': {'total_max_attempts': 5}}}
+    assert paws.cap_timeouts({}, 5) == {
+        'config': {'connect_timeout': 5,
+                   'read_timeout': 5,
+                   'retries': {'total_max_attempts': 1}}}
+
+
+def test_cap_timeouts_minimum():
+    """Less than the smallest step is the smallest step."""
+    assert paws.cap_timeouts({}, 0) == {
+        'config': {'connect_timeout': 1,
+                   'read_timeout': 1,
+                   'retries': {'total_max_attempts': 1}}}
+
+
+def test_cap_timeouts_keeps_lower_and_other_args():
+    """Lower timeouts and other args stay, input doesn't change."""
+    client_args = {'region_name': 'r',
+                   'config': {'connect_timeout': 2,
+                              'retries': {'mode': 'standard'}}}
+
+    assert paws.cap_timeouts(client_args, 12) == {
+        'region_name': 'r',
+        'config': {'connect_timeout': 2,
+                   'read_timeout': 10,
+                   'retries': {'mode': 'standard',
+                               'total_max_attempts': 1}}}
+    assert client_args == {'region_name': 'r',
+                           'config': {'connect_timeout': 2,
+                                      'retries': {'mode': 'standard'}}}
+
+
+def test_cap_timeouts_config_object():
+    """Config object merges capped timeouts."""
+    from botocore.config import Config
+
+    config = Config(connect_timeout=3, read_timeout=100, region_name='r')
+
+    capped = paws.cap_timeouts({'config': config}, 20)['config']
+
+    assert isinstance(capped, Config)
+    assert capped.connect_timeout == 3
+    assert capped.read_timeout == 20
+    assert capped.retries == {'total_max_attempts': 1}
+    assert capped.region_name == 'r'
+    assert config.read_timeout == 100
+
+
+def get_low_timeout_session():
+    """Get AwsSession with lower timeouts than any cap."""
+    from pypyraws.aws.session import AwsSession
+
+    return AwsSession(session_args={'region_name': 'us-east-1',
+                                    'aws_access_key_id': 'a',
+                                    'aws_secret_access_key': 'b'},
+                      config={'connect_timeout': 2, 'read_timeout': 3})
+
+
+def test_cap_timeouts_keeps_lower_session_timeouts():
+    """Session config timeouts below the cap stay."""
+    session = get_low_timeout_session()
+
+    assert paws.cap_timeouts(None, 300, session) == {
+        'config': {'connect_timeout': 2,
+                   'read_timeout': 3,
+                   'retries': {'total_max_attempts': 5}}}
+    assert paws.cap_timeouts({'config': {'read_timeout': 10}},
+                             300,
+                             session) == {
+        'config': {'connect_timeout': 2,
+                   'read_timeout': 10,
+                   'retries': {'total_max_attempts': 5}}}
+    assert paws.cap_timeouts({}, 1, session) == {
+        'config': {'connect_timeout': 1,
+                   'read_timeout': 1,
+                   'retries': {'total_max_attempts': 1}}}
+
+
+def test_cap_timeouts_config_object_keeps_lower_session_timeouts():
+    """Config object caps against session config merged with it."""
+    from botocore.config import Config
+
+    capped = paws.cap_timeouts({'config': Config(read_timeout=10)},
+                               300,
+                               get_low_timeout_session())['config']
+
+    assert capped.connect_timeout == 2
+    assert capped.read_timeout == 10
+
+
+def test_cap_timeouts_session_client_timeouts():
+    """Client from a low timeout session keeps its timeouts when capped."""
+    session = get_low_timeout_session()
+
+    client = paws.get_client('ecs',
+                             paws.cap_timeouts(None, 300, session),
+                             session=session)
+
+    assert client.meta.config.connect_timeout == 2
+    assert client.meta.config.read_timeout == 3
+    assert client.meta.config.retries['total_max_attempts'] == 5
+
+
+def test_cap_timeouts_retries_fit_in_seconds():
+    """Attempts are as many as fit in seconds, at least one."""
+    def get_attempts(seconds):
+        return paws.cap_timeouts(None, seconds)['config']['retries'][
+            'total_max_attempts']
+
+    assert get_attempts(0.5) == 1
+    assert get_attempts(4) == 2
+    assert get_attempts(59) == 1
+    assert get_attempts(130) == 2
+
+
+def test_cap_timeouts_keeps_lower_retries():
+    """Fewer attempts in client args, session or retry mode stay."""
+    from botocore.config import Config
+    from pypyraws.aws.session import AwsSession
+
+    assert paws.cap_timeouts(
+        {'config': {'retries': {'total_max_attempts': 2}}},
+        300)['config']['retries'] == {'total_max_attempts': 2}
+    assert paws.cap_timeouts(
+        {'config': {'retries': {'max_attempts': 0}}},
+        300)['config']['retries'] == {'max_attempts': 0,
+                                      'total_max_attempts': 1}
+    assert paws.cap_timeouts(
+        {'config': {'retries': {'max_attempts': 9}}},
+        600)['config']['retries'] == {'max_attempts': 9,
+                                      'total_max_attempts': 10}
+    assert paws.cap_timeouts(
+        {'config': {'retries': {'mode': 'adaptive'}}},
+        600)['config']['retries'] == {'mode': 'adaptive',
+                                      'total_max_attempts': 3}
+
+    session = AwsSession(config={'retries': {'mode': 'standard',
+                                             'total_max_attempts': 2}})
+    assert paws.cap_timeouts(None, 300, session)['config']['retries'] == {
+        'mode': 'standard', 'total_max_attempts': 2}
+    assert paws.cap_timeouts({'config': Config(read_timeout=10)},
+                             300,
+                             session)['config'].retries == {
+        'mode': 'standard', 'total_max_attempts': 2}
+
+# ---------------------------- cap_timeouts --------------------------------#
+
+# ---------------------------- paginate --------------------------------#
+
+
+@patch('boto3.client')
+def test_paginate_no_args(mock_boto):
+    """Paginate with no operation args or pagination config."""
+    mock_paginator = mock_boto.return_value.get_paginator
+
+    page_iterator = paws.paginate(service_name='test svc',
+                                  method_name='arbmethod')
+
+    mock_boto.assert_called_once_with('test svc')
+    mock_paginator.assert_called_once_with('arbmethod')
+    mock_paginator.return_value.paginate.assert_called_once_with()
+    assert page_iterator is mock_paginator.return_value.paginate.return_value
+
+
+@patch('boto3.client')
+def test_paginate_all_args(mock_boto):
+    """Paginate adds PaginationConfig to operation args."""
+    mock_paginator = mock_boto.return_value.get_paginator
+    operation_args = {'k1': 'v1'}
+
+    paws.paginate(service_name='test svc',
+                  method_name='arbmethod',
+                  client_args={'ck1': 'cv1'},
+                  operation_args=operation_args,
+                  pagination_config={'MaxItems': 10})
+
+    mock_boto.assert_called_once_with('test svc', ck1='cv1')
+    mock_paginator.return_value.paginate.assert_called_once_with(
+        k1='v1', PaginationConfig={'MaxItems': 10})
+    # input not mutated
+    assert operation_args == {'k1': 'v1'}
+
+
+# ---------------------------- PageItems --------------------------------#
+
+
+def get_stubbed_s3_pages():
+    """Get s3 page iterator over two stubbed list_objects_v2 pages."""
+    import boto3
+    from botocore.stub import Stubber
+
+    client = boto3.client('s3',
+                          region_name='us-east-1',
+                          aws_access_key_id='arb',
+                          aws_secret_access_key='arb')
+    stubber = Stubber(client)
+    stubber.add_response('list_objects_v2',
+                         {'Contents': [{'Key': 'a'}, {'Key': 'b'}],
+                          'IsTruncated': True,
+                          'NextContinuationToken': 't1'},
+                         {'Bucket': 'bucket'})
+    stubber.add_response('list_objects_v2',
+                         {'Contents': [{'Key': 'c'}],
+                          'IsTruncated': False},
+                         {'Bucket': 'bucket', 'ContinuationToken': 't1'})
+
+    with patch('pypyraws.aws.service.get_client', return_value=client):
+        page_iterator = paws.paginate(service_name='s3',
+                                      method_name='list_objects_v2',
+                                      operation_args={'Bucket': 'bucket'})
+
+    return stubber, page_iterator
+
+
+def test_page_items_default_result_key():
+    """Items come lazily from paginator's first result key."""
+    stubber, page_iterator = get_stubbed_s3_pages()
+    items = paws.PageItems(page_iterator)
+
+    assert items.result_key == 'Contents'
+    assert repr(items) == "PageItems(result_key='Contents')"
+
+    with stubber:
+        iterator = iter(items)
+        assert next(iterator) == {'Key': 'a'}
+        assert next(iterator) == {'Key': 'b'}
+        # only first page fetched so far
+        assert len(stubber._queue) == 1
+        assert list(iterator) == [{'Key': 'c'}]
+
+    stubber.assert_no_pending_responses()
+
+
+def test_page_items_reiterable():
+    """Each iteration starts from the first page again."""
+    items = paws.PageItems(Mock(result_keys=[Mock(expression='Items')]))
+    items.page_iterator.__iter__ = Mock(
+        side_effect=lambda: iter([{'Items': [1, 2]}, {'Items': [3]}]))
+
+    assert list(items) == [1, 2, 3]
+    assert list(items) == [1, 2, 3]
+
+
+def test_page_items_result_key_expression():
+    """Result key is JMESPath, missing and scalar results handled."""
+    items = paws.PageItems(Mock(), 'Reservations[].Instances[].Id')
+    items.page_iterator.__iter__ = Mock(return_value=iter([
+        {'Reservations': [{'Instances': [{'Id': 1}, {'Id': 2}]},
+                          {'Instances': [{'Id': 3}]}]},
+        {'Other': 'no reservations on this page'},
+        {'Reservations': [{'Instances': [{'Id': 4}]}]}]))
+
+    assert list(items) == [1, 2, 3, 4]
+
+
+def test_page_items_scalar_result_key():
+    """Non-list result yields the value as one item."""
+    items = paws.PageItems(Mock(), 'Count')
+    items.page_iterator.__iter__ = Mock(
+        return_value=iter([{'Count': 1}, {'Count': 2}]))
+
+    assert list(items) == [1, 2]
+# ---------------------------- PageItems --------------------------------#
+
 # ---------------------------- waiter --------------------------------#
 
 
@@ -0,0 +1,81 @@
+"""session.py unit tests."""
+from unittest.mock import patch
+from botocore.config import Config
+from pypyr.context import Context
+from pypyraws.aws.session import AwsSession, get_session
+
+# ---------------------------- AwsSession -----------------------------------#
+
+
+@patch('boto3.Session')
+def test_aws_session_defaults(mock_session):
+    """Session with no args uses boto defaults."""
+    session = AwsSession()
+
+    mock_session.assert_called_once_with()
+    assert session.boto_session is mock_session.return_value
+    assert session.config is None
+
+    client = session.client('svc', region_name='r1')
+
+    assert client is mock_session.return_value.client.return_value
+    mock_session.return_value.client.assert_called_once_with(
+        'svc', region_name='r1')
+
+
+@patch('boto3.Session')
+def test_aws_session_with_args(mock_session):
+    """Session passes session args and builds Config from dict."""
+    session = AwsSession(session_args={'profile_name': 'p1',
+                                       'region_name': 'r1'},
+                         config={'max_pool_connections': 50,
+                                 'retries': {'mode': 'standard'}})
+
+    mock_session.assert_called_once_with(profile_name='p1', region_name='r1')
+    assert isinstance(session.config, Config)
+    assert session.config.max_pool_connections == 50
+    assert session.config.retries == {'mode': 'standard'}
+
+    session.client('svc')
+
+    mock_session.return_value.client.assert_called_once_with(
+        'svc', config=session.config)
+
+
+@patch('boto3.Session')
+def test_aws_session_client_config_merges(mock_session):
+    """Client config merges on top of the session config."""
+    session = AwsSession(config=Config(max_pool_connections=50,
+                                       read_timeout=10))
+
+    session.client('svc', config={'read_timeout': 20})
+
+    config = mock_session.return_value.client.call_args.kwargs['config']
+    assert config.max_pool_connections == 50
+    assert config.read_timeout == 20
+
+
+@patch('boto3.Session')
+def test_aws_session_client_config_no_session_config(mock_session):
+    """Client config used as is when session has no config."""
+    session = AwsSession()
+
+    session.client('svc', config={'read_timeout': 20})
+
+    config = mock_session.return_value.client.call_args.kwargs['config']
+    assert config.read_timeout == 20
+
+# ---------------------------- AwsSession -----------------------------------#
+
+# ---------------------------- get_session ----------------------------------#
+
+
+def test_get_session():
+    """Get session from context."""
+    assert get_session(Context({'awsSessionOut': 'arb'})) == 'arb'
+
+
+def test_get_session_none():
+    """No session in context is None."""
+    assert get_session(Context({'k1': 'v1'})) is None
+# ---------------------------- get_session ----------------------------------#
@@ -0,0 +1,555 @@
+"""waiters.py unit tests."""
+import logging
+import threading
+from unittest.mock import call, MagicMock, Mock, patch
+from botocore.exceptions import WaiterError
+import pypyraws.aws.waiters as waiters
+from pypyraws.poll import Deadline
+import pytest
+
+# ---------------------------- get_waiter -----------------------------------#
+
+
+@patch('pypyraws.aws.waiters.get_client')
+def test_get_waiter_no_waiter_args(mock_get_client):
+    """Get waiter from cached client without waiter args."""
+    client, waiter = waiters.get_waiter('ecs', 'tasks_stopped')
+
+    mock_get_client.assert_called_once_with('ecs', session=None)
+    assert client is mock_get_client.return_value
+    client.get_waiter.assert_called_once_with('tasks_stopped')
+    assert waiter is client.get_waiter.return_value
+
+
+@patch('pypyraws.aws.waiters.get_client')
+def test_get_waiter_with_waiter_args(mock_get_client):
+    """Get waiter from cached session client with waiter args."""
+    client, waiter = waiters.get_waiter('ecs',
+                                        'tasks_stopped',
+                                        waiter_args={'k1': 'v1'},
+                                        session='session')
+
+    mock_get_client.assert_called_once_with('ecs', session='session')
+    client.get_waiter.assert_called_once_with('tasks_stopped', k1='v1')
+
+
+@patch('pypyraws.aws.waiters.get_client')
+def test_get_waiter_with_client_args(mock_get_client):
+    """Get waiter from client with client args."""
+    waiters.get_waiter('ecs', 'tasks_stopped', client_args={'k1': 'v1'})
+
+    mock_get_client.assert_called_once_with('ecs', {'k1': 'v1'},
+                                            session=None)
+
+# ---------------------------- get_waiter -----------------------------------#
+
+# ---------------------------- create_waiter --------------------------------#
+
+
+def get_acceptors():
+    """Get acceptors for ecs tasks stopped, failing on a stuck task."""
+    from pypyraws.aws.response import Acceptor, ResponseMatcher
+
+    return [
+        Acceptor('failure', ResponseMatcher('STUCK',
+                                            query='tasks[].lastStatus',
+                                            matcher='pathAny')),
+        Acceptor('success', ResponseMatcher('STOPPED',
+                                            query='tasks[].lastStatus',
+                                            matcher='pathAll'))]
+
+
+def test_create_waiter():
+    """Acceptors compile into a botocore waiter on the client."""
+    client, stubber = get_stubbed_ecs()
+
+    waiter = waiters.create_waiter(client,
+                                   'ecs.describe_tasks',
+                                   'describe_tasks',
+                                   get_acceptors(),
+                                   delay=0,
+                                   max_attempts=3)
+
+    assert waiter.name == 'ecs.describe_tasks'
+    assert waiter.config.operation == 'DescribeTasks'
+    assert waiter.config.delay == 0
+    assert waiter.config.max_attempts == 3
+    assert [(a.state, a.matcher, a.argument, a.expected)
+            for a in waiter.config.acceptors] == [
+        ('failure', 'pathAny', 'tasks[].lastStatus', 'STUCK'),
+        ('success', 'pathAll', 'tasks[].lastStatus', 'STOPPED')]
+
+    stubber.add_response('describe_tasks', get_tasks_response('RUNNING'))
+    stubber.add_response('describe_tasks', get_tasks_response('STOPPED'))
+    with stubber:
+        assert waiters.wait(client, waiter, {'cluster': 'c',
+                                             'tasks': ['arn1']})
+
+    stubber.add_response('describe_tasks', get_tasks_response('STUCK'))
+    with stubber:
+        with pytest.raises(WaiterError) as err:
+            waiters.wait(client, waiter, {'tasks': ['arn1']})
+
+    assert err.value.kwargs['reason'].startswith(
+        waiters.REASON_FAILURE_STATE)
+
+
+def test_create_waiter_no_method():
+    """Method the client doesn't have raises."""
+    client, _ = get_stubbed_ecs()
+
+    with pytest.raises(ValueError) as err:
+        waiters.create_waiter(client, 'w', 'arb', get_acceptors(), 1, 1)
+
+    assert str(err.value) == 'ecs has no method arb.'
+
+# ---------------------------- create_waiter --------------------------------#
+
+# ---------------------------- cancel_after ---------------------------------#
+
+
+def test_cancel_after_timeout():
+    """Timeout sets cancel."""
+    cancel = threading.Event()
+
+    with waiters.cancel_after(0.01, cancel):
+        assert cancel.wait(5)
+
+
+def test_cancel_after_done_first():
+    """Block done before timeout doesn't set cancel."""
+    cancel = threading.Event()
+
+    with patch('threading.Timer') as mock_timer:
+        with waiters.cancel_after(60, cancel):
+            pass
+
+    mock_timer.assert_called_once_with(60, cancel.set)
+    mock_timer.return_value.cancel.assert_called_once()
+    assert not cancel.is_set()
+
+
+def test_cancel_after_no_timeout():
+    """No timeout never sets cancel."""
+    cancel = threading.Event()
+
+    with patch('threading.Timer') as mock_timer:
+        with waiters.cancel_after(None, cancel):
+            pass
+
+    mock_timer.assert_not_called()
+
+# ---------------------------- cancel_after ---------------------------------#
+
+# ---------------------------- wait -----------------------------------------#
+
+
+def get_stubbed_ecs():
+    """Get real ecs client and its stubber."""
+    import boto3
+    from botocore.stub import Stubber
+
+    client = boto3.client('ecs',
+                          region_name='us-east-1',
+                          aws_access_key_id='arb',
+                          aws_secret_access_key='arb')
+    return client, Stubber(client)
+
+
+def get_tasks_response(status):
+    """Get describe_tasks response with one task in status."""
+    return {'tasks': [{'taskArn': 'arn1', 'lastStatus': status}]}
+
+
+def test_wait_success_after_retries():
+    """Poll until success acceptor matches."""
+    client, stubber = get_stubbed_ecs()
+    expected_params = {'cluster': 'c', 'tasks': ['arn1']}
+    stubber.add_response('describe_tasks',
+                         get_tasks_response('RUNNING'),
+                         expected_params)
+    stubber.add_response('describe_tasks',
+                         get_tasks_response('STOPPED'),
+                         expected_params)
+
+    with stubber:
+        assert waiters.wait(client,
+                            client.get_waiter('tasks_stopped'),
+                            {'cluster': 'c',
+                             'tasks': ['arn1'],
+                             'WaiterConfig': {'Delay': 0}})
+
+    stubber.assert_no_pending_responses()
+
+
+def test_wait_failure_state():
+    """Failure acceptor raises WaiterError."""
+    client, stubber = get_stubbed_ecs()
+    stubber.add_response('describe_services',
+                         {'services': [],
+                          'failures': [{'arn': 'arn1', 'reason': 'MISSING'}]})
+
+    with stubber:
+        with pytest.raises(WaiterError) as err:
+            waiters.wait(client,
+                         client.get_waiter('services_stable'),
+                         {'services': ['arn1']})
+
+    assert str(err.value) == (
+        'Waiter ServicesStable failed: Waiter encountered a terminal failure '
+        'state: For expression "failures[].reason" we matched expected path: '
+        '"MISSING" at least once')
+
+
+def test_wait_unmatched_error_response():
+    """Error response no acceptor matches raises WaiterError."""
+    client, stubber = get_stubbed_ecs()
+    stubber.add_client_error('describe_tasks',
+                             service_error_code='AccessDeniedException',
+                             service_message='nope')
+
+    with stubber:
+        with pytest.raises(WaiterError) as err:
+            waiters.wait(client,
+                         client.get_waiter('tasks_stopped'),
+                         {'tasks': ['arn1']})
+
+    assert str(err.value) == ('Waiter TasksStopped failed: An error occurred '
+                              '(AccessDeniedException): nope')
+    assert err.value.last_response['Error']['Code'] == 'AccessDeniedException'
+
+
+def test_wait_max_attempts():
+    """Max attempts without any matched acceptor raises WaiterError."""
+    client, stubber = get_stubbed_ecs()
+    stubber.add_response('describe_tasks', get_tasks_response('RUNNING'))
+    stubber.add_response('describe_tasks', get_tasks_response('RUNNING'))
+
+    with stubber:
+        with patch('threading.Event.wait') as mock_sleep:
+            with pytest.raises(WaiterError) as err:
+                waiters.wait(client,
+                             client.get_waiter('tasks_stopped'),
+                             {'tasks': ['arn1'],
+                              'WaiterConfig': {'MaxAttempts': 2}})
+
+    assert str(err.value) == ('Waiter TasksStopped failed: Max attempts '
+                              'exceeded')
+    mock_sleep.assert_called_once_with(6)
+
+
+def get_mock_waiter(state):
+    """Get mock waiter that always matches acceptor with state."""
+    acceptor = Mock(state=state, explanation='arb explanation')
+    acceptor.matcher_func.return_value = True
+    waiter = Mock(config=Mock(delay=1,
+                              max_attempts=2,
+                              acceptors=[acceptor],
+                              operation='DescribeArb'))
+    waiter.name = 'ArbWaiter'
+    return waiter
+
+
+def test_wait_max_attempts_with_retry_state():
+    """Max attempts reports the last accepted state."""
+    client = MagicMock()
+    cancel = threading.Event()
+
+    with patch.object(cancel, 'wait') as mock_sleep:
+        with pytest.raises(WaiterError) as err:
+            waiters.wait(client,
+                         get_mock_waiter('retry'),
+                         {'k1': 'v1'},
+                         cancel)
+
+    assert str(err.value) == ('Waiter ArbWaiter failed: Max attempts '
+                              'exceeded. Previously accepted state: arb '
+                              'explanation')
+    assert client.describe_arb.mock_calls == [call(k1='v1'), call(k1='v1')]
+    mock_sleep.assert_called_once_with(1)
+
+
+def test_wait_cancelled_before_start():
+    """Cancelled before first poll never calls aws."""
+    client = MagicMock()
+    cancel = threading.Event()
+    cancel.set()
+
+    assert not waiters.wait(client, get_mock_waiter('retry'), None, cancel)
+
+    client.describe_arb.assert_not_called()
+
+
+def test_wait_cancelled_during_delay():
+    """Cancel interrupts the delay between polls."""
+    client = MagicMock()
+    cancel = threading.Event()
+    waiter = get_mock_waiter('retry')
+    waiter.config.delay = 60
+    client.describe_arb.side_effect = lambda: cancel.set()
+
+    assert not waiters.wait(client, waiter, None, cancel)
+
+    client.describe_arb.assert_called_once_with()
+
+
+def test_wait_get_call_client_each_poll():
+    """Each poll calls on the client get_call_client returns."""
+    client, stubber = get_stubbed_ecs()
+    stubber.add_response('describe_tasks', get_tasks_response('RUNNING'))
+    stubber.add_response('describe_tasks', get_tasks_response('STOPPED'))
+    get_call_client = Mock(return_value=client)
+
+    with stubber:
+        assert waiters.wait('unused',
+                            client.get_waiter('tasks_stopped'),
+                            {'tasks': ['arn1'],
+                             'WaiterConfig': {'Delay': 0}},
+                            get_call_client=get_call_client)
+
+    assert get_call_client.call_count == 2
+
+
+def test_wait_call_timed_out_counts_as_attempt():
+    """With get_call_client, a call that times out is a failed attempt."""
+    from botocore.exceptions import ReadTimeoutError
+
+    client = MagicMock()
+    client.describe_arb.side_effect = [
+        ReadTimeoutError(endpoint_url='url'), {'arb': 'arb'}]
+    waiter = get_mock_waiter('success')
+    waiter.config.acceptors[0].matcher_func.side_effect = bool
+    cancel = threading.Event()
+
+    with patch.object(cancel, 'wait') as mock_sleep:
+        with patch.object(logging.getLogger('pypyraws.aws.waiters'),
+                          'warning') as mock_logger_warning:
+            assert waiters.wait(client,
+                                waiter,
+                                None,
+                                cancel,
+                                lambda: client)
+
+    mock_logger_warning.assert_called_once_with(
+        'ArbWaiter describe_arb timed out: Read timeout on endpoint URL: '
+        '"url"')
+    mock_sleep.assert_called_once_with(1)
+
+
+def test_wait_call_timed_out_max_attempts():
+    """Calls that time out until max attempts raise WaiterError."""
+    from botocore.exceptions import ConnectTimeoutError
+
+    client = MagicMock()
+    client.describe_arb.side_effect = ConnectTimeoutError(endpoint_url='url')
+    waiter = get_mock_waiter('success')
+    waiter.config.acceptors[0].matcher_func.side_effect = bool
+    cancel = threading.Event()
+
+    with patch.object(cancel, 'wait'):
+        with pytest.raises(WaiterError) as err:
+            waiters.wait(client, waiter, None, cancel, lambda: client)
+
+    assert str(err.value) == ('Waiter ArbWaiter failed: Max attempts '
+                              'exceeded')
+    assert err.value.last_response == {}
+
+
+def test_wait_call_timed_out_no_get_call_client():
+    """Without get_call_client, a call that times out raises."""
+    from botocore.exceptions import ReadTimeoutError
+
+    client = MagicMock()
+    client.describe_arb.side_effect = ReadTimeoutError(endpoint_url='url')
+
+    with pytest.raises(ReadTimeoutError):
+        waiters.wait(client, get_mock_waiter('retry'))
+
+# ---------------------------- wait -----------------------------------------#
+
+# ---------------------------- is_satisfied ---------------------------------#
+
+
+@pytest.mark.parametrize('response, stopped, running', [
+    (get_tasks_response('STOPPED'), True, False),
+    (get_tasks_response('RUNNING'), False, True),
+    ({'tasks': [{'lastStatus': 'RUNNING'}, {'lastStatus': 'STOPPED'}]},
+     False, False),
+    ({'tasks': [{'lastStatus': 'RUNNING'}],
+      'failures': [{'reason': 'MISSING'}]}, False, False),
+    ({}, False, False)])
+def test_is_satisfied(response, stopped, running):
+    """Only a first matching success acceptor satisfies the waiter."""
+    client, _ = get_stubbed_ecs()
+
+    assert waiters.is_satisfied(client.get_waiter('tasks_stopped'),
+                                response) is stopped
+    # tasks_running checks for stopped or missing tasks first.
+    assert waiters.is_satisfied(client.get_waiter('tasks_running'),
+                                response) is running
+
+# ---------------------------- is_satisfied ---------------------------------#
+
+# ---------------------------- wait_many ------------------------------------#
+
+
+def get_waiter_specs(*names):
+    """Get wait_many input for waiter names."""
+    return [{'service_name': 'svc',
+             'waiter_name': name,
+             'wait_args': {'name': name}}
+            for name in names]
+
+
+def wait_by_name(client, waiter, wait_args, cancel, get_call_client=None):
+    """Fake wait with outcome depending on waiter name in wait_args."""
+    name = wait_args['name']
+    if name.startswith('fail'):
+        raise WaiterError(name=name, reason='arb', last_response={})
+    if name.startswith('slow'):
+        cancel.wait(10)
+        return not cancel.is_set()
+    return True
+
+
+@patch('pypyraws.aws.waiters.wait', side_effect=wait_by_name)
+@patch('pypyraws.aws.waiters.get_waiter', return_value=('client', 'waiter'))
+def test_wait_many_all_success(mock_get_waiter, mock_wait):
+    """All waiters succeed."""
+    results = waiters.wait_many(get_waiter_specs('ok1', 'ok2'),
+                                session='session')
+
+    assert results == [waiters.WaitResult('success', None),
+                       waiters.WaitResult('success', None)]
+    assert mock_get_waiter.mock_calls == [
+        call(service_name='svc', waiter_name='ok1', waiter_args=None,
+             session='session', client_args=None),
+        call(service_name='svc', waiter_name='ok2', waiter_args=None,
+             session='session', client_args=None)]
+
+
+@patch('pypyraws.aws.waiters.wait', side_effect=wait_by_name)
+@patch('pypyraws.aws.waiters.get_waiter', return_value=('client', 'waiter'))
+def test_wait_many_all_failure_cancels(mock_get_waiter, mock_wait):
+    """With all, the first failure cancels the other waiters."""
+    results = waiters.wait_many(get_waiter_specs('slow', 'fail'))
+
+    assert results[0] == waiters.WaitResult('cancelled', None)
+    assert results[1].state == 'failure'
+    assert isinstance(results[1].error, WaiterError)
+
+
+@patch('pypyraws.aws.waiters.wait', side_effect=wait_by_name)
+@patch('pypyraws.aws.waiters.get_waiter', return_value=('client', 'waiter'))
+def test_wait_many_any_success_cancels(mock_get_waiter, mock_wait):
+    """With any, the first success cancels the other waiters."""
+    results = waiters.wait_many(get_waiter_specs('slow', 'ok'),
+                                complete='any')
+
+    assert results == [waiters.WaitResult('cancelled', None),
+                       waiters.WaitResult('success', None)]
+
+
+@patch('pypyraws.aws.waiters.wait', side_effect=wait_by_name)
+@patch('pypyraws.aws.waiters.get_waiter', return_value=('client', 'waiter'))
+def test_wait_many_any_failures_dont_cancel(mock_get_waiter, mock_wait):
+    """With any, failures don't stop the other waiters."""
+    results = waiters.wait_many(get_waiter_specs('fail1', 'fail2'),
+                                complete='any')
+
+    assert [result.state for result in results] == ['failure', 'failure']
+    assert mock_wait.call_count == 2
+
+
+@patch('pypyraws.aws.waiters.wait', side_effect=wait_by_name)
+@patch('pypyraws.aws.waiters.get_waiter', return_value=('client', 'waiter'))
+def test_wait_many_cancelled_before_start(mock_get_waiter, mock_wait):
+    """Waiters still queued when cancelled never start."""
+    results = waiters.wait_many(get_waiter_specs('ok', 'never'),
+                                complete='any',
+                                max_workers=1)
+
+    assert results == [waiters.WaitResult('success', None),
+                       waiters.WaitResult('cancelled', None)]
+    mock_get_waiter.assert_called_once()
+
+
+def test_wait_many_empty():
+    """No waiters is a no-op."""
+    assert waiters.wait_many([]) == []
+
+
+def test_wait_many_bad_complete():
+    """Complete must be all or any."""
+    with pytest.raises(ValueError) as err:
+        waiters.wait_many(get_waiter_specs('ok'), complete='some')
+
+    assert str(err.value) == 'complete must be all or any, not some.'
+
+
+@patch('pypyraws.aws.waiters.wait', side_effect=wait_by_name)
+@patch('pypyraws.aws.waiters.get_waiter', return_value=('client', 'waiter'))
+def test_wait_many_timeout(mock_get_waiter, mock_wait):
+    """Timeout cancels waiters still running and caps each call."""
+    specs = get_waiter_specs('ok', 'slow')
+    specs[1]['client_args'] = {'region_name': 'r'}
+
+    results = waiters.wait_many(specs, timeout=0.05, session='session')
+
+    assert results == [waiters.WaitResult('success', None),
+                       waiters.WaitResult('cancelled', None)]
+    assert mock_get_waiter.mock_calls == [
+        call(service_name='svc', waiter_name='ok', waiter_args=None,
+             session='session', client_args=None),
+        call(service_name='svc', waiter_name='slow', waiter_args=None,
+             session='session', client_args={'region_name': 'r'})]
+
+    get_call_client = mock_wait.call_args_list[1].args[4]
+    with patch('pypyraws.aws.waiters.get_client') as mock_get_client:
+        assert get_call_client() is mock_get_client.return_value
+
+    mock_get_client.assert_called_once_with(
+        'svc',
+        {'region_name': 'r',
+         'config': {'connect_timeout': 1,
+                    'read_timeout': 1,
+                    'retries': {'total_max_attempts': 1}}},
+        session='session')
+
+
+@patch('pypyraws.aws.waiters.wait', side_effect=wait_by_name)
+@patch('pypyraws.aws.waiters.get_waiter', return_value=('client', 'waiter'))
+def test_wait_many_done_before_timeout(mock_get_waiter, mock_wait):
+    """Waiters that finish before the timeout stop the timer."""
+    with patch('threading.Timer') as mock_timer:
+        results = waiters.wait_many(get_waiter_specs('ok'), timeout=600)
+
+    assert results == [waiters.WaitResult('success', None)]
+    assert mock_timer.call_args.args[0] == 600
+    mock_timer.return_value.start.assert_called_once()
+    mock_timer.return_value.cancel.assert_called_once()
+    assert mock_get_waiter.call_args.kwargs['client_args'] is None
+
+
+@patch('pypyraws.aws.waiters.get_client')
+def test_get_capped_client_getter_time_left(mock_get_client):
+    """Each call caps to the time left on the deadline at that moment."""
+    now = [0]
+    deadline = Deadline(100, clock=lambda: now[0])
+    get_call_client = waiters.get_capped_client_getter('ecs',
+                                                       {'region_name': 'r'},
+                                                       deadline)
+
+    get_call_client()
+    now[0] = 95
+    get_call_client()
+
+    assert [c.args[1]['config'] for c in mock_get_client.call_args_list] == [
+        {'connect_timeout': 60,
+         'read_timeout': 60,
+         'retries': {'total_max_attempts': 1}},
+        {'connect_timeout': 5,
+         'read_timeout': 5,
+         'retries': {'total_max_attempts': 1}}]
+
+# ---------------------------- wait_many ------------------------------------#
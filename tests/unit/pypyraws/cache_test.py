@@ -0,0 +1,123 @@
+"""cache.py unit tests."""
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock
+from pypyraws.cache import CacheInfo, LruCache
+
+
+def test_lru_cache_get_or_create_miss_then_hit():
+    """Creator runs only on miss."""
+    cache = LruCache(maxsize=2)
+    creator = Mock(return_value='item')
+
+    assert cache.get_or_create('k1', creator) == 'item'
+    assert cache.get_or_create('k1', creator) == 'item'
+
+    creator.assert_called_once_with()
+    assert cache.info() == CacheInfo(hits=1, misses=1, maxsize=2, currsize=1)
+    assert len(cache) == 1
+
+
+def test_lru_cache_evicts_least_recently_used():
+    """Exceeding maxsize evicts the least recently used item."""
+    cache = LruCache(maxsize=2)
+
+    cache.get_or_create('k1', lambda: 'v1')
+    cache.get_or_create('k2', lambda: 'v2')
+    # k1 now most recently used, so k2 goes on next add
+    cache.get_or_create('k1', lambda: 'nope')
+    cache.get_or_create('k3', lambda: 'v3')
+
+    assert len(cache) == 2
+    assert cache.get_or_create('k1', lambda: 'new') == 'v1'
+    assert cache.get_or_create('k2', lambda: 'new') == 'new'
+    assert cache.info() == CacheInfo(hits=2, misses=4, maxsize=2, currsize=2)
+
+
+def test_lru_cache_clear():
+    """Clear removes items and resets counters."""
+    cache = LruCache(maxsize=2)
+    cache.get_or_create('k1', lambda: 'v1')
+    cache.get_or_create('k1', lambda: 'v1')
+
+    cache.clear()
+
+    assert cache.info() == CacheInfo(hits=0, misses=0, maxsize=2, currsize=0)
+    assert cache.get_or_create('k1', lambda: 'v2') == 'v2'
+
+
+def test_lru_cache_concurrent_creates_once():
+    """Concurrent callers for the same key only create the item once."""
+    cache = LruCache(maxsize=2)
+    creator = Mock(return_value='item')
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(
+            lambda _: cache.get_or_create('k1', creator), range(50)))
+
+    assert results == ['item'] * 50
+    creator.assert_called_once_with()
+    assert cache.info() == CacheInfo(hits=49, misses=1, maxsize=2, currsize=1)
+
+
+def test_lru_cache_peek_hit_put():
+    """Peek doesn't count, hit and put count and bump recency."""
+    cache = LruCache(maxsize=2)
+
+    assert cache.peek('k1') is None
+    assert cache.peek('k1', 'default') == 'default'
+    cache.put('k1', 'v1')
+    cache.put('k2', 'v2')
+    assert cache.peek('k1') == 'v1'
+    cache.hit('k1')
+    # replacing k2 counts as a miss and doesn't grow the cache
+    cache.put('k2', 'v2 new')
+    cache.put('k3', 'v3')
+
+    assert cache.peek('k1') is None
+    assert cache.peek('k2') == 'v2 new'
+    assert cache.info() == CacheInfo(hits=1, misses=4, maxsize=2, currsize=2)
+
+
+def test_lru_cache_hit_evicted():
+    """Hit on a key evicted since peek still counts."""
+    cache = LruCache(maxsize=2)
+
+    cache.hit('k1')
+
+    assert cache.info() == CacheInfo(hits=1, misses=0, maxsize=2, currsize=0)
+
+
+def test_lru_cache_weigh():
+    """Weighted items evict until total weight within maxsize."""
+    cache = LruCache(maxsize=10, weigh=len)
+
+    cache.put('k1', 'aaaa')
+    cache.put('k2', 'bbbb')
+    cache.put('k3', 'cccc')
+
+    assert cache.peek('k1') is None
+    assert cache.info().currsize == 8
+
+    # too heavy to cache at all, and doesn't evict the rest
+    cache.put('k4', 'd' * 11)
+    assert cache.peek('k4') is None
+    assert len(cache) == 2
+
+    cache.put('k2', 'b')
+    assert cache.info().currsize == 5
+
+    cache.clear()
+    assert cache.info() == CacheInfo(hits=0, misses=0, maxsize=10,
+                                     currsize=0)
+
+
+def test_lru_cache_reset_counters():
+    """Reset counters keeps items."""
+    cache = LruCache(maxsize=2)
+    cache.get_or_create('k1', lambda: 'v1')
+    cache.get_or_create('k1', lambda: 'v1')
+
+    cache.reset_counters()
+
+    assert cache.info() == CacheInfo(hits=0, misses=0, maxsize=2, currsize=1)
+    assert cache.peek('k1') == 'v1'
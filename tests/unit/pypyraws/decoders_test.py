@@ -0,0 +1,208 @@
+"""decoders.py unit tests."""
+from concurrent.futures import ThreadPoolExecutor
+import datetime
+import io
+import json
+import logging
+import math
+import sys
+import threading
+import types
+from unittest.mock import patch
+import pypyraws.decoders as decoders
+import pytest
+
+# ---------------------------- get_decoder ----------------------------------#
+
+
+def test_get_decoder_stdlib():
+    """Stdlib decoder is json.load."""
+    assert decoders.get_decoder('json') is json.load
+
+
+def test_get_decoder_orjson():
+    """Orjson decodes bytes from the file-like."""
+    load = decoders.get_decoder('orjson')
+
+    assert load(io.BytesIO(b'{"a": [1, 2.5, "b"]}')) == {'a': [1, 2.5, 'b']}
+
+
+def test_get_decoder_falls_back_to_stdlib():
+    """Json the fast decoder rejects decodes with the stdlib."""
+    load = decoders.get_decoder('orjson')
+
+    assert math.isnan(load(io.BytesIO(b'{"a": NaN}'))['a'])
+    assert load(io.BytesIO(b'[18446744073709551616]')) == [2**64]
+
+
+def test_get_decoder_invalid_json_raises_stdlib_error():
+    """Invalid json raises the stdlib's error."""
+    with pytest.raises(json.JSONDecodeError) as err:
+        decoders.get_decoder('orjson')(io.BytesIO(b'{"a": '))
+
+    assert str(err.value) == "Expecting value: line 1 column 7 (char 6)"
+
+
+def test_get_decoder_simdjson():
+    """Simdjson decodes with simdjson.loads."""
+    fake = types.ModuleType('simdjson')
+    fake.loads = lambda data: ('simdjson', data)
+
+    with patch.dict(sys.modules, {'simdjson': fake}):
+        load = decoders.get_decoder('simdjson')
+
+    assert load(io.BytesIO(b'[1]')) == ('simdjson', b'[1]')
+
+
+def test_get_decoder_not_installed():
+    """Named decoder that isn't installed raises."""
+    with patch.dict(sys.modules, {'simdjson': None}):
+        with pytest.raises(ImportError):
+            decoders.get_decoder('simdjson')
+
+
+def test_get_decoder_unknown():
+    """Unknown decoder raises."""
+    with pytest.raises(ValueError) as err:
+        decoders.get_decoder('arb')
+
+    assert str(err.value) == ("unknown json decoder arb. Use auto, orjson, "
+                              "simdjson or json.")
+
+
+@pytest.mark.parametrize('name', [None, '', 'auto'])
+def test_get_decoder_auto(name):
+    """Auto uses the fastest installed decoder."""
+    with patch.object(decoders, '_auto_name', 'json'):
+        assert decoders.get_decoder(name) is json.load
+
+# ---------------------------- get_decoder ----------------------------------#
+
+# ---------------------------- get_auto_name --------------------------------#
+
+
+def test_get_auto_name_first_installed():
+    """First fast decoder that imports wins and is remembered."""
+    with patch.object(decoders, '_auto_name', None):
+        with patch('pypyraws.decoders.import_loads',
+                   side_effect=[ImportError(), 'loads']) as mock_import:
+            assert decoders.get_auto_name() == 'simdjson'
+            assert decoders.get_auto_name() == 'simdjson'
+
+    assert [c.args for c in mock_import.mock_calls] == [('orjson',),
+                                                        ('simdjson',)]
+
+
+def test_get_auto_name_none_installed():
+    """No fast decoder installed uses the stdlib."""
+    with patch.object(decoders, '_auto_name', None):
+        with patch.dict(sys.modules, {'orjson': None, 'simdjson': None}):
+            assert decoders.get_auto_name() == 'json'
+
+
+def test_get_auto_name_orjson():
+    """Orjson is first choice."""
+    with patch.object(decoders, '_auto_name', None):
+        assert decoders.get_auto_name() == 'orjson'
+
+# ---------------------------- get_auto_name --------------------------------#
+
+# ---------------------------- get_yaml_loader ------------------------------#
+
+
+@pytest.fixture
+def yaml_loaders():
+    """Don't share cached yaml loaders between tests."""
+    with patch.object(decoders, '_yaml_loaders', threading.local()):
+        yield
+
+
+YAML_1_2 = """\
+a: yes
+b: on
+c: 017
+d: 0o17
+e: 1_000
+f: 2001-12-14
+g: [1, {h: ~}]
+i: &x 1
+j: *x
+"""
+
+
+@pytest.mark.parametrize('name', [None, 'pure'])
+def test_get_yaml_loader_pure(name, yaml_loaders):
+    """Pure safe loader is cached for the thread."""
+    loader = decoders.get_yaml_loader(name)
+
+    assert loader.typ == ['safe']
+    assert loader.pure
+    assert decoders.get_yaml_loader('pure') is loader
+    assert loader.load(YAML_1_2) == {'a': 'yes',
+                                     'b': 'on',
+                                     'c': 17,
+                                     'd': 15,
+                                     'e': 1000,
+                                     'f': datetime.date(2001, 12, 14),
+                                     'g': [1, {'h': None}],
+                                     'i': 1,
+                                     'j': 1}
+
+
+def test_get_yaml_loader_per_thread(yaml_loaders):
+    """Each thread gets its own loader."""
+    loader = decoders.get_yaml_loader()
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        other = executor.submit(decoders.get_yaml_loader).result()
+
+    assert other is not loader
+
+
+def test_get_yaml_loader_c_same_semantics(yaml_loaders):
+    """C loads exactly what pure does."""
+    assert (decoders.get_yaml_loader('c').load(YAML_1_2)
+            == decoders.get_yaml_loader('pure').load(YAML_1_2))
+
+
+@patch('pypyraws.decoders.has_yaml_clib', return_value=True)
+def test_get_yaml_loader_c(mock_has_clib, yaml_loaders):
+    """C loader isn't pure when the clib is installed."""
+    with patch('ruamel.yaml.YAML') as mock_yaml:
+        loader = decoders.get_yaml_loader('c')
+
+    mock_yaml.assert_called_once_with(typ='safe', pure=False)
+    assert loader is mock_yaml.return_value
+
+
+@patch('pypyraws.decoders.has_yaml_clib', return_value=False)
+def test_get_yaml_loader_c_no_clib(mock_has_clib, yaml_loaders):
+    """C without the clib warns and uses pure."""
+    logger = logging.getLogger('pypyraws.decoders')
+    with patch.object(logger, 'warning') as mock_logger_warning:
+        loader = decoders.get_yaml_loader('c')
+        assert decoders.get_yaml_loader('c') is loader
+
+    assert loader.pure
+    mock_logger_warning.assert_called_once_with(
+        "ruamel.yaml.clib isn't installed, so using the pure python yaml "
+        "loader.")
+
+
+def test_get_yaml_loader_unknown():
+    """Unknown loader raises."""
+    with pytest.raises(ValueError) as err:
+        decoders.get_yaml_loader('arb')
+
+    assert str(err.value) == "unknown yaml loader arb. Use pure or c."
+
+
+def test_has_yaml_clib():
+    """Clib installed if _ruamel_yaml imports."""
+    with patch.dict(sys.modules, {'_ruamel_yaml': types.ModuleType('x')}):
+        assert decoders.has_yaml_clib()
+
+    with patch.dict(sys.modules, {'_ruamel_yaml': None}):
+        assert not decoders.has_yaml_clib()
+
+# ---------------------------- get_yaml_loader ------------------------------#
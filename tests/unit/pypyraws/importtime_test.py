@@ -0,0 +1,62 @@
+"""Import time regression guards for the pypyraws steps.
+
+Importing boto3 takes hundreds of milliseconds, so step modules must not import
+it until a step actually runs.
+"""
+import subprocess
+import sys
+import pytest
+
+STEP_MODULES = ['pypyraws.steps.client',
+                'pypyraws.steps.clientbatch',
+                'pypyraws.steps.ecswaitprep',
+                'pypyraws.steps.metrics',
+                'pypyraws.steps.s3fetchjson',
+                'pypyraws.steps.s3fetchyaml',
+                'pypyraws.steps.session',
+                'pypyraws.steps.wait',
+                'pypyraws.steps.waitfor',
+                'pypyraws.steps.waitforevent']
+
+
+def get_imported_modules(module_name):
+    """Import module_name in a clean interpreter, return what it imported."""
+    script = (f"import sys; import {module_name}; "
+              "print('\\n'.join(sys.modules))")
+    result = subprocess.run([sys.executable, '-c', script],
+                            capture_output=True,
+                            check=True,
+                            text=True)
+    return set(result.stdout.splitlines())
+
+
+@pytest.mark.parametrize('module_name', STEP_MODULES)
+def test_step_import_does_not_import_boto(module_name):
+    """Step module import defers boto3 and botocore to first use."""
+    imported = get_imported_modules(module_name)
+
+    assert module_name in imported
+    assert 'boto3' not in imported
+    assert 'botocore' not in imported
+
+
+def test_client_step_import_time():
+    """Importing the client step costs a fraction of importing boto3."""
+    # pypyr is already imported by the time pypyr loads a step, so only
+    # measure what pypyraws itself adds.
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c',
+         'import pypyr.context; import pypyr.utils.poll; '
+         'import pypyraws.steps.client; import boto3'],
+        capture_output=True,
+        check=True,
+        text=True)
+
+    # -X importtime lines: import time: self [us] | cumulative | imported pkg
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            cumulative[parts[2].strip()] = int(parts[1])
+
+    assert cumulative['pypyraws.steps.client'] < cumulative['boto3'] / 10
@@ -0,0 +1,272 @@
+"""poll.py unit tests."""
+import random
+from unittest.mock import patch
+from pypyraws.poll import Backoff, Deadline, poll_until_true
+import pytest
+
+
+class FakeClock():
+    """Deterministic clock. Sleeping advances time instantly."""
+
+    def __init__(self, call_duration=0):
+        """Start at 0. Each polled call takes call_duration seconds."""
+        self.now = 0.0
+        self.call_duration = call_duration
+        self.sleeps = []
+        self.call_times = []
+
+    def clock(self):
+        """Get current fake time."""
+        return self.now
+
+    def sleep(self, seconds):
+        """Advance fake time."""
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def poller(self, true_at=None):
+        """Get func that returns True from fake time true_at onwards."""
+        def func():
+            self.call_times.append(self.now)
+            self.now += self.call_duration
+            return true_at is not None and self.call_times[-1] >= true_at
+
+        return func
+
+
+def take(backoff, count):
+    """Get the first count delays."""
+    delays = backoff.delays()
+    return [next(delays) for _ in range(count)]
+
+# ---------------------------- Backoff --------------------------------------#
+
+
+def test_backoff_fixed():
+    """Multiplier 1 is a fixed interval."""
+    assert take(Backoff(initial_delay=5, multiplier=1), 3) == [5, 5, 5]
+
+
+def test_backoff_exponential_capped():
+    """Delays grow exponentially up to max_delay."""
+    assert take(Backoff(initial_delay=1, multiplier=2, max_delay=10),
+                6) == [1, 2, 4, 8, 10, 10]
+
+
+def test_backoff_uncapped():
+    """No max_delay keeps growing."""
+    assert take(Backoff(initial_delay=0.5, multiplier=3), 4) == [
+        0.5, 1.5, 4.5, 13.5]
+
+
+def test_backoff_full_jitter_bounds():
+    """Full jitter is between 0 and the exponential delay."""
+    backoff = Backoff(initial_delay=1,
+                      multiplier=2,
+                      max_delay=8,
+                      jitter='full',
+                      rand=random.Random(42))
+    delays = take(backoff, 200)
+    for n, delay in enumerate(delays):
+        assert 0 <= delay <= min(2**n, 8)
+
+    # jittered, not all the same
+    assert len(set(delays[5:])) > 100
+
+
+def test_backoff_full_jitter_repeatable():
+    """Seeded random source gives the same delays."""
+    def get():
+        return take(Backoff(jitter='full', rand=random.Random(1)), 10)
+
+    assert get() == get()
+
+
+def test_backoff_decorrelated_jitter_bounds():
+    """Decorrelated jitter between initial and multiplier * previous."""
+    backoff = Backoff(initial_delay=1,
+                      multiplier=3,
+                      max_delay=20,
+                      jitter='decorrelated',
+                      rand=random.Random(7))
+    delays = take(backoff, 200)
+    previous = 1
+    for delay in delays:
+        assert 1 <= delay <= min(previous * 3, 20)
+        previous = delay
+
+    assert max(delays) <= 20
+
+
+def test_backoff_invalid():
+    """Bad args raise ValueError."""
+    with pytest.raises(ValueError) as err:
+        Backoff(initial_delay=-1)
+    assert str(err.value) == "backoff delays can't be negative."
+
+    with pytest.raises(ValueError) as err:
+        Backoff(max_delay=-1)
+    assert str(err.value) == "backoff delays can't be negative."
+
+    with pytest.raises(ValueError) as err:
+        Backoff(multiplier=0.5)
+    assert str(err.value) == "backoff multiplier must be >= 1, not 0.5."
+
+    with pytest.raises(ValueError) as err:
+        Backoff(jitter='arb')
+    assert str(err.value) == ("backoff jitter must be none, full or "
+                              "decorrelated, not arb.")
+
+
+def test_backoff_repr():
+    """Repr shows the policy."""
+    assert repr(Backoff(initial_delay=2, max_delay=9, jitter='full')) == (
+        "Backoff(initial_delay=2, multiplier=2, max_delay=9, jitter='full')")
+
+# ---------------------------- Backoff --------------------------------------#
+
+# ---------------------------- Deadline -------------------------------------#
+
+
+def test_deadline_remaining():
+    """Remaining counts down to 0 and doesn't go negative."""
+    fake = FakeClock()
+    deadline = Deadline(10, clock=fake.clock)
+
+    assert deadline.timeout == 10
+    assert deadline.remaining() == 10
+    assert not deadline.expired
+
+    fake.sleep(4)
+    assert deadline.remaining() == 6
+    assert not deadline.expired
+
+    fake.sleep(7)
+    assert deadline.remaining() == 0
+    assert deadline.expired
+
+# ---------------------------- Deadline -------------------------------------#
+
+# ---------------------------- poll_until_true ------------------------------#
+
+
+def test_poll_true_first_time():
+    """No sleep when first call is True."""
+    fake = FakeClock()
+    assert poll_until_true(fake.poller(true_at=0),
+                           Backoff(),
+                           max_attempts=5,
+                           clock=fake.clock,
+                           sleep=fake.sleep)
+    assert fake.call_times == [0]
+    assert fake.sleeps == []
+
+
+def test_poll_max_attempts():
+    """Stops after max_attempts calls, no sleep after the last."""
+    fake = FakeClock()
+    assert not poll_until_true(fake.poller(),
+                               Backoff(initial_delay=1, multiplier=2),
+                               max_attempts=4,
+                               clock=fake.clock,
+                               sleep=fake.sleep)
+    assert fake.call_times == [0, 1, 3, 7]
+    assert fake.sleeps == [1, 2, 4]
+
+
+def test_poll_backoff_latency_bound():
+    """Backoff detects the change within one capped delay."""
+    fake = FakeClock()
+    assert poll_until_true(fake.poller(true_at=100),
+                           Backoff(initial_delay=1,
+                                   multiplier=2,
+                                   max_delay=16),
+                           timeout=600,
+                           clock=fake.clock,
+                           sleep=fake.sleep)
+
+    # 0 1 3 7 15 31 47 63 79 95 111
+    assert len(fake.call_times) == 11
+    assert fake.call_times[-1] - 100 <= 16
+
+
+def test_poll_backoff_fewer_calls_than_fixed_interval():
+    """Backoff makes fewer calls than a short fixed interval."""
+    fixed = FakeClock()
+    backoff = FakeClock()
+    for fake, policy in ((fixed, Backoff(initial_delay=1, multiplier=1)),
+                         (backoff, Backoff(initial_delay=1,
+                                           multiplier=2,
+                                           max_delay=30))):
+        assert poll_until_true(fake.poller(true_at=300),
+                               policy,
+                               timeout=1000,
+                               clock=fake.clock,
+                               sleep=fake.sleep)
+
+    assert len(fixed.call_times) == 301
+    assert len(backoff.call_times) == 15
+
+
+def test_poll_timeout_last_call_at_deadline():
+    """Last delay shortens so the final call is at the deadline."""
+    fake = FakeClock()
+    assert not poll_until_true(fake.poller(),
+                               Backoff(initial_delay=4, multiplier=1),
+                               timeout=10,
+                               clock=fake.clock,
+                               sleep=fake.sleep)
+    assert fake.call_times == [0, 4, 8, 10]
+    assert fake.sleeps == [4, 4, 2]
+
+
+def test_poll_timeout_counts_call_duration():
+    """Slow calls count against the deadline."""
+    fake = FakeClock(call_duration=3)
+    assert not poll_until_true(fake.poller(),
+                               Backoff(initial_delay=5, multiplier=1),
+                               timeout=10,
+                               max_attempts=100,
+                               clock=fake.clock,
+                               sleep=fake.sleep)
+    # 0 call ends 3, sleep 5 -> 8 call ends 11 > deadline
+    assert fake.call_times == [0, 8]
+    assert fake.now == 11
+
+
+def test_poll_full_jitter_within_deadline():
+    """Jittered polling never runs past the deadline."""
+    fake = FakeClock()
+    assert not poll_until_true(fake.poller(),
+                               Backoff(initial_delay=1,
+                                       multiplier=2,
+                                       max_delay=20,
+                                       jitter='full',
+                                       rand=random.Random(3)),
+                               timeout=120,
+                               clock=fake.clock,
+                               sleep=fake.sleep)
+    assert fake.call_times[-1] == 120
+    assert all(delay <= 20 for delay in fake.sleeps)
+
+
+def test_poll_no_limit_raises():
+    """Polling must stop at some point."""
+    with pytest.raises(ValueError) as err:
+        poll_until_true(lambda: True, Backoff())
+
+    assert str(err.value) == ("set max_attempts or timeout, else polling "
+                              "never stops.")
+
+
+@patch('time.monotonic', return_value=0)
+@patch('time.sleep')
+def test_poll_default_clock_and_sleep(mock_sleep, mock_clock):
+    """Defaults to time.sleep and time.monotonic at call time."""
+    results = iter([False, False, True])
+    assert poll_until_true(lambda: next(results),
+                           Backoff(initial_delay=2),
+                           timeout=60)
+    assert mock_sleep.call_args_list == [((2,),), ((4,),)]
+
+# ---------------------------- poll_until_true ------------------------------#
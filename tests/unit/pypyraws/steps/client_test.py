@@ -1,5 +1,5 @@
 """client.py unit tests."""
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 from pypyr.context import Context
 from pypyr.errors import KeyNotInContextError
 import pypyraws.steps.client as client_step
@@ -45,6 +45,7 @@ def test_aws_client_pass_no_args(mock_service):
                                          method_name='method_name',
                                          client_args=None,
                                          operation_args=None,
+                                         session=None,
                                          )
 
 
@@ -76,6 +77,7 @@ def test_aws_client_pass_client_args(mock_service):
                                          client_args={'ck1': 'cv1',
                                                       'ck2': 'cv2'},
                                          operation_args=None,
+                                         session=None,
                                          )
 
 
@@ -107,6 +109,7 @@ def test_aws_client_pass_method_args(mock_service):
                                          client_args=None,
                                          operation_args={'mk1': 'mv1',
                                                          'mk2': 'mv2'},
+                                         session=None,
                                          )
 
 
@@ -141,6 +144,7 @@ def test_aws_client_pass_all_args(mock_service):
                                                       'ck2': 'cv2'},
                                          operation_args={'mk1': 'mv1',
                                                          'mk2': 'mv2'},
+                                         session=None,
                                          )
 
 # ---------------------------- run_step -------------------------------------#
@@ -185,6 +189,7 @@ def test_aws_client_substitute_all_args(mock_service):
                                                       'ck2': 'cv2'},
                                          operation_args={'mk1': 'mv1',
                                                          'mk2v6': 'mv2v7'},
+                                         session=None,
                                          )
 
 
@@ -218,7 +223,8 @@ def test_aws_client_substitute_no_client_method_args(mock_service):
     mock_service.assert_called_once_with(service_name='service name v1',
                                          method_name='method_name v2',
                                          client_args=None,
-                                         operation_args=None
+                                         operation_args=None,
+                                         session=None
                                          )
 
 
@@ -256,6 +262,7 @@ def test_aws_client_substitute_no_client_args(mock_service):
                                          client_args=None,
                                          operation_args={'mk1': 'mv1',
                                                          'mk2v6': 'mv2v7'},
+                                         session=None,
                                          )
 
 
@@ -292,6 +299,277 @@ def test_aws_client_substitute_no_method_args(mock_service):
                                          method_name='method_name v2',
                                          client_args={'ck1v4': 'cv1v5',
                                                       'ck2': 'cv2'},
-                                         operation_args=None
+                                         operation_args=None,
+                                         session=None
                                          )
 # ---------------------------- substitutions --------------------------------#
+
+# ---------------------------- paginate -------------------------------------#
+
+
+@patch('pypyraws.aws.service.paginate')
+def test_aws_client_paginate_true(mock_paginate):
+    """Paginate True merges all pages with no PaginationConfig."""
+    mock_paginate.return_value.build_full_result.return_value = {
+        'Items': [1, 2, 3]}
+    context = Context({
+        'k1': 'v1',
+        'awsClientIn': {
+            'serviceName': 'service name',
+            'methodName': 'method_name',
+            'methodArgs': {'mk1': '{k1}'},
+            'paginate': True
+        }})
+    client_step.run_step(context)
+
+    assert context['awsClientOut'] == {'Items': [1, 2, 3]}
+    mock_paginate.assert_called_once_with(service_name='service name',
+                                          method_name='method_name',
+                                          client_args=None,
+                                          operation_args={'mk1': 'v1'},
+                                          pagination_config=None,
+                                          session=None)
+
+
+@patch('pypyraws.aws.service.paginate')
+def test_aws_client_paginate_config(mock_paginate):
+    """Paginate dict is the PaginationConfig."""
+    mock_paginate.return_value.build_full_result.return_value = {
+        'Items': [1, 2]}
+    context = Context({
+        'max': 2,
+        'awsClientIn': {
+            'serviceName': 'service name',
+            'methodName': 'method_name',
+            'clientArgs': {'ck1': 'cv1'},
+            'paginate': {'MaxItems': '{max}', 'PageSize': 1}
+        }})
+    client_step.run_step(context)
+
+    assert context['awsClientOut'] == {'Items': [1, 2]}
+    mock_paginate.assert_called_once_with(
+        service_name='service name',
+        method_name='method_name',
+        client_args={'ck1': 'cv1'},
+        operation_args=None,
+        pagination_config={'MaxItems': 2, 'PageSize': 1},
+        session=None)
+
+
+@patch('pypyraws.aws.service.operation_exec', return_value={'rk1': 'rv1'})
+@patch('pypyraws.aws.service.paginate')
+def test_aws_client_paginate_false(mock_paginate, mock_service):
+    """Paginate False executes the method once."""
+    context = Context({
+        'awsClientIn': {
+            'serviceName': 'service name',
+            'methodName': 'method_name',
+            'paginate': False
+        }})
+    client_step.run_step(context)
+
+    assert context['awsClientOut'] == {'rk1': 'rv1'}
+    mock_paginate.assert_not_called()
+    mock_service.assert_called_once()
+
+
+@patch('pypyraws.aws.service.operation_exec', return_value={'rk1': 'rv1'})
+@patch('pypyraws.aws.service.paginate')
+def test_aws_client_paginate_false_string(mock_paginate, mock_service):
+    """Paginate from a formatted 'False' string executes the method once."""
+    context = Context({
+        'no': 'False',
+        'awsClientIn': {
+            'serviceName': 'service name',
+            'methodName': 'method_name',
+            'paginate': '{no}'
+        }})
+    client_step.run_step(context)
+
+    assert context['awsClientOut'] == {'rk1': 'rv1'}
+    mock_paginate.assert_not_called()
+    mock_service.assert_called_once()
+
+
+def test_aws_client_paginate_merges_pages_on_real_paginator():
+    """Pages from the botocore paginator merge into one result."""
+    import boto3
+    from botocore.stub import Stubber
+
+    client = boto3.client('s3',
+                          region_name='us-east-1',
+                          aws_access_key_id='arb',
+                          aws_secret_access_key='arb')
+    stubber = Stubber(client)
+    stubber.add_response('list_objects_v2',
+                         {'Contents': [{'Key': 'a'}, {'Key': 'b'}],
+                          'IsTruncated': True,
+                          'NextContinuationToken': 't1',
+                          'Name': 'bucket'},
+                         {'Bucket': 'bucket', 'MaxKeys': 2})
+    stubber.add_response('list_objects_v2',
+                         {'Contents': [{'Key': 'c'}, {'Key': 'd'}],
+                          'IsTruncated': True,
+                          'NextContinuationToken': 't2',
+                          'Name': 'bucket'},
+                         {'Bucket': 'bucket',
+                          'MaxKeys': 2,
+                          'ContinuationToken': 't1'})
+
+    context = Context({
+        'awsClientIn': {
+            'serviceName': 's3',
+            'methodName': 'list_objects_v2',
+            'methodArgs': {'Bucket': 'bucket'},
+            'paginate': {'MaxItems': 3, 'PageSize': 2}
+        }})
+
+    with patch('pypyraws.aws.service.get_client', return_value=client):
+        with stubber:
+            client_step.run_step(context)
+
+    out = context['awsClientOut']
+    assert out['Contents'] == [{'Key': 'a'}, {'Key': 'b'}, {'Key': 'c'}]
+    assert out['NextToken']
+    assert 'ResponseMetadata' not in out
+    stubber.assert_no_pending_responses()
+
+# ---------------------------- stream ---------------------------------------#
+
+
+@patch('pypyraws.aws.service.PageItems')
+@patch('pypyraws.aws.service.paginate')
+def test_aws_client_stream(mock_paginate, mock_items):
+    """Stream saves lazy items to awsClientOut."""
+    context = Context({
+        'key': 'Contents',
+        'awsClientIn': {
+            'serviceName': 'service name',
+            'methodName': 'method_name',
+            'stream': True,
+            'resultKey': '{key}'
+        }})
+    client_step.run_step(context)
+
+    assert context['awsClientOut'] is mock_items.return_value
+    mock_paginate.assert_called_once_with(service_name='service name',
+                                          method_name='method_name',
+                                          client_args=None,
+                                          operation_args=None,
+                                          pagination_config=None,
+                                          session=None)
+    mock_items.assert_called_once_with(
+        page_iterator=mock_paginate.return_value,
+        result_key='Contents')
+    mock_paginate.return_value.build_full_result.assert_not_called()
+
+
+@patch('pypyraws.aws.service.paginate')
+def test_aws_client_stream_with_paginate_config(mock_paginate):
+    """Stream passes PaginationConfig and iterates items per page."""
+    mock_paginate.return_value.__iter__ = lambda _: iter(
+        [{'Items': [1, 2]}, {'Items': [3]}])
+    mock_paginate.return_value.result_keys = [Mock(expression='Items')]
+
+    context = Context({
+        'awsClientIn': {
+            'serviceName': 'service name',
+            'methodName': 'method_name',
+            'stream': True,
+            'paginate': {'PageSize': 2}
+        }})
+    client_step.run_step(context)
+
+    assert list(context['awsClientOut']) == [1, 2, 3]
+    assert mock_paginate.call_args.kwargs['pagination_config'] == {
+        'PageSize': 2}
+
+
+@patch('pypyraws.aws.service.paginate')
+def test_aws_client_stream_false_string(mock_paginate):
+    """Stream from a formatted 'False' string merges all pages."""
+    mock_paginate.return_value.build_full_result.return_value = {
+        'Items': [1]}
+    context = Context({
+        'no': 'False',
+        'awsClientIn': {
+            'serviceName': 'service name',
+            'methodName': 'method_name',
+            'paginate': True,
+            'stream': '{no}'
+        }})
+    client_step.run_step(context)
+
+    assert context['awsClientOut'] == {'Items': [1]}
+# ---------------------------- stream ---------------------------------------#
+
+# ---------------------------- projection -----------------------------------#
+
+
+@patch('pypyraws.aws.service.operation_exec',
+       return_value={'Items': [{'Id': 1, 'Big': 'x'}, {'Id': 2, 'Big': 'y'}],
+                     'ResponseMetadata': {'RequestId': 'arb'}})
+def test_aws_client_output_query(mock_service):
+    """Output query saves only the projection."""
+    context = Context({
+        'awsClientIn': {
+            'serviceName': 'service name',
+            'methodName': 'method_name',
+            'outputQuery': 'Items[].Id'
+        }})
+    client_step.run_step(context)
+
+    assert context['awsClientOut'] == [1, 2]
+
+
+@patch('pypyraws.aws.service.operation_exec',
+       return_value={'Items': [1],
+                     'ResponseMetadata': {'RequestId': 'arb'}})
+def test_aws_client_strip_metadata(mock_service):
+    """Strip metadata removes ResponseMetadata."""
+    context = Context({
+        'awsClientIn': {
+            'serviceName': 'service name',
+            'methodName': 'method_name',
+            'stripMetadata': True
+        }})
+    client_step.run_step(context)
+
+    assert context['awsClientOut'] == {'Items': [1]}
+
+
+@patch('pypyraws.aws.service.operation_exec',
+       return_value={'Items': [1],
+                     'ResponseMetadata': {'RequestId': 'arb'}})
+def test_aws_client_strip_metadata_false_string(mock_service):
+    """Strip metadata from a formatted 'False' string keeps metadata."""
+    context = Context({
+        'no': 'False',
+        'awsClientIn': {
+            'serviceName': 'service name',
+            'methodName': 'method_name',
+            'stripMetadata': '{no}'
+        }})
+    client_step.run_step(context)
+
+    assert context['awsClientOut'] == {'Items': [1],
+                                       'ResponseMetadata': {
+                                           'RequestId': 'arb'}}
+
+
+@patch('pypyraws.aws.service.paginate')
+def test_aws_client_paginate_output_query(mock_paginate):
+    """Output query applies to merged pages."""
+    mock_paginate.return_value.build_full_result.return_value = {
+        'Items': [{'Id': 1}, {'Id': 2}]}
+    context = Context({
+        'awsClientIn': {
+            'serviceName': 'service name',
+            'methodName': 'method_name',
+            'paginate': True,
+            'outputQuery': 'length(Items)'
+        }})
+    client_step.run_step(context)
+
+    assert context['awsClientOut'] == 2
+# ---------------------------- projection -----------------------------------#
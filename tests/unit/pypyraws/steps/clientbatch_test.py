@@ -0,0 +1,222 @@
+"""clientbatch.py unit tests."""
+from unittest.mock import patch
+from pypyr.context import Context
+from pypyr.errors import KeyInContextHasNoValueError, KeyNotInContextError
+from pypyraws.aws.service import CallResult
+import pypyraws.steps.clientbatch as clientbatch_step
+import pytest
+
+# ---------------------------- run_step -------------------------------------#
+
+
+def test_clientbatch_missing_awsclientbatchin():
+    """Missing awsClientBatchIn raises."""
+    context = Context({'k1': 'v1'})
+
+    with pytest.raises(KeyNotInContextError) as err_info:
+        clientbatch_step.run_step(context)
+
+    assert str(err_info.value) == (
+        "context['awsClientBatchIn'] doesn't exist. It must exist for "
+        "pypyraws.steps.clientbatch.")
+
+
+def test_clientbatch_no_calls_or_awsclientin():
+    """Neither calls nor awsClientIn in awsClientBatchIn raises."""
+    context = Context({'awsClientBatchIn': {'maxWorkers': 2}})
+
+    with pytest.raises(KeyNotInContextError) as err_info:
+        clientbatch_step.run_step(context)
+
+    assert str(err_info.value) == (
+        "awsClientBatchIn for pypyraws.steps.clientbatch must contain either "
+        "calls or awsClientIn.")
+
+
+def test_clientbatch_calls_validated():
+    """Each call needs serviceName and methodName."""
+    context = Context({'awsClientBatchIn': {
+        'calls': [{'serviceName': 'svc', 'methodName': ''}]}})
+
+    with pytest.raises(KeyInContextHasNoValueError) as err_info:
+        clientbatch_step.run_step(context)
+
+    assert str(err_info.value) == (
+        "methodName required in awsClientIn for pypyraws.steps.clientbatch")
+
+
+@patch('pypyraws.aws.service.operation_exec_many')
+def test_clientbatch_calls(mock_many):
+    """List of awsClientIn runs with defaults and formatting."""
+    err = ValueError('arb err')
+    mock_many.return_value = [CallResult({'r': 1}, None),
+                              CallResult(None, err)]
+    context = Context({
+        'k1': 'v1',
+        'awsClientBatchIn': {
+            'calls': [
+                {'serviceName': 'svc1',
+                 'methodName': 'method1',
+                 'methodArgs': {'a': '{k1}'}},
+                {'serviceName': 'svc2',
+                 'methodName': 'method2',
+                 'clientArgs': {'c': 'd'}}]}})
+
+    clientbatch_step.run_step(context)
+
+    mock_many.assert_called_once_with(
+        calls=[{'service_name': 'svc1',
+                'method_name': 'method1',
+                'client_args': None,
+                'operation_args': {'a': 'v1'}},
+               {'service_name': 'svc2',
+                'method_name': 'method2',
+                'client_args': {'c': 'd'},
+                'operation_args': None}],
+        max_workers=10,
+        fail_fast=False,
+        session=None)
+
+    assert context['awsClientBatchOut'] == [
+        {'response': {'r': 1}, 'error': None},
+        {'response': None, 'error': 'ValueError: arb err'}]
+
+
+@patch('pypyraws.aws.service.operation_exec_many')
+def test_clientbatch_method_args_list(mock_many):
+    """One awsClientIn with list of methodArgs."""
+    mock_many.return_value = [CallResult({'r': 1}, None),
+                              CallResult({'r': 2}, None)]
+    context = Context({
+        'workers': 3,
+        'awsClientBatchIn': {
+            'awsClientIn': {'serviceName': 'svc',
+                            'methodName': 'method',
+                            'clientArgs': {'c': 'd'},
+                            'methodArgs': {'overwritten': True}},
+            'methodArgsList': [{'a': 1}, {'a': 2}],
+            'maxWorkers': '{workers}',
+            'failFast': True}})
+
+    clientbatch_step.run_step(context)
+
+    mock_many.assert_called_once_with(
+        calls=[{'service_name': 'svc',
+                'method_name': 'method',
+                'client_args': {'c': 'd'},
+                'operation_args': {'a': 1}},
+               {'service_name': 'svc',
+                'method_name': 'method',
+                'client_args': {'c': 'd'},
+                'operation_args': {'a': 2}}],
+        max_workers=3,
+        fail_fast=True,
+        session=None)
+
+    assert context['awsClientBatchOut'] == [
+        {'response': {'r': 1}, 'error': None},
+        {'response': {'r': 2}, 'error': None}]
+
+
+@patch('boto3.client')
+def test_clientbatch_end_to_end(mock_boto):
+    """Calls run through to the shared cached boto client."""
+    mock_boto.return_value.describe.side_effect = (
+        lambda Name: {'name': Name})
+
+    context = Context({
+        'awsClientBatchIn': {
+            'awsClientIn': {'serviceName': 'logs',
+                            'methodName': 'describe'},
+            'methodArgsList': [{'Name': f'group{i}'} for i in range(50)],
+            'maxWorkers': 8}})
+
+    clientbatch_step.run_step(context)
+
+    mock_boto.assert_called_once_with('logs')
+    assert context['awsClientBatchOut'] == [
+        {'response': {'name': f'group{i}'}, 'error': None}
+        for i in range(50)]
+
+
+@patch('pypyraws.aws.aio.operation_exec_many')
+def test_clientbatch_asyncio_backend(mock_many):
+    """Asyncio backend runs on the event loop."""
+    mock_many.return_value = [CallResult({'r': 1}, None)]
+    context = Context({
+        'awsClientBatchIn': {
+            'awsClientIn': {'serviceName': 'svc', 'methodName': 'method'},
+            'methodArgsList': [{'a': 1}],
+            'maxWorkers': 1000,
+            'backend': 'asyncio'}})
+
+    clientbatch_step.run_step(context)
+
+    mock_many.assert_called_once_with(
+        calls=[{'service_name': 'svc',
+                'method_name': 'method',
+                'client_args': None,
+                'operation_args': {'a': 1}}],
+        max_concurrency=1000,
+        fail_fast=False,
+        session=None)
+    assert context['awsClientBatchOut'] == [{'response': {'r': 1},
+                                             'error': None}]
+
+
+@patch('pypyraws.aws.service.operation_exec_many')
+def test_clientbatch_projection(mock_many):
+    """Output query and strip metadata apply to each response."""
+    mock_many.return_value = [
+        CallResult({'Id': 1, 'ResponseMetadata': {}}, None),
+        CallResult(None, ValueError('arb')),
+        CallResult({'Id': 2, 'ResponseMetadata': {}}, None)]
+    context = Context({
+        'awsClientBatchIn': {
+            'awsClientIn': {'serviceName': 'svc', 'methodName': 'method'},
+            'methodArgsList': [{'a': 1}, {'a': 2}, {'a': 3}],
+            'stripMetadata': True,
+            'outputQuery': 'keys(@)'}})
+
+    clientbatch_step.run_step(context)
+
+    assert context['awsClientBatchOut'] == [
+        {'response': ['Id'], 'error': None},
+        {'response': None, 'error': 'ValueError: arb'},
+        {'response': ['Id'], 'error': None}]
+
+
+@patch('pypyraws.aws.service.operation_exec_many')
+def test_clientbatch_bool_strings(mock_many):
+    """Bool args from formatted strings are bools."""
+    mock_many.return_value = [CallResult({'Id': 1, 'ResponseMetadata': {}},
+                                         None)]
+    context = Context({
+        'no': 'False',
+        'awsClientBatchIn': {
+            'awsClientIn': {'serviceName': 'svc', 'methodName': 'method'},
+            'methodArgsList': [{'a': 1}],
+            'failFast': '{no}',
+            'stripMetadata': 'True'}})
+
+    clientbatch_step.run_step(context)
+
+    assert mock_many.call_args.kwargs['fail_fast'] is False
+    assert context['awsClientBatchOut'] == [
+        {'response': {'Id': 1}, 'error': None}]
+
+
+def test_clientbatch_bad_backend():
+    """Unknown backend raises."""
+    context = Context({
+        'awsClientBatchIn': {
+            'calls': [{'serviceName': 'svc', 'methodName': 'method'}],
+            'backend': 'arb'}})
+
+    with pytest.raises(ValueError) as err_info:
+        clientbatch_step.run_step(context)
+
+    assert str(err_info.value) == (
+        "awsClientBatchIn backend for pypyraws.steps.clientbatch must be "
+        "thread or asyncio, not arb.")
+# ---------------------------- run_step -------------------------------------#
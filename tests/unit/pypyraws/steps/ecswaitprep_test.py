@@ -52,9 +52,9 @@ def test_waitprep_task_no_cluster():
 
     prepstep.run_step(context)
 
-    assert context['awsWaitIn'] == {'waitArgs': {
-                                    'cluster': 'cluster1',
-                                    'tasks': ['arn1']}}
+    assert context['awsWaitIn']['waitArgs'] == {
+        'cluster': 'cluster1',
+        'tasks': ['arn1']}
 
 
 def test_waitprep_task_with_cluster():
@@ -71,9 +71,9 @@ def test_waitprep_task_with_cluster():
 
     prepstep.run_step(context)
 
-    assert context['awsWaitIn'] == {'waitArgs': {
-                                    'cluster': 'arb cluster',
-                                    'tasks': ['arn1']}}
+    assert context['awsWaitIn']['waitArgs'] == {
+        'cluster': 'arb cluster',
+        'tasks': ['arn1']}
 
 
 def test_waitprep_tasks_with_cluster():
@@ -97,13 +97,13 @@ def test_waitprep_tasks_with_cluster():
 
     prepstep.run_step(context)
 
-    assert context['awsWaitIn'] == {'waitArgs': {
-                                    'cluster': 'arb cluster',
-                                    'tasks': ['t one', 't two', 't three']}}
+    assert context['awsWaitIn']['waitArgs'] == {
+        'cluster': 'arb cluster',
+        'tasks': ['t one', 't two', 't three']}
 
 
 def test_waitprep_tasks_no_cluster():
-    """Tasks parsed. Uses 1st task cluster."""
+    """Tasks parsed. Uses first task cluster."""
     context = Context({
         'awsClientOut': {'tasks': [
             {
@@ -122,9 +122,9 @@ def test_waitprep_tasks_no_cluster():
 
     prepstep.run_step(context)
 
-    assert context['awsWaitIn'] == {'waitArgs': {
-                                    'cluster': 'c arn 1',
-                                    'tasks': ['t one', 't two', 't three']}}
+    assert context['awsWaitIn']['waitArgs'] == {
+        'cluster': 'c arn 1',
+        'tasks': ['t one', 't two', 't three']}
 
 
 def test_waitprep_taskarns_with_no_cluster():
@@ -213,9 +213,9 @@ def test_waitprep_service_no_cluster():
 
     prepstep.run_step(context)
 
-    assert context['awsWaitIn'] == {'waitArgs': {
-                                    'cluster': 'cluster1',
-                                    'services': ['arn1']}}
+    assert context['awsWaitIn']['waitArgs'] == {
+        'cluster': 'cluster1',
+        'services': ['arn1']}
 
 
 def test_waitprep_service_with_cluster():
@@ -232,9 +232,9 @@ def test_waitprep_service_with_cluster():
 
     prepstep.run_step(context)
 
-    assert context['awsWaitIn'] == {'waitArgs': {
-                                    'cluster': 'arb cluster',
-                                    'services': ['arn1']}}
+    assert context['awsWaitIn']['waitArgs'] == {
+        'cluster': 'arb cluster',
+        'services': ['arn1']}
 
 
 def test_waitprep_servicearns_with_no_cluster():
@@ -286,13 +286,13 @@ def test_waitprep_services_with_cluster():
 
     prepstep.run_step(context)
 
-    assert context['awsWaitIn'] == {'waitArgs': {
-                                    'cluster': 'arb cluster',
-                                    'services': ['s one', 's two', 's three']}}
+    assert context['awsWaitIn']['waitArgs'] == {
+        'cluster': 'arb cluster',
+        'services': ['s one', 's two', 's three']}
 
 
 def test_waitprep_services_no_cluster():
-    """Services parsed. Uses 1st task cluster."""
+    """Services parsed. Uses first task cluster."""
     context = Context({
         'awsClientOut': {'services': [
             {
@@ -311,7 +311,120 @@ def test_waitprep_services_no_cluster():
 
     prepstep.run_step(context)
 
-    assert context['awsWaitIn'] == {'waitArgs': {
-                                    'cluster': 'c arn 1',
-                                    'services': ['s one', 's two', 's three']}}
+    assert context['awsWaitIn']['waitArgs'] == {
+        'cluster': 'c arn 1',
+        'services': ['s one', 's two', 's three']}
 # ------------------------------ services-------------------------------------#
+
+# ------------------------------ chunks --------------------------------------#
+
+
+def test_waitprep_task_arns_exactly_100_one_chunk():
+    """100 tasks fit in one describe_tasks call."""
+    arns = [f'arn{i}' for i in range(100)]
+    context = Context({'awsClientOut': {'taskArns': arns}})
+    prepstep.run_step(context)
+
+    assert context['awsWaitIn']['waitArgs'] == {'tasks': arns}
+
+
+def test_waitprep_task_arns_chunked():
+    """More than 100 tasks split into chunks of 100."""
+    arns = [f'arn{i}' for i in range(250)]
+    context = Context({'awsClientOut': {'taskArns': arns},
+                       'awsEcsWaitPrepCluster': 'cluster',
+                       'awsWaitIn': {'serviceName': 'ecs',
+                                     'waiterName': 'tasks_stopped'}})
+    prepstep.run_step(context)
+
+    assert context['awsWaitIn'] == {
+        'serviceName': 'ecs',
+        'waiterName': 'tasks_stopped',
+        'waitArgs': [{'cluster': 'cluster', 'tasks': arns[0:100]},
+                     {'cluster': 'cluster', 'tasks': arns[100:200]},
+                     {'cluster': 'cluster', 'tasks': arns[200:250]}]}
+
+
+def test_waitprep_services_chunked():
+    """More than 10 services split into chunks of 10."""
+    services = [{'clusterArn': 'cluster', 'serviceArn': f'arn{i}'}
+                for i in range(11)]
+    context = Context({'awsClientOut': {'services': services}})
+    prepstep.run_step(context)
+
+    assert context['awsWaitIn']['waitArgs'] == [
+        {'cluster': 'cluster', 'services': [f'arn{i}' for i in range(10)]},
+        {'cluster': 'cluster', 'services': ['arn10']}]
+
+
+def test_waitprep_empty_arns_one_chunk():
+    """No arns still gives one waitArgs dict."""
+    context = Context({'awsClientOut': {'serviceArns': []}})
+    prepstep.run_step(context)
+
+    assert context['awsWaitIn']['waitArgs'] == {'services': []}
+
+# ------------------------------ chunks --------------------------------------#
+
+# ------------------------------ initial response ----------------------------#
+
+
+def test_waitprep_initial_response_task():
+    """Single task becomes a describe_tasks shaped response."""
+    task = {'taskArn': 'arn1', 'clusterArn': 'c', 'lastStatus': 'RUNNING'}
+    context = Context({'awsClientOut': {'task': task}})
+    prepstep.run_step(context)
+
+    assert context['awsWaitIn']['initialResponse'] == {'tasks': [task]}
+
+
+def test_waitprep_initial_response_tasks_with_failures():
+    """Tasks keep the failures from the response."""
+    tasks = [{'taskArn': 'arn1', 'clusterArn': 'c'}]
+    failures = [{'arn': 'arn2', 'reason': 'MISSING'}]
+    context = Context({'awsClientOut': {'tasks': tasks,
+                                        'failures': failures}})
+    prepstep.run_step(context)
+
+    assert context['awsWaitIn']['initialResponse'] == {
+        'tasks': tasks,
+        'failures': failures}
+
+
+def test_waitprep_initial_response_service():
+    """Single service becomes a describe_services shaped response."""
+    service = {'serviceArn': 'arn1', 'clusterArn': 'c', 'runningCount': 1}
+    context = Context({'awsClientOut': {'service': service}})
+    prepstep.run_step(context)
+
+    assert context['awsWaitIn']['initialResponse'] == {'services': [service]}
+
+
+def test_waitprep_initial_response_services():
+    """Services are already a describe_services shaped response."""
+    services = [{'serviceArn': 'arn1', 'clusterArn': 'c'}]
+    context = Context({'awsClientOut': {'services': services}})
+    prepstep.run_step(context)
+
+    assert context['awsWaitIn']['initialResponse'] == {'services': services}
+
+
+def test_waitprep_initial_response_arns_only():
+    """Arns only remove a stale initial response."""
+    context = Context({'awsClientOut': {'taskArns': ['arn1']},
+                       'awsWaitIn': {'initialResponse': {'tasks': []}}})
+    prepstep.run_step(context)
+
+    assert context['awsWaitIn'] == {'waitArgs': {'tasks': ['arn1']}}
+
+
+def test_waitprep_initial_response_chunks():
+    """Chunked waitArgs keep the initial response in awsWaitIn."""
+    tasks = [{'taskArn': f'arn{i}', 'clusterArn': 'c'} for i in range(101)]
+    context = Context({'awsClientOut': {'tasks': tasks}})
+    prepstep.run_step(context)
+
+    assert len(context['awsWaitIn']['waitArgs']) == 2
+    assert context['awsWaitIn']['initialResponse'] == {'tasks': tasks}
+
+# ------------------------------ initial response ----------------------------#
@@ -0,0 +1,116 @@
+"""metrics.py step unit tests."""
+import logging
+from unittest.mock import patch
+from pypyr.context import Context
+from pypyraws.aws.instrumentation import metrics
+import pypyraws.aws.s3
+from pypyraws.cache import CacheInfo
+import pypyraws.steps.metrics as metrics_step
+
+
+def get_cached_document():
+    """Get 10 byte document cache entry."""
+    return pypyraws.aws.s3.CachedDocument(etag='e',
+                                          size=10,
+                                          body=None,
+                                          document={})
+
+
+def test_metrics_step_no_input():
+    """Metrics saved to context and logged without awsMetricsIn."""
+    metrics.record_client_created(0.5)
+    metrics.record_call('ecs.DescribeTasks', 2.0, retries=1)
+    metrics.record_call('ecs.DescribeTasks', 1.0, is_error=True)
+    metrics.record_throttle('ecs.DescribeTasks')
+
+    context = Context({'k1': 'v1'})
+    logger = logging.getLogger('pypyraws.steps.metrics')
+    with patch.object(logger, 'info') as mock_logger_info:
+        metrics_step.run_step(context)
+
+    out = context['awsMetricsOut']
+    assert out['operations']['ecs.DescribeTasks'] == {
+        'calls': 2,
+        'errors': 1,
+        'retries': 1,
+        'throttles': 1,
+        'latencyTotal': 3.0,
+        'latencyMax': 2.0,
+        'latencyAvg': 1.5,
+        'bytesSent': 0,
+        'bytesReceived': 0}
+    assert out['clients'] == {'created': 1, 'creationTime': 0.5}
+
+    assert [c.args[0] for c in mock_logger_info.mock_calls] == [
+        'aws calls: 2 in 3.000s, errors: 1, retries: 1, throttles: 1, '
+        'bytes sent: 0, bytes received: 0, clients created: 1 in 0.500s.',
+        'ecs.DescribeTasks: 2 calls, avg 1.500s, max 2.000s, errors: 1, '
+        'retries: 1, throttles: 1']
+
+    assert out['documentCache'] == {'hits': 0,
+                                    'misses': 0,
+                                    'hitRatio': 0.0,
+                                    'size': 0,
+                                    'maxSize': 64 * 1024 * 1024}
+
+    # not reset
+    assert metrics.summary() == {k: v for k, v in out.items()
+                                 if k != 'documentCache'}
+
+
+def test_metrics_step_reset():
+    """Reset clears metrics after saving them."""
+    metrics.record_call('ecs.DescribeTasks', 2.0)
+    pypyraws.aws.s3._document_cache.put('k', get_cached_document())
+
+    context = Context({'doReset': True,
+                       'awsMetricsIn': {'reset': '{doReset}'}})
+    metrics_step.run_step(context)
+
+    assert context['awsMetricsOut']['totals']['calls'] == 1
+    assert metrics.summary()['totals']['calls'] == 0
+    assert pypyraws.aws.s3.document_cache_info() == CacheInfo(
+        hits=0, misses=0, maxsize=64 * 1024 * 1024, currsize=10)
+
+
+def test_metrics_step_no_reset():
+    """Reset False keeps metrics."""
+    metrics.record_call('ecs.DescribeTasks', 2.0)
+
+    context = Context({'awsMetricsIn': {'reset': False}})
+    metrics_step.run_step(context)
+
+    assert metrics.summary()['totals']['calls'] == 1
+
+
+def test_metrics_step_reset_false_string():
+    """Reset from a formatted 'False' string keeps metrics."""
+    metrics.record_call('ecs.DescribeTasks', 2.0)
+
+    context = Context({'no': 'False', 'awsMetricsIn': {'reset': '{no}'}})
+    metrics_step.run_step(context)
+
+    assert metrics.summary()['totals']['calls'] == 1
+
+
+def test_metrics_step_document_cache():
+    """Document cache hit ratio saves to context and logs."""
+    pypyraws.aws.s3._document_cache.put('k', get_cached_document())
+    pypyraws.aws.s3._document_cache.hit('k')
+    pypyraws.aws.s3._document_cache.hit('k')
+    pypyraws.aws.s3._document_cache.hit('k')
+
+    context = Context()
+    logger = logging.getLogger('pypyraws.steps.metrics')
+    with patch.object(logger, 'info') as mock_logger_info:
+        metrics_step.run_step(context)
+
+    assert context['awsMetricsOut']['documentCache'] == {
+        'hits': 3,
+        'misses': 1,
+        'hitRatio': 0.75,
+        'size': 10,
+        'maxSize': 64 * 1024 * 1024}
+    assert mock_logger_info.mock_calls[-1].args[0] == (
+        's3 document cache: 3 hits, 1 misses, hit ratio 0.75, 10 bytes.')
+    assert pypyraws.aws.s3.document_cache_info().hits == 3
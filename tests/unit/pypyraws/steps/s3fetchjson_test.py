@@ -1,4 +1,5 @@
 """s3fetchjson.py unit tests."""
+import io
 import json
 import pytest
 from unittest.mock import Mock, patch
@@ -214,3 +215,67 @@ def test_fetchjson_list_fails(mock_s3):
 
     with pytest.raises(TypeError):
         s3fetchjson.run_step(context)
+
+
+@patch('pypyraws.aws.service.operation_exec')
+def test_fetchjson_memory_cache(mock_s3):
+    """Memory cache parses once and context changes don't leak into it."""
+    mock_s3.return_value = {
+        'Body': io.BytesIO(json.dumps({'k2': {'a': 1}}).encode()),
+        'ETag': 'e'}
+    context = Context({
+        's3Fetch': {
+            'methodArgs': {'Bucket': 'b', 'Key': 'k', 'VersionId': 'v1'},
+            'memoryCache': True}})
+
+    s3fetchjson.run_step(context)
+    context['k2']['a'] = 2
+    s3fetchjson.run_step(context)
+
+    assert context['k2'] == {'a': 1}
+    mock_s3.assert_called_once()
+
+
+@patch('pypyraws.steps.s3fetchjson.get_decoder', return_value=json.load)
+@patch('pypyraws.aws.service.operation_exec')
+def test_fetchjson_decoder(mock_s3, mock_get_decoder):
+    """Decoder in s3Fetch beats awsJsonDecoder."""
+    mock_s3.return_value = {'Body': io.BytesIO(b'{"k2": "v2"}')}
+    context = Context({
+        'awsJsonDecoder': 'json',
+        'dec': 'simdjson',
+        's3Fetch': {'methodArgs': {'Bucket': 'b', 'Key': 'k'},
+                    'decoder': '{dec}'}})
+
+    s3fetchjson.run_step(context)
+
+    mock_get_decoder.assert_called_once_with('simdjson')
+    assert context['k2'] == 'v2'
+
+
+@patch('pypyraws.steps.s3fetchjson.get_decoder', return_value=json.load)
+@patch('pypyraws.aws.service.operation_exec')
+def test_fetchjson_pipeline_decoder(mock_s3, mock_get_decoder):
+    """Pipeline-wide awsJsonDecoder sets the decoder."""
+    mock_s3.return_value = {'Body': io.BytesIO(b'{"k2": "v2"}')}
+    context = Context({
+        'awsJsonDecoder': '{dec}',
+        'dec': 'json',
+        's3Fetch': {'methodArgs': {'Bucket': 'b', 'Key': 'k'}}})
+
+    s3fetchjson.run_step(context)
+
+    mock_get_decoder.assert_called_once_with('json')
+
+
+@patch('pypyraws.steps.s3fetchjson.get_decoder', return_value=json.load)
+@patch('pypyraws.aws.service.operation_exec')
+def test_fetchjson_auto_decoder(mock_s3, mock_get_decoder):
+    """No decoder set is auto."""
+    mock_s3.return_value = {'Body': io.BytesIO(b'{"k2": "v2"}')}
+    context = Context({
+        's3Fetch': {'methodArgs': {'Bucket': 'b', 'Key': 'k'}}})
+
+    s3fetchjson.run_step(context)
+
+    mock_get_decoder.assert_called_once_with(None)
@@ -1,6 +1,8 @@
 """s3fetchyaml.py unit tests."""
 import io
+import threading
 import pytest
+import pypyraws.decoders
 import pypyraws.steps.s3fetchyaml  # as s3fetchyaml
 from pypyr.context import Context
 import ruamel.yaml as yaml
@@ -187,3 +189,74 @@ def test_s3fetchyaml_list_fails(mock_s3):
 
     with pytest.raises(TypeError):
         pypyraws.steps.s3fetchyaml.run_step(context)
+
+
+@patch('pypyraws.aws.service.operation_exec')
+def test_s3fetchyaml_memory_cache(mock_s3):
+    """Memory cache parses once and context changes don't leak into it."""
+    mock_s3.return_value = {'Body': io.BytesIO(b'k2:\n  a: 1\n'),
+                            'ETag': 'e'}
+    context = Context({
+        's3Fetch': {
+            'methodArgs': {'Bucket': 'b', 'Key': 'k', 'VersionId': 'v1'},
+            'memoryCache': True}})
+
+    pypyraws.steps.s3fetchyaml.run_step(context)
+    context['k2']['a'] = 2
+    pypyraws.steps.s3fetchyaml.run_step(context)
+
+    assert context['k2'] == {'a': 1}
+    mock_s3.assert_called_once()
+
+
+@patch('pypyraws.steps.s3fetchyaml.get_yaml_loader')
+@patch('pypyraws.aws.service.operation_exec')
+def test_s3fetchyaml_loader(mock_s3, mock_get_loader):
+    """Loader in s3Fetch beats awsYamlLoader."""
+    mock_s3.return_value = {'Body': 'k2: v2'}
+    mock_get_loader.return_value.load.return_value = {'k2': 'v2'}
+    context = Context({
+        'awsYamlLoader': 'pure',
+        'l': 'c',
+        's3Fetch': {'methodArgs': {'Bucket': 'b', 'Key': 'k'},
+                    'loader': '{l}'}})
+
+    pypyraws.steps.s3fetchyaml.run_step(context)
+
+    mock_get_loader.assert_called_once_with('c')
+    mock_get_loader.return_value.load.assert_called_once_with('k2: v2')
+    assert context['k2'] == 'v2'
+
+
+@patch('pypyraws.steps.s3fetchyaml.get_yaml_loader')
+@patch('pypyraws.aws.service.operation_exec')
+def test_s3fetchyaml_pipeline_loader(mock_s3, mock_get_loader):
+    """Pipeline-wide awsYamlLoader sets the loader."""
+    mock_s3.return_value = {'Body': 'k2: v2'}
+    mock_get_loader.return_value.load.return_value = {'k2': 'v2'}
+    context = Context({
+        'awsYamlLoader': '{l}',
+        'l': 'c',
+        's3Fetch': {'methodArgs': {'Bucket': 'b', 'Key': 'k'}}})
+
+    pypyraws.steps.s3fetchyaml.run_step(context)
+
+    mock_get_loader.assert_called_once_with('c')
+
+
+@patch('pypyraws.aws.service.operation_exec')
+def test_s3fetchyaml_reuses_loader(mock_s3):
+    """Loader builds once and loads many files."""
+    mock_s3.side_effect = [{'Body': 'k2: v2'}, {'Body': 'k3: v3'}]
+    context = Context({
+        's3Fetch': {'methodArgs': {'Bucket': 'b', 'Key': 'k'}}})
+
+    with patch('ruamel.yaml.YAML', wraps=yaml.YAML) as mock_yaml:
+        with patch.object(pypyraws.decoders, '_yaml_loaders',
+                          threading.local()):
+            pypyraws.steps.s3fetchyaml.run_step(context)
+            pypyraws.steps.s3fetchyaml.run_step(context)
+
+    mock_yaml.assert_called_once_with(typ='safe', pure=True)
+    assert context['k2'] == 'v2'
+    assert context['k3'] == 'v3'
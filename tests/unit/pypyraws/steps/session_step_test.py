@@ -0,0 +1,78 @@
+"""session.py step unit tests."""
+from unittest.mock import patch
+from pypyr.context import Context
+from pypyr.errors import KeyNotInContextError
+from pypyraws.aws.session import AwsSession
+import pypyraws.steps.session as session_step
+import pytest
+
+# ---------------------------- run_step -------------------------------------#
+
+
+def test_session_missing_awssessionin():
+    """Missing awsSessionIn raises."""
+    context = Context({'k1': 'v1'})
+
+    with pytest.raises(KeyNotInContextError) as err_info:
+        session_step.run_step(context)
+
+    assert str(err_info.value) == (
+        "context['awsSessionIn'] doesn't exist. It must exist for "
+        "pypyraws.steps.session.")
+
+
+@patch('boto3.Session')
+def test_session_pass_substitutions(mock_session):
+    """Session created from formatted awsSessionIn."""
+    context = Context({
+        'region': 'eu-west-1',
+        'awsSessionIn': {
+            'sessionArgs': {'region_name': '{region}'},
+            'config': {'max_pool_connections': '{pool}',
+                       'connect_timeout': 5}
+        },
+        'pool': 50})
+
+    session_step.run_step(context)
+
+    session = context['awsSessionOut']
+    assert isinstance(session, AwsSession)
+    mock_session.assert_called_once_with(region_name='eu-west-1')
+    assert session.config.max_pool_connections == 50
+    assert session.config.connect_timeout == 5
+
+
+@patch('boto3.Session')
+def test_session_pass_empty(mock_session):
+    """Session created with no args."""
+    context = Context({'awsSessionIn': {}})
+
+    session_step.run_step(context)
+
+    assert context['awsSessionOut'].config is None
+    mock_session.assert_called_once_with()
+
+
+@patch('boto3.Session')
+def test_session_used_by_client_step(mock_session):
+    """Client step creates its client from the session."""
+    import pypyraws.steps.client as client_step
+
+    context = Context({
+        'awsSessionIn': {'config': {'read_timeout': 7}},
+        'awsClientIn': {'serviceName': 'svc',
+                        'methodName': 'arbmethod',
+                        'methodArgs': {'k1': 'v1'}}})
+
+    session_step.run_step(context)
+    mock_client = mock_session.return_value.client
+    mock_client.return_value.arbmethod.return_value = {'rk1': 'rv1'}
+
+    client_step.run_step(context)
+    client_step.run_step(context)
+
+    mock_client.assert_called_once()
+    assert mock_client.call_args.args == ('svc',)
+    assert mock_client.call_args.kwargs['config'].read_timeout == 7
+    assert context['awsClientOut'] == {'rk1': 'rv1'}
+# ---------------------------- run_step -------------------------------------#
@@ -1,7 +1,11 @@
 """wait.py unit tests."""
+import logging
 from unittest.mock import patch
+from botocore.exceptions import WaiterError
 from pypyr.context import Context
 from pypyr.errors import KeyInContextHasNoValueError, KeyNotInContextError
+from pypyraws.aws.waiters import WaitResult
+from pypyraws.errors import WaitTimeOut
 import pypyraws.steps.wait as wait
 import pytest
 
@@ -44,6 +48,7 @@ def test_aws_wait_pass_no_args(mock_waiter):
                                         waiter_name='waiter_name',
                                         waiter_args=None,
                                         wait_args=None,
+                                        session=None,
                                         )
 
 
@@ -74,6 +79,7 @@ def test_aws_wait_pass_waiter_args(mock_waiter):
                                         waiter_args={'ck1': 'cv1',
                                                      'ck2': 'cv2'},
                                         wait_args=None,
+                                        session=None,
                                         )
 
 
@@ -104,6 +110,7 @@ def test_aws_waiter_pass_wait_args(mock_waiter):
                                         waiter_args=None,
                                         wait_args={'mk1': 'mv1',
                                                     'mk2': 'mv2'},
+                                        session=None,
                                         )
 
 
@@ -137,6 +144,7 @@ def test_aws_client_pass_all_args(mock_waiter):
                                                      'ck2': 'cv2'},
                                         wait_args={'mk1': 'mv1',
                                                     'mk2': 'mv2'},
+                                        session=None,
                                         )
 
 
@@ -174,6 +182,7 @@ def test_aws_client_pass_all_args_substitutions(mock_waiter):
                                                      'ck2': 'v4 cv2'},
                                         wait_args={'mk1': 'mv1',
                                                     'v5 mk2': 'mv2'},
+                                        session=None,
                                         )
 
 
@@ -208,6 +217,7 @@ def test_aws_client_pass_no_waiterargs_substitutions(mock_waiter):
                                         waiter_args=None,
                                         wait_args={'mk1': 'mv1',
                                                     'v5 mk2': 'mv2'},
+                                        session=None,
                                         )
 
 
@@ -241,7 +251,8 @@ def test_aws_client_pass_no_waitargs_substitutions(mock_waiter):
                                         waiter_name='v2 waiter_name',
                                         waiter_args={'ck1 v3': 'cv1',
                                                      'ck2': 'v4 cv2'},
-                                        wait_args=None
+                                        wait_args=None,
+                                        session=None
                                         )
 
 
@@ -272,7 +283,8 @@ def test_aws_client_pass_no_opt_args_substitutions(mock_waiter):
     mock_waiter.assert_called_once_with(service_name='service name v1',
                                         waiter_name='v2 waiter_name',
                                         waiter_args=None,
-                                        wait_args=None
+                                        wait_args=None,
+                                        session=None
                                         )
 
 # ---------------------------- run_step -------------------------------------#
@@ -384,3 +396,470 @@ def test_get_waiter_args_waitername_empty():
                                    "for pypyraws.steps.wait")
 
 # ---------------------------- get_waiter_args------------------------------#
+
+# ---------------------------- run_waiters ----------------------------------#
+
+
+@patch('pypyraws.aws.waiters.wait_many')
+def test_aws_wait_list_all(mock_wait_many):
+    """List awsWaitIn runs waiters concurrently with all."""
+    mock_wait_many.return_value = [WaitResult('success', None),
+                                   WaitResult('success', None)]
+    context = Context({
+        'k1': 'v1',
+        'awsWaitIn': [
+            {'serviceName': 'cloudformation',
+             'waiterName': 'stack_create_complete',
+             'waitArgs': {'StackName': '{k1}'}},
+            {'serviceName': 'ecs',
+             'waiterName': 'services_stable',
+             'waiterArgs': {'wk1': 'wv1'},
+             'waitArgs': {'services': ['s1']}}]})
+
+    wait.run_step(context)
+
+    mock_wait_many.assert_called_once_with(
+        waiters=[{'service_name': 'cloudformation',
+                  'waiter_name': 'stack_create_complete',
+                  'waiter_args': None,
+                  'wait_args': {'StackName': 'v1'}},
+                 {'service_name': 'ecs',
+                  'waiter_name': 'services_stable',
+                  'waiter_args': {'wk1': 'wv1'},
+                  'wait_args': {'services': ['s1']}}],
+        complete='all',
+        max_workers=None,
+        session=None,
+        timeout=None)
+
+    assert context['awsWaitOut'] == [
+        {'serviceName': 'cloudformation',
+         'waiterName': 'stack_create_complete',
+         'state': 'success',
+         'error': None},
+        {'serviceName': 'ecs',
+         'waiterName': 'services_stable',
+         'state': 'success',
+         'error': None}]
+
+
+@patch('pypyraws.aws.waiters.wait_many')
+def test_aws_wait_waiters_any(mock_wait_many):
+    """Dict awsWaitIn with waiters passes complete and maxWorkers."""
+    mock_wait_many.return_value = [
+        WaitResult('failure', WaiterError(name='w1',
+                                          reason='arb',
+                                          last_response={})),
+        WaitResult('success', None),
+        WaitResult('cancelled', None)]
+    context = Context({
+        'complete': 'any',
+        'awsSessionOut': 'session',
+        'awsWaitIn': {
+            'complete': '{complete}',
+            'maxWorkers': '2',
+            'waiters': [{'serviceName': 's', 'waiterName': 'w1'},
+                        {'serviceName': 's', 'waiterName': 'w2'},
+                        {'serviceName': 's', 'waiterName': 'w3'}]}})
+
+    wait.run_step(context)
+
+    assert mock_wait_many.call_args.kwargs['complete'] == 'any'
+    assert mock_wait_many.call_args.kwargs['max_workers'] == 2
+    assert mock_wait_many.call_args.kwargs['session'] == 'session'
+    assert [out['state'] for out in context['awsWaitOut']] == [
+        'failure', 'success', 'cancelled']
+    assert context['awsWaitOut'][0]['error'] == (
+        'WaiterError: Waiter w1 failed: arb')
+
+
+@patch('pypyraws.aws.waiters.wait_many')
+def test_aws_wait_all_failure_raises(mock_wait_many):
+    """With all, any failure raises the first error after saving results."""
+    err = WaiterError(name='w2', reason='arb', last_response={})
+    mock_wait_many.return_value = [WaitResult('cancelled', None),
+                                   WaitResult('failure', err)]
+    context = Context({
+        'awsWaitIn': [{'serviceName': 's', 'waiterName': 'w1'},
+                      {'serviceName': 's', 'waiterName': 'w2'}]})
+
+    with pytest.raises(WaiterError) as err_info:
+        wait.run_step(context)
+
+    assert err_info.value is err
+    assert [out['state'] for out in context['awsWaitOut']] == [
+        'cancelled', 'failure']
+
+
+@patch('pypyraws.aws.waiters.wait_many')
+def test_aws_wait_any_all_failed_raises(mock_wait_many):
+    """With any, raises when no waiter succeeded."""
+    err1 = WaiterError(name='w1', reason='arb', last_response={})
+    err2 = WaiterError(name='w2', reason='arb', last_response={})
+    mock_wait_many.return_value = [WaitResult('failure', err1),
+                                   WaitResult('failure', err2)]
+    context = Context({
+        'awsWaitIn': {
+            'complete': 'any',
+            'waiters': [{'serviceName': 's', 'waiterName': 'w1'},
+                        {'serviceName': 's', 'waiterName': 'w2'}]}})
+
+    with pytest.raises(WaiterError) as err_info:
+        wait.run_step(context)
+
+    assert err_info.value is err1
+
+
+def test_aws_wait_list_missing_waitername():
+    """Each waiter in the list needs a waiterName."""
+    context = Context({
+        'awsWaitIn': [{'serviceName': 's', 'waiterName': 'w1'},
+                      {'serviceName': 's'}]})
+
+    with pytest.raises(KeyNotInContextError) as err_info:
+        wait.run_step(context)
+
+    assert str(err_info.value) == (
+        "awsWaitIn missing required key for pypyraws.steps.wait: "
+        "'waiterName'")
+
+# ---------------------------- run_waiters ----------------------------------#
+
+# ---------------------------- waitArgs list --------------------------------#
+
+
+@patch('pypyraws.aws.waiters.wait_many')
+def test_aws_wait_wait_args_list(mock_wait_many):
+    """List of waitArgs runs the same waiter for each concurrently."""
+    mock_wait_many.return_value = [WaitResult('success', None),
+                                   WaitResult('success', None)]
+    context = Context({
+        'awsWaitIn': {
+            'serviceName': 'ecs',
+            'waiterName': 'tasks_stopped',
+            'waiterArgs': {'wk1': 'wv1'},
+            'maxWorkers': 5,
+            'waitArgs': [{'cluster': 'c', 'tasks': ['t1']},
+                         {'cluster': 'c', 'tasks': ['t2']}]}})
+
+    wait.run_step(context)
+
+    mock_wait_many.assert_called_once_with(
+        waiters=[{'service_name': 'ecs',
+                  'waiter_name': 'tasks_stopped',
+                  'waiter_args': {'wk1': 'wv1'},
+                  'wait_args': {'cluster': 'c', 'tasks': ['t1']}},
+                 {'service_name': 'ecs',
+                  'waiter_name': 'tasks_stopped',
+                  'waiter_args': {'wk1': 'wv1'},
+                  'wait_args': {'cluster': 'c', 'tasks': ['t2']}}],
+        complete='all',
+        max_workers=5,
+        session=None,
+        timeout=None)
+    assert [out['state'] for out in context['awsWaitOut']] == ['success',
+                                                               'success']
+
+
+@patch('pypyraws.aws.waiters.get_waiter')
+@patch('pypyraws.aws.waiters.wait', return_value=True)
+def test_ecswaitprep_chunks_then_wait(mock_wait, mock_get_waiter):
+    """Chunked ecswaitprep output waits on every chunk."""
+    import pypyraws.steps.ecswaitprep as prepstep
+
+    mock_get_waiter.return_value = ('client', 'waiter')
+    arns = [f'arn{i}' for i in range(1000)]
+    context = Context({'awsClientOut': {'taskArns': arns},
+                       'awsWaitIn': {'serviceName': 'ecs',
+                                     'waiterName': 'tasks_stopped'}})
+
+    prepstep.run_step(context)
+    wait.run_step(context)
+
+    assert mock_wait.call_count == 10
+    waited_for = sorted(arn
+                        for c in mock_wait.call_args_list
+                        for arn in c.args[2]['tasks'])
+    assert waited_for == sorted(arns)
+    assert len(context['awsWaitOut']) == 10
+
+# ---------------------------- waitArgs list --------------------------------#
+
+# ---------------------------- timeout --------------------------------------#
+
+
+@patch('pypyraws.aws.waiters.wait_many')
+def test_aws_wait_single_with_timeout(mock_wait_many):
+    """Single waiter with timeout runs through wait_many."""
+    mock_wait_many.return_value = [WaitResult('success', None)]
+    context = Context({
+        'timeout': '90',
+        'awsWaitIn': {
+            'serviceName': 'ecs',
+            'waiterName': 'tasks_stopped',
+            'waitArgs': {'cluster': 'c', 'tasks': ['t1']},
+            'timeout': '{timeout}'}})
+
+    wait.run_step(context)
+
+    mock_wait_many.assert_called_once_with(
+        waiters=[{'service_name': 'ecs',
+                  'waiter_name': 'tasks_stopped',
+                  'waiter_args': None,
+                  'wait_args': {'cluster': 'c', 'tasks': ['t1']}}],
+        complete='all',
+        max_workers=None,
+        session=None,
+        timeout=90.0)
+    assert context['awsWaitOut'] == [{'serviceName': 'ecs',
+                                      'waiterName': 'tasks_stopped',
+                                      'state': 'success',
+                                      'error': None}]
+
+
+@patch('pypyraws.aws.waiters.wait_many')
+def test_aws_wait_all_timeout_raises(mock_wait_many):
+    """With all, a waiter cancelled without failures is a timeout."""
+    mock_wait_many.return_value = [WaitResult('success', None),
+                                   WaitResult('cancelled', None)]
+    context = Context({
+        'awsWaitIn': {
+            'timeout': 30,
+            'waiters': [{'serviceName': 's', 'waiterName': 'w1'},
+                        {'serviceName': 's', 'waiterName': 'w2'}]}})
+
+    with pytest.raises(WaitTimeOut) as err_info:
+        wait.run_step(context)
+
+    assert str(err_info.value) == ("1 of 2 aws waiters did not complete "
+                                   "within 30 seconds.")
+    assert mock_wait_many.call_args.kwargs['timeout'] == 30.0
+    assert [out['state'] for out in context['awsWaitOut']] == [
+        'success', 'cancelled']
+
+
+@patch('pypyraws.aws.waiters.wait_many')
+def test_aws_wait_any_timeout_raises(mock_wait_many):
+    """With any, all cancelled or failed is a timeout."""
+    err = WaiterError(name='w1', reason='arb', last_response={})
+    mock_wait_many.return_value = [WaitResult('failure', err),
+                                   WaitResult('cancelled', None)]
+    context = Context({
+        'awsWaitIn': {
+            'complete': 'any',
+            'timeout': 30,
+            'waiters': [{'serviceName': 's', 'waiterName': 'w1'},
+                        {'serviceName': 's', 'waiterName': 'w2'}]}})
+
+    with pytest.raises(WaitTimeOut) as err_info:
+        wait.run_step(context)
+
+    assert str(err_info.value) == ("1 of 2 aws waiters did not complete "
+                                   "within 30 seconds.")
+
+# ---------------------------- timeout --------------------------------------#
+
+# ---------------------------- initial response -----------------------------#
+
+
+def get_ecs_client():
+    """Get real ecs client that never calls aws."""
+    import boto3
+
+    return boto3.session.Session().client('ecs',
+                                          region_name='us-east-1',
+                                          aws_access_key_id='arb',
+                                          aws_secret_access_key='arb')
+
+
+def get_tasks_context(status, **kwargs):
+    """Get tasks_running awsWaitIn with initial response in status."""
+    return Context({
+        'awsWaitIn': {'serviceName': 'ecs',
+                      'waiterName': 'tasks_running',
+                      'waitArgs': {'cluster': 'c', 'tasks': ['arn1']},
+                      'initialResponse': get_tasks_response(status),
+                      **kwargs}})
+
+
+def get_tasks_response(status):
+    """Get describe_tasks response with one task in status."""
+    return {'tasks': [{'taskArn': 'arn1',
+                       'lastStatus': status,
+                       'overrides': {'command': ['echo {literal}']}}]}
+
+
+@patch('pypyraws.aws.service.waiter')
+@patch('boto3.client')
+def test_aws_wait_initial_response_satisfied(mock_boto, mock_waiter):
+    """Initial response already in success state skips the wait."""
+    mock_boto.return_value = get_ecs_client()
+    context = get_tasks_context('RUNNING')
+
+    wait.run_step(context)
+
+    mock_waiter.assert_not_called()
+    assert context['awsWaitSkipped']
+    assert 'initialResponse' not in context['awsWaitIn']
+
+
+@patch('pypyraws.aws.service.waiter')
+@patch('boto3.client')
+def test_aws_wait_initial_response_not_satisfied(mock_boto, mock_waiter):
+    """Initial response not in success state waits as usual."""
+    mock_boto.return_value = get_ecs_client()
+    context = get_tasks_context('PENDING', waiterArgs={})
+
+    wait.run_step(context)
+
+    mock_waiter.assert_called_once_with(
+        service_name='ecs',
+        waiter_name='tasks_running',
+        waiter_args={},
+        wait_args={'cluster': 'c', 'tasks': ['arn1']},
+        session=None)
+    assert not context['awsWaitSkipped']
+    assert 'initialResponse' not in context['awsWaitIn']
+
+
+@patch('pypyraws.aws.waiters.wait_many')
+@patch('boto3.client')
+def test_aws_wait_initial_response_wait_args_list(mock_boto,
+                                                  mock_wait_many):
+    """Satisfied initial response skips every chunk of waitArgs."""
+    mock_boto.return_value = get_ecs_client()
+    context = get_tasks_context('RUNNING', timeout=60)
+    context['awsWaitIn']['waitArgs'] = [{'tasks': ['arn1']},
+                                        {'tasks': ['arn2']}]
+
+    wait.run_step(context)
+
+    mock_wait_many.assert_not_called()
+    assert context['awsWaitSkipped']
+
+
+@patch('pypyraws.aws.waiters.wait_many')
+def test_aws_wait_initial_response_waiters_form(mock_wait_many):
+    """Waiters form warns about and consumes a top-level initial response."""
+    mock_wait_many.return_value = [WaitResult('success', None)]
+    context = Context({
+        'awsWaitIn': {'waiters': [{'serviceName': 's', 'waiterName': 'w1'}],
+                      'initialResponse': {'a': 'b'}}})
+
+    with patch.object(logging.getLogger('pypyraws.steps.wait'),
+                      'warning') as mock_logger_warning:
+        wait.run_step(context)
+
+    mock_logger_warning.assert_called_once_with(
+        "initialResponse only applies to one waiter. Set it on each of the "
+        "waiters instead. Ignoring it.")
+    assert len(mock_wait_many.call_args[1]['waiters']) == 1
+    assert 'awsWaitSkipped' not in context
+    assert 'initialResponse' not in context['awsWaitIn']
+
+
+def get_tasks_waiters(*statuses):
+    """Get awsWaitIn list of tasks_running waiters with initial responses."""
+    return [{'serviceName': 'ecs',
+             'waiterName': 'tasks_running',
+             'waitArgs': {'tasks': [f'arn{i}']},
+             'initialResponse': get_tasks_response(status)}
+            for i, status in enumerate(statuses)]
+
+
+@patch('pypyraws.aws.waiters.wait_many')
+@patch('boto3.client')
+def test_aws_wait_initial_response_list_runs_pending(mock_boto,
+                                                     mock_wait_many):
+    """List form only runs the waiters not satisfied already."""
+    mock_boto.return_value = get_ecs_client()
+    waiters_in = get_tasks_waiters('RUNNING', 'PENDING')
+    waiters_in.append({'serviceName': 'ecs', 'waiterName': 'tasks_stopped'})
+    mock_wait_many.return_value = [WaitResult('success', None),
+                                   WaitResult('success', None)]
+    context = Context({'awsWaitIn': waiters_in})
+
+    wait.run_step(context)
+
+    waiters = mock_wait_many.call_args[1]['waiters']
+    assert [waiter['wait_args'] for waiter in waiters] == [
+        {'tasks': ['arn1']}, None]
+    assert not context['awsWaitSkipped']
+    assert [out['state'] for out in context['awsWaitOut']] == [
+        'success', 'success', 'success']
+    assert all('initialResponse' not in waiter_in
+               for waiter_in in context['awsWaitIn'])
+
+
+@patch('pypyraws.aws.waiters.wait_many')
+@patch('boto3.client')
+def test_aws_wait_initial_response_list_all_satisfied(mock_boto,
+                                                      mock_wait_many):
+    """List form with every waiter satisfied doesn't wait."""
+    mock_boto.return_value = get_ecs_client()
+    context = Context({'awsWaitIn': get_tasks_waiters('RUNNING',
+                                                      'RUNNING')})
+
+    wait.run_step(context)
+
+    mock_wait_many.assert_not_called()
+    assert context['awsWaitSkipped']
+    assert [out['state'] for out in context['awsWaitOut']] == [
+        'success', 'success']
+
+
+@patch('pypyraws.aws.waiters.wait_many')
+@patch('boto3.client')
+def test_aws_wait_initial_response_all_satisfied_bad_complete(
+        mock_boto, mock_wait_many):
+    """Invalid complete raises even when every waiter is satisfied."""
+    mock_boto.return_value = get_ecs_client()
+    context = Context({'awsWaitIn': {
+        'waiters': get_tasks_waiters('RUNNING', 'RUNNING'),
+        'complete': 'some'}})
+
+    with pytest.raises(ValueError) as err:
+        wait.run_step(context)
+
+    assert str(err.value) == 'complete must be all or any, not some.'
+    mock_wait_many.assert_not_called()
+    assert 'awsWaitSkipped' not in context
+    assert 'awsWaitOut' not in context
+
+
+@patch('pypyraws.aws.waiters.wait_many')
+@patch('boto3.client')
+def test_aws_wait_initial_response_any_satisfied(mock_boto,
+                                                 mock_wait_many):
+    """Complete any with one waiter satisfied cancels the others."""
+    mock_boto.return_value = get_ecs_client()
+    context = Context({'awsWaitIn': {
+        'waiters': get_tasks_waiters('PENDING', 'RUNNING'),
+        'complete': 'any'}})
+
+    wait.run_step(context)
+
+    mock_wait_many.assert_not_called()
+    assert context['awsWaitSkipped']
+    assert [out['state'] for out in context['awsWaitOut']] == [
+        'cancelled', 'success']
+
+
+@patch('pypyraws.aws.waiters.wait_many')
+@patch('boto3.client')
+def test_aws_wait_initial_response_any_not_satisfied(mock_boto,
+                                                     mock_wait_many):
+    """Complete any with no waiter satisfied runs them all."""
+    mock_boto.return_value = get_ecs_client()
+    mock_wait_many.return_value = [WaitResult('cancelled', None),
+                                   WaitResult('success', None)]
+    context = Context({'awsWaitIn': {
+        'waiters': get_tasks_waiters('PENDING', 'PENDING'),
+        'complete': 'any'}})
+
+    wait.run_step(context)
+
+    assert len(mock_wait_many.call_args[1]['waiters']) == 2
+    assert not context['awsWaitSkipped']
+
+# ---------------------------- initial response -----------------------------#
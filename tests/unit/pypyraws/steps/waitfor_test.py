@@ -1,8 +1,10 @@
 """waitfor.py unit tests."""
+from botocore.exceptions import ConnectTimeoutError, ReadTimeoutError
 import logging
 from pypyr.context import Context
 from pypyr.errors import KeyNotInContextError
-from pypyraws.errors import WaitTimeOut
+from pypyraws.aws.response import ResponseMatcher
+from pypyraws.errors import WaitFailure, WaitTimeOut
 import pypyraws.steps.waitfor as waitfor_step
 import pytest
 from unittest.mock import call, patch
@@ -62,6 +64,7 @@ def test_waitfor_pass_1st_time_no_client_args(mock_sleep, mock_service):
                                          method_name='method_name',
                                          client_args=None,
                                          operation_args=None,
+                                         session=None,
                                          )
 
 
@@ -109,6 +112,7 @@ def test_waitfor_fail_no_client_args(mock_sleep, mock_service):
                                     method_name='method_name',
                                     client_args=None,
                                     operation_args=None,
+                                    session=None,
                                     )
 
 
@@ -154,6 +158,7 @@ def test_waitfor_fail_no_client_args_no_throw(mock_sleep, mock_service):
                                     method_name='method_name',
                                     client_args=None,
                                     operation_args=None,
+                                    session=None,
                                     )
 
 
@@ -200,6 +205,7 @@ def test_waitfor_pass_client_args(mock_sleep, mock_service):
                                     client_args={'ck1': 'cv1',
                                                  'ck2': 'cv2'},
                                     operation_args=None,
+                                    session=None,
                                     )
     mock_sleep.call_count == 3
     mock_sleep.assert_called_with(30)
@@ -248,6 +254,7 @@ def test_waitfor_pass_method_args(mock_sleep, mock_service):
                                     client_args=None,
                                     operation_args={'mk1': 'mv1',
                                                     'mk2': 'mv2'},
+                                    session=None,
                                     )
     mock_sleep.call_count == 2
     mock_sleep.assert_called_with(30)
@@ -298,6 +305,7 @@ def test_waitfor_pass_all_args(mock_sleep, mock_service):
                                                  'ck2': 'cv2'},
                                     operation_args={'mk1': 'mv1',
                                                     'mk2': 'mv2'},
+                                    session=None,
                                     )
 
 # ---------------------------- run_step -------------------------------------#
@@ -359,6 +367,7 @@ def test_waitfor_substitute_all_args(mock_sleep, mock_service):
                                                  'ck2': 'cv2'},
                                     operation_args={'mk1': 'mv1',
                                                     'mk2v6': 'mv2v7'},
+                                    session=None,
                                     )
 
 
@@ -404,7 +413,8 @@ def test_waitfor_substitute_no_client_meth_args(mock_sleep, mock_service):
     mock_service.assert_called_once_with(service_name='service name v1',
                                          method_name='method_name v2',
                                          client_args=None,
-                                         operation_args=None
+                                         operation_args=None,
+                                         session=None
                                          )
 
 
@@ -453,6 +463,7 @@ def test_aws_waitfor_substitute_no_client_args(mock_sleep, mock_service):
                                          client_args=None,
                                          operation_args={'mk1': 'mv1',
                                                          'mk2v6': 'mv2v7'},
+                                         session=None,
                                          )
 
 
@@ -496,7 +507,8 @@ def test_aws_waitfor_substitute_no_method_args(mock_sleep, mock_service):
                                          method_name='method_name v2',
                                          client_args={'ck1v4': 'cv1v5',
                                                       'ck2': 'cv2'},
-                                         operation_args=None
+                                         operation_args=None,
+                                         session=None
                                          )
 # ---------------------------- substitutions --------------------------------
 
@@ -530,7 +542,8 @@ def test_execute_awsclientmethod_parse_response_top_string(mock_service):
                                          client_args={'ck1': 'cv1',
                                                       'ck2': 'cv2'},
                                          operation_args={'mk1': 'mv1',
-                                                         'mk2': 'mv2'}
+                                                         'mk2': 'mv2'},
+                                         session=None
                                          )
 
 
@@ -562,7 +575,8 @@ def test_execute_awsclientmethod_parse_response_path_float(mock_service):
                                          client_args={'ck1': 'cv1',
                                                       'ck2': 'cv2'},
                                          operation_args={'mk1': 'mv1',
-                                                         'mk2': 'mv2'})
+                                                         'mk2': 'mv2'},
+                                         session=None)
 
 
 @patch('pypyraws.aws.service.operation_exec', return_value={'rk1': 'rv1',
@@ -593,7 +607,8 @@ def test_execute_awsclientmethod_parse_response_path_int(mock_service):
                                          client_args={'ck1': 'cv1',
                                                       'ck2': 'cv2'},
                                          operation_args={'mk1': 'mv1',
-                                                         'mk2': 'mv2'})
+                                                         'mk2': 'mv2'},
+                                         session=None)
 
 
 @patch('pypyraws.aws.service.operation_exec', return_value={'rk1': 'rv1',
@@ -624,7 +639,8 @@ def test_execute_awsclientmethod_parse_response_path_bool_true(mock_service):
                                          client_args={'ck1': 'cv1',
                                                       'ck2': 'cv2'},
                                          operation_args={'mk1': 'mv1',
-                                                         'mk2': 'mv2'})
+                                                         'mk2': 'mv2'},
+                                         session=None)
 
 
 @patch('pypyraws.aws.service.operation_exec', return_value={'rk1': 'rv1',
@@ -655,7 +671,8 @@ def test_execute_awsclientmethod_parse_response_path_bool_false(mock_service):
                                          client_args={'ck1': 'cv1',
                                                       'ck2': 'cv2'},
                                          operation_args={'mk1': 'mv1',
-                                                         'mk2': 'mv2'})
+                                                         'mk2': 'mv2'},
+                                         session=None)
 
 
 @patch('pypyraws.aws.service.operation_exec', return_value={'rk1': 'rv1',
@@ -687,7 +704,8 @@ def test_execute_awsclientmethod_parse_false_path_bool_false(mock_service):
                                          client_args={'ck1': 'cv1',
                                                       'ck2': 'cv2'},
                                          operation_args={'mk1': 'mv1',
-                                                         'mk2': 'mv2'})
+                                                         'mk2': 'mv2'},
+                                         session=None)
 
 
 @patch('pypyraws.aws.service.operation_exec', return_value={'rk1': 'rv1',
@@ -719,7 +737,8 @@ def test_execute_awsclientmethod_parse_false_path_bool_true(mock_service):
                                          client_args={'ck1': 'cv1',
                                                       'ck2': 'cv2'},
                                          operation_args={'mk1': 'mv1',
-                                                         'mk2': 'mv2'})
+                                                         'mk2': 'mv2'},
+                                         session=None)
 
 
 @patch('pypyraws.aws.service.operation_exec', return_value={'rk1': 'rv1',
@@ -750,7 +769,8 @@ def test_execute_awsclientmethod_parse_response_path_dict(mock_service):
                                          client_args={'ck1': 'cv1',
                                                       'ck2': 'cv2'},
                                          operation_args={'mk1': 'mv1',
-                                                         'mk2': 'mv2'}
+                                                         'mk2': 'mv2'},
+                                         session=None
                                          )
 # ----------------------execute_aws_client_method ------------------------
 
@@ -832,3 +852,1008 @@ def test_get_poll_args_substitutions():
     assert max_attempts == 66
     assert not error_on_wait_timeout
 # ----------------------get_poll_args ------------------------------------
+
+# ----------------------get_backoff_args ---------------------------------
+
+
+def test_get_backoff_args_defaults():
+    """No backoff is a fixed poll interval and no timeout."""
+    context = Context({'waitFor': {}})
+
+    backoff, timeout = waitfor_step.get_backoff_args(context['waitFor'],
+                                                     context,
+                                                     12)
+
+    assert repr(backoff) == ("Backoff(initial_delay=12, multiplier=1, "
+                             "max_delay=None, jitter='none')")
+    assert timeout is None
+
+
+def test_get_backoff_args_backoff_defaults():
+    """Empty-ish backoff starts at pollInterval and doubles."""
+    context = Context({'waitFor': {'backoff': {'jitter': 'full'}}})
+
+    backoff, timeout = waitfor_step.get_backoff_args(context['waitFor'],
+                                                     context,
+                                                     12)
+
+    assert repr(backoff) == ("Backoff(initial_delay=12.0, multiplier=2.0, "
+                             "max_delay=None, jitter='full')")
+    assert timeout is None
+
+
+def test_get_backoff_args_substitutions():
+    """All backoff args and timeout substituted."""
+    context = Context({
+        'k1': 0.5,
+        'k2': '3',
+        'k3': 60,
+        'k4': 'decorrelated',
+        'k5': 900,
+        'waitFor': {
+            'backoff': {'initialDelay': '{k1}',
+                        'multiplier': '{k2}',
+                        'maxDelay': '{k3}',
+                        'jitter': '{k4}'},
+            'timeout': '{k5}'}})
+
+    backoff, timeout = waitfor_step.get_backoff_args(context['waitFor'],
+                                                     context,
+                                                     12)
+
+    assert repr(backoff) == ("Backoff(initial_delay=0.5, multiplier=3.0, "
+                             "max_delay=60.0, jitter='decorrelated')")
+    assert timeout == 900.0
+
+
+def test_get_backoff_args_invalid_jitter():
+    """Unknown jitter raises."""
+    context = Context({'waitFor': {'backoff': {'jitter': 'arb'}}})
+
+    with pytest.raises(ValueError):
+        waitfor_step.get_backoff_args(context['waitFor'], context, 12)
+
+# ----------------------get_backoff_args ---------------------------------
+
+# ----------------------backoff and timeout --------------------------------
+
+
+@patch('pypyraws.aws.service.operation_exec')
+@patch('time.sleep')
+def test_waitfor_backoff(mock_sleep, mock_service):
+    """Backoff grows the delay between polls up to maxDelay."""
+    mock_service.side_effect = [{'rk1': 'x'}] * 5 + [{'rk1': 'done'}]
+    context = Context({
+        'awsWaitFor': {
+            'awsClientIn': {
+                'serviceName': 'service name',
+                'methodName': 'method_name'
+            },
+            'waitForField': '{rk1}',
+            'toBe': 'done',
+            'backoff': {'initialDelay': 1, 'maxDelay': 10}
+        }})
+
+    waitfor_step.run_step(context)
+
+    assert not context['awsWaitForTimedOut']
+    assert mock_service.call_count == 6
+    assert mock_sleep.call_args_list == [((1.0,),), ((2.0,),), ((4.0,),),
+                                         ((8.0,),), ((10.0,),)]
+
+
+@patch('pypyraws.aws.service.operation_exec', return_value={'rk1': 'x'})
+@patch('time.sleep')
+@patch('time.monotonic')
+def test_waitfor_timeout_no_max_attempts(mock_clock,
+                                         mock_sleep,
+                                         mock_service):
+    """Timeout without maxAttempts polls until the deadline."""
+    now = [0]
+    mock_clock.side_effect = lambda: now[0]
+    mock_sleep.side_effect = lambda seconds: now.__setitem__(
+        0, now[0] + seconds)
+
+    context = Context({
+        'awsWaitFor': {
+            'awsClientIn': {
+                'serviceName': 'service name',
+                'methodName': 'method_name'
+            },
+            'waitForField': '{rk1}',
+            'toBe': 'done',
+            'pollInterval': 30,
+            'timeout': 400
+        }})
+
+    with pytest.raises(WaitTimeOut) as err_info:
+        waitfor_step.run_step(context)
+
+    assert str(err_info.value) == ("aws service name method_name did not "
+                                   "return done within 400.0 seconds.")
+    assert context['awsWaitForTimedOut']
+    # 0, 30 ... 390, 400: more than the default 10 maxAttempts
+    assert mock_service.call_count == 15
+    assert now[0] == 400
+
+    # per-call timeouts shrink with the time left.
+    configs = [call.kwargs['client_args']['config']
+               for call in mock_service.call_args_list]
+    assert configs[0] == {'connect_timeout': 60,
+                          'read_timeout': 60,
+                          'retries': {'total_max_attempts': 5}}
+    assert configs[-2] == {'connect_timeout': 10,
+                           'read_timeout': 10,
+                           'retries': {'total_max_attempts': 1}}
+    assert configs[-1] == {'connect_timeout': 1,
+                           'read_timeout': 1,
+                           'retries': {'total_max_attempts': 1}}
+
+
+@patch('pypyraws.aws.service.operation_exec')
+@patch('time.sleep')
+def test_waitfor_timeout_caps_client_args(mock_sleep, mock_service):
+    """Timeout keeps clientArgs and lower timeouts already in config."""
+    mock_service.side_effect = [{'rk1': 'x'}, {'rk1': 'done'}]
+    context = Context({
+        'awsWaitFor': {
+            'awsClientIn': {
+                'serviceName': 'service name',
+                'methodName': 'method_name',
+                'clientArgs': {'region_name': 'r',
+                               'config': {'read_timeout': 3}}
+            },
+            'waitForField': '{rk1}',
+            'toBe': 'done',
+            'timeout': 25
+        }})
+
+    waitfor_step.run_step(context)
+
+    assert not context['awsWaitForTimedOut']
+    assert mock_service.call_count == 2
+    assert mock_service.call_args_list[0].kwargs['client_args'] == {
+        'region_name': 'r',
+        'config': {'connect_timeout': 20,
+                   'read_timeout': 3,
+                   'retries': {'total_max_attempts': 1}}}
+    assert context['awsWaitFor']['awsClientIn']['clientArgs'] == {
+        'region_name': 'r', 'config': {'read_timeout': 3}}
+
+
+@patch('pypyraws.aws.service.operation_exec')
+@patch('time.sleep')
+def test_waitfor_timeout_call_timed_out(mock_sleep, mock_service):
+    """A call that times out with a deadline is an unsuccessful poll."""
+    mock_service.side_effect = [
+        ReadTimeoutError(endpoint_url='https://arb'),
+        ConnectTimeoutError(endpoint_url='https://arb'),
+        {'rk1': 'done'}]
+    context = Context({
+        'awsWaitFor': {
+            'awsClientIn': {
+                'serviceName': 'service name',
+                'methodName': 'method_name'
+            },
+            'waitForField': '{rk1}',
+            'toBe': 'done',
+            'pollInterval': 1,
+            'timeout': 60
+        }})
+
+    logger = logging.getLogger('pypyraws.steps.waitfor')
+    with patch.object(logger, 'warning') as mock_logger_warning:
+        waitfor_step.run_step(context)
+
+    assert not context['awsWaitForTimedOut']
+    assert mock_service.call_count == 3
+    assert mock_logger_warning.call_count == 2
+    assert mock_logger_warning.call_args_list[0].args[0].startswith(
+        'aws service name method_name timed out: Read timeout')
+
+
+@patch('pypyraws.aws.service.operation_exec')
+def test_waitfor_call_timed_out_no_deadline(mock_service):
+    """Without timeout, a call that times out raises."""
+    mock_service.side_effect = ReadTimeoutError(endpoint_url='https://arb')
+    context = Context({
+        'awsWaitFor': {
+            'awsClientIn': {
+                'serviceName': 'service name',
+                'methodName': 'method_name'
+            },
+            'waitForField': '{rk1}',
+            'toBe': 'done'
+        }})
+
+    with pytest.raises(ReadTimeoutError):
+        waitfor_step.run_step(context)
+
+    assert mock_service.call_count == 1
+
+
+@patch('pypyraws.aws.service.operation_exec', return_value={'rk1': 'x'})
+@patch('time.sleep')
+def test_waitfor_timeout_with_max_attempts(mock_sleep, mock_service):
+    """Timeout still stops at maxAttempts."""
+    context = Context({
+        'awsWaitFor': {
+            'awsClientIn': {
+                'serviceName': 'service name',
+                'methodName': 'method_name'
+            },
+            'waitForField': '{rk1}',
+            'toBe': 'done',
+            'maxAttempts': 3,
+            'timeout': 1000,
+            'errorOnWaitTimeout': False
+        }})
+
+    waitfor_step.run_step(context)
+
+    assert context['awsWaitForTimedOut']
+    assert mock_service.call_count == 3
+    assert mock_sleep.call_count == 2
+
+# ----------------------backoff and timeout --------------------------------
+
+# ----------------------waitForQuery -------------------------------------
+
+
+@patch('pypyraws.aws.service.operation_exec')
+@patch('time.sleep')
+def test_waitfor_query_path_all(mock_sleep, mock_service):
+    """Query with pathAll waits for every item."""
+    mock_service.side_effect = [
+        {'tasks': [{'lastStatus': 'STOPPED'}, {'lastStatus': 'RUNNING'}]},
+        {'tasks': [{'lastStatus': 'STOPPED'}, {'lastStatus': 'STOPPED'}]}]
+    context = Context({
+        'status': 'STOPPED',
+        'awsWaitFor': {
+            'awsClientIn': {
+                'serviceName': 'ecs',
+                'methodName': 'describe_tasks'
+            },
+            'waitForQuery': 'tasks[].lastStatus',
+            'matcher': 'pathAll',
+            'toBe': '{status}'
+        }})
+
+    with patch('pypyraws.steps.waitfor.ResponseMatcher',
+               wraps=ResponseMatcher) as mock_matcher:
+        waitfor_step.run_step(context)
+
+    assert not context['awsWaitForTimedOut']
+    assert mock_service.call_count == 2
+    mock_sleep.assert_called_once_with(30)
+    # compiles once, not per poll
+    mock_matcher.assert_called_once_with('STOPPED',
+                                         query='tasks[].lastStatus',
+                                         matcher='pathAll')
+
+
+@patch('pypyraws.aws.service.operation_exec',
+       return_value={'count': 3, 'ready': True})
+def test_waitfor_query_typed_int(mock_service):
+    """Query compares int toBe as int."""
+    context = Context({
+        'awsWaitFor': {
+            'awsClientIn': {
+                'serviceName': 'svc',
+                'methodName': 'method'
+            },
+            'waitForQuery': 'count',
+            'toBe': 3
+        }})
+
+    waitfor_step.run_step(context)
+
+    assert not context['awsWaitForTimedOut']
+
+
+@patch('pypyraws.aws.service.operation_exec', return_value={'count': 3})
+@patch('time.sleep')
+def test_waitfor_query_typed_str_no_match(mock_sleep, mock_service):
+    """Query doesn't match str toBe against int."""
+    context = Context({
+        'awsWaitFor': {
+            'awsClientIn': {
+                'serviceName': 'svc',
+                'methodName': 'method'
+            },
+            'waitForQuery': 'count',
+            'toBe': '3',
+            'maxAttempts': 2,
+            'errorOnWaitTimeout': False
+        }})
+
+    waitfor_step.run_step(context)
+
+    assert context['awsWaitForTimedOut']
+
+
+def test_get_matcher_field():
+    """Field matcher from waitForField."""
+    context = Context({'waitFor': {'waitForField': '{a}'}})
+
+    matcher = waitfor_step.get_matcher(context['waitFor'],
+                                       context,
+                                       '{a}',
+                                       'x')
+
+    assert repr(matcher) == "ResponseMatcher(path {a} == 'x')"
+
+
+def test_get_matcher_query_substitutions():
+    """Query and matcher substituted."""
+    context = Context({'q': 'a[]',
+                       'm': 'pathAny',
+                       'waitFor': {'waitForQuery': '{q}',
+                                   'matcher': '{m}'}})
+
+    matcher = waitfor_step.get_matcher(context['waitFor'],
+                                       context,
+                                       None,
+                                       1)
+
+    assert repr(matcher) == "ResponseMatcher(pathAny a[] == 1)"
+
+
+def test_get_matcher_neither():
+    """Neither waitForField nor waitForQuery raises."""
+    context = Context({'waitFor': {}})
+
+    with pytest.raises(KeyNotInContextError) as err_info:
+        waitfor_step.get_matcher(context['waitFor'], context, None, 1)
+
+    assert str(err_info.value) == ("awsWaitFor for pypyraws.steps.waitfor "
+                                   "needs waitForField or waitForQuery.")
+
+
+def test_get_matcher_both():
+    """Both waitForField and waitForQuery raises."""
+    context = Context({'waitFor': {'waitForField': '{a}',
+                                   'waitForQuery': 'a'}})
+
+    with pytest.raises(ValueError) as err_info:
+        waitfor_step.get_matcher(context['waitFor'], context, '{a}', 1)
+
+    assert str(err_info.value) == ("awsWaitFor for pypyraws.steps.waitfor "
+                                   "can have waitForField or waitForQuery, "
+                                   "not both.")
+
+# ----------------------waitForQuery -------------------------------------
+
+# ----------------------acceptors ----------------------------------------
+
+
+@patch('pypyraws.aws.service.operation_exec')
+@patch('time.sleep')
+def test_waitfor_fail_when_exits_early(mock_sleep, mock_service):
+    """Raise as soon as the failure value shows up."""
+    mock_service.side_effect = [
+        {'tasks': [{'lastStatus': 'PENDING'}, {'lastStatus': 'RUNNING'}]},
+        {'tasks': [{'lastStatus': 'STOPPED'}, {'lastStatus': 'RUNNING'}]},
+        {'tasks': [{'lastStatus': 'RUNNING'}, {'lastStatus': 'RUNNING'}]}]
+    context = Context({
+        'awsWaitFor': {
+            'awsClientIn': {
+                'serviceName': 'ecs',
+                'methodName': 'describe_tasks'
+            },
+            'waitForQuery': 'tasks[].lastStatus',
+            'matcher': 'pathAll',
+            'toBe': 'RUNNING',
+            'failWhen': ['STOPPED', 'DEPROVISIONING']
+        }})
+
+    with pytest.raises(WaitFailure) as err_info:
+        waitfor_step.run_step(context)
+
+    assert str(err_info.value) == (
+        "aws ecs describe_tasks reached failure state: tasks[].lastStatus is "
+        "'STOPPED' (pathAny).")
+    assert mock_service.call_count == 2
+    mock_sleep.assert_called_once_with(30)
+    assert context['awsWaitForAcceptor'] == {
+        'state': 'failure',
+        'matcher': 'pathAny',
+        'expression': 'tasks[].lastStatus',
+        'expected': 'STOPPED'}
+    assert 'awsWaitForTimedOut' not in context
+
+
+@patch('pypyraws.aws.service.operation_exec')
+@patch('time.sleep')
+def test_waitfor_fail_when_field_single_value(mock_sleep, mock_service):
+    """Fail values work with waitForField and a single value."""
+    mock_service.side_effect = [{'Stacks': [{'StackStatus': 'X'}]},
+                                {'Stacks': [{'StackStatus': 'CREATE_DONE'}]}]
+    context = Context({
+        'fail': 'ROLLBACK_COMPLETE',
+        'awsWaitFor': {
+            'awsClientIn': {
+                'serviceName': 'cloudformation',
+                'methodName': 'describe_stacks'
+            },
+            'waitForField': '{Stacks[0][StackStatus]}',
+            'toBe': 'CREATE_DONE',
+            'failWhen': '{fail}'
+        }})
+
+    waitfor_step.run_step(context)
+
+    assert not context['awsWaitForTimedOut']
+    assert context['awsWaitForAcceptor'] == {
+        'state': 'success',
+        'matcher': 'path',
+        'expression': '{Stacks[0][StackStatus]}',
+        'expected': 'CREATE_DONE'}
+
+
+@patch('pypyraws.aws.service.operation_exec')
+@patch('time.sleep')
+def test_waitfor_acceptors_in_order(mock_sleep, mock_service):
+    """First matching acceptor wins and retry skips later acceptors."""
+    mock_service.side_effect = [
+        # retry wins over failure after it
+        {'status': 'UPDATING', 'ok': False},
+        # nothing matches
+        {'status': 'OTHER', 'ok': False},
+        # success
+        {'status': 'DONE', 'ok': True}]
+    context = Context({
+        'awsWaitFor': {
+            'awsClientIn': {
+                'serviceName': 'svc',
+                'methodName': 'method'
+            },
+            'acceptors': [
+                {'state': 'retry', 'expected': 'UPDATING', 'query': 'status'},
+                {'state': 'success', 'expected': True, 'query': 'ok'},
+                {'state': 'failure', 'expected': False, 'query': 'ok',
+                 'matcher': 'path'}],
+            'maxAttempts': 5
+        }})
+
+    logger = logging.getLogger('pypyraws.steps.waitfor')
+    with patch.object(logger, 'info') as mock_logger_info:
+        with pytest.raises(WaitFailure):
+            waitfor_step.run_step(context)
+
+    assert mock_service.call_count == 2
+    assert context['awsWaitForAcceptor']['state'] == 'failure'
+    # ok only evaluated once even though two acceptors use it
+    assert mock_logger_info.mock_calls == [
+        call('status in aws response is: UPDATING'),
+        call('status in aws response is: OTHER'),
+        call('ok in aws response is: False')]
+
+
+@patch('pypyraws.aws.service.operation_exec', return_value={'a': 'x'})
+@patch('time.sleep')
+def test_waitfor_acceptors_no_to_be_timeout(mock_sleep, mock_service):
+    """Success acceptor without toBe times out with generic message."""
+    context = Context({
+        'awsWaitFor': {
+            'awsClientIn': {
+                'serviceName': 'svc',
+                'methodName': 'method'
+            },
+            'acceptors': [{'state': 'success',
+                           'expected': 'y',
+                           'field': '{a}'}],
+            'maxAttempts': 2
+        }})
+
+    with pytest.raises(WaitTimeOut) as err_info:
+        waitfor_step.run_step(context)
+
+    assert str(err_info.value) == ("aws svc method did not return a success "
+                                   "state within 2 retries.")
+    assert context['awsWaitForAcceptor'] is None
+
+
+def test_get_acceptors_order_and_substitutions():
+    """Acceptors, then toBe, then failWhen."""
+    context = Context({
+        'k1': 'retry',
+        'k2': 'pathAny',
+        'waitFor': {
+            'waitForQuery': 'a[]',
+            'acceptors': [{'state': '{k1}',
+                           'expected': 1,
+                           'query': 'b[]',
+                           'matcher': '{k2}'}],
+            'failWhen': [2, 3]}})
+
+    acceptors = waitfor_step.get_acceptors(context['waitFor'],
+                                           context,
+                                           None,
+                                           0)
+
+    assert [repr(acceptor) for acceptor in acceptors] == [
+        'Acceptor(retry when ResponseMatcher(pathAny b[] == 1))',
+        'Acceptor(success when ResponseMatcher(path a[] == 0))',
+        'Acceptor(failure when ResponseMatcher(path a[] == 2))',
+        'Acceptor(failure when ResponseMatcher(path a[] == 3))']
+
+
+def test_get_acceptors_no_success():
+    """At least one success acceptor."""
+    context = Context({
+        'waitFor': {
+            'waitForQuery': 'a',
+            'failWhen': 1}})
+
+    with pytest.raises(KeyNotInContextError) as err_info:
+        waitfor_step.get_acceptors(context['waitFor'], context, None, None)
+
+    assert str(err_info.value) == ("awsWaitFor for pypyraws.steps.waitfor "
+                                   "needs toBe or a success acceptor.")
+
+
+def test_get_acceptors_missing_key():
+    """Acceptor without expected raises."""
+    context = Context({
+        'waitFor': {
+            'acceptors': [{'state': 'success', 'query': 'a'}]}})
+
+    with pytest.raises(KeyNotInContextError) as err_info:
+        waitfor_step.get_acceptors(context['waitFor'], context, None, None)
+
+    assert str(err_info.value) == ("awsWaitFor acceptors for "
+                                   "pypyraws.steps.waitfor missing required "
+                                   "key: 'expected'")
+
+# ----------------------acceptors ----------------------------------------
+
+# ----------------------resourceIds --------------------------------------
+
+
+def get_instances(*instances):
+    """Get describe_instances response for (id, state) instances."""
+    return {'Reservations': [
+        {'Instances': [{'InstanceId': instance_id,
+                        'State': {'Name': state}}
+                       for instance_id, state in instances]}]}
+
+
+def get_resources_context(**kwargs):
+    """Get context to wait for five ec2 instances to run."""
+    return Context({
+        'ids': ['i-1', 'i-2', 'i-3', 'i-4', 'i-5'],
+        'awsWaitFor': {
+            'awsClientIn': {
+                'serviceName': 'ec2',
+                'methodName': 'describe_instances',
+                'methodArgs': {'DryRun': False}
+            },
+            'resourceIds': '{ids}',
+            'resourceIdsKey': 'InstanceIds',
+            'itemsQuery': 'Reservations[].Instances[]',
+            'resourceIdQuery': 'InstanceId',
+            'batchSize': 2,
+            'waitForQuery': 'State.Name',
+            'toBe': 'running',
+            **kwargs
+        }})
+
+
+def describe_instances(states):
+    """Fake describe_instances that looks up state per poll."""
+    def operation_exec(service_name,
+                       method_name,
+                       client_args,
+                       operation_args,
+                       session):
+        return get_instances(*[(instance_id, states[instance_id])
+                               for instance_id in operation_args[
+                                   'InstanceIds']])
+    return operation_exec
+
+
+@patch('pypyraws.aws.service.operation_exec')
+@patch('time.sleep')
+def test_waitfor_resources_batched(mock_sleep, mock_service):
+    """Batches ids, drops finished resources from later polls."""
+    states = {'i-1': 'pending',
+              'i-2': 'running',
+              'i-3': 'pending',
+              'i-4': 'running',
+              'i-5': 'running'}
+    mock_service.side_effect = describe_instances(states)
+
+    def sleep(seconds):
+        states.update({'i-1': 'running', 'i-3': 'running'})
+
+    mock_sleep.side_effect = sleep
+    context = get_resources_context()
+
+    waitfor_step.run_step(context)
+
+    assert not context['awsWaitForTimedOut']
+    assert context['awsWaitForResources'] == {'i-1': 'success',
+                                              'i-2': 'success',
+                                              'i-3': 'success',
+                                              'i-4': 'success',
+                                              'i-5': 'success'}
+    asked_for = [c.kwargs['operation_args']['InstanceIds']
+                 for c in mock_service.call_args_list]
+    assert sorted(asked_for) == [['i-1', 'i-2'],
+                                 ['i-1', 'i-3'],
+                                 ['i-3', 'i-4'],
+                                 ['i-5']]
+    assert mock_service.call_args_list[0].kwargs['operation_args'][
+        'DryRun'] is False
+    mock_sleep.assert_called_once_with(30)
+
+
+@patch('pypyraws.aws.service.operation_exec')
+@patch('time.sleep')
+def test_waitfor_resources_failure(mock_sleep, mock_service):
+    """1 resource in a failure state fails the wait at once."""
+    states = {'i-1': 'running',
+              'i-2': 'pending',
+              'i-3': 'terminated',
+              'i-4': 'pending',
+              'i-5': 'pending'}
+    mock_service.side_effect = describe_instances(states)
+    context = get_resources_context(failWhen=['terminated'])
+
+    with pytest.raises(WaitFailure) as err_info:
+        waitfor_step.run_step(context)
+
+    assert str(err_info.value) == (
+        "aws ec2 describe_instances i-3 reached failure state: State.Name is "
+        "'terminated' (path).")
+    assert context['awsWaitForResources']['i-3'] == 'failure'
+    assert context['awsWaitForResources']['i-2'] == 'pending'
+    assert context['awsWaitForAcceptor']['state'] == 'failure'
+    mock_sleep.assert_not_called()
+
+
+@patch('pypyraws.aws.service.operation_exec')
+@patch('time.sleep')
+def test_waitfor_resources_timeout(mock_sleep, mock_service):
+    """Missing and unfinished resources stay pending."""
+    mock_service.side_effect = lambda **kwargs: get_instances(
+        ('i-1', 'running'), ('i-2', 'pending'))
+    context = get_resources_context(maxAttempts=2,
+                                    batchSize='100',
+                                    errorOnWaitTimeout=False)
+
+    waitfor_step.run_step(context)
+
+    assert context['awsWaitForTimedOut']
+    assert context['awsWaitForResources'] == {'i-1': 'success',
+                                              'i-2': 'pending',
+                                              'i-3': 'pending',
+                                              'i-4': 'pending',
+                                              'i-5': 'pending'}
+    assert mock_service.call_count == 2
+    assert mock_service.call_args_list[1].kwargs['operation_args'] == {
+        'DryRun': False, 'InstanceIds': ['i-2', 'i-3', 'i-4', 'i-5']}
+
+
+@patch('pypyraws.aws.service.operation_exec')
+def test_waitfor_resources_retry_acceptor(mock_service):
+    """Retry acceptor keeps a resource pending."""
+    mock_service.side_effect = [get_instances(('i-1', 'shutting-down')),
+                                get_instances(('i-1', 'stopped'))]
+    context = Context({
+        'awsWaitFor': {
+            'awsClientIn': {
+                'serviceName': 'ec2',
+                'methodName': 'describe_instances'
+            },
+            'resourceIds': ['i-1'],
+            'resourceIdsKey': 'InstanceIds',
+            'itemsQuery': 'Reservations[].Instances[]',
+            'resourceIdQuery': 'InstanceId',
+            'acceptors': [{'state': 'retry',
+                           'expected': 'shutting-down',
+                           'query': 'State.Name'},
+                          {'state': 'success',
+                           'expected': 'stopped',
+                           'query': 'State.Name'}],
+            'pollInterval': 0
+        }})
+
+    waitfor_step.run_step(context)
+
+    assert context['awsWaitForResources'] == {'i-1': 'success'}
+    assert context['awsWaitForAcceptor']['expected'] == 'stopped'
+
+
+def test_get_resource_tracker_none():
+    """No resourceIds, no tracker."""
+    context = Context({'waitFor': {}})
+    assert waitfor_step.get_resource_tracker(context['waitFor'],
+                                             context) is None
+
+
+def test_get_resource_tracker_missing_key():
+    """Resource ids need their query keys."""
+    context = Context({'waitFor': {'resourceIds': ['a'],
+                                   'resourceIdsKey': 'k',
+                                   'itemsQuery': 'items'}})
+
+    with pytest.raises(KeyNotInContextError) as err_info:
+        waitfor_step.get_resource_tracker(context['waitFor'], context)
+
+    assert str(err_info.value) == ("awsWaitFor with resourceIds for "
+                                   "pypyraws.steps.waitfor missing required "
+                                   "key: 'resourceIdQuery'")
+
+# ----------------------resourceIds --------------------------------------
+
+# ----------------------compileWaiter ------------------------------------
+
+
+def get_stubbed_ecs():
+    """Get real ecs client and its stubber."""
+    import boto3
+    from botocore.stub import Stubber
+
+    client = boto3.session.Session().client('ecs',
+                                            region_name='us-east-1',
+                                            aws_access_key_id='arb',
+                                            aws_secret_access_key='arb')
+    return client, Stubber(client)
+
+
+def get_tasks(*statuses):
+    """Get describe_tasks response with a task per status."""
+    return {'tasks': [{'taskArn': f'arn{i}', 'lastStatus': status}
+                      for i, status in enumerate(statuses)]}
+
+
+def get_compile_context(**kwargs):
+    """Get awsWaitFor context for compileWaiter on ecs describe_tasks."""
+    return Context({
+        'awsWaitFor': {
+            'awsClientIn': {
+                'serviceName': 'ecs',
+                'methodName': 'describe_tasks',
+                'methodArgs': {'tasks': ['arn0', 'arn1']}
+            },
+            'waitForQuery': 'tasks[].lastStatus',
+            'matcher': 'pathAll',
+            'toBe': 'STOPPED',
+            'pollInterval': 0,
+            'compileWaiter': True,
+            **kwargs
+        }})
+
+
+@patch('boto3.client')
+def test_waitfor_compile_waiter_success(mock_boto):
+    """Compiled waiter polls with one cached client until success."""
+    client, stubber = get_stubbed_ecs()
+    mock_boto.return_value = client
+    stubber.add_response('describe_tasks', get_tasks('RUNNING', 'STOPPED'),
+                         {'tasks': ['arn0', 'arn1']})
+    stubber.add_response('describe_tasks', get_tasks('STOPPED', 'STOPPED'),
+                         {'tasks': ['arn0', 'arn1']})
+    context = get_compile_context()
+
+    with stubber:
+        waitfor_step.run_step(context)
+
+    stubber.assert_no_pending_responses()
+    assert not context['awsWaitForTimedOut']
+    mock_boto.assert_called_once_with('ecs')
+
+
+@patch('boto3.client')
+def test_waitfor_compile_waiter_fail_when(mock_boto):
+    """Compiled failure acceptor raises WaitFailure."""
+    client, stubber = get_stubbed_ecs()
+    mock_boto.return_value = client
+    stubber.add_response('describe_tasks', get_tasks('RUNNING', 'RUNNING'))
+    stubber.add_response('describe_tasks', get_tasks('STOPPED', 'STUCK'))
+    context = get_compile_context(failWhen=['STUCK'])
+
+    with stubber:
+        with pytest.raises(WaitFailure) as err_info:
+            waitfor_step.run_step(context)
+
+    assert str(err_info.value) == (
+        "aws ecs describe_tasks reached failure state: tasks[].lastStatus "
+        "is 'STUCK' (pathAny).")
+    assert context['awsWaitForAcceptor'] == {'state': 'failure',
+                                             'matcher': 'pathAny',
+                                             'expression':
+                                                 'tasks[].lastStatus',
+                                             'expected': 'STUCK'}
+
+
+@patch('boto3.client')
+def test_waitfor_compile_waiter_max_attempts(mock_boto):
+    """Compiled waiter out of attempts times out."""
+    client, stubber = get_stubbed_ecs()
+    mock_boto.return_value = client
+    stubber.add_response('describe_tasks', get_tasks('RUNNING'))
+    stubber.add_response('describe_tasks', get_tasks('RUNNING'))
+    context = get_compile_context(maxAttempts=2)
+
+    with stubber:
+        with pytest.raises(WaitTimeOut) as err_info:
+            waitfor_step.run_step(context)
+
+    assert str(err_info.value) == ("aws ecs describe_tasks did not return "
+                                   "STOPPED within 2 retries.")
+    assert context['awsWaitForTimedOut']
+
+
+@patch('boto3.client')
+def test_waitfor_compile_waiter_timeout(mock_boto):
+    """Compiled waiter cancels at timeout with capped call timeouts."""
+    client, stubber = get_stubbed_ecs()
+    mock_boto.return_value = client
+    stubber.add_response('describe_tasks', get_tasks('RUNNING'))
+    context = get_compile_context(pollInterval=60,
+                                  timeout=0.05,
+                                  errorOnWaitTimeout=False)
+
+    with stubber:
+        waitfor_step.run_step(context)
+
+    assert context['awsWaitForTimedOut']
+    config = mock_boto.call_args.kwargs['config']
+    assert (config.connect_timeout, config.read_timeout) == (1, 1)
+    assert config.retries == {'total_max_attempts': 1}
+
+
+@patch('boto3.client')
+def test_waitfor_compile_waiter_error_response(mock_boto):
+    """Error response that no acceptor matches raises WaiterError."""
+    from botocore.exceptions import WaiterError
+
+    client, stubber = get_stubbed_ecs()
+    mock_boto.return_value = client
+    stubber.add_client_error('describe_tasks', 'ClusterNotFoundException')
+    context = get_compile_context()
+
+    with stubber:
+        with pytest.raises(WaiterError):
+            waitfor_step.run_step(context)
+
+
+@pytest.mark.parametrize('extra', [{'backoff': {'multiplier': 2}},
+                                   {'resourceIds': ['a'],
+                                    'resourceIdsKey': 'tasks',
+                                    'itemsQuery': 'tasks',
+                                    'resourceIdQuery': 'taskArn'}])
+def test_waitfor_compile_waiter_unsupported(extra):
+    """Backoff and resourceIds can't compile."""
+    with pytest.raises(ValueError) as err_info:
+        waitfor_step.run_step(get_compile_context(**extra))
+
+    assert str(err_info.value) == (
+        "awsWaitFor for pypyraws.steps.waitfor can't compile resourceIds or "
+        "backoff into a botocore waiter.")
+
+
+@patch('pypyraws.aws.service.get_client')
+def test_waitfor_compile_waiter_field(mock_get_client):
+    """A waitForField can't compile."""
+    context = Context({
+        'awsWaitFor': {
+            'awsClientIn': {
+                'serviceName': 'ecs',
+                'methodName': 'describe_tasks'
+            },
+            'waitForField': '{tasks}',
+            'toBe': 'STOPPED',
+            'compileWaiter': True
+        }})
+
+    with pytest.raises(ValueError) as err_info:
+        waitfor_step.run_step(context)
+
+    assert str(err_info.value) == ("botocore waiters need a JMESPath query, "
+                                   "not field {tasks}.")
+
+# ----------------------compileWaiter ------------------------------------
+
+# ----------------------scheduler ----------------------------------------
+
+
+def get_scheduler_context(**kwargs):
+    """Get awsWaitFor context that polls on the scheduler."""
+    return Context({
+        'awsWaitFor': {
+            'awsClientIn': {
+                'serviceName': 'service name',
+                'methodName': 'method_name',
+                'methodArgs': {'k': 'v'}
+            },
+            'waitForQuery': 'status',
+            'toBe': 'done',
+            'pollInterval': 0,
+            'scheduler': True,
+            **kwargs
+        }})
+
+
+@patch('pypyraws.aws.service.operation_exec')
+def test_waitfor_scheduler_success(mock_service):
+    """Scheduler polls until toBe."""
+    mock_service.side_effect = [{'status': 'x'}, {'status': 'done'}]
+    context = get_scheduler_context()
+
+    waitfor_step.run_step(context)
+
+    assert not context['awsWaitForTimedOut']
+    assert mock_service.call_count == 2
+    mock_service.assert_called_with(service_name='service name',
+                                    method_name='method_name',
+                                    client_args=None,
+                                    operation_args={'k': 'v'},
+                                    session=None)
+
+
+@patch('pypyraws.aws.service.operation_exec', return_value={'status': 'x'})
+def test_waitfor_scheduler_max_attempts(mock_service):
+    """Scheduler out of attempts times out."""
+    context = get_scheduler_context(maxAttempts=3, errorOnWaitTimeout=False)
+
+    waitfor_step.run_step(context)
+
+    assert context['awsWaitForTimedOut']
+    assert mock_service.call_count == 3
+
+
+@patch('pypyraws.aws.service.operation_exec')
+def test_waitfor_scheduler_fail_when(mock_service):
+    """Scheduler raises failure from the check on the caller."""
+    mock_service.side_effect = [{'status': 'x'}, {'status': 'bad'}]
+    context = get_scheduler_context(failWhen='bad')
+
+    with pytest.raises(WaitFailure):
+        waitfor_step.run_step(context)
+
+    assert context['awsWaitForAcceptor']['state'] == 'failure'
+
+
+@patch('pypyraws.aws.service.operation_exec', return_value={'status': 'x'})
+def test_waitfor_scheduler_timeout_caps_client_args(mock_service):
+    """Scheduler with timeout caps call timeouts at the time left."""
+    context = get_scheduler_context(timeout=0.05,
+                                    pollInterval=0.01,
+                                    errorOnWaitTimeout=False)
+
+    waitfor_step.run_step(context)
+
+    assert context['awsWaitForTimedOut']
+    assert mock_service.call_args.kwargs['client_args'] == {
+        'config': {'connect_timeout': 1,
+                   'read_timeout': 1,
+                   'retries': {'total_max_attempts': 1}}}
+
+
+@patch('pypyraws.aws.service.operation_exec',
+       side_effect=ReadTimeoutError(endpoint_url='https://arb'))
+def test_waitfor_scheduler_call_timed_out(mock_service):
+    """Scheduler call timing out is an unsuccessful poll, not an error."""
+    context = get_scheduler_context(timeout=0.05, pollInterval=0.01)
+
+    with pytest.raises(WaitTimeOut):
+        waitfor_step.run_step(context)
+
+    assert context['awsWaitForTimedOut']
+    assert mock_service.call_count >= 2
+
+
+def test_waitfor_scheduler_unsupported():
+    """Scheduler with compileWaiter raises."""
+    with pytest.raises(ValueError) as err_info:
+        waitfor_step.run_step(get_scheduler_context(compileWaiter=True))
+
+    assert str(err_info.value) == (
+        "awsWaitFor for pypyraws.steps.waitfor can't use the scheduler with "
+        "resourceIds or compileWaiter.")
+
+# ----------------------scheduler ----------------------------------------
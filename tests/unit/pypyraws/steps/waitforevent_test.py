@@ -0,0 +1,164 @@
+"""waitforevent.py unit tests."""
+from unittest.mock import patch
+from pypyr.context import Context
+from pypyr.errors import KeyInContextHasNoValueError, KeyNotInContextError
+from pypyraws.errors import WaitTimeOut
+import pypyraws.steps.waitforevent as waitforevent_step
+import pytest
+
+# ---------------------------- run_step -------------------------------------#
+
+
+def test_waitforevent_missing_awswaitforevent():
+    """Missing awsWaitForEvent raises."""
+    with pytest.raises(KeyNotInContextError) as err_info:
+        waitforevent_step.run_step(Context({'k1': 'v1'}))
+
+    assert str(err_info.value) == (
+        "context['awsWaitForEvent'] doesn't exist. It must exist for "
+        "pypyraws.steps.waitforevent.")
+
+
+def test_waitforevent_missing_queue_url():
+    """Missing queueUrl raises."""
+    context = Context({'awsWaitForEvent': {'match': {'a': 'b'}}})
+
+    with pytest.raises(KeyNotInContextError) as err_info:
+        waitforevent_step.run_step(context)
+
+    assert str(err_info.value) == (
+        "context['awsWaitForEvent']['queueUrl'] doesn't exist. It must exist "
+        "for pypyraws.steps.waitforevent.")
+
+
+def test_waitforevent_match_none():
+    """Match None raises."""
+    context = Context({'awsWaitForEvent': {'queueUrl': 'url',
+                                           'match': None}})
+
+    with pytest.raises(KeyInContextHasNoValueError):
+        waitforevent_step.run_step(context)
+
+
+@patch('pypyraws.aws.events.receive_event', return_value={'e': 1})
+def test_waitforevent_match_defaults(mock_receive):
+    """Matching event saves to context with default args."""
+    context = Context({'awsWaitForEvent': {'queueUrl': 'url',
+                                           'match': {'source': ['aws.ecs']}}})
+
+    waitforevent_step.run_step(context)
+
+    mock_receive.assert_called_once_with(queue_url='url',
+                                         pattern={'source': ['aws.ecs']},
+                                         timeout=300.0,
+                                         wait_time_seconds=20,
+                                         delete_matched=True,
+                                         delete_unmatched=False,
+                                         client_args=None,
+                                         session=None)
+    assert context['awsWaitForEventOut'] == {'e': 1}
+    assert not context['awsWaitForEventTimedOut']
+
+
+@patch('pypyraws.aws.events.receive_event', return_value={'e': 1})
+def test_waitforevent_all_args_substitutions(mock_receive):
+    """All args format from context."""
+    context = Context({
+        'arn': 'arn1',
+        'url': 'queue url',
+        'awsSessionOut': 'session',
+        'awsWaitForEvent': {
+            'queueUrl': '{url}',
+            'match': {'detail': {'taskArn': ['{arn}']}},
+            'clientArgs': {'endpoint_url': 'http://localhost:9324'},
+            'timeout': '60',
+            'waitTimeSeconds': '5',
+            'deleteMatched': False,
+            'deleteUnmatched': True}})
+
+    waitforevent_step.run_step(context)
+
+    mock_receive.assert_called_once_with(
+        queue_url='queue url',
+        pattern={'detail': {'taskArn': ['arn1']}},
+        timeout=60.0,
+        wait_time_seconds=5,
+        delete_matched=False,
+        delete_unmatched=True,
+        client_args={'endpoint_url': 'http://localhost:9324'},
+        session='session')
+
+
+@patch('pypyraws.aws.events.receive_event', return_value=None)
+def test_waitforevent_timeout_raises(mock_receive):
+    """No event and no awsWaitFor raises WaitTimeOut."""
+    context = Context({'awsWaitForEvent': {'queueUrl': 'url',
+                                           'match': {},
+                                           'timeout': 10}})
+
+    with pytest.raises(WaitTimeOut) as err_info:
+        waitforevent_step.run_step(context)
+
+    assert str(err_info.value) == ("no matching event on url within 10.0 "
+                                   "seconds.")
+    assert context['awsWaitForEventOut'] is None
+    assert context['awsWaitForEventTimedOut']
+
+
+@patch('pypyraws.aws.events.receive_event', return_value=None)
+def test_waitforevent_timeout_no_error(mock_receive):
+    """No event with errorOnWaitTimeout False continues."""
+    context = Context({'awsWaitForEvent': {'queueUrl': 'url',
+                                           'match': {},
+                                           'errorOnWaitTimeout': False}})
+
+    waitforevent_step.run_step(context)
+
+    assert context['awsWaitForEventTimedOut']
+
+
+@patch('pypyraws.aws.events.receive_event', return_value=None)
+def test_waitforevent_bool_strings(mock_receive):
+    """Bool args from formatted strings are bools."""
+    context = Context({'no': 'False',
+                       'awsWaitForEvent': {'queueUrl': 'url',
+                                           'match': {},
+                                           'deleteMatched': '{no}',
+                                           'deleteUnmatched': 'True',
+                                           'errorOnWaitTimeout': '{no}'}})
+
+    waitforevent_step.run_step(context)
+
+    assert mock_receive.call_args.kwargs['delete_matched'] is False
+    assert mock_receive.call_args.kwargs['delete_unmatched'] is True
+    assert context['awsWaitForEventTimedOut']
+
+
+@patch('pypyraws.steps.waitfor.run_step')
+@patch('pypyraws.aws.events.receive_event', return_value=None)
+def test_waitforevent_timeout_falls_back_to_waitfor(mock_receive,
+                                                    mock_waitfor):
+    """No event with awsWaitFor polls with waitfor instead."""
+    context = Context({'awsWaitForEvent': {'queueUrl': 'url',
+                                           'match': {}},
+                       'awsWaitFor': {'arb': 'arb'}})
+
+    waitforevent_step.run_step(context)
+
+    mock_waitfor.assert_called_once_with(context)
+    assert context['awsWaitForEventTimedOut']
+
+
+@patch('pypyraws.steps.waitfor.run_step')
+@patch('pypyraws.aws.events.receive_event', return_value={'e': 1})
+def test_waitforevent_match_skips_waitfor(mock_receive, mock_waitfor):
+    """Matching event doesn't run the waitfor fallback."""
+    context = Context({'awsWaitForEvent': {'queueUrl': 'url',
+                                           'match': {}},
+                       'awsWaitFor': {'arb': 'arb'}})
+
+    waitforevent_step.run_step(context)
+
+    mock_waitfor.assert_not_called()
+
+# ---------------------------- run_step -------------------------------------#